@@ -7,7 +7,7 @@ from sqlalchemy import func
 from typing import Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
-from app.database import get_db
+from app.database import get_db, get_reporting_db
 from app.models import (
     FoodCourtID, Transaction, StoreTransaction, CounterTransaction,
     Customer, Store, BankingProfile,
@@ -17,7 +17,7 @@ router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 
 @router.get("/statistics")
-async def get_statistics(db: Session = Depends(get_db)):
+def get_statistics(db: Session = Depends(get_reporting_db)):
     """
     ดึงสถิติรวมของระบบ
     """
@@ -77,7 +77,7 @@ async def get_statistics(db: Session = Depends(get_db)):
 
 
 @router.get("/transactions")
-async def list_transactions(
+def list_transactions(
     skip: int = 0,
     limit: int = 100,
     store_id: Optional[int] = None,
@@ -110,7 +110,7 @@ async def list_transactions(
 
 
 @router.get("/customers")
-async def list_customers(
+def list_customers(
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
@@ -163,7 +163,7 @@ class LinkFoodCourtIDRequest(BaseModel):
 
 
 @router.post("/customers/link-foodcourt-id")
-async def link_foodcourt_id(
+def link_foodcourt_id(
     request: LinkFoodCourtIDRequest,
     db: Session = Depends(get_db)
 ):
@@ -242,7 +242,7 @@ async def link_foodcourt_id(
 
 
 @router.delete("/customers/{customer_id}/foodcourt-id/{foodcourt_id}")
-async def unlink_foodcourt_id(
+def unlink_foodcourt_id(
     customer_id: int,
     foodcourt_id: str,
     db: Session = Depends(get_db)
@@ -365,7 +365,7 @@ def resolve_banking_profile_for_store(db: Session, store: Store):
 
 
 @router.get("/banking-profiles")
-async def list_banking_profiles(db: Session = Depends(get_db)):
+def list_banking_profiles(db: Session = Depends(get_db)):
     """รายการ Banking Profiles ทั้งหมด"""
     rows = db.query(BankingProfile).order_by(BankingProfile.scope_type, BankingProfile.group_id, BankingProfile.site_id, BankingProfile.store_id).all()
     return [
@@ -390,7 +390,7 @@ async def list_banking_profiles(db: Session = Depends(get_db)):
 
 
 @router.get("/banking-profiles/resolve")
-async def resolve_banking_profile(store_id: int, db: Session = Depends(get_db)):
+def resolve_banking_profile(store_id: int, db: Session = Depends(get_db)):
     """หา profile ที่ใช้กับร้านนี้ (สำหรับ debug / แสดงใน UI)"""
     store = db.query(Store).filter(Store.id == store_id).first()
     if not store:
@@ -409,7 +409,7 @@ async def resolve_banking_profile(store_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/banking-profiles", response_model=None)
-async def create_banking_profile(body: BankingProfileCreate, db: Session = Depends(get_db)):
+def create_banking_profile(body: BankingProfileCreate, db: Session = Depends(get_db)):
     """สร้าง Banking Profile"""
     p = BankingProfile(
         name=body.name,
@@ -444,7 +444,7 @@ async def create_banking_profile(body: BankingProfileCreate, db: Session = Depen
 
 
 @router.get("/banking-profiles/{profile_id}")
-async def get_banking_profile(profile_id: int, db: Session = Depends(get_db)):
+def get_banking_profile(profile_id: int, db: Session = Depends(get_db)):
     """ดึงรายละเอียด Banking Profile (รวม secret สำหรับแก้ไข; แสดงแบบ mask ใน list)"""
     p = db.query(BankingProfile).filter(BankingProfile.id == profile_id).first()
     if not p:
@@ -480,7 +480,7 @@ async def get_banking_profile(profile_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/banking-profiles/{profile_id}")
-async def update_banking_profile(profile_id: int, body: BankingProfileUpdate, db: Session = Depends(get_db)):
+def update_banking_profile(profile_id: int, body: BankingProfileUpdate, db: Session = Depends(get_db)):
     """อัปเดต Banking Profile"""
     p = db.query(BankingProfile).filter(BankingProfile.id == profile_id).first()
     if not p:
@@ -538,7 +538,7 @@ async def update_banking_profile(profile_id: int, body: BankingProfileUpdate, db
 
 
 @router.delete("/banking-profiles/{profile_id}")
-async def delete_banking_profile(profile_id: int, db: Session = Depends(get_db)):
+def delete_banking_profile(profile_id: int, db: Session = Depends(get_db)):
     """ลบ Banking Profile"""
     p = db.query(BankingProfile).filter(BankingProfile.id == profile_id).first()
     if not p:
@@ -13,7 +13,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from app.database import get_db
-from app.models import AdFeed, AdImpression, StorePromotion, Store
+from app.models import AdFeed, AdImpressionCounter, StorePromotion, Store
+from app.services import ad_impressions
+from app.services import calendar_events as calendar_events_service
 
 router = APIRouter(prefix="/api/admin/ads", tags=["admin-ads"])
 
@@ -186,6 +188,7 @@ def delete_ad(ad_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="ไม่พบโฆษณา")
     db.delete(ad)
     db.commit()
+    ad_impressions.collector.ad_ids.clear()
     return {"message": "ลบเรียบร้อย"}
 
 
@@ -195,9 +198,8 @@ def ads_summary(
     to_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     db: Session = Depends(get_db),
 ):
-    """สรุปผลการตอบรับโฆษณา: จำนวน view และ click ต่อรายการ (มีตาราง ad_impressions)"""
-    q = db.query(AdFeed).order_by(AdFeed.id)
-    ads = q.all()
+    """สรุปผลการตอบรับโฆษณา: จำนวน view และ click ต่อรายการ (จาก ad_impression_counters ยอดต่อนาที)"""
+    ads = db.query(AdFeed.id, AdFeed.title).order_by(AdFeed.id).all()
     start_dt = None
     end_dt = None
     if from_date:
@@ -210,28 +212,24 @@ def ads_summary(
             end_dt = datetime.strptime(to_date, "%Y-%m-%d") + timedelta(days=1)
         except ValueError:
             pass
+    qr = db.query(
+        AdImpressionCounter.ad_feed_id,
+        func.sum(AdImpressionCounter.views).label("views"),
+        func.sum(AdImpressionCounter.clicks).label("clicks"),
+    )
+    if start_dt:
+        qr = qr.filter(AdImpressionCounter.minute >= start_dt)
+    if end_dt:
+        qr = qr.filter(AdImpressionCounter.minute < end_dt)
+    totals = {r.ad_feed_id: r for r in qr.group_by(AdImpressionCounter.ad_feed_id).all()}
     out = []
     for ad in ads:
-        qr = db.query(
-            AdImpression.event_type,
-            func.count(AdImpression.id).label("cnt"),
-        ).filter(AdImpression.ad_feed_id == ad.id)
-        if start_dt:
-            qr = qr.filter(AdImpression.created_at >= start_dt)
-        if end_dt:
-            qr = qr.filter(AdImpression.created_at < end_dt)
-        rows = qr.group_by(AdImpression.event_type).all()
-        views = clicks = 0
-        for r in rows:
-            if r.event_type == "view":
-                views = r.cnt or 0
-            elif r.event_type == "click":
-                clicks = r.cnt or 0
+        row = totals.get(ad.id)
         out.append({
             "ad_id": ad.id,
             "title": ad.title,
-            "views": views,
-            "clicks": clicks,
+            "views": int(row.views or 0) if row else 0,
+            "clicks": int(row.clicks or 0) if row else 0,
         })
     return {"items": out, "from": from_date, "to": to_date}
 
@@ -310,7 +308,7 @@ def calendar_events(
     month: Optional[int] = Query(None),
     db: Session = Depends(get_db),
 ):
-    """เหตุการณ์ปฏิทินจากโฆษณา (ad_feeds) และโปรโมชั่นร้าน (store_promotions) สำหรับแสดงแบบ Google Calendar"""
+    """เหตุการณ์ปฏิทินจากโฆษณา โปรโมชั่นร้าน คูปองโปรโมชั่น และ event ที่ทับกับช่วงวันที่ สำหรับแสดงแบบ Google Calendar"""
     start_dt = end_dt = None
     if start:
         try:
@@ -323,6 +321,8 @@ def calendar_events(
     if end:
         try:
             end_dt = datetime.fromisoformat(end.replace("Z", "+00:00"))
+            if len(end) == 10:
+                end_dt += timedelta(days=1)  # YYYY-MM-DD = รวมทั้งวันสุดท้าย (หน้าปฏิทินส่งวันสิ้นเดือน)
         except Exception:
             try:
                 end_dt = datetime.strptime(end[:10], "%Y-%m-%d") + timedelta(days=1)
@@ -339,45 +339,4 @@ def calendar_events(
     if not start_dt:
         start_dt = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         end_dt = start_dt + timedelta(days=31)
-    events = []
-    # โฆษณา
-    ad_rows = db.query(AdFeed).filter(AdFeed.is_active == True).all()
-    for r in ad_rows:
-        s = getattr(r, "start_at", None)
-        e = getattr(r, "end_at", None)
-        if not s:
-            s = getattr(r, "created_at", None)
-        if not s:
-            continue
-        if end_dt and s and s.replace(tzinfo=None) >= end_dt:
-            continue
-        if start_dt and e and e.replace(tzinfo=None) <= start_dt:
-            continue
-        events.append({
-            "id": "ad-" + str(r.id),
-            "title": r.title or "โฆษณา",
-            "start": (s.isoformat() if s else None),
-            "end": (e.isoformat() if e else s.isoformat() if s else None),
-            "type": "ad",
-            "store_id": getattr(r, "store_id", None),
-        })
-    # โปรโมชั่นร้าน
-    promos = db.query(StorePromotion).filter(StorePromotion.is_active == True).all()
-    for r in promos:
-        s = getattr(r, "valid_from", None)
-        e = getattr(r, "valid_to", None)
-        if not s:
-            continue
-        if end_dt and s and s.replace(tzinfo=None) >= end_dt:
-            continue
-        if start_dt and e and e.replace(tzinfo=None) <= start_dt:
-            continue
-        events.append({
-            "id": "promo-" + str(r.id),
-            "title": r.title or "โปรโมชั่น",
-            "start": (s.isoformat() if s else None),
-            "end": (e.isoformat() if e else s.isoformat() if s else None),
-            "type": "promotion",
-            "store_id": r.store_id,
-        })
-    return {"events": events}
+    return {"events": calendar_events_service.events_in_range(db, start_dt, end_dt)}
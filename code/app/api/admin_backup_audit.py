@@ -11,9 +11,10 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.database import get_db
-from app.models import EmergencyBackupEntry, AuditLog, User, Store
+from app.models import EmergencyBackupEntry, User, Store
 from app.api.auth import get_current_session_user, require_admin
-from app.services.audit_log import write_audit_log
+from app.services import archive
+from app.services.audit_log import log_action
 
 router = APIRouter(prefix="/api", tags=["admin-backup-audit"])
 
@@ -56,8 +57,8 @@ def create_emergency_backup(
     db.commit()
     db.refresh(entry)
     ip = request.client.host if request.client else None
-    write_audit_log(
-        db, action="emergency_backup_create", table_name="emergency_backup_entries",
+    log_action(
+        action="emergency_backup_create", table_name="emergency_backup_entries",
         record_id=entry.id, new_values={"amount": body.amount, "entry_type": body.entry_type},
         user_id=user_id, source=body.source, ip_address=ip,
     )
@@ -102,26 +103,26 @@ def list_audit_logs(
     db: Session = Depends(get_db),
     user: dict = Depends(require_admin),
 ):
-    """ดู audit logs - เฉพาะ admin"""
-    q = db.query(AuditLog).order_by(AuditLog.id.desc()).limit(limit)
+    """ดู audit logs - เฉพาะ admin (รวมแถวที่ย้ายไป archive แล้ว)"""
+    where = {}
     if source:
-        q = q.filter(AuditLog.source == source)
+        where["source"] = source
     if table_name:
-        q = q.filter(AuditLog.table_name == table_name)
-    rows = q.all()
+        where["table_name"] = table_name
+    rows = archive.query(db, "audit_logs", where=where, limit=limit)
     return {
         "items": [
             {
-                "id": r.id,
-                "user_id": r.user_id,
-                "source": r.source,
-                "action": r.action,
-                "table_name": r.table_name,
-                "record_id": r.record_id,
-                "old_values": r.old_values,
-                "new_values": r.new_values,
-                "ip_address": r.ip_address,
-                "created_at": r.created_at.isoformat() if r.created_at else None,
+                "id": r["id"],
+                "user_id": r["user_id"],
+                "source": r["source"],
+                "action": r["action"],
+                "table_name": r["table_name"],
+                "record_id": r["record_id"],
+                "old_values": r["old_values"],
+                "new_values": r["new_values"],
+                "ip_address": r["ip_address"],
+                "created_at": r["created_at"].isoformat() if r["created_at"] else None,
             }
             for r in rows
         ]
@@ -37,7 +37,7 @@ def _load_config() -> configparser.ConfigParser:
 
 
 @router.get("")
-async def get_config_masked(user: dict = Depends(require_admin)):
+def get_config_masked(user: dict = Depends(require_admin)):
     """
     ดึง config ทั้งหมด สำหรับค่าลับส่งเป็น ****
     ใช้ร่วมกับ /reveal เมื่อต้องการดูค่าจริง
@@ -58,7 +58,7 @@ async def get_config_masked(user: dict = Depends(require_admin)):
 
 
 @router.get("/reveal")
-async def reveal_config_value(
+def reveal_config_value(
     section: str = Query(..., description="Section ใน config.ini"),
     key: str = Query(..., description="Key ที่ต้องการดูค่า"),
     user: dict = Depends(require_admin),
@@ -87,7 +87,7 @@ GP_KEY = "SETTLEMENT_GP_PERCENT"
 
 
 @router.get("/gp")
-async def get_gp_percent(user: dict = Depends(require_admin)):
+def get_gp_percent(user: dict = Depends(require_admin)):
     """ดึงอัตราหัก GP % ปัจจุบัน (จาก config.ini หรือ env)"""
     cfg = _load_config()
     value = None
@@ -107,7 +107,7 @@ class GPUpdateBody(BaseModel):
 
 
 @router.put("/gp")
-async def update_gp_percent(
+def update_gp_percent(
     body: GPUpdateBody,
     user: dict = Depends(require_admin),
 ):
@@ -127,7 +127,7 @@ async def update_gp_percent(
 
 
 @router.put("")
-async def update_config(
+def update_config(
     body: ConfigUpdateBody,
     user: dict = Depends(require_admin),
 ):
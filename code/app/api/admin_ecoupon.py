@@ -1,20 +1,23 @@
 # Admin E-Coupon API - ออก/แลก E-Coupon
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-import secrets
-import string
+import csv
+import io
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.database import get_db
-from app.models import ECoupon, Customer
+from app.models import ECoupon, Customer, CouponPromo
+from app.api.auth import require_admin
+from app.services import ecoupon_codes
 from sqlalchemy.orm import Session
 from fastapi import Depends
 
 router = APIRouter(prefix="/api/admin/ecoupon", tags=["admin-ecoupon"])
 PAYMENT_METHODS = ["cash", "promptpay", "credit_debit", "omise", "stripe", "alipay", "wechat_pay", "line_pay", "true_wallet", "e_money"]
 
-def _gen_code(prefix="EC", length=10):
-    return prefix + "".join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+BULK_MAX_COUNT = 100000
 
 class IssueECouponRequest(BaseModel):
     amount: float
@@ -28,9 +31,6 @@ def issue_ecoupon(data: IssueECouponRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="จำนวนต้องมากกว่า 0")
     if data.payment_method not in PAYMENT_METHODS:
         raise HTTPException(status_code=400, detail="วิธีชำระไม่รองรับ")
-    code = _gen_code()
-    while db.query(ECoupon).filter(ECoupon.code == code).first():
-        code = _gen_code()
     paid_at = datetime.utcnow()
     if data.paid_at:
         try:
@@ -40,12 +40,81 @@ def issue_ecoupon(data: IssueECouponRequest, db: Session = Depends(get_db)):
     status = "assigned" if data.customer_id else "available"
     if data.customer_id and not db.query(Customer).filter(Customer.id == data.customer_id).first():
         raise HTTPException(status_code=404, detail="ไม่พบลูกค้า")
-    ec = ECoupon(code=code, amount=data.amount, customer_id=data.customer_id, status=status, payment_method=data.payment_method, paid_at=paid_at)
-    db.add(ec)
+    ec = ECoupon(amount=data.amount, customer_id=data.customer_id, status=status, payment_method=data.payment_method, paid_at=paid_at)
+    ecoupon_codes.add_with_unique_code(db, ec)
     db.commit()
     db.refresh(ec)
     return {"success": True, "code": ec.code, "amount": float(ec.amount), "status": ec.status, "customer_id": ec.customer_id}
 
+class BulkIssueRequest(BaseModel):
+    count: int
+    amount: float
+    payment_method: str
+    scheme: str = "random"  # random | keyed
+    customer_id: Optional[int] = None
+    promotion_id: Optional[int] = None
+    valid_from: Optional[str] = None
+    valid_to: Optional[str] = None
+    store_ids: Optional[List[int]] = None  # ว่าง = ทุกร้าน
+
+def _parse_dt(s: Optional[str], field: str) -> Optional[datetime]:
+    if not s:
+        return None
+    try:
+        return datetime.fromisoformat(s.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{field} ไม่ถูกต้อง")
+
+def _codes_csv(codes: List[str], amount: float, status: str):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["code", "amount", "status"])
+    for i, code in enumerate(codes, 1):
+        writer.writerow([code, f"{amount:.2f}", status])
+        if i % 1000 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+@router.post("/bulk-issue")
+def bulk_issue_ecoupons(data: BulkIssueRequest, db: Session = Depends(get_db), user: dict = Depends(require_admin)):
+    """ออกคูปองจำนวนมาก (แคมเปญ) แล้วคืนรายการรหัสเป็น CSV แบบ stream"""
+    if data.count <= 0 or data.count > BULK_MAX_COUNT:
+        raise HTTPException(status_code=400, detail=f"จำนวนต้องอยู่ระหว่าง 1 - {BULK_MAX_COUNT}")
+    if data.amount <= 0:
+        raise HTTPException(status_code=400, detail="จำนวนต้องมากกว่า 0")
+    if data.payment_method not in PAYMENT_METHODS:
+        raise HTTPException(status_code=400, detail="วิธีชำระไม่รองรับ")
+    if data.scheme not in ecoupon_codes.SCHEMES:
+        raise HTTPException(status_code=400, detail="scheme ต้องเป็น random หรือ keyed")
+    if data.customer_id and not db.query(Customer).filter(Customer.id == data.customer_id).first():
+        raise HTTPException(status_code=404, detail="ไม่พบลูกค้า")
+    if data.promotion_id and not db.query(CouponPromo).filter(CouponPromo.id == data.promotion_id).first():
+        raise HTTPException(status_code=404, detail="ไม่พบโปรโมชั่น")
+    store_ids = sorted(set(data.store_ids or []))
+    codes = ecoupon_codes.issue_bulk(
+        db,
+        count=data.count,
+        amount=data.amount,
+        payment_method=data.payment_method,
+        scheme=data.scheme,
+        customer_id=data.customer_id,
+        promotion_id=data.promotion_id,
+        valid_from=_parse_dt(data.valid_from, "valid_from"),
+        valid_to=_parse_dt(data.valid_to, "valid_to"),
+        allowed_store_ids=json.dumps(store_ids) if store_ids else None,
+        store_ids=store_ids,
+    )
+    db.commit()
+    status = "assigned" if data.customer_id else "available"
+    filename = f"ecoupons_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.csv"
+    return StreamingResponse(
+        _codes_csv(codes, data.amount, status),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Issued-Count": str(len(codes))},
+    )
+
 @router.get("/list")
 def list_ecoupons(status: Optional[str] = None, customer_id: Optional[int] = None, limit: int = 100, db: Session = Depends(get_db)):
     q = db.query(ECoupon)
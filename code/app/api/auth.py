@@ -69,7 +69,7 @@ def _get_session_user(request: Request) -> Optional[dict]:
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login(
+def login(
     data: LoginRequest,
     request: Request,
     db: Session = Depends(get_db),
@@ -114,7 +114,7 @@ async def login(
 
 
 @router.get("/me", response_model=MeResponse)
-async def me(request: Request, db: Session = Depends(get_db)):
+def me(request: Request, db: Session = Depends(get_db)):
     """ตรวจสอบสถานะล็อกอิน"""
     user_data = _get_session_user(request)
     if not user_data:
@@ -2,12 +2,12 @@
 Counter API - ระบบแลก Marketplace ID ที่ Counter
 """
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
-import json
-from app.database import get_db
-from app.services.payment_hub import PaymentHub
+from app.database import get_async_db, get_db
+from app.services.payment_hub import FoodCourtIDNotFound, PaymentHub
 from app.models import PaymentMethod
 
 router = APIRouter(prefix="/api/counter", tags=["counter"])
@@ -38,7 +38,7 @@ class TopUpRequest(BaseModel):
 
 
 @router.post("/exchange")
-async def exchange_to_foodcourt_id(
+def exchange_to_foodcourt_id(
     request: ExchangeRequest,
     db: Session = Depends(get_db)
 ):
@@ -82,14 +82,13 @@ async def exchange_to_foodcourt_id(
 @router.get("/balance/{foodcourt_id}")
 async def get_balance(
     foodcourt_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     ตรวจสอบยอดเงินคงเหลือของ Marketplace ID
     """
     try:
-        payment_hub = PaymentHub(db)
-        balance_info = payment_hub.get_foodcourt_id_balance(foodcourt_id)
+        balance_info = await db.run_sync(lambda session: PaymentHub(session).get_foodcourt_id_balance(foodcourt_id))
 
         if not balance_info:
             raise HTTPException(status_code=404, detail=f"Marketplace ID not found: {foodcourt_id}")
@@ -105,7 +104,7 @@ async def get_balance(
 
 
 @router.post("/refund")
-async def refund_remaining_balance(
+def refund_remaining_balance(
     request: RefundRequest,
     db: Session = Depends(get_db)
 ):
@@ -131,7 +130,7 @@ async def refund_remaining_balance(
 
 
 @router.get("/payment-methods")
-async def get_payment_methods(db: Session = Depends(get_db)):
+def get_payment_methods(db: Session = Depends(get_db)):
     """
     ดึงรายการ Payment Methods ที่รองรับ
     """
@@ -151,7 +150,7 @@ async def get_payment_methods(db: Session = Depends(get_db)):
 
 
 @router.post("/topup")
-async def topup_foodcourt_id(
+def topup_foodcourt_id(
     request: TopUpRequest,
     db: Session = Depends(get_db)
 ):
@@ -159,9 +158,6 @@ async def topup_foodcourt_id(
     เติมเงินให้ Marketplace ID ที่มีอยู่แล้ว
     """
     try:
-        from app.models import FoodCourtID, CounterTransaction
-        from datetime import datetime
-        
         # Validate payment method
         try:
             payment_method = PaymentMethod(request.payment_method)
@@ -170,51 +166,25 @@ async def topup_foodcourt_id(
                 status_code=400,
                 detail=f"Invalid payment method. Available methods: {[m.value for m in PaymentMethod]}"
             )
-        
-        # Validate amount
-        if request.amount <= 0:
-            raise HTTPException(status_code=400, detail="Amount must be greater than 0")
-        
-        # Find Marketplace ID
-        foodcourt_id = db.query(FoodCourtID).filter(
-            FoodCourtID.foodcourt_id == request.foodcourt_id
-        ).first()
-        
-        if not foodcourt_id:
-            raise HTTPException(status_code=404, detail=f"Marketplace ID not found: {request.foodcourt_id}")
-        
-        if foodcourt_id.status != "active":
-            raise HTTPException(status_code=400, detail=f"Marketplace ID is not active (status: {foodcourt_id.status})")
-        
-        # Add balance
-        old_balance = foodcourt_id.current_balance
-        foodcourt_id.current_balance += request.amount
-        foodcourt_id.initial_amount += request.amount  # Update initial amount as well
-        
-        # Create counter transaction for topup
-        counter_transaction = CounterTransaction(
-            foodcourt_id=request.foodcourt_id,
-            counter_id=request.counter_id or 0,
-            counter_user_id=request.counter_user_id or 0,
-            amount=request.amount,
-            payment_method=payment_method,
-            payment_details=json.dumps(request.payment_details) if request.payment_details else None,
-            status="completed"
-        )
-        db.add(counter_transaction)
-        db.commit()
-        db.refresh(foodcourt_id)
-        db.refresh(counter_transaction)
-        
+
+        payment_hub = PaymentHub(db)
+        try:
+            topup_info = payment_hub.topup_foodcourt_id(
+                foodcourt_id_str=request.foodcourt_id,
+                amount=request.amount,
+                payment_method=payment_method,
+                payment_details=request.payment_details,
+                counter_id=request.counter_id,
+                counter_user_id=request.counter_user_id
+            )
+        except FoodCourtIDNotFound as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         return {
             "success": True,
-            "foodcourt_id": foodcourt_id.foodcourt_id,
-            "topup_amount": request.amount,
-            "old_balance": old_balance,
-            "new_balance": foodcourt_id.current_balance,
-            "payment_method": payment_method.value,
-            "transaction_id": counter_transaction.id,
-            "created_at": counter_transaction.created_at.isoformat()
+            **topup_info
         }
     except HTTPException:
         raise
@@ -226,7 +196,7 @@ async def topup_foodcourt_id(
 
 
 @router.get("/foodcourt-ids")
-async def list_foodcourt_ids(
+def list_foodcourt_ids(
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
@@ -36,7 +36,7 @@ class TransactionStatusResponse(BaseModel):
 
 
 @router.get("/stores/{store_id}/contract-status")
-async def get_contract_status(store_id: int, db: Session = Depends(get_db)):
+def get_contract_status(store_id: int, db: Session = Depends(get_db)):
     """
     ตรวจสอบสถานะการยอมรับสัญญา P2P ของร้านค้า
     """
@@ -55,7 +55,7 @@ async def get_contract_status(store_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/stores/accept-contract")
-async def accept_contract(request: AcceptContractRequest, db: Session = Depends(get_db)):
+def accept_contract(request: AcceptContractRequest, db: Session = Depends(get_db)):
     """
     ร้านค้ายอมรับสัญญา P2P
     """
@@ -77,7 +77,7 @@ async def accept_contract(request: AcceptContractRequest, db: Session = Depends(
 
 
 @router.post("/transactions")
-async def create_crypto_transaction(
+def create_crypto_transaction(
     request: CreateCryptoTransactionRequest,
     db: Session = Depends(get_db)
 ):
@@ -148,7 +148,7 @@ async def update_transaction_status(
 
 
 @router.get("/stores/{store_id}/transactions")
-async def get_store_transactions(store_id: int, db: Session = Depends(get_db)):
+def get_store_transactions(store_id: int, db: Session = Depends(get_db)):
     """
     ดึงรายการ Crypto Transactions ของร้านค้า
     """
@@ -173,7 +173,7 @@ async def get_store_transactions(store_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/fee/transaction")
-async def get_transaction_fee(amount: float, db: Session = Depends(get_db)):
+def get_transaction_fee(amount: float, db: Session = Depends(get_db)):
     """
     คำนวณ Transaction Fee
     """
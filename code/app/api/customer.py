@@ -58,7 +58,7 @@ class RefundResponse(BaseModel):
 
 
 @router.post("/register", response_model=RegisterResponse)
-async def register_customer(request: RegisterRequest, db: Session = Depends(get_db)):
+def register_customer(request: RegisterRequest, db: Session = Depends(get_db)):
     """
     ลงทะเบียนลูกค้าใหม่ และผูก Marketplace ID ที่ว่าง หรือสร้างใหม่
     """
@@ -127,7 +127,7 @@ async def register_customer(request: RegisterRequest, db: Session = Depends(get_
 
 
 @router.post("/check-balance", response_model=BalanceResponse)
-async def check_balance(request: BalanceCheckRequest, db: Session = Depends(get_db)):
+def check_balance(request: BalanceCheckRequest, db: Session = Depends(get_db)):
     """
     ตรวจสอบยอดเงินผ่าน QR Code
     """
@@ -176,7 +176,7 @@ async def check_balance(request: BalanceCheckRequest, db: Session = Depends(get_
 
 
 @router.get("/{customer_id}/balance", response_model=BalanceResponse)
-async def get_balance(customer_id: int, db: Session = Depends(get_db)):
+def get_balance(customer_id: int, db: Session = Depends(get_db)):
     """
     ดึงยอดเงินคงเหลือของลูกค้า
     """
@@ -208,7 +208,7 @@ async def get_balance(customer_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/refund", response_model=RefundResponse)
-async def request_refund(request: RefundRequest, db: Session = Depends(get_db)):
+def request_refund(request: RefundRequest, db: Session = Depends(get_db)):
     """
     สร้างคำขอคืนเงิน (Self-Service Refund)
     """
@@ -252,7 +252,7 @@ async def request_refund(request: RefundRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/{customer_id}/refund-requests")
-async def get_refund_requests(customer_id: int, db: Session = Depends(get_db)):
+def get_refund_requests(customer_id: int, db: Session = Depends(get_db)):
     """
     ดึงรายการคำขอคืนเงินของลูกค้า
     """
@@ -274,7 +274,7 @@ async def get_refund_requests(customer_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/generate-qr/{customer_id}")
-async def generate_qr_code(customer_id: int, db: Session = Depends(get_db)):
+def generate_qr_code(customer_id: int, db: Session = Depends(get_db)):
     """
     สร้าง QR Code สำหรับตรวจสอบยอดเงิน
     """
@@ -2,11 +2,11 @@
 Geo API - ระบบจัดการตำแหน่งร้านค้าและแผนที่
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from pydantic import BaseModel
 from typing import Optional, List
 from app.database import get_db
-from app.models import Store, Profile, Event
+from app.models import Store
 
 router = APIRouter(prefix="/api/geo", tags=["geo"])
 
@@ -35,13 +35,14 @@ class StoreLocationResponse(BaseModel):
 
 
 @router.get("/stores", response_model=List[StoreLocationResponse])
-async def get_stores_with_locations(
+def get_stores_with_locations(
     profile_id: Optional[int] = Query(None),
     event_id: Optional[int] = Query(None),
     db: Session = Depends(get_db)
 ):
     """ดึงรายการร้านค้าพร้อมตำแหน่ง"""
-    query = db.query(Store)
+    # profile / event มากับ query เดียว (ไม่ query ต่อร้าน)
+    query = db.query(Store).options(joinedload(Store.profile), joinedload(Store.event))
     
     if profile_id:
         query = query.filter(Store.profile_id == profile_id)
@@ -52,16 +53,8 @@ async def get_stores_with_locations(
     
     result = []
     for store in stores:
-        profile_name = None
-        event_name = None
-        
-        if store.profile_id:
-            profile = db.query(Profile).filter(Profile.id == store.profile_id).first()
-            profile_name = profile.name if profile else None
-        
-        if store.event_id:
-            event = db.query(Event).filter(Event.id == store.event_id).first()
-            event_name = event.name if event else None
+        profile_name = store.profile.name if store.profile else None
+        event_name = store.event.name if store.event else None
         
         result.append({
             "id": store.id,
@@ -79,7 +72,7 @@ async def get_stores_with_locations(
 
 
 @router.put("/stores/{store_id}/location")
-async def update_store_location(
+def update_store_location(
     store_id: int,
     location: StoreLocationUpdate,
     db: Session = Depends(get_db)
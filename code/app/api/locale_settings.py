@@ -3,16 +3,20 @@ Locale & Currency Settings API – ตั้งค่าภาษาและห
 """
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.models import Locale, Currency, AppSetting, ProgramSetting, StoreLocaleSetting, Store
+from app.models import Locale, Currency, StoreLocaleSetting, Store
+from app.services import settings_cache
+from app.services.locale_context import get_labels_bundle, get_locale_context, invalidate_locale_cache
+from app.utils.i18n import SUPPORTED_LOCALES
 
 router = APIRouter(prefix="/api/locale-settings", tags=["locale-settings"])
 
-VALID_LOCALES = {"th", "en", "lo", "my", "kh", "ms", "shn", "zh", "ru"}
+VALID_LOCALES = set(SUPPORTED_LOCALES)
 CURRENCY_MAP = {
     "th": ("THB", "฿", "Baht"),
     "en": ("USD", "$", "Dollar"),
@@ -27,8 +31,7 @@ CURRENCY_MAP = {
 
 
 def _get_global_setting(db: Session, key: str) -> Optional[str]:
-    row = db.query(AppSetting).filter(AppSetting.key == key).first()
-    return row.value if row else None
+    return settings_cache.get_app_setting(db, key)
 
 
 def _get_store_locale(db: Session, store_id: int) -> Optional[StoreLocaleSetting]:
@@ -36,17 +39,8 @@ def _get_store_locale(db: Session, store_id: int) -> Optional[StoreLocaleSetting
 
 
 def _resolve_locale(db: Session, store_id: Optional[int]) -> tuple:
-    """คืน (locale, currency_code, currency_symbol, currency_name)"""
-    if store_id:
-        row = _get_store_locale(db, store_id)
-        if row:
-            return (row.locale, row.currency_code, row.currency_symbol, row.currency_name or "Baht")
-    return (
-        _get_global_setting(db, "locale") or "th",
-        _get_global_setting(db, "currency_code") or "THB",
-        _get_global_setting(db, "currency_symbol") or "฿",
-        _get_global_setting(db, "currency_name") or "Baht",
-    )
+    """คืน (locale, currency_code, currency_symbol, currency_name) - cache ต่อร้าน"""
+    return tuple(get_locale_context(db, store_id))
 
 
 class LocaleSettingsResponse(BaseModel):
@@ -55,6 +49,7 @@ class LocaleSettingsResponse(BaseModel):
     currency_symbol: str
     currency_name: str
     translations: dict
+    labels_version: Optional[str] = None  # ใช้ต่อท้าย /bundle/{locale}?v=... ให้ browser cache ได้
 
 
 class LocaleUpdateBody(BaseModel):
@@ -81,41 +76,49 @@ def list_currencies(db: Session = Depends(get_db)):
 def get_locale_settings(
     store_id: Optional[int] = Query(None, description="ร้านที่ต้องการ - ถ้าไม่ระบุใช้ค่าทั่วไป"),
     locale: Optional[str] = Query(None, description="Override ภาษา (th,en,lo,...) - สำหรับ admin/customer"),
+    include_translations: bool = Query(True, description="false = ไม่ส่ง translations (ให้โหลดจาก /bundle/{locale})"),
     db: Session = Depends(get_db),
 ):
     """ดึงการตั้งค่าภาษา หน่วยเงิน และคำแปล (ตาม store_id ถ้ามี) - labels จาก program_settings"""
     base_locale, currency_code, currency_symbol, currency_name = _resolve_locale(db, store_id)
     locale = locale if locale and locale in VALID_LOCALES else base_locale
 
-    # อ่าน labels จาก program_settings (แต่ละ row = label key, แต่ละ column = ภาษา)
-    col_map = {"th": "label_th", "en": "label_en", "lo": "label_lo", "my": "label_my",
-               "kh": "label_kh", "ms": "label_ms", "shn": "label_shn", "zh": "label_zh", "ru": "label_ru"}
-    fallback_order = [locale, "en", "th"] if locale != "th" else [locale, "en"]
-    translations = {}
-    try:
-        rows = db.query(ProgramSetting).all()
-        for r in rows:
-            val = None
-            for loc in fallback_order:
-                col = col_map.get(loc)
-                if col:
-                    val = getattr(r, col, None)
-                    if val:
-                        break
-            if val:
-                translations[r.label_key] = val
-    except Exception:
-        pass  # ตาราง program_settings อาจยังไม่มี
+    # labels จาก program_settings (แต่ละ row = label key, แต่ละ column = ภาษา) - cache ต่อภาษา
+    bundle = get_labels_bundle(db, locale)
 
     return LocaleSettingsResponse(
         locale=locale,
         currency_code=currency_code,
         currency_symbol=currency_symbol,
         currency_name=currency_name,
-        translations=translations,
+        translations=bundle.labels if include_translations else {},
+        labels_version=bundle.version,
     )
 
 
+@router.get("/bundle/{locale}")
+def get_labels_bundle_file(locale: str, request: Request, db: Session = Depends(get_db)):
+    """
+    คำแปลทั้งหมดของภาษาเดียว (JSON สร้างไว้แล้ว + gzip ถ้า browser รองรับ)
+    ส่ง ETag / Cache-Control - เรียกพร้อม ?v={labels_version} เพื่อให้ cache ได้นาน
+    """
+    if locale not in VALID_LOCALES:
+        raise HTTPException(status_code=404, detail="Locale not found")
+    bundle = get_labels_bundle(db, locale)
+    versioned = request.query_params.get("v") == bundle.version
+    headers = {
+        "ETag": bundle.etag,
+        "Cache-Control": "public, max-age=31536000, immutable" if versioned else "public, max-age=60, must-revalidate",
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == bundle.etag:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in (request.headers.get("accept-encoding") or "").lower():
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=bundle.body_gzip, media_type="application/json; charset=utf-8", headers=headers)
+    return Response(content=bundle.body, media_type="application/json; charset=utf-8", headers=headers)
+
+
 @router.put("")
 def update_locale_settings(body: LocaleUpdateBody, db: Session = Depends(get_db)):
     """อัปเดตการตั้งค่าภาษาและหน่วยเงิน (ต่อร้าน store_id)"""
@@ -156,4 +159,5 @@ def update_locale_settings(body: LocaleUpdateBody, db: Session = Depends(get_db)
 
     db.commit()
     db.refresh(row)
-    return get_locale_settings(store_id=store_id, db=db)
+    invalidate_locale_cache()
+    return get_locale_settings(store_id=store_id, locale=None, include_translations=True, db=db)
@@ -3,7 +3,7 @@ Member API - ลูกค้าสมาชิกออนไลน์: ลง
 """
 import re
 from datetime import datetime, timedelta
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -16,17 +16,13 @@ from app.models import (
     Customer,
     CustomerBalance,
     MemberPointsLedger,
-    MemberVoucher,
-    VoucherDefinition,
-    StorePromotion,
     ECoupon,
     AdFeed,
-    AdImpression,
     MemberActivity,
     Store,
 )
 from app.config import SECRET_KEY, STRIPE_SECRET_KEY, STRIPE_PUBLISHABLE_KEY, BACKEND_URL
-from app.services import stripe_promptpay
+from app.services import ad_impressions, member_summary, stripe_promptpay
 
 router = APIRouter(prefix="/api/member", tags=["member"])
 security = HTTPBearer(auto_error=False)
@@ -211,52 +207,21 @@ class DashboardResponse(BaseModel):
 
 @router.get("/me", response_model=DashboardResponse)
 def me(customer: Customer = Depends(get_current_customer), db: Session = Depends(get_db)):
-    bal = db.query(CustomerBalance).filter(CustomerBalance.customer_id == customer.id).first()
-    balance = float(bal.balance) if bal else 0.0
-    vouchers = []
-    for mv in db.query(MemberVoucher).join(VoucherDefinition).filter(
-        MemberVoucher.customer_id == customer.id,
-        MemberVoucher.used_at.is_(None),
-        VoucherDefinition.is_active == True,
-    ).all():
-        vouchers.append({
-            "id": mv.id,
-            "name": mv.voucher_definition.name,
-            "value": mv.voucher_definition.value,
-            "valid_to": mv.voucher_definition.valid_to.isoformat() if mv.voucher_definition.valid_to else None,
-        })
-    promotions = []
-    for p in db.query(StorePromotion).filter(StorePromotion.is_active == True).limit(20).all():
-        promotions.append({
-            "id": p.id,
-            "store_id": p.store_id,
-            "title": p.title,
-            "description": p.description,
-            "valid_to": p.valid_to.isoformat() if p.valid_to else None,
-        })
-    e_coupon_sum = db.query(ECoupon).filter(
-        ECoupon.customer_id == customer.id,
-        ECoupon.status == "assigned",
-    ).all()
-    e_coupon_balance = sum(float(c.amount) for c in e_coupon_sum)
-    activities = db.query(MemberActivity).filter(MemberActivity.customer_id == customer.id).order_by(MemberActivity.id.desc()).limit(20).all()
-    recent_activities = [
-        {"id": a.id, "type": a.activity_type, "amount": a.amount, "description": a.description, "created_at": a.created_at.isoformat() if a.created_at else None}
-        for a in activities
-    ]
+    # ยอดเงิน / คูปอง / voucher / กิจกรรมล่าสุด อ่านจาก member_summaries แถวเดียว (อัปเดตตอนมีการแก้ไข)
+    summary = member_summary.get_summary(db, customer.id)
     return DashboardResponse(
         customer_id=customer.id,
         username=customer.username,
         name=customer.name,
         phone=customer.phone,
         email=customer.email,
-        balance=balance,
+        balance=float(summary.balance or 0),
         total_points=float(customer.total_points or 0),
-        vouchers=vouchers,
-        promotions=promotions,
-        e_coupon_balance=e_coupon_balance,
+        vouchers=member_summary.summary_vouchers(summary),
+        promotions=member_summary.get_active_promotions(db),
+        e_coupon_balance=float(summary.e_coupon_balance or 0),
         auto_apply_coupon=getattr(customer, "auto_apply_coupon", True),
-        recent_activities=recent_activities,
+        recent_activities=member_summary.summary_activities(summary),
     )
 
 
@@ -335,19 +300,20 @@ class AdTrackRequest(BaseModel):
 
 @router.post("/ads/track")
 def track_ad(
-    body: AdTrackRequest,
+    body: Union[AdTrackRequest, List[AdTrackRequest]],
     db: Session = Depends(get_db),
     customer: Optional[Customer] = Depends(get_current_customer_optional),
 ):
-    """บันทึกการดู/กดโฆษณา (สำหรับสรุปผล); สมาชิกล็อกอินส่ง token ได้ customer_id จะถูกเก็บ"""
-    ad = db.query(AdFeed).filter(AdFeed.id == body.ad_feed_id).first()
-    if not ad:
-        raise HTTPException(status_code=404, detail="ไม่พบโฆษณา")
+    """
+    บันทึกการดู/กดโฆษณา (สำหรับสรุปผล); สมาชิกล็อกอินส่ง token ได้ customer_id จะถูกเก็บ
+    ส่งเป็น array ได้ (หลาย event ในครั้งเดียว) - เก็บลง buffer แล้วเขียน DB เป็นชุด (services/ad_impressions)
+    """
+    items = body if isinstance(body, list) else [body]
     customer_id = customer.id if customer else None
-    imp = AdImpression(ad_feed_id=body.ad_feed_id, event_type=body.event_type, customer_id=customer_id)
-    db.add(imp)
-    db.commit()
-    return {"ok": True}
+    accepted = ad_impressions.track(db, [(i.ad_feed_id, i.event_type) for i in items], customer_id=customer_id)
+    if not isinstance(body, list) and not accepted:
+        raise HTTPException(status_code=404, detail="ไม่พบโฆษณา")
+    return {"ok": True, "accepted": accepted}
 
 
 # --- Stripe: เติมเงิน / ซื้อ E-Coupon (สำหรับทดสอบผ่าน Stripe) ---
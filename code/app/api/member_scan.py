@@ -1,10 +1,9 @@
 """
 Member Scan-Pay API - อ่าน QR PromptPay (plain text) ดึง store_id, order_id แล้วหักจ่ายด้วย e-coupon
-กรองคูปองตาม valid_from/valid_to และร้านที่ร่วมรายการ; รองรับ use_coupon (ไม่ใช้คูปองจากหน้า member)
+กรองคูปองตาม valid_from/valid_to และร้านที่ร่วมรายการใน SQL (services/ecoupon_redemption); รองรับ use_coupon (ไม่ใช้คูปองจากหน้า member)
 """
 import re
-import json
-from typing import Optional, List
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -13,29 +12,13 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.database import get_db
-from app.models import Customer, ECoupon, Order, MemberActivity
+from app.models import Customer, Order, MemberActivity
 from app.api.member import get_current_customer
+from app.services import ecoupon_redemption
 
 router = APIRouter(prefix="/api/member", tags=["member"])
 
 
-def _parse_allowed_store_ids(s: Optional[str]) -> List[int]:
-    if not s or not s.strip():
-        return []
-    try:
-        out = json.loads(s)
-        return [int(x) for x in out] if isinstance(out, list) else []
-    except Exception:
-        return []
-
-
-def _coupon_valid_for_store(ec: ECoupon, store_id: int) -> bool:
-    allowed = _parse_allowed_store_ids(ec.allowed_store_ids)
-    if not allowed:
-        return True
-    return store_id in allowed
-
-
 def parse_promptpay_qr(qr_text: str) -> dict:
     """
     อ่านข้อความจาก QR PromptPay (plain text) แล้วดึง store_id, order_id
@@ -127,45 +110,16 @@ def scan_pay(
             detail="คุณเลือกไม่ใช้คูปองสำหรับการชำระนี้ กรุณาชำระด้วยวิธีอื่นหรือเปลี่ยนการตั้งค่าในหน้า Member",
         )
 
-    now_utc = datetime.utcnow()
-    # หา e-coupon ที่ assigned ให้ลูกค้า อยู่ในช่วงใช้ได้ (valid_from/valid_to) และใช้ได้ที่ร้านนี้
-    all_assigned = (
-        db.query(ECoupon)
-        .filter(ECoupon.customer_id == customer.id, ECoupon.status == "assigned")
-        .order_by(ECoupon.id.asc())
-        .all()
-    )
-    available = []
-    for ec in all_assigned:
-        if ec.valid_from and ec.valid_from > now_utc:
-            continue
-        if ec.valid_to and ec.valid_to < now_utc:
-            continue
-        if not _coupon_valid_for_store(ec, store_id):
-            continue
-        available.append(ec)
-    total_available = sum(float(c.amount) for c in available)
-    if total_available < amount:
+    # เลือกคูปองที่ใช้ได้ + หักยอดแบบ atomic ใน query ชุดเดียว (กันสแกนพร้อมกันแล้วจ่ายซ้ำ)
+    try:
+        ecoupon_redemption.redeem(db, customer.id, store_id, amount, order_id=order.id if order else None)
+    except ecoupon_redemption.InsufficientCouponBalance as e:
         raise HTTPException(
             status_code=400,
-            detail=f"ยอด e-coupon ไม่พอ (มี {total_available:.2f} บาท ต้องการ {amount:.2f} บาท)",
+            detail=f"ยอด e-coupon ไม่พอ (มี {e.available:.2f} บาท ต้องการ {amount:.2f} บาท)",
         )
-
-    remaining = amount
-    for ec in available:
-        if remaining <= 0:
-            break
-        use = min(remaining, float(ec.amount))
-        ec.store_id = store_id
-        ec.order_id = order.id if order else None
-        ec.redeemed_at = datetime.utcnow()
-        if use >= float(ec.amount):
-            ec.status = "used"
-            ec.amount = 0
-        else:
-            ec.amount = float(ec.amount) - use
-        remaining -= use
-        db.add(ec)
+    except ecoupon_redemption.ConcurrentRedemption:
+        raise HTTPException(status_code=409, detail="คูปองกำลังถูกใช้จากอีกรายการ กรุณาลองใหม่อีกครั้ง")
 
     act = MemberActivity(
         customer_id=customer.id,
@@ -1,48 +1,41 @@
 """
 Menu API - ระบบจัดการรายการสินค้า (เก็บราคาเดิมใน menu_price_logs เมื่อแก้ไข)
 """
-import json
-from pathlib import Path
 from typing import Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import BACKEND_URL
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.models import Menu, Store, MenuPriceLog
 from app.services.menu_image_service import MENU_IMAGES_DIR, download_and_save, fetch_url_to_base64
-from app.services.audit_log import write_audit_log
-from app.utils.i18n import resolve_i18n, resolve_addon_options
+from app.services.audit_log import log_action
+from app.services import settings_cache
+from app.services.locale_context import get_store_locale
+from app.utils.i18n import project_menu_text
 
 router = APIRouter(prefix="/api/menus", tags=["menus"])
 
-_POS_SETTINGS_FILE = Path(__file__).resolve().parent.parent / "data" / "pos_settings.json"
 
-
-def _get_menu_image_priority() -> str:
-    """อ่านลำดับการเลือกแหล่งรูปจาก pos_settings"""
-    default = "local,server,base64"
-    if not _POS_SETTINGS_FILE.exists():
-        return default
-    try:
-        with open(_POS_SETTINGS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("menu_image_priority", default)
-    except Exception:
-        return default
+def _get_menu_image_priority() -> List[str]:
+    """ลำดับการเลือกแหล่งรูปจาก pos_settings (cache ไว้ ไม่อ่านไฟล์ทุกแถว)"""
+    priority = settings_cache.get_menu_image_priority()
+    return [p.strip().lower() for p in priority.split(",") if p.strip()]
 
 
-def _resolve_image_src(menu: Menu, base_url: str) -> Optional[str]:
+def _resolve_image_src(menu: Menu, base_url: str, priority: Optional[List[str]] = None) -> Optional[str]:
     """
     คืนค่า URL หรือ data URI ของรูปตามลำดับ menu_image_priority
     - local: /menu-images/{filename} ถ้ามีไฟล์
     - server: image_url
     - base64: data:image/jpeg;base64,...
+    priority: ส่งมาจาก caller เมื่อแปลงหลายแถว (อ่านลำดับครั้งเดียวต่อ request)
     """
-    priority = _get_menu_image_priority()
-    parts = [p.strip().lower() for p in priority.split(",") if p.strip()]
+    parts = priority if priority is not None else _get_menu_image_priority()
     base = (base_url or BACKEND_URL or "").rstrip("/")
 
     for src in parts:
@@ -101,24 +94,19 @@ class MenuResponse(BaseModel):
         from_attributes = True
 
 
-def _menu_to_response(menu: Menu, base_url: str = None, locale: str = "th") -> dict:
+def _menu_to_response(menu: Menu, base_url: str = None, locale: str = "th", image_priority: Optional[List[str]] = None) -> dict:
     """แปลง Menu เป็น dict สำหรับ MenuResponse พร้อม image_src และ resolve ภาษาตาม locale"""
-    name_i18n = getattr(menu, "name_i18n", None)
-    desc_i18n = getattr(menu, "description_i18n", None)
-    name = resolve_i18n(name_i18n, menu.name, locale)
-    description = resolve_i18n(desc_i18n, menu.description, locale)
-    addon_raw = getattr(menu, "addon_options", None)
-    addon_options = resolve_addon_options(addon_raw, locale) if addon_raw else None
+    name, description, addon_options = project_menu_text(menu, locale)
     return {
         "id": menu.id,
         "store_id": menu.store_id,
-        "name": name or menu.name,
-        "description": description or menu.description,
+        "name": name,
+        "description": description,
         "unit_price": menu.unit_price,
         "image_url": getattr(menu, "image_url", None),
-        "image_src": _resolve_image_src(menu, base_url or BACKEND_URL or ""),
+        "image_src": _resolve_image_src(menu, base_url or BACKEND_URL or "", image_priority),
         "barcode": getattr(menu, "barcode", None),
-        "addon_options": addon_options or addon_raw,
+        "addon_options": addon_options,
         "is_active": menu.is_active,
         "created_at": menu.created_at.isoformat() if menu.created_at else "",
         "updated_at": menu.updated_at.isoformat() if menu.updated_at else None,
@@ -126,7 +114,7 @@ def _menu_to_response(menu: Menu, base_url: str = None, locale: str = "th") -> d
 
 
 @router.post("/", response_model=MenuResponse)
-async def create_menu(menu: MenuCreate, db: Session = Depends(get_db)):
+def create_menu(menu: MenuCreate, db: Session = Depends(get_db)):
     """
     สร้างรายการสินค้าใหม่
     """
@@ -151,10 +139,8 @@ async def create_menu(menu: MenuCreate, db: Session = Depends(get_db)):
     return MenuResponse(**_menu_to_response(new_menu))
 
 
-def _get_store_locale(db: Session, store_id: int) -> str:
-    from app.models import StoreLocaleSetting
-    row = db.query(StoreLocaleSetting).filter(StoreLocaleSetting.store_id == store_id).first()
-    return row.locale if row else "th"
+async def _get_store_locale(db: AsyncSession, store_id: int) -> str:
+    return await db.run_sync(get_store_locale, store_id)
 
 
 @router.get("/store/{store_id}", response_model=List[MenuResponse])
@@ -162,24 +148,24 @@ async def get_menus_by_store(
     store_id: int,
     is_active: Optional[bool] = None,
     locale: Optional[str] = Query(None, description="ภาษา (th,en,lo,...) - ไม่ระบุใช้ตามร้าน"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     ดึงรายการสินค้าตาม store_id (name, description, addon ตาม locale)
     """
-    store = db.query(Store).filter(Store.id == store_id).first()
-    if not store:
+    if await db.scalar(select(Store.id).where(Store.id == store_id)) is None:
         raise HTTPException(status_code=404, detail="Store not found")
     
-    loc = locale or _get_store_locale(db, store_id)
+    loc = locale or await _get_store_locale(db, store_id)
     
-    query = db.query(Menu).filter(Menu.store_id == store_id)
+    query = select(Menu).where(Menu.store_id == store_id)
     if is_active is not None:
-        query = query.filter(Menu.is_active == is_active)
+        query = query.where(Menu.is_active == is_active)
     
-    menus = query.order_by(Menu.created_at.desc()).all()
+    menus = (await db.scalars(query.order_by(Menu.created_at.desc()))).all()
     base = (BACKEND_URL or "").rstrip("/")
-    return [MenuResponse(**_menu_to_response(menu, base, loc)) for menu in menus]
+    priority = _get_menu_image_priority()
+    return [MenuResponse(**_menu_to_response(menu, base, loc, priority)) for menu in menus]
 
 
 @router.get("/{menu_id}", response_model=MenuResponse)
@@ -187,15 +173,15 @@ async def get_menu(
     menu_id: int,
     locale: Optional[str] = Query(None, description="ภาษา (th,en,...) - ไม่ระบุใช้ th"),
     store_id: Optional[int] = Query(None, description="store_id สำหรับดึง locale ของร้าน"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     ดึงข้อมูลรายการสินค้า (name, description, addon ตาม locale)
     """
-    menu = db.query(Menu).filter(Menu.id == menu_id).first()
+    menu = await db.scalar(select(Menu).where(Menu.id == menu_id))
     if not menu:
         raise HTTPException(status_code=404, detail="Menu not found")
-    loc = locale or (_get_store_locale(db, store_id) if store_id else "th")
+    loc = locale or (await _get_store_locale(db, store_id) if store_id else "th")
     base = (BACKEND_URL or "").rstrip("/")
     return MenuResponse(**_menu_to_response(menu, base, loc))
 
@@ -205,24 +191,23 @@ async def get_menu_by_barcode(
     store_id: int,
     barcode_or_id: str,
     locale: Optional[str] = Query(None, description="ภาษา"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     ค้นหารายการสินค้าจากบาร์โค้ดหรือรหัส (id)
     """
-    store = db.query(Store).filter(Store.id == store_id).first()
-    if not store:
+    if await db.scalar(select(Store.id).where(Store.id == store_id)) is None:
         raise HTTPException(status_code=404, detail="Store not found")
-    loc = locale or _get_store_locale(db, store_id)
+    loc = locale or await _get_store_locale(db, store_id)
     barcode_clean = (barcode_or_id or "").strip()
     if not barcode_clean:
         raise HTTPException(status_code=400, detail="barcode or id required")
     base = (BACKEND_URL or "").rstrip("/")
     if barcode_clean.isdigit():
-        menu = db.query(Menu).filter(Menu.store_id == store_id, Menu.id == int(barcode_clean)).first()
+        menu = await db.scalar(select(Menu).where(Menu.store_id == store_id, Menu.id == int(barcode_clean)))
         if menu:
             return MenuResponse(**_menu_to_response(menu, base, loc))
-    menu = db.query(Menu).filter(Menu.store_id == store_id, Menu.barcode == barcode_clean).first()
+    menu = await db.scalar(select(Menu).where(Menu.store_id == store_id, Menu.barcode == barcode_clean).limit(1))
     if not menu:
         raise HTTPException(status_code=404, detail="Menu not found for barcode/id")
     return MenuResponse(**_menu_to_response(menu, base, loc))
@@ -239,7 +224,7 @@ def _get_session_user_id(request: Request) -> Optional[int]:
 
 
 @router.put("/{menu_id}", response_model=MenuResponse)
-async def update_menu(
+def update_menu(
     menu_id: int,
     menu_update: MenuUpdate,
     request: Request,
@@ -286,8 +271,8 @@ async def update_menu(
 
     user_id = _get_session_user_id(request)
     ip = request.client.host if request.client else None
-    write_audit_log(
-        db, action="menu_update", table_name="menus", record_id=menu.id,
+    log_action(
+        action="menu_update", table_name="menus", record_id=menu.id,
         old_values={"unit_price": old_price, "addon_options": old_addon} if (price_changed or addon_changed) else None,
         new_values={"unit_price": menu.unit_price, "addon_options": menu.addon_options},
         user_id=user_id, source="store_pos" if user_id else "system", ip_address=ip,
@@ -311,7 +296,7 @@ async def fetch_image_base64(req: FetchImageRequest):
 
 
 @router.post("/{menu_id}/download-image")
-async def download_menu_image(
+def download_menu_image(
     menu_id: int,
     image_url: Optional[str] = Query(None, description="URL รูปจาก Internet (ถ้าไม่ระบุใช้จาก menu.image_url)"),
     db: Session = Depends(get_db)
@@ -346,7 +331,7 @@ async def download_menu_image(
 
 
 @router.delete("/{menu_id}")
-async def delete_menu(menu_id: int, db: Session = Depends(get_db)):
+def delete_menu(menu_id: int, db: Session = Depends(get_db)):
     """
     ลบรายการสินค้า
     """
@@ -11,6 +11,7 @@ from typing import Optional, Any
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import (
@@ -23,7 +24,7 @@ from app.config import (
     STRIPE_WEBHOOK_CHANNEL,
     STRIPE_WEBHOOK_URL,
 )
-from app.database import get_db
+from app.database import get_async_db, get_db, get_reporting_db
 from app.services.settlement_service import (
     receive_back_transaction,
     get_back_transactions_report,
@@ -40,11 +41,11 @@ from app.api.signage import set_signage_paid
 from app.api.admin import resolve_banking_profile_for_store
 from app.api.auth import require_admin
 from app.services import scb_deeplink
-from app.models import Store, Order, Customer, CustomerBalance, MemberActivity, ECoupon, CouponPromo
-from app.services import omise_promptpay, stripe_promptpay
+from app.models import Store, Order, Customer, MemberActivity, ECoupon, CouponPromo
+from app.services.ecoupon_codes import add_with_unique_code
+from app.services.ecoupon_redemption import set_coupon_stores
+from app.services import metrics, omise_promptpay, stripe_promptpay, wallet_ledger
 import hashlib
-import secrets
-import string
 import hmac as hmacc
 import json
 
@@ -178,7 +179,7 @@ def _resolve_scb_config(db: Session, store: Store) -> tuple:
 
 
 @router.get("/stores/{store_id}/gateway-info")
-async def get_gateway_info(store_id: int, db: Session = Depends(get_db)):
+def get_gateway_info(store_id: int, db: Session = Depends(get_db)):
     """
     คืนค่า payment gateway ของร้าน (สำหรับ Store POS เลือกใช้ Stripe / Omise / SCB / QR ธรรมดา)
     - stripe: ใช้ Stripe API (PromptPay QR) — ลำดับแรก
@@ -216,7 +217,7 @@ async def get_gateway_info(store_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/stores/{store_id}/create-gateway-qr")
-async def create_gateway_qr(
+def create_gateway_qr(
     store_id: int,
     body: CreateGatewayQRRequest,
     db: Session = Depends(get_db),
@@ -393,7 +394,7 @@ async def create_gateway_qr(
 
 
 @router.post("/stores/{store_id}/charge-card")
-async def create_charge_card(
+def create_charge_card(
     store_id: int,
     body: CreateChargeCardRequest,
     db: Session = Depends(get_db),
@@ -433,7 +434,7 @@ async def create_charge_card(
 
 
 @router.get("/stores/{store_id}/charge-status/{charge_id}")
-async def get_charge_status(
+def get_charge_status(
     store_id: int,
     charge_id: str,
     db: Session = Depends(get_db),
@@ -493,20 +494,14 @@ async def webhook_health():
     return {"status": "ok", "message": "SCB webhook endpoint is ready", "provider": "scb"}
 
 
-@router.post("/back-transaction")
-async def post_back_transaction(
-    payload: BackTransactionPayload,
-    db: Session = Depends(get_db),
-):
-    """
-    รับข้อมูล Back Transaction จากธนาคาร (Webhook/Callback)
-    ใช้ ref1 (store token), ref2, ref3, ยอดเงิน, เวลาโอน เก็บไว้ทำ Report
-    """
+def _save_back_transaction(db: Session, payload: BackTransactionPayload) -> dict:
+    """บันทึก Back Transaction + แจ้งจอ signage (sync - webhook เรียกผ่าน AsyncSession.run_sync)"""
     try:
         logger.info("Bank callback received: ref1=%s amount=%.2f", payload.ref1[:20] + "..." if len(payload.ref1) > 20 else payload.ref1, payload.amount)
         paid_at = datetime.utcnow()
         if payload.paid_at:
             paid_at = datetime.fromisoformat(payload.paid_at.replace("Z", "+00:00"))
+            metrics.observe_webhook_lag(payload.payment_gateway, paid_at)
         raw = None
         if payload.raw_payload is not None:
             import json
@@ -540,10 +535,22 @@ async def post_back_transaction(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/back-transaction")
+async def post_back_transaction(
+    payload: BackTransactionPayload,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    รับข้อมูล Back Transaction จากธนาคาร (Webhook/Callback)
+    ใช้ ref1 (store token), ref2, ref3, ยอดเงิน, เวลาโอน เก็บไว้ทำ Report
+    """
+    return await db.run_sync(_save_back_transaction, payload)
+
+
 @router.post("/webhook")
 async def webhook_receive(
     payload: BackTransactionPayload,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Webhook URL สำหรับลงทะเบียนกับธนาคาร (SCB QR Payment ฯลฯ)
@@ -566,7 +573,7 @@ async def webhook_kbank_health():
 @router.post("/webhook/kbank")
 async def webhook_kbank_receive(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Webhook สำหรับ K Bank (ธนาคารกสิกร) QR Payment จาก K API Portal
@@ -597,7 +604,7 @@ async def webhook_omise_health():
 
 
 @router.post("/webhook/omise")
-async def webhook_omise_receive(request: Request, db: Session = Depends(get_db)):
+async def webhook_omise_receive(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Webhook จาก Omise (charge.complete)
     ต้องส่ง metadata.ref1 (store token 20 หลัก) ตอนสร้าง charge เพื่อแมปกับร้าน
@@ -739,8 +746,102 @@ def _verify_stripe_signature(payload_body: bytes, sig_header: str, secret: str)
     return hmacc.compare_digest(expected, v1)
 
 
+def _process_stripe_member_intent(
+    db: Session, body: dict, data: dict, intent_type: str, customer_id_raw, amount_baht: float,
+) -> dict:
+    """เติมเงิน / ซื้อ E-Coupon ของสมาชิกจาก PaymentIntent (sync - เรียกผ่าน AsyncSession.run_sync)"""
+    ev_type = body.get("type")
+    try:
+        customer_id = int(customer_id_raw)
+    except (ValueError, TypeError):
+        customer_id = None
+    payment_intent_id = data.get("id") or body.get("id")
+    if customer_id and not payment_intent_id:
+        logger.warning("Stripe webhook: member intent without PaymentIntent id, skipped")
+        return {"received": True}
+    if customer_id and not wallet_ledger.claim_payment(
+        db, "stripe", payment_intent_id,
+        event_id=body.get("id"), event_type=ev_type, customer_id=customer_id, amount=amount_baht,
+    ):
+        logger.info("Stripe webhook: %s %s already processed", intent_type, payment_intent_id)
+        db.rollback()
+        return {"received": True, "duplicate": True}
+    if customer_id:
+        customer = db.query(Customer).filter(Customer.id == customer_id).first()
+        if customer:
+            if intent_type == "member_topup":
+                balance_after = wallet_ledger.credit(db, customer_id, amount_baht, reason="topup", ref=payment_intent_id)
+                act = MemberActivity(
+                    customer_id=customer_id,
+                    activity_type="topup",
+                    amount=amount_baht,
+                    description=f"เติมเงินผ่าน Stripe {amount_baht:.2f} บาท",
+                )
+                db.add(act)
+                # ออกคูปองจากโปรโมชั่นที่ตรงเงื่อนไข (เติมขั้นต่ำได้ส่วนลด) — ใช้โปรที่ min_topup สูงสุดที่ยังไม่เกินยอดเติม
+                now_utc = datetime.utcnow()
+                promo = (
+                    db.query(CouponPromo)
+                    .filter(
+                        CouponPromo.is_active == True,
+                        CouponPromo.min_topup_amount <= amount_baht,
+                    )
+                    .order_by(CouponPromo.min_topup_amount.desc())
+                    .first()
+                )
+                if promo and float(promo.discount_amount) > 0:
+                    ec = ECoupon(
+                        amount=float(promo.discount_amount),
+                        customer_id=customer_id,
+                        status="assigned",
+                        payment_method="stripe",
+                        paid_at=now_utc,
+                        promotion_id=promo.id,
+                        valid_from=promo.valid_from,
+                        valid_to=promo.valid_to,
+                        allowed_store_ids=promo.store_ids,
+                    )
+                    add_with_unique_code(db, ec)
+                    set_coupon_stores(db, ec.id, ec.allowed_store_ids)
+                    act2 = MemberActivity(
+                        customer_id=customer_id,
+                        activity_type="redeem",
+                        amount=float(promo.discount_amount),
+                        description=f"ได้คูปอง {promo.discount_amount:.0f} บาท จากโปรโมชั่น: {promo.title}",
+                        ref_id=ec.id,
+                    )
+                    db.add(act2)
+                    logger.info("Stripe webhook: member_topup issued coupon promo_id=%s amount=%.2f code=%s", promo.id, promo.discount_amount, ec.code)
+                db.commit()
+                logger.info("Stripe webhook: member_topup customer_id=%s +%.2f balance=%.2f", customer_id, amount_baht, balance_after)
+            else:  # member_ecoupon
+                paid_at = datetime.utcnow()
+                ec = ECoupon(
+                    amount=amount_baht,
+                    customer_id=customer_id,
+                    status="assigned",
+                    payment_method="stripe",
+                    paid_at=paid_at,
+                )
+                add_with_unique_code(db, ec)
+                act = MemberActivity(
+                    customer_id=customer_id,
+                    activity_type="redeem",
+                    amount=amount_baht,
+                    description=f"ซื้อ E-Coupon {amount_baht:.2f} บาท (Stripe)",
+                    ref_id=ec.id,
+                )
+                db.add(act)
+                db.commit()
+                logger.info("Stripe webhook: member_ecoupon customer_id=%s amount=%.2f code=%s", customer_id, amount_baht, ec.code)
+        else:
+            db.rollback()
+            logger.warning("Stripe webhook: member intent customer_id=%s not found", customer_id)
+    return {"received": True}
+
+
 @router.post("/webhook/stripe")
-async def webhook_stripe_receive(request: Request, db: Session = Depends(get_db)):
+async def webhook_stripe_receive(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Webhook จาก Stripe (payment_intent.succeeded)
     ต้องส่ง metadata.ref1 (store token) ตอนสร้าง PaymentIntent
@@ -774,97 +875,11 @@ async def webhook_stripe_receive(request: Request, db: Session = Depends(get_db)
     amount_baht = amount_satang / 100.0
 
     # Member: เติมเงิน (member_topup) หรือซื้อ E-Coupon (member_ecoupon)
+    # ประมวลผลครั้งเดียวต่อ PaymentIntent (Stripe retry webhook ได้หลายครั้ง) - ยอด + คูปองอยู่ใน commit เดียว
     if customer_id_raw and intent_type in ("member_topup", "member_ecoupon"):
-        try:
-            customer_id = int(customer_id_raw)
-        except (ValueError, TypeError):
-            customer_id = None
-        if customer_id:
-            customer = db.query(Customer).filter(Customer.id == customer_id).first()
-            if customer:
-                if intent_type == "member_topup":
-                    bal = db.query(CustomerBalance).filter(CustomerBalance.customer_id == customer_id).first()
-                    if not bal:
-                        bal = CustomerBalance(customer_id=customer_id, balance=0.0)
-                        db.add(bal)
-                    bal.balance = (bal.balance or 0) + amount_baht
-                    db.add(bal)
-                    act = MemberActivity(
-                        customer_id=customer_id,
-                        activity_type="topup",
-                        amount=amount_baht,
-                        description=f"เติมเงินผ่าน Stripe {amount_baht:.2f} บาท",
-                    )
-                    db.add(act)
-                    # ออกคูปองจากโปรโมชั่นที่ตรงเงื่อนไข (เติมขั้นต่ำได้ส่วนลด) — ใช้โปรที่ min_topup สูงสุดที่ยังไม่เกินยอดเติม
-                    now_utc = datetime.utcnow()
-                    promo = (
-                        db.query(CouponPromo)
-                        .filter(
-                            CouponPromo.is_active == True,
-                            CouponPromo.min_topup_amount <= amount_baht,
-                        )
-                        .order_by(CouponPromo.min_topup_amount.desc())
-                        .first()
-                    )
-                    if promo and float(promo.discount_amount) > 0:
-                        code = "".join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(10))
-                        code = "EC" + code
-                        while db.query(ECoupon).filter(ECoupon.code == code).first():
-                            code = "EC" + "".join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(10))
-                        ec = ECoupon(
-                            code=code,
-                            amount=float(promo.discount_amount),
-                            customer_id=customer_id,
-                            status="assigned",
-                            payment_method="stripe",
-                            paid_at=now_utc,
-                            promotion_id=promo.id,
-                            valid_from=promo.valid_from,
-                            valid_to=promo.valid_to,
-                            allowed_store_ids=promo.store_ids,
-                        )
-                        db.add(ec)
-                        act2 = MemberActivity(
-                            customer_id=customer_id,
-                            activity_type="redeem",
-                            amount=float(promo.discount_amount),
-                            description=f"ได้คูปอง {promo.discount_amount:.0f} บาท จากโปรโมชั่น: {promo.title}",
-                            ref_id=ec.id,
-                        )
-                        db.add(act2)
-                        logger.info("Stripe webhook: member_topup issued coupon promo_id=%s amount=%.2f code=%s", promo.id, promo.discount_amount, code)
-                    db.commit()
-                    logger.info("Stripe webhook: member_topup customer_id=%s +%.2f balance=%.2f", customer_id, amount_baht, bal.balance)
-                else:  # member_ecoupon
-                    def _gen_ecode(prefix="EC", length=10):
-                        return prefix + "".join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(length))
-                    code = _gen_ecode()
-                    while db.query(ECoupon).filter(ECoupon.code == code).first():
-                        code = _gen_ecode()
-                    paid_at = datetime.utcnow()
-                    ec = ECoupon(
-                        code=code,
-                        amount=amount_baht,
-                        customer_id=customer_id,
-                        status="assigned",
-                        payment_method="stripe",
-                        paid_at=paid_at,
-                    )
-                    db.add(ec)
-                    act = MemberActivity(
-                        customer_id=customer_id,
-                        activity_type="redeem",
-                        amount=amount_baht,
-                        description=f"ซื้อ E-Coupon {amount_baht:.2f} บาท (Stripe)",
-                        ref_id=ec.id,
-                    )
-                    db.add(act)
-                    db.commit()
-                    logger.info("Stripe webhook: member_ecoupon customer_id=%s amount=%.2f code=%s", customer_id, amount_baht, code)
-            else:
-                logger.warning("Stripe webhook: member intent customer_id=%s not found", customer_id)
-        return {"received": True}
+        return await db.run_sync(
+            _process_stripe_member_intent, body, data, intent_type, customer_id_raw, amount_baht
+        )
 
     if not ref1:
         logger.warning("Stripe webhook: payment_intent %s has no metadata.ref1 or member metadata", data.get("id"))
@@ -884,12 +899,12 @@ async def webhook_stripe_receive(request: Request, db: Session = Depends(get_db)
 
 
 @router.get("/back-transactions/report")
-async def report_back_transactions(
+def report_back_transactions(
     store_id: Optional[int] = Query(None),
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     limit: int = Query(500, le=2000),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_reporting_db),
 ):
     """รายงาน Back Transactions สำหรับทำ Report (ใช้ ref1, ref2, ref3, ยอด, เวลา)"""
     start = datetime.fromisoformat(start_date + "T00:00:00") if start_date else None
@@ -899,7 +914,7 @@ async def report_back_transactions(
 
 
 @router.get("/back-transactions/live")
-async def live_back_transactions(
+def live_back_transactions(
     store_id: Optional[int] = Query(None),
     since_created: Optional[str] = Query(None, description="ISO datetime – ดึงเฉพาะรายการที่ created_at หลังเวลานี้ (สำหรับ poll)"),
     limit: int = Query(100, le=200),
@@ -920,7 +935,7 @@ async def live_back_transactions(
 
 
 @router.get("/settlements")
-async def list_settlements(
+def list_settlements(
     settlement_date: Optional[str] = Query(None, description="YYYY-MM-DD สิ้นวันที่ต้องการดู"),
     status: Optional[str] = Query(None, description="pending / transferred / notified"),
     db: Session = Depends(get_db),
@@ -935,7 +950,7 @@ async def list_settlements(
 
 
 @router.post("/settlements/create-daily")
-async def create_daily_settlements_endpoint(
+def create_daily_settlements_endpoint(
     settlement_date: Optional[str] = Query(None, description="YYYY-MM-DD ไม่ส่งใช้วันนี้"),
     db: Session = Depends(get_db),
 ):
@@ -952,7 +967,7 @@ async def create_daily_settlements_endpoint(
 
 
 @router.post("/settlements/{settlement_id}/mark-transferred")
-async def mark_transferred(
+def mark_transferred(
     settlement_id: int,
     db: Session = Depends(get_db),
     user: dict = Depends(require_admin),
@@ -965,7 +980,7 @@ async def mark_transferred(
 
 
 @router.post("/settlements/{settlement_id}/mark-pending")
-async def mark_pending(
+def mark_pending(
     settlement_id: int,
     db: Session = Depends(get_db),
     user: dict = Depends(require_admin),
@@ -978,7 +993,7 @@ async def mark_pending(
 
 
 @router.post("/settlements/{settlement_id}/notify-store")
-async def notify_store(
+def notify_store(
     settlement_id: int,
     db: Session = Depends(get_db),
     user: dict = Depends(require_admin),
@@ -1004,19 +1019,20 @@ async def store_recent_paid(
     store_id: int,
     since: Optional[str] = Query(None, description="ISO datetime ใช้ดึงรายการที่จ่ายหลังเวลานี้ (store-pos ใช้ poll)"),
     limit: int = Query(50, le=100),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     รายการที่จ่ายเงินแล้วของร้าน (สำหรับ store-pos แจ้งเตือน + ออกเสียง "เงินเข้าแล้ว X บาท ขอบคุณครับ")
     store-pos เรียก poll ด้วย since=เวลาล่าสุดที่เช็คแล้ว
     """
+    metrics.touch_subscriber("pos", store_id)
     since_dt = datetime.fromisoformat(since.replace("Z", "+00:00")) if since else None
-    items = get_recent_paid_for_store(db, store_id=store_id, since=since_dt, limit=limit)
+    items = await db.run_sync(get_recent_paid_for_store, store_id, since_dt, limit)
     return {"items": items, "count": len(items)}
 
 
 @router.get("/stores/{store_id}/settlements-for-receipt")
-async def store_settlements_for_receipt(
+def store_settlements_for_receipt(
     store_id: int,
     notified_only: bool = Query(True, description="แสดงเฉพาะที่แจ้งแล้ว (เงินเข้าเรียบร้อย)"),
     db: Session = Depends(get_db),
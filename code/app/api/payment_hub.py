@@ -19,7 +19,7 @@ class UseFoodCourtIDRequest(BaseModel):
 
 
 @router.post("/use")
-async def use_foodcourt_id(
+def use_foodcourt_id(
     request: UseFoodCourtIDRequest,
     db: Session = Depends(get_db)
 ):
@@ -45,7 +45,7 @@ async def use_foodcourt_id(
 
 
 @router.get("/balance/{foodcourt_id}")
-async def get_balance(
+def get_balance(
     foodcourt_id: str,
     db: Session = Depends(get_db)
 ):
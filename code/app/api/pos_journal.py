@@ -0,0 +1,70 @@
+"""
+Store POS: ส่งรายการที่บันทึกไว้ตอนออฟไลน์ (journal) เข้าระบบทีเดียว
+- เครื่อง POS สร้าง client_id ให้ทุกรายการ ส่งซ้ำได้ไม่บันทึกซ้ำ (ตอบ duplicate)
+- ตอบผลทีละรายการ: created / duplicate / rejected (พร้อม error)
+"""
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.api.auth import get_current_session_user
+from app.database import get_db
+from app.models import Store
+from app.services import pos_journal
+from app.services.audit_log import log_action
+
+router = APIRouter(prefix="/api/pos-journal", tags=["pos-journal"])
+
+
+class JournalItem(BaseModel):
+    client_id: str
+    entry_type: str  # sale, exchange, topup, other
+    amount: float
+    payment_method: Optional[str] = None  # sale: ค่าเริ่มต้น cash
+    order_lines: Optional[list] = None  # [{ menu_id, name, qty, unit_price }]
+    description: Optional[str] = None
+    occurred_at: Optional[datetime] = None
+
+
+class JournalSyncRequest(BaseModel):
+    store_id: int
+    items: List[JournalItem]
+
+
+@router.post("/sync")
+def sync_journal(
+    body: JournalSyncRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    user: dict = Depends(get_current_session_user),
+):
+    """ส่งรายการ journal ของร้าน (สูงสุด MAX_ITEMS ต่อครั้ง) - ต้องล็อกอิน"""
+    if len(body.items) > pos_journal.MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"ส่งได้ไม่เกิน {pos_journal.MAX_ITEMS} รายการต่อครั้ง")
+    if user.get("store_ids") and body.store_id not in user["store_ids"]:
+        raise HTTPException(status_code=403, detail="ไม่มีสิทธิ์ร้านนี้")
+    if not db.get(Store, body.store_id):
+        raise HTTPException(status_code=404, detail="Store not found")
+    try:
+        results = pos_journal.sync(db, body.store_id, body.items, user["user_id"])
+    except pos_journal.JournalConflict:
+        raise HTTPException(status_code=409, detail="มีการส่งรายการชุดนี้พร้อมกัน กรุณาส่งใหม่")
+
+    counts = Counter(r["status"] for r in results)
+    if counts["created"]:
+        log_action(
+            action="pos_journal_sync", table_name="pos_journal_entries",
+            new_values={"store_id": body.store_id, **counts},
+            user_id=user["user_id"], source="store_pos",
+            ip_address=request.client.host if request.client else None,
+        )
+    return {
+        "created": counts["created"],
+        "duplicate": counts["duplicate"],
+        "rejected": counts["rejected"],
+        "results": results,
+    }
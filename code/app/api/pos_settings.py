@@ -2,22 +2,16 @@
 POS Settings API – ตั้งค่า Store POS (เครื่องพิมพ์ Thermal, เครื่องอ่าน QR, EDC)
 ค่าจาก config.ini + override จาก pos_settings.json (บันทึกจากหน้า Web Setting)
 """
-import json
-import os
-from pathlib import Path
 from typing import Any, Optional
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from app import config as app_config
+from app.services import settings_cache
 
 router = APIRouter(prefix="/api/pos-settings", tags=["pos-settings"])
 
-# เก็บ override ที่บันทึกจากหน้า Web (ไม่เขียน config.ini)
-_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
-_SETTINGS_FILE = _DATA_DIR / "pos_settings.json"
-
 
 def _default_settings() -> dict:
     return {
@@ -27,7 +21,7 @@ def _default_settings() -> dict:
         "qr_reader_port": getattr(app_config, "POS_QR_READER_PORT", "") or "",
         "edc_reader_port": getattr(app_config, "POS_EDC_READER_PORT", "") or "",
         "thermal_paper_width_mm": getattr(app_config, "POS_THERMAL_PAPER_WIDTH_MM", 80) or 80,
-        "menu_image_priority": "local,server,base64",
+        "menu_image_priority": settings_cache.DEFAULT_MENU_IMAGE_PRIORITY,
         "menu_columns": 6,
         "payment_promptpay_enabled": getattr(app_config, "POS_PAYMENT_PROMPTPAY_ENABLED", True),
         "payment_credit_debit_enabled": getattr(app_config, "POS_PAYMENT_CREDIT_DEBIT_ENABLED", True),
@@ -36,19 +30,12 @@ def _default_settings() -> dict:
 
 
 def _load_overrides() -> dict:
-    if not _SETTINGS_FILE.exists():
-        return {}
-    try:
-        with open(_SETTINGS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    """override ที่บันทึกจากหน้า Web (ไม่เขียน config.ini) - cache ไว้ reload เมื่อไฟล์เปลี่ยน"""
+    return dict(settings_cache.get_pos_overrides())
 
 
 def _save_overrides(data: dict) -> None:
-    _DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with open(_SETTINGS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    settings_cache.save_pos_overrides(data)
 
 
 class PosSettingsBody(BaseModel):
@@ -59,7 +59,7 @@ class EventResponse(BaseModel):
 
 
 @router.post("/", response_model=ProfileResponse)
-async def create_profile(profile: ProfileCreate, db: Session = Depends(get_db)):
+def create_profile(profile: ProfileCreate, db: Session = Depends(get_db)):
     """สร้าง Profile ใหม่"""
     db_profile = Profile(**profile.dict())
     db.add(db_profile)
@@ -69,7 +69,7 @@ async def create_profile(profile: ProfileCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=List[ProfileResponse])
-async def list_profiles(
+def list_profiles(
     profile_type: Optional[str] = None,
     is_active: Optional[bool] = None,
     db: Session = Depends(get_db)
@@ -86,7 +86,7 @@ async def list_profiles(
 
 
 @router.get("/{profile_id}", response_model=ProfileResponse)
-async def get_profile(profile_id: int, db: Session = Depends(get_db)):
+def get_profile(profile_id: int, db: Session = Depends(get_db)):
     """ดึง Profile ตาม ID"""
     profile = db.query(Profile).filter(Profile.id == profile_id).first()
     if not profile:
@@ -95,7 +95,7 @@ async def get_profile(profile_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/events/", response_model=EventResponse)
-async def create_event(event: EventCreate, db: Session = Depends(get_db)):
+def create_event(event: EventCreate, db: Session = Depends(get_db)):
     """สร้าง Event ใหม่"""
     db_event = Event(**event.dict())
     db.add(db_event)
@@ -105,7 +105,7 @@ async def create_event(event: EventCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/events/", response_model=List[EventResponse])
-async def list_events(
+def list_events(
     profile_id: Optional[int] = None,
     is_active: Optional[bool] = None,
     db: Session = Depends(get_db)
@@ -122,7 +122,7 @@ async def list_events(
 
 
 @router.get("/events/{event_id}", response_model=EventResponse)
-async def get_event(event_id: int, db: Session = Depends(get_db)):
+def get_event(event_id: int, db: Session = Depends(get_db)):
     """ดึง Event ตาม ID"""
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import ProgramSetting
+from app.services.locale_context import invalidate_locale_cache
 
 router = APIRouter(prefix="/api/program-settings", tags=["program-settings"])
 
@@ -69,6 +70,7 @@ def update_program_setting(label_key: str, body: ProgramSettingUpdate, db: Sessi
 
     db.commit()
     db.refresh(row)
+    invalidate_locale_cache()
     return {"label_key": row.label_key, "ok": True}
 
 
@@ -90,4 +92,5 @@ def create_program_setting(body: ProgramSettingUpdate, db: Session = Depends(get
     db.add(row)
     db.commit()
     db.refresh(row)
+    invalidate_locale_cache()
     return {"label_key": row.label_key, "ok": True}
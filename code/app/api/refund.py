@@ -11,7 +11,7 @@ router = APIRouter(prefix="/api/refunds", tags=["refunds"])
 
 
 @router.get("/pending")
-async def get_pending_refunds(db: Session = Depends(get_db)):
+def get_pending_refunds(db: Session = Depends(get_db)):
     """
     ดึงคำขอคืนเงินที่รอการประมวลผล
     """
@@ -33,7 +33,7 @@ async def get_pending_refunds(db: Session = Depends(get_db)):
 
 
 @router.post("/{refund_request_id}/process")
-async def process_refund(refund_request_id: int, db: Session = Depends(get_db)):
+def process_refund(refund_request_id: int, db: Session = Depends(get_db)):
     """
     ประมวลผลการคืนเงิน
     """
@@ -55,7 +55,7 @@ async def process_refund(refund_request_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/daily-reset")
-async def trigger_daily_reset(db: Session = Depends(get_db)):
+def trigger_daily_reset(db: Session = Depends(get_db)):
     """
     เรียกใช้ Daily Balance Reset (สำหรับ Cron Job)
     """
@@ -72,7 +72,7 @@ async def trigger_daily_reset(db: Session = Depends(get_db)):
 
 
 @router.post("/notify/{customer_id}")
-async def send_refund_notification(customer_id: int, db: Session = Depends(get_db)):
+def send_refund_notification(customer_id: int, db: Session = Depends(get_db)):
     """
     ส่งการแจ้งเตือนคืนเงินให้ลูกค้า
     """
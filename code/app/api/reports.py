@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
-from app.database import get_db
+from app.database import get_reporting_db
 from app.services.tax_service import TaxService
 from app.services.refund_service import RefundService
 
@@ -13,10 +13,10 @@ router = APIRouter(prefix="/api/reports", tags=["reports"])
 
 
 @router.get("/sales-tax")
-async def get_sales_tax_report(
+def get_sales_tax_report(
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reporting_db)
 ):
     """
     รายงานภาษีขาย (Sales Tax Report)
@@ -42,10 +42,10 @@ async def get_sales_tax_report(
 
 
 @router.get("/separation-of-funds")
-async def get_separation_of_funds_report(
+def get_separation_of_funds_report(
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reporting_db)
 ):
     """
     รายงานแยกยอดเงินสด/โอน (Revenue) ออกจากยอด Crypto Status (Information Only)
@@ -70,10 +70,10 @@ async def get_separation_of_funds_report(
 
 
 @router.get("/refund-summary")
-async def get_refund_summary(
+def get_refund_summary(
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reporting_db)
 ):
     """
     รายงานสรุปการคืนเงิน
@@ -145,9 +145,9 @@ async def get_refund_summary(
 
 
 @router.get("/wht-calculation")
-async def calculate_wht(
+def calculate_wht(
     amount: float,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reporting_db)
 ):
     """
     คำนวณภาษีหัก ณ ที่จ่าย (Withholding Tax) 3%
@@ -159,9 +159,9 @@ async def calculate_wht(
 
 
 @router.get("/vat-calculation")
-async def calculate_vat(
+def calculate_vat(
     amount: float,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reporting_db)
 ):
     """
     คำนวณภาษีมูลค่าเพิ่ม (VAT) 7%
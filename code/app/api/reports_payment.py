@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
-from app.database import get_db
+from app.database import get_reporting_db
 from app.services.report_service import ReportService
 from app.services.settlement_service import get_settlement_summary_by_period
 
@@ -68,13 +68,13 @@ def _parse_period(period_type: Optional[str], date_str: Optional[str], year: Opt
 
 
 @router.get("/store/{store_id}")
-async def get_store_summary(
+def get_store_summary(
     store_id: int,
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     profile_id: Optional[int] = Query(None),
     event_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reporting_db)
 ):
     """
     สรุปยอดรายร้านค้า
@@ -92,9 +92,9 @@ async def get_store_summary(
 
 
 @router.get("/daily")
-async def get_daily_summary(
+def get_daily_summary(
     date: Optional[str] = Query(None, description="YYYY-MM-DD"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reporting_db)
 ):
     """
     สรุปยอดรายวัน
@@ -110,10 +110,10 @@ async def get_daily_summary(
 
 
 @router.get("/monthly")
-async def get_monthly_summary(
+def get_monthly_summary(
     year: int = Query(..., description="Year (e.g., 2024)"),
     month: int = Query(..., description="Month (1-12)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reporting_db)
 ):
     """
     สรุปยอดรายเดือน
@@ -130,9 +130,9 @@ async def get_monthly_summary(
 
 
 @router.get("/yearly")
-async def get_yearly_summary(
+def get_yearly_summary(
     year: int = Query(..., description="Year (e.g., 2024)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reporting_db)
 ):
     """
     สรุปยอดรายปี
@@ -146,7 +146,7 @@ async def get_yearly_summary(
 
 
 @router.get("/settlement-summary")
-async def get_settlement_summary(
+def get_settlement_summary(
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD (ช่วงเวลา)"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD (ช่วงเวลา)"),
     period_type: Optional[str] = Query(None, description="day | week | month | year (ใช้คู่กับ date หรือ year/month)"),
@@ -154,7 +154,7 @@ async def get_settlement_summary(
     year: Optional[int] = Query(None, description="ปี สำหรับ period_type=month|year"),
     month: Optional[int] = Query(None, description="เดือน 1-12 สำหรับ period_type=month"),
     gp_percent: Optional[float] = Query(None, description="อัตราหัก GP % (ว่าง = ใช้จาก config)"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_reporting_db),
 ):
     """
     สรุปยอดรายวัน/สัปดาห์/เดือน/ปี/ช่วงเวลาที่เลือก แยกร้านค้าทั้งหมดในครั้งเดียว
@@ -177,14 +177,14 @@ async def get_settlement_summary(
 
 
 @router.get("/overall-summary")
-async def get_overall_summary(
+def get_overall_summary(
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     period_type: Optional[str] = Query(None, description="day | week | month | year"),
     date: Optional[str] = Query(None, description="YYYY-MM-DD สำหรับ day|week"),
     year: Optional[int] = Query(None, description="ปี สำหรับ month|year"),
     month: Optional[int] = Query(None, description="เดือน 1-12 สำหรับ month"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_reporting_db),
 ):
     """
     สรุปรายได้ ยอดขาย GP รวม รายวัน/สัปดาห์/เดือน/ปี/ช่วงเวลาที่เลือก
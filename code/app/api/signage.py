@@ -4,24 +4,17 @@ Signage API - จอที่ 2 สำหรับ POS (แสดง QR Payment
 เมื่อจ่ายเงินแล้ว webhook จะ set status=paid, signage แสดง "ได้รับเงินเรียบร้อยแล้ว" + พูด แล้วเล่น signage ต่อ
 เมื่อ idle (ไม่มี QR): แสดง video/โฆษณา loop
 """
-import json
-from pathlib import Path
 from typing import Optional, Dict, Any, List
 
 from fastapi import APIRouter, Query, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Store
-
-_SIGNAGE_MEDIA_FILE = Path(__file__).resolve().parent.parent / "data" / "signage_media.json"
-
-DEFAULT_SIGNAGE_MEDIA = [
-    {"type": "image", "url": "https://picsum.photos/1200/800?random=1", "duration": 2},
-    {"type": "image", "url": "https://picsum.photos/1200/800?random=2", "duration": 2},
-    {"type": "image", "url": "https://picsum.photos/1200/800?random=3", "duration": 2},
-]
+from app.services import metrics, settings_cache
+from app.services.settings_cache import DEFAULT_SIGNAGE_MEDIA
 
 # In-memory state ต่อร้าน: store_id -> { qr_image, amount, status, order_items, ... }
 _signage_state: Dict[int, Dict[str, Any]] = {}
@@ -125,14 +118,13 @@ async def post_set_display(payload: SetDisplayPayload):
 
 
 @router.get("/display")
-async def get_display(store_id: int = Query(..., description="รหัสร้าน"), db: Session = Depends(get_db)):
+async def get_display(store_id: int = Query(..., description="รหัสร้าน"), db: AsyncSession = Depends(get_async_db)):
     """จอ signage poll เพื่อดึงสถานะปัจจุบัน (qr_image, amount, status, store_name, order_items)"""
+    metrics.touch_subscriber("signage", store_id)
     data = get_signage_display(store_id)
     store_name = ""
     try:
-        store = db.query(Store).filter(Store.id == store_id).first()
-        if store:
-            store_name = store.name or ""
+        store_name = (await db.scalar(select(Store.name).where(Store.id == store_id))) or ""
     except Exception:
         pass
 
@@ -163,16 +155,8 @@ async def post_clear(store_id: int = Query(..., description="รหัสร้
 
 
 def _load_signage_media() -> List[dict]:
-    """โหลดรายการ video/โฆษณาสำหรับ idle mode"""
-    if _SIGNAGE_MEDIA_FILE.exists():
-        try:
-            with open(_SIGNAGE_MEDIA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list) and len(data) > 0:
-                    return data
-        except Exception:
-            pass
-    return DEFAULT_SIGNAGE_MEDIA
+    """โหลดรายการ video/โฆษณาสำหรับ idle mode (cache ไว้ reload เมื่อ signage_media.json เปลี่ยน)"""
+    return settings_cache.get_signage_media()
 
 
 @router.get("/media")
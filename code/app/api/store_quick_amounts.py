@@ -37,7 +37,7 @@ class QuickAmountResponse(BaseModel):
 
 
 @router.get("/", response_model=List[QuickAmountResponse])
-async def get_quick_amounts(store_id: int, db: Session = Depends(get_db)):
+def get_quick_amounts(store_id: int, db: Session = Depends(get_db)):
     """
     ดึงรายการราคาด่วนของร้านค้า
     """
@@ -56,7 +56,7 @@ async def get_quick_amounts(store_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/", response_model=QuickAmountResponse)
-async def create_quick_amount(
+def create_quick_amount(
     store_id: int,
     quick_amount: QuickAmountCreate,
     db: Session = Depends(get_db)
@@ -89,7 +89,7 @@ async def create_quick_amount(
 
 
 @router.put("/{quick_amount_id}", response_model=QuickAmountResponse)
-async def update_quick_amount(
+def update_quick_amount(
     store_id: int,
     quick_amount_id: int,
     quick_amount: QuickAmountUpdate,
@@ -134,7 +134,7 @@ async def update_quick_amount(
 
 
 @router.delete("/{quick_amount_id}")
-async def delete_quick_amount(
+def delete_quick_amount(
     store_id: int,
     quick_amount_id: int,
     db: Session = Depends(get_db)
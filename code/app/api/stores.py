@@ -7,8 +7,9 @@ from pydantic import BaseModel
 from typing import Optional
 import json
 from app.database import get_db
-from app.models import Store, Menu, Order, StoreLocaleSetting
-from app.utils.i18n import resolve_i18n
+from app.models import Store, Menu, Order
+from app.services.locale_context import get_store_locale
+from app.utils.i18n import project_store_name
 from app.utils.store_token import generate_store_token
 from app.services.promptpay import (
     generate_promptpay_qr_image,
@@ -49,7 +50,7 @@ class StoreResponse(BaseModel):
 
 
 @router.post("/", response_model=StoreResponse)
-async def create_store(store: StoreCreate, db: Session = Depends(get_db)):
+def create_store(store: StoreCreate, db: Session = Depends(get_db)):
     """
     สร้างร้านค้าใหม่ และสร้าง token 20 หลัก (group_id 3 + site_id 4 + store_id 6 + menu_id 7)
     """
@@ -88,12 +89,11 @@ async def create_store(store: StoreCreate, db: Session = Depends(get_db)):
 
 
 def _get_store_locale(db: Session, store_id: int) -> str:
-    row = db.query(StoreLocaleSetting).filter(StoreLocaleSetting.store_id == store_id).first()
-    return row.locale if row else "th"
+    return get_store_locale(db, store_id)
 
 
 @router.get("/{store_id}")
-async def get_store(
+def get_store(
     store_id: int,
     locale: Optional[str] = Query(None, description="ภาษา - ไม่ระบุใช้ตามร้าน"),
     db: Session = Depends(get_db)
@@ -109,8 +109,7 @@ async def get_store(
             raise HTTPException(status_code=404, detail="Store not found")
         
         loc = locale or _get_store_locale(db, store_id)
-        name_i18n = getattr(store, "name_i18n", None)
-        store_name = resolve_i18n(name_i18n, store.name, loc) or store.name
+        store_name = project_store_name(store, loc)
         
         # Get profile and event names if available
         profile_name = None
@@ -157,7 +156,7 @@ async def get_store(
 
 
 @router.get("/")
-async def list_stores(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def list_stores(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     ดึงรายการร้านค้าทั้งหมด (รวม group_id, site_id สำหรับ Admin จัด Site/Group/Store)
     """
@@ -180,7 +179,7 @@ async def list_stores(skip: int = 0, limit: int = 100, db: Session = Depends(get
 
 
 @router.patch("/{store_id}")
-async def update_store(
+def update_store(
     store_id: int,
     body: StoreUpdate,
     db: Session = Depends(get_db),
@@ -228,7 +227,7 @@ class GeneratePromptPayQRRequest(BaseModel):
 
 
 @router.post("/{store_id}/generate-promptpay-qr")
-async def generate_promptpay_qr(
+def generate_promptpay_qr(
     store_id: int,
     request: GeneratePromptPayQRRequest,
     db: Session = Depends(get_db),
@@ -400,7 +399,7 @@ class CreateOrderRequest(BaseModel):
 
 
 @router.post("/{store_id}/orders")
-async def create_store_order(
+def create_store_order(
     store_id: int,
     body: CreateOrderRequest,
     db: Session = Depends(get_db),
@@ -422,7 +421,7 @@ async def create_store_order(
 
 
 @router.get("/{store_id}/orders")
-async def list_store_orders(
+def list_store_orders(
     store_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
@@ -452,7 +451,7 @@ async def list_store_orders(
 
 
 @router.get("/{store_id}/orders/{order_id}")
-async def get_store_order(
+def get_store_order(
     store_id: int,
     order_id: int,
     db: Session = Depends(get_db),
@@ -490,7 +489,7 @@ class GenerateBOTStandardQRRequest(BaseModel):
 
 
 @router.post("/{store_id}/generate-bot-standard-qr")
-async def generate_bot_standard_qr(
+def generate_bot_standard_qr(
     store_id: int,
     request: GenerateBOTStandardQRRequest,
     db: Session = Depends(get_db)
@@ -11,7 +11,7 @@ router = APIRouter(prefix="/api/tax", tags=["tax"])
 
 
 @router.post("/invoices/{transaction_id}")
-async def create_tax_invoice(
+def create_tax_invoice(
     transaction_id: int,
     invoice_number: str = None,
     db: Session = Depends(get_db)
@@ -41,7 +41,7 @@ async def create_tax_invoice(
 
 
 @router.get("/invoices/{invoice_id}")
-async def get_tax_invoice(invoice_id: int, db: Session = Depends(get_db)):
+def get_tax_invoice(invoice_id: int, db: Session = Depends(get_db)):
     """
     ดึงข้อมูลใบกำกับภาษี
     """
@@ -65,7 +65,7 @@ async def get_tax_invoice(invoice_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/invoices/{invoice_id}/send-e-tax")
-async def send_e_tax_invoice(invoice_id: int, db: Session = Depends(get_db)):
+def send_e_tax_invoice(invoice_id: int, db: Session = Depends(get_db)):
     """
     ส่งใบกำกับภาษีไปยัง E-Tax Invoice Provider
     """
@@ -87,7 +87,7 @@ async def send_e_tax_invoice(invoice_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/invoices")
-async def list_tax_invoices(
+def list_tax_invoices(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
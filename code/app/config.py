@@ -47,23 +47,84 @@ DB_PORT = get_config("DATABASE", "DB_PORT", fallback=3306, env_var="DB_PORT", en
 DB_NAME = get_config("DATABASE", "DB_NAME", fallback="market_place_system", env_var="DB_NAME")
 DB_USER = get_config("DATABASE", "DB_USER", fallback="root", env_var="DB_USER")
 DB_PASSWORD = get_config("DATABASE", "DB_PASSWORD", fallback="123456", env_var="DB_PASSWORD")
+# connection ต่อ worker (app/database): engine sync + engine async แบ่งงบเดิมของ worker ไม่ใช่คนละเต็มก้อน
+#   sync 4+4 = 8, async 2+1 = 3, รายงาน 3+2 = 5 -> 16 ต่อ worker
+#   + connection จองเลขเอกสาร (document_numbers, NullPool) ชั่วคราวไม่เกิน 1 = 17
+#   8 workers (gunicorn_config) = 136 + GET_LOCK ของ scheduler 1 = 137 < max_connections ค่าเริ่มต้นของ MySQL (151)
+#   เพิ่ม workers หรือ pool ต้องเพิ่ม max_connections ตาม (REPORTING_DB_URL ชี้ replica = รายงานไม่นับที่ primary)
+DB_POOL_SIZE = get_config("DATABASE", "DB_POOL_SIZE", fallback=4, env_var="DB_POOL_SIZE", env_type=int)
+DB_MAX_OVERFLOW = get_config("DATABASE", "DB_MAX_OVERFLOW", fallback=4, env_var="DB_MAX_OVERFLOW", env_type=int)
+DB_ASYNC_POOL_SIZE = get_config("DATABASE", "DB_ASYNC_POOL_SIZE", fallback=2, env_var="DB_ASYNC_POOL_SIZE", env_type=int)
+DB_ASYNC_MAX_OVERFLOW = get_config(
+    "DATABASE", "DB_ASYNC_MAX_OVERFLOW", fallback=1, env_var="DB_ASYNC_MAX_OVERFLOW", env_type=int
+)
+# engine รายงาน (get_reporting_db): pool แยกจาก OLTP - รายงานหนัก ๆ ไม่แย่ง connection ของ checkout / webhook
+# REPORTING_DB_URL ว่าง = DB เดียวกับ DATABASE_URL (ชี้ไป read replica ได้ เช่น mysql+pymysql://ro:pw@replica/db)
+REPORTING_DB_URL = get_config("DATABASE", "REPORTING_DB_URL", fallback="", env_var="REPORTING_DB_URL")
+REPORTING_POOL_SIZE = get_config("DATABASE", "REPORTING_POOL_SIZE", fallback=3, env_var="REPORTING_POOL_SIZE", env_type=int)
+REPORTING_MAX_OVERFLOW = get_config("DATABASE", "REPORTING_MAX_OVERFLOW", fallback=2, env_var="REPORTING_MAX_OVERFLOW", env_type=int)
+# วินาที: รอ connection รายงานนานสุด (เกิน = 503) / query รายงานนานสุด (MySQL max_execution_time)
+REPORTING_POOL_TIMEOUT = get_config("DATABASE", "REPORTING_POOL_TIMEOUT", fallback=5, env_var="REPORTING_POOL_TIMEOUT", env_type=int)
+REPORTING_STATEMENT_TIMEOUT = get_config(
+    "DATABASE", "REPORTING_STATEMENT_TIMEOUT", fallback=60, env_var="REPORTING_STATEMENT_TIMEOUT", env_type=int
+)
+# จำนวน thread สูงสุดที่รัน handler / dependency แบบ sync
+# (ค่าเริ่มต้น = pool_size + max_overflow ของ engine หลักเท่านั้น ไม่บวก pool รายงาน - handler OLTP ทุกตัวได้ connection ทันที
+#  handler รายงานใช้ thread จากก้อนเดียวกัน และรอ pool รายงานไม่เกิน REPORTING_POOL_TIMEOUT)
+DB_THREADPOOL_SIZE = get_config(
+    "DATABASE", "DB_THREADPOOL_SIZE", fallback=DB_POOL_SIZE + DB_MAX_OVERFLOW, env_var="DB_THREADPOOL_SIZE", env_type=int
+)
 
 # Backend Configuration
 BACKEND_URL = get_config("BACKEND", "BACKEND_URL", fallback="http://localhost:8000", env_var="BACKEND_URL")
 SECRET_KEY = get_config("BACKEND", "SECRET_KEY", fallback="your-secret-key-here", env_var="SECRET_KEY")
 DEBUG = get_config("BACKEND", "DEBUG", fallback=True, env_var="DEBUG", env_type=bool)
+# token สำหรับ GET /metrics (Prometheus ส่ง Authorization: Bearer <token>)
+# ว่าง (ค่าเริ่มต้น) = เปิดให้เฉพาะ request จากเครื่องเดียวกันที่ไม่ผ่าน reverse proxy ทุกโหมด (DEBUG ด้วย)
+METRICS_TOKEN = get_config("BACKEND", "METRICS_TOKEN", fallback="", env_var="METRICS_TOKEN")
 
 # E-Money Configuration
 HAS_E_MONEY_LICENSE = get_config("E_MONEY", "HAS_E_MONEY_LICENSE", fallback=False, env_var="HAS_E_MONEY_LICENSE", env_type=bool)
 AUTO_REFUND_ENABLED = get_config("E_MONEY", "AUTO_REFUND_ENABLED", fallback=True, env_var="AUTO_REFUND_ENABLED", env_type=bool)
 REFUND_NOTIFICATION_TIME = get_config("E_MONEY", "REFUND_NOTIFICATION_TIME", fallback="23:00", env_var="REFUND_NOTIFICATION_TIME")
 DAILY_BALANCE_RESET = get_config("E_MONEY", "DAILY_BALANCE_RESET", fallback=True, env_var="DAILY_BALANCE_RESET", env_type=bool)
+# คีย์สำหรับรหัส e-coupon แบบ keyed (ว่าง = ใช้ SECRET_KEY) - ห้ามเปลี่ยนหลังออกคูปองแล้ว ไม่งั้นรหัสซ้ำได้
+ECOUPON_CODE_KEY = get_config("E_MONEY", "ECOUPON_CODE_KEY", fallback="", env_var="ECOUPON_CODE_KEY")
+
+# Member Points – แต้มสะสมจากยอดซื้อ (ปัดลง) คำนวณทั้งวันครั้งเดียวตอน POINTS_ACCRUAL_TIME ของวันถัดไป
+POINTS_PER_BAHT = get_config("POINTS", "POINTS_PER_BAHT", fallback=0.04, env_var="POINTS_PER_BAHT", env_type=float)
+POINTS_ACCRUAL_TIME = get_config("POINTS", "POINTS_ACCRUAL_TIME", fallback="00:30", env_var="POINTS_ACCRUAL_TIME")
+
+# Archive – ย้ายประวัติที่เก่ากว่า retention (วัน) ออกจากตารางหลักไปเป็นไฟล์ gzip JSONL แยกวัน (services/archive)
+ARCHIVE_DIR = get_config("ARCHIVE", "ARCHIVE_DIR", fallback="", env_var="ARCHIVE_DIR")  # ว่าง = data/archive
+ARCHIVE_TIME = get_config("ARCHIVE", "ARCHIVE_TIME", fallback="03:00", env_var="ARCHIVE_TIME")
+ARCHIVE_BACK_TRANSACTION_DAYS = get_config(
+    "ARCHIVE", "BACK_TRANSACTION_DAYS", fallback=180, env_var="ARCHIVE_BACK_TRANSACTION_DAYS", env_type=int
+)
+ARCHIVE_AUDIT_LOG_DAYS = get_config("ARCHIVE", "AUDIT_LOG_DAYS", fallback=365, env_var="ARCHIVE_AUDIT_LOG_DAYS", env_type=int)
+ARCHIVE_AD_IMPRESSION_DAYS = get_config(
+    "ARCHIVE", "AD_IMPRESSION_DAYS", fallback=90, env_var="ARCHIVE_AD_IMPRESSION_DAYS", env_type=int
+)
+
+# Scheduler – งานตามเวลา (app/scheduler) รันใน worker ที่เป็น leader ตัวเดียว (worker อื่นรอรับช่วงถ้า leader ตาย)
+# SCHEDULER_LOCK: auto = MySQL GET_LOCK (ข้ามเครื่องได้) / ไฟล์ flock เมื่อ DB ไม่ใช่ MySQL | db | file
+SCHEDULER_ENABLED = get_config("SCHEDULER", "ENABLED", fallback=True, env_var="SCHEDULER_ENABLED", env_type=bool)
+SCHEDULER_LOCK = get_config("SCHEDULER", "LOCK", fallback="auto", env_var="SCHEDULER_LOCK")
+SCHEDULER_LOCK_FILE = get_config("SCHEDULER", "LOCK_FILE", fallback="", env_var="SCHEDULER_LOCK_FILE")  # ว่าง = data/scheduler.lock
+SCHEDULER_TICK = get_config("SCHEDULER", "TICK", fallback=15, env_var="SCHEDULER_TICK", env_type=int)  # วินาที
+SETTLEMENT_TIME = get_config("SCHEDULER", "SETTLEMENT_TIME", fallback="23:00", env_var="SETTLEMENT_TIME")
 
 # Crypto Configuration
 BLOCKCHAIN_EXPLORER_API = get_config("CRYPTO", "BLOCKCHAIN_EXPLORER_API", fallback="https://api.blockchain.info", env_var="BLOCKCHAIN_EXPLORER_API")
 TRANSACTION_FEE = get_config("CRYPTO", "TRANSACTION_FEE", fallback=5.00, env_var="TRANSACTION_FEE", env_type=float)
 MONTHLY_FLAT_FEE = get_config("CRYPTO", "MONTHLY_FLAT_FEE", fallback=500.00, env_var="MONTHLY_FLAT_FEE", env_type=float)
 CRYPTO_ENABLED = get_config("CRYPTO", "ENABLED", fallback=True, env_var="CRYPTO_ENABLED", env_type=bool)
+# ตรวจสถานะ tx ที่ยัง pending เป็นชุด (scheduler): จำนวน request พร้อมกัน / timeout ต่อ request (วินาที)
+# tx ถูกตรวจซ้ำหลังเว้นเท่ากับอายุของมันตอนตรวจครั้งก่อน (ห่างขึ้นเรื่อย ๆ) อยู่ในช่วง MIN..MAX วินาที
+CRYPTO_POLL_CONCURRENCY = get_config("CRYPTO", "POLL_CONCURRENCY", fallback=20, env_var="CRYPTO_POLL_CONCURRENCY", env_type=int)
+CRYPTO_POLL_TIMEOUT = get_config("CRYPTO", "POLL_TIMEOUT", fallback=10, env_var="CRYPTO_POLL_TIMEOUT", env_type=int)
+CRYPTO_POLL_MIN_INTERVAL = get_config("CRYPTO", "POLL_MIN_INTERVAL", fallback=60, env_var="CRYPTO_POLL_MIN_INTERVAL", env_type=int)
+CRYPTO_POLL_MAX_INTERVAL = get_config("CRYPTO", "POLL_MAX_INTERVAL", fallback=3600, env_var="CRYPTO_POLL_MAX_INTERVAL", env_type=int)
 
 # Tax Configuration
 WHT_RATE = get_config("TAX", "WHT_RATE", fallback=0.03, env_var="WHT_RATE", env_type=float)
@@ -131,4 +192,7 @@ PUSH_NOTIFICATION_ENABLED = get_config("NOTIFICATION", "PUSH_NOTIFICATION_ENABLE
 # Database URL - MariaDB/MySQL (password URL-encoded ถ้ามีอักขระพิเศษ เช่น @ # %)
 _safe_password = quote_plus(DB_PASSWORD) if DB_PASSWORD else ""
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{_safe_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
+# ตั้ง env DATABASE_URL แทนทั้งชุด (เช่น sqlite:///data/bench/lunch_peak.db ตอนรัน scripts/bench_lunch_peak.py)
+DATABASE_URL = os.getenv("DATABASE_URL") or DATABASE_URL
+REPORTING_DATABASE_URL = REPORTING_DB_URL or DATABASE_URL
 
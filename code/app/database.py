@@ -1,21 +1,58 @@
 """
 Database connection and session management
+- engine / SessionLocal / get_db: Session แบบ sync (PyMySQL) ใช้กับ handler ทั่วไป ที่ FastAPI รันใน thread pool
+- get_async_engine / get_async_db: AsyncSession (aiomysql, SQLite ใช้ aiosqlite) สำหรับ endpoint ที่ถูกเรียกถี่
+  (webhook, signage, menus, recent-paid) ไม่บล็อก event loop ของ worker
+  service ที่เขียนแบบ sync เรียกผ่าน await db.run_sync(fn, ...) ได้ (I/O ยังเป็น async)
+- reporting_engine / get_reporting_db: Session อ่านอย่างเดียวสำหรับรายงาน / สถิติ / export ใช้ pool ของตัวเอง
+  (REPORTING_DB_URL ชี้ไป read replica ได้) รายงานหนักจึงไม่ทำให้ pool ของ checkout / webhook หมด
+  endpoint ประกาศประเภทเองด้วย Depends(get_db) (เขียน / OLTP) หรือ Depends(get_reporting_db) (รายงาน)
 """
-from sqlalchemy import create_engine, text
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.config import DATABASE_URL
+from app.config import (
+    DATABASE_URL,
+    DB_ASYNC_MAX_OVERFLOW,
+    DB_ASYNC_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+    REPORTING_DATABASE_URL,
+    REPORTING_MAX_OVERFLOW,
+    REPORTING_POOL_SIZE,
+    REPORTING_POOL_TIMEOUT,
+    REPORTING_STATEMENT_TIMEOUT,
+)
+from app.services import metrics
+
+POOL_SIZE = DB_POOL_SIZE
+MAX_OVERFLOW = DB_MAX_OVERFLOW
+
+
+def _connect_args(url) -> dict:
+    """SQLite (ตัวแทน DB ตอน benchmark ผ่าน env DATABASE_URL) ไม่มี connect_timeout และต้องใช้ข้าม thread ได้"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"check_same_thread": False}
+    return {"connect_timeout": 10}  # Connection timeout (seconds)
+
 
 # MariaDB/MySQL connection settings
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,   # Verify connections before using (fixes stale connection)
     pool_recycle=3600,    # Recycle connections after 1 hour
-    pool_size=5,          # Connection pool size
-    max_overflow=10,      # Extra connections when pool exhausted
-    connect_args={"connect_timeout": 10},  # Connection timeout (seconds)
+    pool_size=POOL_SIZE,          # Connection pool size
+    max_overflow=MAX_OVERFLOW,      # Extra connections when pool exhausted
+    poolclass=metrics.TimedQueuePool,  # วัดเวลารอ connection (/metrics)
+    connect_args=_connect_args(DATABASE_URL),
     echo=False            # Set to True for SQL query debugging
 )
+metrics.instrument_pool(engine, "sync", POOL_SIZE + MAX_OVERFLOW)
 
 
 def check_db_connection():
@@ -40,3 +77,104 @@ def get_db():
     finally:
         db.close()
 
+
+# ---------- reporting ----------
+
+reporting_engine = create_engine(
+    REPORTING_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    pool_size=REPORTING_POOL_SIZE,
+    max_overflow=REPORTING_MAX_OVERFLOW,
+    pool_timeout=REPORTING_POOL_TIMEOUT,  # รอไม่นาน - เต็มแล้วตอบ 503 ไม่ให้ thread ค้างรอ
+    poolclass=metrics.TimedQueuePool,
+    connect_args=_connect_args(REPORTING_DATABASE_URL),
+)
+metrics.instrument_pool(reporting_engine, "reporting", REPORTING_POOL_SIZE + REPORTING_MAX_OVERFLOW)
+
+
+@event.listens_for(reporting_engine, "connect")
+def _limit_reporting_session(dbapi_conn, _record):
+    """
+    connection รายงาน: จำกัดเวลาต่อ query และห้ามเขียน (MySQL / MariaDB - SQLite ไม่มีทั้งสองอย่าง)
+    ดูจาก DBAPI connection ที่กำลังต่อ (driver MySQL มี get_server_info) ไม่ใช่ reporting_engine ของ module
+    """
+    if not hasattr(dbapi_conn, "get_server_info"):
+        return
+    cursor = dbapi_conn.cursor()
+    try:
+        if "mariadb" in dbapi_conn.get_server_info().lower():
+            cursor.execute(f"SET SESSION max_statement_time = {int(REPORTING_STATEMENT_TIMEOUT)}")
+        else:
+            cursor.execute(f"SET SESSION max_execution_time = {int(REPORTING_STATEMENT_TIMEOUT) * 1000}")
+        cursor.execute("SET SESSION TRANSACTION READ ONLY")
+    finally:
+        cursor.close()
+
+
+ReportingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=reporting_engine)
+
+
+def get_reporting_db():
+    """Dependency สำหรับ endpoint รายงาน - ยืม connection ทันที pool รายงานเต็ม = 503 (ไม่แตะ pool หลัก)"""
+    db = ReportingSessionLocal()
+    try:
+        try:
+            db.connection()
+        except exc.TimeoutError:
+            raise HTTPException(
+                status_code=503,
+                detail="ระบบรายงานกำลังใช้งานเต็ม กรุณาลองใหม่อีกครั้ง",
+                headers={"Retry-After": str(REPORTING_POOL_TIMEOUT)},
+            )
+        yield db
+    finally:
+        db.close()
+
+
+# ---------- async ----------
+
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+_async_engine: Optional[AsyncEngine] = None
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+def async_url(url) -> URL:
+    """URL ของ engine sync -> driver async ของ DB เดียวกัน"""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def get_async_engine() -> AsyncEngine:
+    """async engine ของ DB เดียวกับ engine (สร้างครั้งแรกที่ใช้ - worker ที่ไม่เรียก endpoint async ไม่ต้องมี driver)"""
+    global _async_engine
+    if _async_engine is None:
+        url = async_url(engine.url)
+        if url.get_backend_name() == "mysql":
+            _async_engine = create_async_engine(
+                url,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+                pool_size=DB_ASYNC_POOL_SIZE,  # แบ่งจากงบ connection ต่อ worker (ดู app/config)
+                max_overflow=DB_ASYNC_MAX_OVERFLOW,
+                poolclass=metrics.TimedAsyncQueuePool,
+                connect_args={"connect_timeout": 10},
+            )
+            metrics.instrument_pool(_async_engine.sync_engine, "async", DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW)
+        else:
+            _async_engine = create_async_engine(url)
+    return _async_engine
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependency สำหรับ AsyncSession"""
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
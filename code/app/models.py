@@ -1,7 +1,7 @@
 """
 Database models for Marketplace System
 """
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, Date, DateTime, Text, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -169,6 +169,37 @@ class CustomerBalance(Base):
     customer = relationship("Customer", back_populates="balances")
 
 
+class WalletLedger(Base):
+    """สมุดกระเป๋าเงินสมาชิก: ทุกการเพิ่ม/ลด CustomerBalance ผ่าน services/wallet_ledger"""
+    __tablename__ = "wallet_ledger"
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
+    delta = Column(Float, nullable=False)  # บวก = เติม, ลบ = หัก
+    balance_after = Column(Float, nullable=False)
+    reason = Column(String(50), nullable=False)  # topup, refund, ...
+    ref = Column(String(255), nullable=True)  # เช่น PaymentIntent id, refund_request_id
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ProcessedPaymentEvent(Base):
+    """การชำระจาก gateway ที่ประมวลผลแล้ว (กัน webhook ซ้ำ) - 1 แถวต่อ (provider, payment id)"""
+    __tablename__ = "processed_payment_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String(20), nullable=False)  # stripe, omise, ...
+    payment_id = Column(String(255), nullable=False)  # Stripe: PaymentIntent id
+    event_id = Column(String(255), nullable=True)
+    event_type = Column(String(100), nullable=True)
+    customer_id = Column(Integer, nullable=True)
+    amount = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ux_processed_payment_events", "provider", "payment_id", unique=True),
+    )
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
@@ -198,6 +229,13 @@ class Transaction(Base):
     tax_invoice = relationship("TaxInvoice", back_populates="transaction", uselist=False)
     foodcourt_id_obj = relationship("FoodCourtID", foreign_keys=[foodcourt_id])
 
+    # รายงานภาษี / แต้มสะสม: สถานะ + ช่วงวัน, admin: ล่าสุดก่อน (ทั้งหมด / รายร้าน)
+    __table_args__ = (
+        Index("ix_transactions_status_created", "status", "created_at"),
+        Index("ix_transactions_store_created", "store_id", "created_at"),
+        Index("ix_transactions_created", "created_at"),
+    )
+
 
 class CryptoTransaction(Base):
     __tablename__ = "crypto_transactions"
@@ -246,6 +284,7 @@ class Event(Base):
     Event - สำหรับจัดการงาน event
     """
     __tablename__ = "events"
+    __table_args__ = (Index("ix_events_active_range", "is_active", "start_date", "end_date"),)
 
     id = Column(Integer, primary_key=True, index=True)
     profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=True)
@@ -340,6 +379,9 @@ class Order(Base):
     # Relationships
     store = relationship("Store", back_populates="orders")
 
+    # store-pos: ประวัติ order ของร้าน (กรองสถานะ) ล่าสุดก่อน
+    __table_args__ = (Index("ix_orders_store_status_created", "store_id", "status", "created_at"),)
+
 
 class RefundRequest(Base):
     __tablename__ = "refund_requests"
@@ -378,8 +420,13 @@ class RefundNotification(Base):
 # ---------- ลูกค้าสมาชิกออนไลน์: แต้ม, คูปอง, อีคูปอง, โฆษณา, ประวัติ ----------
 
 class MemberPointsLedger(Base):
-    """สมุดแต้มสะสมลูกค้า"""
+    """สมุดแต้มสะสมลูกค้า (เขียนผ่าน services/points_ledger เท่านั้น - balance_after ตรงกับ Customer.total_points)"""
     __tablename__ = "member_points_ledger"
+    __table_args__ = (
+        # แต้มจากรายการเดียวกันเข้าได้ครั้งเดียว (ref_id NULL ไม่นับซ้ำ)
+        Index("ux_member_points_ledger_ref", "customer_id", "reason", "ref_id", unique=True),
+        Index("ix_member_points_ledger_created", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
@@ -392,6 +439,18 @@ class MemberPointsLedger(Base):
     customer = relationship("Customer", back_populates="points_ledger")
 
 
+class MemberPointsSnapshot(Base):
+    """ยอดแต้มของสมาชิก ณ สิ้นวัน (ledger_id = แถวสุดท้ายของ ledger ที่รวมแล้ว) ใช้หายอดย้อนหลังโดยไม่ไล่ ledger"""
+    __tablename__ = "member_points_snapshots"
+    __table_args__ = (Index("ix_member_points_snapshots_customer", "customer_id", "snapshot_date"),)
+
+    snapshot_date = Column(Date, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    balance = Column(Float, nullable=False)
+    ledger_id = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class VoucherDefinition(Base):
     """คำจำกัดความคูปอง/วoucher ที่ Admin กำหนด"""
     __tablename__ = "voucher_definitions"
@@ -428,6 +487,7 @@ class MemberVoucher(Base):
 class StorePromotion(Base):
     """โปรโมชั่นร้านที่ Admin กำหนด แสดงในแอปสมาชิก"""
     __tablename__ = "store_promotions"
+    __table_args__ = (Index("ix_store_promotions_active_range", "is_active", "valid_from", "valid_to"),)
 
     id = Column(Integer, primary_key=True, index=True)
     store_id = Column(Integer, ForeignKey("stores.id"), nullable=False, index=True)
@@ -441,12 +501,26 @@ class StorePromotion(Base):
     store = relationship("Store", backref="store_promotions")
 
 
+class MemberSummary(Base):
+    """สรุปหน้า dashboard สมาชิก (1 แถวต่อคน) - คำนวณใหม่ตอน commit ที่แก้ยอด/คูปอง/กิจกรรม (services/member_summary)"""
+    __tablename__ = "member_summaries"
+
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    balance = Column(Float, default=0.0, nullable=False)
+    e_coupon_balance = Column(Float, default=0.0, nullable=False)
+    voucher_count = Column(Integer, default=0, nullable=False)
+    vouchers_json = Column(Text, nullable=True)  # JSON array ของ voucher ที่ยังไม่ใช้
+    recent_activities_json = Column(Text, nullable=True)  # JSON array กิจกรรมล่าสุด 20 รายการ
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class CouponPromo(Base):
     """
     ตั้งค่าคูปองโปรโมชั่น เช่น เติม 200 ได้คูปอง 20 บาท
     กำหนดร้านที่ร่วมรายการ (store_ids ว่าง = ทุกร้าน) และวันเวลาที่คูปองใช้ได้
     """
     __tablename__ = "coupon_promos"
+    __table_args__ = (Index("ix_coupon_promos_active_range", "is_active", "valid_from", "valid_to"),)
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
@@ -488,10 +562,49 @@ class ECoupon(Base):
     store = relationship("Store", backref="e_coupons")
     promotion = relationship("CouponPromo", back_populates="e_coupons", foreign_keys=[promotion_id])
 
+    __table_args__ = (
+        Index("ix_e_coupons_customer_status", "customer_id", "status", "id"),
+    )
+
+
+class ECouponStore(Base):
+    """ร้านที่ใช้คูปองได้ (normalized จาก ECoupon.allowed_store_ids) - คูปองที่ไม่จำกัดร้านไม่มีแถวในตารางนี้"""
+    __tablename__ = "e_coupon_stores"
+
+    coupon_id = Column(Integer, ForeignKey("e_coupons.id", ondelete="CASCADE"), primary_key=True)
+    store_id = Column(Integer, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_e_coupon_stores_store", "store_id", "coupon_id"),
+    )
+
+
+class ECouponRedemption(Base):
+    """สมุดการหักคูปอง: 1 แถวต่อคูปองที่ถูกหักในการจ่ายแต่ละครั้ง"""
+    __tablename__ = "e_coupon_redemptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    coupon_id = Column(Integer, ForeignKey("e_coupons.id"), nullable=False, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
+    store_id = Column(Integer, nullable=True)
+    order_id = Column(Integer, nullable=True, index=True)
+    amount = Column(Float, nullable=False)  # ยอดที่หักจากคูปองนี้
+    balance_after = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CodeSequence(Base):
+    """ลำดับเลข (รหัส e-coupon แบบ keyed, เลขเอกสารรายวัน) - จองทีละช่วงด้วย UPDATE เดียว (services/document_numbers)"""
+    __tablename__ = "code_sequences"
+
+    name = Column(String(64), primary_key=True)
+    next_value = Column(BigInteger, nullable=False, default=0)
+
 
 class AdFeed(Base):
     """ฟีดโฆษณา/สื่อ (video หรือภาพ) - เลือกทุกร้าน (store_id=null = broadcast) หรือเฉพาะร้าน ตั้งเวลา start_at/end_at ได้"""
     __tablename__ = "ad_feeds"
+    __table_args__ = (Index("ix_ad_feeds_active_range", "is_active", "start_at", "end_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
@@ -519,6 +632,22 @@ class AdImpression(Base):
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_ad_impressions_created", "created_at"),)  # archive ตัดตามวัน
+
+
+class AdImpressionCounter(Base):
+    """ยอด view/click ต่อโฆษณาต่อนาที (รวมไว้ตอน flush จาก services/ad_impressions) - ใช้ทำสรุปแทน COUNT(*)"""
+    __tablename__ = "ad_impression_counters"
+
+    ad_feed_id = Column(Integer, ForeignKey("ad_feeds.id"), primary_key=True)
+    minute = Column(DateTime, primary_key=True)  # เวลาปัดลงเป็นนาที
+    views = Column(Integer, default=0, nullable=False)
+    clicks = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index("ix_ad_impression_counters_minute", "minute"),
+    )
+
 
 class MemberActivity(Base):
     """ประวัติการใช้งาน: เติมเงิน, จ่ายเงิน, ใช้คูปอง ฯลฯ"""
@@ -570,6 +699,28 @@ class AuditLog(Base):
     ip_address = Column(String(50), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_audit_logs_created", "created_at"),)  # archive ตัดตามวัน
+
+
+class JobRun(Base):
+    """
+    ประวัติงานตามเวลา (app/scheduler) - หนึ่งแถวต่อรอบ (job_name + scheduled_for)
+    unique กันรอบเดียวกันรันซ้ำ แม้ leader เปลี่ยนตัวกลางรอบหรือรันย้อนหลังหลัง restart
+    """
+    __tablename__ = "job_runs"
+    __table_args__ = (Index("ux_job_runs_job_scheduled", "job_name", "scheduled_for", unique=True),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_name = Column(String(100), nullable=False)
+    scheduled_for = Column(DateTime, nullable=False)  # เวลารอบตามตาราง (ไม่ใช่เวลาที่เริ่มจริง)
+    status = Column(String(20), nullable=False, default="running")  # running, success, failed, timeout
+    runner = Column(String(100), nullable=True)  # host:pid ของ leader
+    started_at = Column(DateTime, nullable=False)
+    heartbeat_at = Column(DateTime, nullable=True)  # runner ยังทำงานอยู่ (อัปเดตทุก tick) - NULL = งานจบจริงแล้ว
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+
 
 class EmergencyBackupEntry(Base):
     """รายการกรอกข้อมูลสำรอง กรณีไฟดับ/ระบบใช้งานไม่ได้ (บังคับ login admin เพื่อดูย้อนหลัง)"""
@@ -588,6 +739,27 @@ class EmergencyBackupEntry(Base):
     entered_by = relationship("User", backref="emergency_backup_entries")
 
 
+class PosJournalEntry(Base):
+    """
+    รายการที่ Store POS บันทึกไว้ตอนออฟไลน์แล้วส่งมาทีหลังผ่าน /api/pos-journal/sync
+    client_id สร้างที่เครื่อง POS (uuid) - ส่งซ้ำกี่ครั้งก็บันทึกครั้งเดียว
+    """
+    __tablename__ = "pos_journal_entries"
+    __table_args__ = (Index("ux_pos_journal_entries_client", "store_id", "client_id", unique=True),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    client_id = Column(String(64), nullable=False)
+    entry_type = Column(String(50), nullable=False)  # sale, exchange, topup, other
+    amount = Column(Float, nullable=False)
+    occurred_at = Column(DateTime(timezone=True), nullable=True)  # เวลาที่เกิดรายการที่เครื่อง POS
+    order_id = Column(Integer, nullable=True)
+    transaction_id = Column(Integer, nullable=True)
+    backup_entry_id = Column(Integer, nullable=True)
+    entered_by_user_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class FoodCourtID(Base):
     """
     Marketplace ID - ระบบแลก Marketplace ID ที่ Counter
@@ -669,6 +841,12 @@ class StoreTransaction(Base):
     foodcourt_id_obj = relationship("FoodCourtID", foreign_keys=[foodcourt_id])
     store = relationship("Store")
 
+    # ReportService: รายร้าน (ร้าน + สถานะ + ช่วงวัน) / รายวัน-เดือน-ปี (ช่วงวัน + สถานะ ครอบ store_id, amount)
+    __table_args__ = (
+        Index("ix_store_transactions_store_status_created", "store_id", "status", "created_at"),
+        Index("ix_store_transactions_created_status", "created_at", "status", "store_id", "amount"),
+    )
+
 
 class StoreQuickAmount(Base):
     """
@@ -755,6 +933,16 @@ class PromptPayBackTransaction(Base):
     # Relationships
     store = relationship("Store", back_populates="promptpay_back_transactions")
 
+    __table_args__ = (
+        # store-pos แจ้งเงินเข้า: ร้าน + received + paid_at ล่าสุดก่อน
+        Index("ix_promptpay_back_transactions_store_status_paid", "store_id", "status", "paid_at"),
+        # live feed: รายร้าน / ทุกร้าน ตาม created_at
+        Index("ix_promptpay_back_transactions_store_created", "store_id", "created_at"),
+        Index("ix_promptpay_back_transactions_created", "created_at"),
+        # settlement สิ้นวัน SUM(amount) GROUP BY store_id ช่วง paid_at (ครอบคลุม ไม่ต้องอ่านแถว) + รายงาน / archive
+        Index("ix_promptpay_back_transactions_paid_store", "paid_at", "store_id", "amount"),
+    )
+
 
 class StoreSettlement(Base):
     """
@@ -777,6 +965,12 @@ class StoreSettlement(Base):
     # Relationships
     store = relationship("Store", back_populates="store_settlements")
 
+    # รายการโอนของวัน (เรียงร้าน) / ประวัติของร้าน - กรองวันเป็นช่วง settlement_date ไม่ใช่ DATE(...)
+    __table_args__ = (
+        Index("ix_store_settlements_date_store", "settlement_date", "store_id"),
+        Index("ix_store_settlements_store_date", "store_id", "settlement_date"),
+    )
+
 
 # ค่าที่ใช้ใน BankingProfile.provider_type
 PROVIDER_K_API = "k_api"           # K API ธนาคารกสิกรไทย
@@ -1,19 +1,33 @@
 """
 Scheduler - ระบบทำงานตามเวลาที่กำหนด (Cron Jobs)
+รันด้วย services/job_runner: ทุก worker เริ่ม runner (main.py startup) แต่มีเพียง leader ตัวเดียวที่รันงาน
+ทุกรอบบันทึกใน job_runs (รอบหนึ่งรันครั้งเดียว) และรอบที่พลาดตอน restart ถูกรันย้อนหลังตาม catch_up
+งานรับเวลารอบ (run_at) - รันย้อนหลังก็ทำของวันที่ถูกต้อง; error ส่งต่อให้ runner บันทึกเป็น failed
+
+รันมือ: python -m app.scheduler --run daily_settlement [--for 2026-10-18T23:00]
 """
-import schedule
-import time
-from datetime import datetime
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
 from app.database import SessionLocal
 from app.services.refund_service import RefundService
 from app.services.crypto_service import CryptoService
-from app.config import REFUND_NOTIFICATION_TIME
-import logging
+from app.services.job_runner import Job, JobRunner, make_leader_lock
+from app.config import (
+    ARCHIVE_TIME,
+    POINTS_ACCRUAL_TIME,
+    REFUND_NOTIFICATION_TIME,
+    SCHEDULER_ENABLED,
+    SETTLEMENT_TIME,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def daily_balance_reset():
+def daily_balance_reset(run_at: Optional[datetime] = None):
     """
     รีเซ็ตยอดเงินทุกสิ้นวัน (เมื่อไม่มีใบอนุญาต e-Money)
     """
@@ -22,13 +36,11 @@ def daily_balance_reset():
         refund_service = RefundService(db)
         refund_service.daily_balance_reset()
         logger.info(f"Daily balance reset completed at {datetime.now()}")
-    except Exception as e:
-        logger.error(f"Error in daily balance reset: {e}")
     finally:
         db.close()
 
 
-def send_refund_notifications():
+def send_refund_notifications(run_at: Optional[datetime] = None):
     """
     ส่งการแจ้งเตือนคืนเงินให้ลูกค้าที่มียอดเงินคงเหลือ
     """
@@ -45,91 +57,145 @@ def send_refund_notifications():
             refund_service.check_and_send_refund_notification(balance.customer_id)
         
         logger.info(f"Refund notifications sent at {datetime.now()}")
-    except Exception as e:
-        logger.error(f"Error sending refund notifications: {e}")
     finally:
         db.close()
 
 
-def update_crypto_transactions():
+def update_crypto_transactions(run_at: Optional[datetime] = None):
     """
     อัพเดทสถานะ Crypto Transactions จาก Blockchain Explorer
+    ตรวจ tx pending ทั้งชุดพร้อมกัน (session เดียว) แล้วเขียนผลกลับเป็น bulk UPDATE - CryptoService.poll_pending_transactions
     """
     db = SessionLocal()
     try:
-        from app.models import CryptoTransaction, CryptoTransactionStatus
-        
-        # ดึง transactions ที่ยัง pending
-        pending_transactions = db.query(CryptoTransaction).filter(
-            CryptoTransaction.status == CryptoTransactionStatus.PENDING
-        ).all()
-        
-        crypto_service = CryptoService(db)
-        for tx in pending_transactions:
-            try:
-                # Use asyncio to run async function
-                import asyncio
-                asyncio.run(crypto_service.update_transaction_status(tx.id))
-            except Exception as e:
-                logger.error(f"Error updating transaction {tx.id}: {e}")
-        
-        logger.info(f"Crypto transactions updated at {datetime.now()}")
-    except Exception as e:
-        logger.error(f"Error updating crypto transactions: {e}")
+        # job sync รันใน thread ของ runner - event loop เดียวต่อรอบ
+        counts = asyncio.run(CryptoService(db).poll_pending_transactions())
+        logger.info(f"Crypto transactions updated at {datetime.now()}: {counts}")
     finally:
         db.close()
 
 
-def daily_settlement_schedule():
+def daily_settlement_schedule(run_at: Optional[datetime] = None):
     """
-    สร้างรายการเตรียมโอนเงินไปยังร้านค้า สิ้นวัน
+    สร้างรายการเตรียมโอนเงินไปยังร้านค้า สิ้นวัน (ของวันที่ของรอบ - รันย้อนหลังหลังเที่ยงคืนก็ได้วันที่ถูก)
     ข้อกำหนดกฏหมาย: ถือฝากได้แค่ 1 วัน (เกิน = payment gateway ต้องขอใบอนุญาต)
     ใช้ ref1/ref2/ref3 ยอดเงิน เวลาโอน แยกและแจ้งร้านว่าเงินเข้าเรียบร้อยแล้ว เพื่อพิมพ์ใบเสร็จรับเงิน
     """
     db = SessionLocal()
     try:
         from app.services.settlement_service import create_daily_settlements
-        from datetime import date
 
-        created = create_daily_settlements(db, settlement_date=date.today())
-        logger.info(f"Daily settlement schedule: created {len(created)} items at {datetime.now()}")
-    except Exception as e:
-        logger.error(f"Error creating daily settlements: {e}")
+        day = (run_at or datetime.now()).date()
+        created = create_daily_settlements(db, settlement_date=day)
+        logger.info(f"Daily settlement schedule {day}: created {len(created)} items at {datetime.now()}")
     finally:
         db.close()
 
 
-def setup_scheduler():
+def daily_points_accrual(run_at: Optional[datetime] = None):
     """
-    ตั้งค่า Scheduled Tasks
+    ให้แต้มสะสมจากยอดซื้อของเมื่อวานทั้งวัน (INSERT ... SELECT เดียว) แล้วเขียน snapshot ยอดแต้มสิ้นวัน
+    รันซ้ำวันเดิมได้ - รายการที่ให้แต้มแล้วจะไม่ได้ซ้ำ
     """
-    # Daily balance reset at midnight
-    schedule.every().day.at("00:00").do(daily_balance_reset)
-    
-    # Send refund notifications at configured time
-    schedule.every().day.at(REFUND_NOTIFICATION_TIME).do(send_refund_notifications)
-    
-    # Update crypto transactions every 5 minutes
-    schedule.every(5).minutes.do(update_crypto_transactions)
-
-    # สิ้นวัน: สร้างรายการเตรียมโอนเงินไปยังร้านค้า (ข้อกำหนดกฏหมาย ถือฝากได้ 1 วัน)
-    schedule.every().day.at("23:00").do(daily_settlement_schedule)
-    
-    logger.info("Scheduler setup completed")
+    db = SessionLocal()
+    try:
+        from app.services import points_ledger
+
+        day = (run_at or datetime.now()).date() - timedelta(days=1)
+        accrued = points_ledger.accrue_day(db, day)
+        snapshots = points_ledger.write_snapshots(db, day)
+        db.commit()
+        logger.info(f"Points accrual for {day}: {accrued} transactions, {snapshots} snapshots at {datetime.now()}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
 
-def run_scheduler():
+def daily_archive(run_at: Optional[datetime] = None):
     """
-    รัน Scheduler (เรียกใช้ใน background thread)
+    ย้ายประวัติที่เก่ากว่า retention (back transactions, audit logs, ad impressions) ไปเป็นไฟล์ แล้วตรวจไฟล์
+    ตารางหลักจึงเล็กคงที่ - รายงานยังเห็นแถวเก่าผ่าน services/archive.query
     """
-    setup_scheduler()
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+    db = SessionLocal()
+    try:
+        from app.services import archive
+
+        for name in archive.ARCHIVES:
+            result = archive.archive_table(db, name)
+            check = archive.verify(name, db, files=result.files)  # ทั้งหมดตรวจด้วย scripts/archive_history --verify-only
+            logger.info(f"Archive {name}: {result.rows} rows in {result.days} days, {check.files} files verified")
+            for error in check.errors:
+                logger.error(f"Archive verify {name}: {error}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
 
-if __name__ == "__main__":
-    # For testing
-    setup_scheduler()
-    run_scheduler()
+# timeout = วินาที; catch_up = รอบที่พลาด (restart / ไม่มี leader) ไม่เกินนี้ถูกรันย้อนหลังหนึ่งครั้ง
+JOBS = [
+    # Daily balance reset at midnight
+    Job("daily_balance_reset", daily_balance_reset, daily_at="00:00", timeout=600, catch_up=timedelta(hours=6)),
+    # Send refund notifications at configured time (ช้ากว่าเวลาเกิน 1 ชม. ไม่ส่ง - กลางดึก)
+    Job(
+        "send_refund_notifications", send_refund_notifications, daily_at=REFUND_NOTIFICATION_TIME,
+        timeout=1800, catch_up=timedelta(hours=1),
+    ),
+    # Update crypto transactions every 5 minutes (รอบยังไม่จบ = รอบถัดไปข้าม)
+    Job(
+        "update_crypto_transactions", update_crypto_transactions, every=timedelta(minutes=5),
+        timeout=240, catch_up=timedelta(minutes=5),
+    ),
+    # สิ้นวัน: สร้างรายการเตรียมโอนเงินไปยังร้านค้า (ข้อกำหนดกฏหมาย ถือฝากได้ 1 วัน) - พลาดแล้วรันย้อนหลังได้ทั้งคืน
+    Job(
+        "daily_settlement", daily_settlement_schedule, daily_at=SETTLEMENT_TIME,
+        timeout=1800, catch_up=timedelta(hours=12),
+    ),
+    # ต้นวัน: ให้แต้มสะสมจากยอดซื้อของเมื่อวาน + snapshot ยอดแต้ม (รันซ้ำได้)
+    Job(
+        "daily_points_accrual", daily_points_accrual, daily_at=POINTS_ACCRUAL_TIME,
+        timeout=1800, catch_up=timedelta(hours=23),
+    ),
+    # กลางดึก: ย้ายประวัติเก่าออกจากตารางหลัก (hot/cold archive)
+    Job("daily_archive", daily_archive, daily_at=ARCHIVE_TIME, timeout=3 * 3600, catch_up=timedelta(hours=12)),
+]
+
+runner = JobRunner(JOBS, make_leader_lock())
+
+
+def start_scheduler():
+    """เริ่ม runner ใน worker นี้ (เรียกจาก main.py startup) - ทุก worker เริ่มได้ รันงานเฉพาะ leader"""
+    if not SCHEDULER_ENABLED:
+        logger.info("Scheduler disabled (SCHEDULER_ENABLED)")
+        return
+    runner.start()
+
+
+def stop_scheduler():
+    runner.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduler: รัน loop (ไม่ใส่ --run) หรือรันงานเดียวทันที")
+    parser.add_argument("--run", choices=sorted(job.name for job in JOBS), help="ชื่องานที่จะรันทันที")
+    parser.add_argument("--for", dest="run_for", help="เวลารอบ ISO เช่น 2026-10-18T23:00 (ไม่ใส่ = รอบล่าสุด)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.run:
+        run_for = datetime.fromisoformat(args.run_for) if args.run_for else None
+        status = runner.run_once(args.run, run_for)
+        print(f"{args.run}: {status or 'รอบนี้รันไปแล้ว'}")
+        return 0 if status in (None, "success") else 1
+    try:
+        asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        pass
+    return 0
 
+
+if __name__ == "__main__":
+    raise SystemExit(main())
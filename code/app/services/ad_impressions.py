@@ -0,0 +1,224 @@
+"""
+Ad Impressions - เก็บ view/click โฆษณาแบบ write-behind
+- POST /api/member/ads/track ใส่ event ลง buffer ในหน่วยความจำของ worker แล้วตอบทันที (ไม่ query / commit ต่อ request)
+- thread เบื้องหลัง flush ทุก FLUSH_INTERVAL วินาที หรือเมื่อ buffer ครบ FLUSH_SIZE:
+  INSERT หลายแถวลง ad_impressions + บวกยอดต่อนาทีลง ad_impression_counters (upsert) ใน commit เดียว
+- ตรวจว่ามีโฆษณาจริงจาก cache ของ id (โหลดใหม่เมื่อเจอ id ที่ไม่รู้จัก ไม่บ่อยกว่า AD_IDS_REFRESH วินาที)
+event ที่ยังไม่ flush อาจหายถ้า worker ตายกะทันหัน (ยอมรับได้สำหรับสถิติโฆษณา) - ตอน shutdown จะ flush ให้
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import AdFeed, AdImpression, AdImpressionCounter
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = 500  # event
+FLUSH_INTERVAL = 2.0  # วินาที
+INSERT_CHUNK = 1000  # แถวต่อ INSERT
+MAX_BUFFER = 50000  # กัน memory โตไม่จำกัดถ้า DB ล่ม (event เก่าสุดถูกทิ้ง)
+AD_IDS_REFRESH = 5.0  # วินาที
+EVENT_TYPES = ("view", "click")
+
+
+class ImpressionEvent(NamedTuple):
+    ad_feed_id: int
+    event_type: str
+    customer_id: Optional[int]
+    created_at: datetime
+
+
+def _minute(dt: datetime) -> datetime:
+    return dt.replace(second=0, microsecond=0)
+
+
+def aggregate_counters(events: Iterable[ImpressionEvent]) -> Dict[Tuple[int, datetime], List[int]]:
+    """{(ad_feed_id, minute): [views, clicks]}"""
+    counters: Dict[Tuple[int, datetime], List[int]] = defaultdict(lambda: [0, 0])
+    for ev in events:
+        counters[(ev.ad_feed_id, _minute(ev.created_at))][0 if ev.event_type == "view" else 1] += 1
+    return counters
+
+
+def _upsert_counters(db: Session, counters: Dict[Tuple[int, datetime], List[int]]) -> None:
+    rows = [
+        {"ad_feed_id": ad_id, "minute": minute, "views": v, "clicks": c}
+        for (ad_id, minute), (v, c) in counters.items()
+    ]
+    if not rows:
+        return
+    table = AdImpressionCounter.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(table).values(rows)
+        db.execute(stmt.on_duplicate_key_update(
+            views=table.c.views + stmt.inserted.views,
+            clicks=table.c.clicks + stmt.inserted.clicks,
+        ))
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        stmt = sqlite_insert(table).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.ad_feed_id, table.c.minute],
+            set_={"views": table.c.views + stmt.excluded.views, "clicks": table.c.clicks + stmt.excluded.clicks},
+        ))
+    else:
+        for row in rows:
+            result = db.execute(
+                update(table)
+                .where(table.c.ad_feed_id == row["ad_feed_id"], table.c.minute == row["minute"])
+                .values(views=table.c.views + row["views"], clicks=table.c.clicks + row["clicks"])
+            )
+            if result.rowcount == 0:
+                db.execute(insert(table).values(row))
+
+
+def write_events(db: Session, events: List[ImpressionEvent]) -> None:
+    """เขียน event ชุดหนึ่ง: raw impressions (multi-row INSERT) + counters ต่อนาที แล้ว commit"""
+    if not events:
+        return
+    for i in range(0, len(events), INSERT_CHUNK):
+        db.execute(insert(AdImpression).values([ev._asdict() for ev in events[i:i + INSERT_CHUNK]]))
+    _upsert_counters(db, aggregate_counters(events))
+    db.commit()
+
+
+class _AdIdCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: Set[int] = set()
+        self._loaded_at = 0.0
+
+    def contains(self, db: Session, ad_feed_id: int) -> bool:
+        if ad_feed_id in self._ids:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if now - self._loaded_at >= AD_IDS_REFRESH:
+                self._ids = set(db.execute(select(AdFeed.id)).scalars())
+                self._loaded_at = now
+            return ad_feed_id in self._ids
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids = set()
+            self._loaded_at = 0.0
+
+
+class ImpressionCollector:
+    """buffer event ต่อ worker + thread flush เบื้องหลัง (เริ่มเมื่อมี event แรก)"""
+
+    def __init__(self, flush_size: int = FLUSH_SIZE, flush_interval: float = FLUSH_INTERVAL, session_factory=None):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer: List[ImpressionEvent] = []
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.ad_ids = _AdIdCache()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="ad-impressions-flush", daemon=True)
+            self._thread.start()
+
+    def add(self, events: Iterable[ImpressionEvent]) -> int:
+        with self._lock:
+            before = len(self._buffer)
+            self._buffer.extend(events)
+            added = len(self._buffer) - before
+            if len(self._buffer) > MAX_BUFFER:
+                dropped = len(self._buffer) - MAX_BUFFER
+                del self._buffer[:dropped]
+                logger.warning("Ad impression buffer full, dropped %s events", dropped)
+            full = len(self._buffer) >= self.flush_size
+            self._ensure_thread()
+        if full:
+            self._wakeup.set()
+        return added
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """เขียน event ที่ค้างอยู่ทั้งหมด คืนจำนวน event ที่เขียน (ถ้าล้มเหลวจะคืน event กลับเข้า buffer)"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+            if not events:
+                return 0
+            own_session = db is None
+            if own_session:
+                if self._session_factory is None:
+                    from app.database import SessionLocal
+
+                    self._session_factory = SessionLocal
+                db = self._session_factory()
+            try:
+                try:
+                    write_events(db, events)
+                except IntegrityError:
+                    # โฆษณาถูกลบระหว่างรอ flush: ตัด event ของ id ที่ไม่มีแล้วลองอีกครั้ง
+                    db.rollback()
+                    existing = set(db.execute(select(AdFeed.id)).scalars())
+                    events = [ev for ev in events if ev.ad_feed_id in existing]
+                    write_events(db, events)
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    self._buffer[:0] = events
+                raise
+            finally:
+                if own_session:
+                    db.close()
+            return len(events)
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Ad impression flush failed: %s", e)
+
+    def close(self) -> None:
+        """หยุด thread แล้ว flush ที่เหลือ (เรียกตอน shutdown)"""
+        self._stopped = True
+        self._wakeup.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error("Ad impression final flush failed: %s", e)
+
+
+collector = ImpressionCollector()
+
+
+def track(db: Session, items: Iterable[Tuple[int, str]], customer_id: Optional[int] = None) -> int:
+    """
+    รับ event [(ad_feed_id, event_type), ...] ใส่ buffer - คืนจำนวนที่รับ
+    ข้าม ad_feed_id ที่ไม่มีในระบบ และ event_type ที่ไม่รู้จัก
+    """
+    now = datetime.now()  # ตรงกับ server_default func.now() ของ created_at (DB อยู่เครื่อง/timezone เดียวกัน)
+    events = [
+        ImpressionEvent(ad_feed_id, event_type, customer_id, now)
+        for ad_feed_id, event_type in items
+        if event_type in EVENT_TYPES and collector.ad_ids.contains(db, ad_feed_id)
+    ]
+    return collector.add(events) if events else 0
@@ -0,0 +1,356 @@
+"""
+Archive - ย้ายประวัติเก่าออกจากตารางหลัก (hot) ไปเก็บเป็นไฟล์ (cold) ให้ตารางเล็กและ range query ไม่ช้าลงตามเวลา
+- ตาราง (ARCHIVES): promptpay_back_transactions (ตาม paid_at), audit_logs, ad_impressions (ตาม created_at)
+  แถวที่เก่ากว่า retention (config ARCHIVE_*_DAYS) ย้ายทีละวัน เก่าสุดก่อน
+- ไฟล์: <ARCHIVE_DIR>/<table>/<YYYY-MM>/<YYYY-MM-DD>-<id แรก>.jsonl.gz (1 แถว = 1 บรรทัด JSON ทุกคอลัมน์)
+  + <table>/manifest.jsonl จำนวนแถว / id ต่ำสุด-สูงสุด / sha256 ของแต่ละไฟล์
+- ต่อวัน: เขียนไฟล์ชั่วคราว -> อ่านกลับตรวจ id ครบ -> rename -> manifest -> DELETE ใน DB -> commit
+  ตายกลางทาง = แถวยังอยู่ใน hot รันรอบถัดไปเขียนไฟล์ชื่อเดิมทับ (query ตัดแถวซ้ำด้วย id อยู่แล้ว)
+- query(): แถว hot + ไฟล์ของวันที่อยู่ในช่วง รวมเรียงใหม่ - รายงาน / export ไม่ต้องรู้ว่าแถวอยู่ที่ไหน
+  เปิดไฟล์จากวันใหม่สุดย้อนไป หยุดเมื่อได้ครบ limit แถวที่ใหม่กว่าวันของไฟล์ถัดไป
+- verify(): sha256 / จำนวนแถวของไฟล์เทียบ manifest, แถวที่ย้ายแล้วแต่ยังค้างใน hot (COUNT ตามช่วง id ต่อไฟล์)
+  งานรายคืนตรวจเฉพาะไฟล์ที่เพิ่งเขียน (files=) ไม่ระบุ = ทุกไฟล์ + ไฟล์นอก manifest (scripts/archive_history --verify-only)
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import DateTime, delete, func, select
+from sqlalchemy.orm import Session
+
+from app.config import (
+    ARCHIVE_AD_IMPRESSION_DAYS,
+    ARCHIVE_AUDIT_LOG_DAYS,
+    ARCHIVE_BACK_TRANSACTION_DAYS,
+    ARCHIVE_DIR,
+)
+from app.models import AdImpression, AuditLog, PromptPayBackTransaction
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_ROOT = Path(ARCHIVE_DIR) if ARCHIVE_DIR else Path(__file__).resolve().parent.parent.parent / "data" / "archive"
+MANIFEST = "manifest.jsonl"
+DELETE_CHUNK = 1000  # id ต่อ DELETE ... WHERE id IN (...)
+
+
+class ArchiveError(Exception):
+    """ไฟล์ที่เขียนอ่านกลับไม่ตรงกับแถวใน DB - ไม่ลบแถวออกจาก hot"""
+
+
+@dataclass(frozen=True)
+class ArchiveSpec:
+    model: type
+    date_column: str
+    retention_days: int
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+
+ARCHIVES: Dict[str, ArchiveSpec] = {
+    "promptpay_back_transactions": ArchiveSpec(PromptPayBackTransaction, "paid_at", ARCHIVE_BACK_TRANSACTION_DAYS),
+    "audit_logs": ArchiveSpec(AuditLog, "created_at", ARCHIVE_AUDIT_LOG_DAYS),
+    "ad_impressions": ArchiveSpec(AdImpression, "created_at", ARCHIVE_AD_IMPRESSION_DAYS),
+}
+
+
+@dataclass
+class ArchiveResult:
+    table: str
+    days: int = 0
+    rows: int = 0
+    files: List[str] = field(default_factory=list)
+
+
+@dataclass
+class VerifyResult:
+    table: str
+    files: int = 0
+    rows: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+# ---------- ไฟล์ ----------
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    """เทียบเวลาแบบ wall clock (MySQL คืน naive, webhook บางตัวเก็บ +00:00)"""
+    return value.replace(tzinfo=None) if value is not None and value.tzinfo else value
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _table_dir(name: str, root: Optional[Path]) -> Path:
+    return (root or ARCHIVE_ROOT) / name
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_file(path: Path) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _write_partition(path: Path, rows: List[dict]) -> str:
+    """เขียน + fsync + อ่านกลับตรวจ id ก่อน rename เป็นชื่อจริง คืน sha256"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for row in rows:
+                gz.write((json.dumps(row, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    if [row["id"] for row in _read_file(tmp)] != [row["id"] for row in rows]:
+        tmp.unlink()
+        raise ArchiveError(f"{path.name}: อ่านกลับได้ id ไม่ครบ")
+    digest = _sha256(tmp)
+    os.replace(tmp, path)
+    return digest
+
+
+def _manifest(name: str, root: Optional[Path]) -> Dict[str, dict]:
+    """{ไฟล์ (path ย่อย): entry ล่าสุด} - ไฟล์ที่เขียนทับภายหลังใช้ entry ล่าสุด"""
+    path = _table_dir(name, root) / MANIFEST
+    if not path.exists():
+        return {}
+    entries = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            entries[entry["file"]] = entry
+    return entries
+
+
+def _append_manifest(name: str, root: Optional[Path], entry: dict) -> None:
+    path = _table_dir(name, root) / MANIFEST
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _day_range(day: date):
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def _decode(spec: ArchiveSpec, row: dict) -> dict:
+    for column in spec.table.columns:
+        if isinstance(column.type, DateTime) and row.get(column.key):
+            row[column.key] = datetime.fromisoformat(row[column.key])
+    return row
+
+
+# ---------- ย้าย ----------
+
+def archive_table(
+    db: Session,
+    name: str,
+    now: Optional[datetime] = None,
+    root: Optional[Path] = None,
+    max_days: Optional[int] = None,
+) -> ArchiveResult:
+    """ย้ายแถวที่เก่ากว่า retention ของตาราง name ทีละวัน (commit ทุกวัน - ไฟล์กับ DB ต้องไปพร้อมกันทีละชุด)"""
+    spec = ARCHIVES[name]
+    table = spec.table
+    column = table.c[spec.date_column]
+    cutoff = datetime.combine((now or datetime.now()).date() - timedelta(days=spec.retention_days), time.min)
+    result = ArchiveResult(name)
+    while max_days is None or result.days < max_days:
+        oldest = db.execute(select(func.min(column)).where(column < cutoff)).scalar()
+        if oldest is None:
+            break
+        start = datetime.combine(_naive(oldest).date(), time.min)
+        end = min(start + timedelta(days=1), cutoff)
+        rows = [dict(r) for r in db.execute(
+            select(table).where(column >= start, column < end).order_by(table.c.id)
+        ).mappings()]
+        if not rows:
+            break
+        rel = f"{start:%Y-%m}/{start.date().isoformat()}-{rows[0]['id']}.jsonl.gz"
+        digest = _write_partition(_table_dir(name, root) / rel, rows)
+        ids = [row["id"] for row in rows]
+        _append_manifest(name, root, {
+            "file": rel,
+            "day": start.date().isoformat(),
+            "rows": len(rows),
+            "min_id": min(ids),
+            "max_id": max(ids),
+            "sha256": digest,
+            "archived_at": datetime.now().isoformat(timespec="seconds"),
+        })
+        for i in range(0, len(ids), DELETE_CHUNK):
+            db.execute(delete(table).where(table.c.id.in_(ids[i:i + DELETE_CHUNK])))
+        db.commit()
+        result.days += 1
+        result.rows += len(rows)
+        result.files.append(rel)
+        logger.info("Archived %s %s: %d rows -> %s", name, start.date(), len(rows), rel)
+    return result
+
+
+# ---------- อ่าน ----------
+
+def _read_entry(
+    name: str,
+    entry: dict,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    where: Optional[Dict[str, Any]],
+    root: Optional[Path],
+) -> Iterator[dict]:
+    spec = ARCHIVES[name]
+    for row in _read_file(_table_dir(name, root) / entry["file"]):
+        row = _decode(spec, row)
+        value = _naive(row.get(spec.date_column))
+        if (start and (value is None or value < start)) or (end and (value is None or value > end)):
+            continue
+        if where and any(row.get(key) != expected for key, expected in where.items()):
+            continue
+        yield row
+
+
+def _entries_in_range(name: str, start: Optional[datetime], end: Optional[datetime], root: Optional[Path], newest_first=False):
+    entries = sorted(_manifest(name, root).values(), key=lambda e: (e["day"], e["min_id"]), reverse=newest_first)
+    for entry in entries:
+        day = date.fromisoformat(entry["day"])
+        if (start and day < start.date()) or (end and day > end.date()):
+            continue
+        yield day, entry
+
+
+def read_archived(
+    name: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    where: Optional[Dict[str, Any]] = None,
+    root: Optional[Path] = None,
+) -> Iterator[dict]:
+    """แถวในไฟล์ที่ date_column อยู่ใน [start, end] และคอลัมน์ตรงกับ where ทุกตัว (เปิดเฉพาะไฟล์ของวันในช่วง)"""
+    start, end = _naive(start), _naive(end)
+    for _, entry in _entries_in_range(name, start, end, root):
+        yield from _read_entry(name, entry, start, end, where, root)
+
+
+def query(
+    db: Session,
+    name: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    where: Optional[Dict[str, Any]] = None,
+    limit: Optional[int] = None,
+    root: Optional[Path] = None,
+) -> List[dict]:
+    """แถว (dict ทุกคอลัมน์) จาก hot + archive ในช่วง [start, end] เรียงใหม่สุดก่อน - id ซ้ำใช้แถวใน hot
+    เปิดไฟล์จากวันใหม่สุดย้อนไป: มีครบ limit แถวที่ใหม่กว่าวันของไฟล์ถัดไปแล้ว = ไฟล์ที่เหลือไม่มีแถวที่ต้องใช้ หยุดอ่าน"""
+    spec = ARCHIVES[name]
+    table = spec.table
+    column = table.c[spec.date_column]
+    stmt = select(table).order_by(column.desc(), table.c.id.desc())
+    if start is not None:
+        stmt = stmt.where(column >= start)
+    if end is not None:
+        stmt = stmt.where(column <= end)
+    for key, expected in (where or {}).items():
+        stmt = stmt.where(table.c[key] == expected)
+    if limit:
+        stmt = stmt.limit(limit)
+    hot = [dict(r) for r in db.execute(stmt).mappings()]
+
+    def newest(rows):
+        return sorted(rows, key=lambda r: (_naive(r[spec.date_column]) or datetime.min, r["id"]), reverse=True)
+
+    rows, hot_ids = hot, {row["id"] for row in hot}
+    start, end = _naive(start), _naive(end)
+    for day, entry in _entries_in_range(name, start, end, root, newest_first=True):
+        if limit and len(rows) >= limit:
+            kth = _naive(rows[limit - 1][spec.date_column])
+            if kth is not None and kth >= _day_range(day)[1]:
+                break
+        archived = [row for row in _read_entry(name, entry, start, end, where, root) if row["id"] not in hot_ids]
+        if archived:
+            rows = newest(rows + archived)
+            if limit:
+                rows = rows[:limit]
+    return rows
+
+
+# ---------- ตรวจ ----------
+
+def verify(
+    name: str,
+    db: Optional[Session] = None,
+    root: Optional[Path] = None,
+    files: Optional[Iterable[str]] = None,
+) -> VerifyResult:
+    """
+    ตรวจไฟล์ของตาราง name เทียบ manifest (ส่ง db = ตรวจด้วยว่าแถวที่ย้ายแล้วไม่ค้างใน hot)
+    files: ตรวจเฉพาะไฟล์เหล่านี้ (path ย่อยจาก ArchiveResult.files) - ไม่ระบุ = ทุกไฟล์ + หาไฟล์ที่ไม่อยู่ใน manifest
+    """
+    spec = ARCHIVES[name]
+    table_dir = _table_dir(name, root)
+    entries = _manifest(name, root)
+    result = VerifyResult(name)
+    if files is None:
+        on_disk = {p.relative_to(table_dir).as_posix() for p in table_dir.glob("*/*.jsonl.gz")} if table_dir.exists() else set()
+        for rel in sorted(on_disk - set(entries)):
+            result.errors.append(f"{rel}: ไม่มีใน manifest")
+        files = entries
+    column = spec.table.c[spec.date_column]
+    id_column = spec.table.c.id
+    leftover = 0
+    for rel in sorted(set(files)):
+        entry = entries.get(rel)
+        path = table_dir / rel
+        if entry is None:
+            result.errors.append(f"{rel}: ไม่มีใน manifest")
+            continue
+        if not path.exists():
+            result.errors.append(f"{rel}: ไม่พบไฟล์")
+            continue
+        if _sha256(path) != entry["sha256"]:
+            result.errors.append(f"{rel}: sha256 ไม่ตรง manifest")
+            continue
+        count, low, high = 0, None, None
+        for row in _read_file(path):
+            count += 1
+            low = row["id"] if low is None else min(low, row["id"])
+            high = row["id"] if high is None else max(high, row["id"])
+        if count != entry["rows"] or (count and (low, high) != (entry["min_id"], entry["max_id"])):
+            result.errors.append(f"{rel}: จำนวนแถว / ช่วง id ไม่ตรง manifest")
+            continue
+        result.files += 1
+        result.rows += count
+        if db is not None and count:
+            # ไฟล์หนึ่ง = ทุกแถวของวันนั้น: แถวใน hot ที่อยู่ในวันเดียวกันและช่วง id เดียวกัน = ย้ายแล้วแต่ไม่ถูกลบ
+            day_start, day_end = _day_range(date.fromisoformat(entry["day"]))
+            leftover += db.execute(
+                select(func.count()).select_from(spec.table).where(
+                    id_column.between(entry["min_id"], entry["max_id"]), column >= day_start, column < day_end,
+                )
+            ).scalar()
+    if leftover:
+        result.errors.append(f"{leftover} แถวที่ย้ายแล้วยังอยู่ในตารางหลัก (รัน archive ซ้ำเพื่อย้ายต่อ)")
+    return result
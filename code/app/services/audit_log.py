@@ -1,16 +1,49 @@
 """
 Audit Log Service - บันทึกทุกการดำเนินการในระบบเพื่อใช้เป็นหลักฐานอ้างอิง
+- log_action(): ใส่ entry ลงคิวในหน่วยความจำของ worker แล้วคืนทันที (ไม่ query / commit / แปลง JSON ใน request)
+- thread เบื้องหลัง (AuditWriter):
+  1) ทุกครั้งที่มี entry ใหม่: แปลงเป็น JSON เขียนลงไฟล์ spool (data/audit_spool/<pid>-<token>-<seq>.jsonl) + fsync
+  2) ทุก FLUSH_INTERVAL วินาที หรือค้างครบ FLUSH_SIZE: INSERT หลายแถวต่อ statement, commit ครั้งเดียว แล้วลบไฟล์
+- worker ตาย / restart: ไฟล์ spool ของ process ที่ไม่อยู่แล้วถูก worker อื่นรับไปเขียนต่อ (rename - รับได้ worker เดียว)
+  เจ้าของไฟล์ถือ flock บน <owner>.lock ตลอดอายุ process - ล็อกได้ = เจ้าของตายแล้ว (ไม่ดูจาก pid ที่ถูกใช้ซ้ำได้)
+- ชุดที่ INSERT ไม่ผ่านติดกัน MAX_FLUSH_FAILURES ครั้ง (ไม่ใช่ DB ล่ม): แยกเขียนทีละแถว แถวที่เสียย้ายไป
+  data/audit_spool/quarantine/ (JSON บรรทัดเดิม แก้แล้วย้ายกลับมาที่ spool ได้) ไม่ขวางทุก flush ต่อจากนั้น
+  entry ที่ยังอยู่ในคิว (ยังไม่ถึงไฟล์ ไม่กี่ ms) หายได้เฉพาะกรณี process ถูก kill ทันที - ตอน shutdown ปกติ flush ให้
+  ตายหลัง commit ก่อนลบไฟล์ = entry ชุดนั้นซ้ำ (audit ซ้ำดีกว่าหาย)
+- write_audit_log(): เขียนลง DB ทันทีใน Session ที่ส่งมา (script / งานที่ต้องการแถวทันที)
 """
 import json
 import logging
-from typing import Any, Optional
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+from typing import Any, List, NamedTuple, Optional
 
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
 from sqlalchemy.orm import Session
 
 from app.models import AuditLog
 
+try:
+    import fcntl
+except ImportError:  # Windows - รับไฟล์ spool ตาม pid ที่ไม่อยู่แล้วแทน
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+SPOOL_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "audit_spool"
+FLUSH_SIZE = 200  # entry
+FLUSH_INTERVAL = 1.0  # วินาที - เวลาสูงสุดจาก log_action ถึงแถวใน DB (เมื่อ DB ปกติ)
+INSERT_CHUNK = 500  # แถวต่อ INSERT
+MAX_QUEUE = 50000  # กัน memory โตไม่จำกัดถ้าเขียน spool ไม่ได้ (entry เก่าสุดถูกทิ้ง)
+MAX_FLUSH_FAILURES = 3  # ชุดเดิม INSERT ไม่ผ่านติดกันกี่ครั้งจึงแยกแถวที่เสียออก
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)  # DB ล่ม / connection หลุด - ไม่ใช่แถวเสีย รอรอบหน้า
+
 
 def _serialize(val: Any) -> Optional[str]:
     if val is None:
@@ -21,6 +54,344 @@ def _serialize(val: Any) -> Optional[str]:
         return str(val)
 
 
+class AuditEntry(NamedTuple):
+    action: str
+    table_name: str
+    record_id: Optional[int]
+    old_values: Any
+    new_values: Any
+    user_id: Optional[int]
+    source: Optional[str]
+    ip_address: Optional[str]
+    created_at: datetime
+
+
+def _to_row(entry: AuditEntry) -> dict:
+    return {
+        "user_id": entry.user_id,
+        "source": entry.source or "system",
+        "action": entry.action,
+        "table_name": entry.table_name,
+        "record_id": entry.record_id,
+        "old_values": _serialize(entry.old_values),
+        "new_values": _serialize(entry.new_values),
+        "ip_address": entry.ip_address,
+        "created_at": entry.created_at.isoformat(),
+    }
+
+
+def _from_spool(line: str) -> dict:
+    row = json.loads(line)
+    row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return row
+
+
+def _try_lock(path: Path) -> Optional[int]:
+    """flock แบบไม่รอ - คืน fd ที่ถือล็อก (None = process อื่นถือไว้)"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditWriter:
+    """คิว entry ต่อ worker + spool บนดิสก์ + thread เขียนลง DB เป็นชุด (เริ่มเมื่อมี entry แรก)"""
+
+    def __init__(
+        self,
+        spool_dir: Optional[Path] = None,
+        flush_size: int = FLUSH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        session_factory=None,
+    ):
+        self.spool_dir = Path(spool_dir or SPOOL_DIR)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._queue: List[AuditEntry] = []
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._owner: Optional[str] = None
+        self._pid: Optional[int] = None
+        self._lock_fd: Optional[int] = None
+        self._failures = 0
+        self._seq = 0
+        self._spooled = 0
+        self._claimed = False
+        self._last_flush = time.monotonic()
+
+    @property
+    def owner(self) -> str:
+        """prefix ชื่อไฟล์ spool ของ process นี้ (สร้างใหม่หลัง fork) - ถือ flock <owner>.lock ก่อนเขียนไฟล์แรก"""
+        if self._pid != os.getpid():
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)  # fd ที่ได้มาจาก parent - ล็อกยังเป็นของ parent
+                self._lock_fd = None
+            self._pid = os.getpid()
+            self._owner = f"{self._pid}-{uuid.uuid4().hex[:8]}"
+            self._seq = 0
+            self._spooled = 0
+            self._claimed = False
+            self._failures = 0
+        if fcntl is not None and self._lock_fd is None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._lock_fd = _try_lock(self.spool_dir / f"{self._owner}.lock")
+        return self._owner
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+            self._thread.start()
+
+    def add(self, entry: AuditEntry) -> None:
+        with self._lock:
+            self._queue.append(entry)
+            if len(self._queue) > MAX_QUEUE:
+                dropped = len(self._queue) - MAX_QUEUE
+                del self._queue[:dropped]
+                logger.error("Audit log queue full, dropped %s entries", dropped)
+            self._ensure_thread()
+        self._wakeup.set()
+
+    def pending(self) -> int:
+        """entry ที่ยังไม่ถึง DB (คิว + spool ของ process นี้)"""
+        return len(self._queue) + self._spooled
+
+    def spool(self) -> int:
+        """ย้าย entry ในคิวลงไฟล์ spool ใหม่หนึ่งไฟล์ (JSON + fsync แล้ว rename) คืนจำนวน"""
+        with self._lock:
+            entries, self._queue = self._queue, []
+        if not entries:
+            return 0
+        with self._flush_lock:
+            try:
+                self.spool_dir.mkdir(parents=True, exist_ok=True)
+                self._seq += 1
+                path = self.spool_dir / f"{self.owner}-{self._seq:08d}.jsonl"
+                tmp = path.with_suffix(".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for entry in entries:
+                        f.write(json.dumps(_to_row(entry), ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+            except Exception:
+                with self._lock:
+                    self._queue[:0] = entries
+                raise
+            self._spooled += len(entries)
+        return len(entries)
+
+    def _claim_orphans(self) -> int:
+        """รับไฟล์ spool ของ process ที่ตายไปแล้วมาเป็นของตัวเอง (เรียกใต้ _flush_lock)"""
+        claimed = 0
+        names = chain(self.spool_dir.glob("*.jsonl"), self.spool_dir.glob("*.lock"))
+        owners = {path.name.rsplit("-", 1)[0] if path.suffix == ".jsonl" else path.stem for path in names}
+        owners.discard(self.owner)
+        for owner in sorted(owners):
+            if fcntl is None:
+                pid = owner.partition("-")[0]
+                if not pid.isdigit() or _alive(int(pid)):
+                    continue
+                lock_fd = None
+            else:
+                lock_fd = _try_lock(self.spool_dir / f"{owner}.lock")
+                if lock_fd is None:
+                    continue  # เจ้าของยังอยู่
+            try:
+                for path in sorted(self.spool_dir.glob(f"{owner}-*.jsonl")):
+                    self._seq += 1
+                    try:
+                        os.rename(path, self.spool_dir / f"{self.owner}-{self._seq:08d}.jsonl")
+                    except FileNotFoundError:
+                        continue  # worker อื่นรับไปแล้ว
+                    claimed += 1
+                if lock_fd is not None:
+                    (self.spool_dir / f"{owner}.lock").unlink(missing_ok=True)
+            finally:
+                if lock_fd is not None:
+                    os.close(lock_fd)
+        if claimed:
+            logger.warning("Audit log: replaying %s spool files from dead workers", claimed)
+        self._claimed = True
+        return claimed
+
+    def _session(self) -> Session:
+        if self._session_factory is None:
+            from app.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def _quarantine(self, path: Path, lines: List[str]) -> None:
+        """เขียนแถวที่เขียนลง DB ไม่ได้ไว้ใน quarantine/ (ชื่อเดียวกับไฟล์ spool) + fsync"""
+        target = self.spool_dir / "quarantine"
+        target.mkdir(exist_ok=True)
+        with open(target / path.name, "a", encoding="utf-8") as f:
+            f.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+            f.flush()
+            os.fsync(f.fileno())
+        logger.error("Audit log: %s bad entries from %s moved to quarantine", len(lines), path.name)
+
+    @staticmethod
+    def _read(path: Path) -> List[str]:
+        with open(path, encoding="utf-8") as f:
+            return [line for line in f if line.strip()]
+
+    @staticmethod
+    def _insert(db: Session, lines: List[str]) -> None:
+        rows = [_from_spool(line) for line in lines]
+        for i in range(0, len(rows), INSERT_CHUNK):
+            db.execute(insert(AuditLog).values(rows[i:i + INSERT_CHUNK]))
+        db.commit()
+
+    def _isolate(self, db: Session, segments: List[Path]) -> int:
+        """
+        เขียนทีละไฟล์ ไฟล์ที่ไม่ผ่านเขียนทีละแถว แถวที่ DB ไม่รับย้ายไป quarantine แล้วลบไฟล์
+        DB ล่มระหว่างทาง (TRANSIENT_ERRORS) หยุด - ไฟล์ที่เหลือรอรอบหน้า
+        """
+        written = 0
+        for path in segments:
+            lines = self._read(path)
+            bad = []
+            try:
+                self._insert(db, lines)
+                written += len(lines)
+            except TRANSIENT_ERRORS:
+                db.rollback()
+                raise
+            except Exception:
+                db.rollback()
+                for line in lines:
+                    try:
+                        self._insert(db, [line])
+                    except TRANSIENT_ERRORS:
+                        db.rollback()
+                        raise
+                    except Exception:
+                        db.rollback()
+                        bad.append(line)
+                        continue
+                    written += 1
+            if bad:
+                self._quarantine(path, bad)
+            path.unlink()  # แถวที่ผ่าน commit ไปแล้ว - ตายก่อนลบ = บางแถวซ้ำ (เหมือน flush ปกติ)
+        return written
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """spool คิวที่เหลือ แล้วเขียนทุกไฟล์ spool ของ process นี้ลง DB ใน commit เดียว คืนจำนวนแถว"""
+        self.spool()
+        with self._flush_lock:
+            self._last_flush = time.monotonic()
+            if not self.spool_dir.exists():
+                return 0
+            owner = self.owner
+            if not self._claimed:
+                self._claim_orphans()
+            segments = sorted(self.spool_dir.glob(f"{owner}-*.jsonl"))
+            if not segments:
+                return 0
+            own_session = db is None
+            if own_session:
+                db = self._session()
+            try:
+                try:
+                    lines = [line for path in segments for line in self._read(path)]
+                    self._insert(db, lines)
+                except TRANSIENT_ERRORS:
+                    db.rollback()
+                    raise
+                except Exception:
+                    db.rollback()
+                    self._failures += 1
+                    if self._failures < MAX_FLUSH_FAILURES:
+                        raise
+                    logger.error("Audit log: batch failed %s times, isolating bad entries", self._failures)
+                    written = self._isolate(db, segments)
+                else:
+                    for path in segments:
+                        path.unlink()
+                    written = len(lines)
+            finally:
+                if own_session:
+                    db.close()
+            self._failures = 0
+            self._spooled = 0
+            return written
+
+    def _due(self) -> bool:
+        return self._spooled >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.spool()
+                if self._due():
+                    self.flush()
+            except Exception as e:
+                logger.error("Audit log flush failed: %s", e)
+
+    def close(self, flush: bool = True) -> None:
+        """
+        หยุด thread แล้ว flush ที่เหลือ (เรียกตอน shutdown) แล้วปล่อย flock
+        flush ไม่สำเร็จ / flush=False: entry ยังอยู่ใน spool ให้ worker อื่นรับไปเขียน
+        """
+        self._stopped = True
+        self._wakeup.set()
+        if flush:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Audit log final flush failed: %s", e)
+        if self._lock_fd is not None and self._pid == os.getpid():
+            with self._flush_lock:
+                if not any(self.spool_dir.glob(f"{self._owner}-*.jsonl")):
+                    (self.spool_dir / f"{self._owner}.lock").unlink(missing_ok=True)
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+
+writer = AuditWriter()
+
+
+def log_action(
+    action: str,
+    table_name: str,
+    record_id: Optional[int] = None,
+    old_values: Any = None,
+    new_values: Any = None,
+    user_id: Optional[int] = None,
+    source: Optional[str] = None,
+    ip_address: Optional[str] = None,
+) -> None:
+    """
+    บันทึก audit log แบบไม่รอ DB (เขียนเป็นชุดโดย writer) - ห้ามแก้ dict ที่ส่งมาหลังเรียก
+    source: 'admin' | 'store_pos' | 'member' | 'system'
+    """
+    writer.add(AuditEntry(
+        action, table_name, record_id, old_values, new_values, user_id, source, ip_address, datetime.now(),
+    ))
+
+
 def write_audit_log(
     db: Session,
     action: str,
@@ -33,7 +404,7 @@ def write_audit_log(
     ip_address: Optional[str] = None,
 ) -> AuditLog:
     """
-    บันทึก audit log ทุกการดำเนินการ
+    บันทึก audit log ลง DB ทันที (commit) - request ทั่วไปใช้ log_action
     source: 'admin' | 'store_pos' | 'member' | 'system'
     """
     entry = AuditLog(
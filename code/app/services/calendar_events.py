@@ -0,0 +1,183 @@
+"""
+Calendar Events - เหตุการณ์ปฏิทิน admin จากโฆษณา / โปรโมชั่นร้าน / คูปองโปรโมชั่น / event ในช่วงวันที่
+- query ต่อแหล่งเลือกเฉพาะแถวที่ active และช่วงเวลาทับกับ [start, end) ให้ DB กรองด้วย index
+  (is_active, เริ่ม, สิ้นสุด) แทนการโหลดทั้งตารางมากรองใน Python - อ่านเฉพาะคอลัมน์ที่ใช้
+- ผลของช่วงขนาดหน้าเดือน (ไม่เกิน MONTH_VIEW_MAX_DAYS) cache ต่อ worker ใน channel "calendar" ของ settings_cache
+  commit ที่แก้ AdFeed / StorePromotion / CouponPromo / Event ล้าง cache นี้ทุก worker (ไม่แตะ cache ค่าตั้งค่า)
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.orm import Session
+
+from app.models import AdFeed, CouponPromo, Event, StorePromotion
+from app.services import settings_cache
+
+MONTH_VIEW_MAX_DAYS = 45  # ช่วงที่ยาวกว่านี้ไม่ cache
+CACHE_SIZE = 64  # จำนวนช่วงที่ cache ต่อ worker
+
+CACHE_CHANNEL = "calendar"
+
+_CHANGED_KEY = "calendar_events_changed"
+_SOURCE_MODELS = (AdFeed, StorePromotion, CouponPromo, Event)
+
+
+def _naive(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def _overlaps(start_col, end_col, start: datetime, end: datetime):
+    """เริ่มก่อน end และ (ไม่มีวันสิ้นสุด หรือสิ้นสุดหลัง start)"""
+    return and_(start_col < end, or_(end_col.is_(None), end_col > start))
+
+
+def _event(prefix: str, row_id: int, title: str, kind: str, s: datetime, e: Optional[datetime], store_id) -> dict:
+    return {
+        "id": prefix + str(row_id),
+        "title": title,
+        "start": s.isoformat(),
+        "end": (e or s).isoformat(),
+        "type": kind,
+        "store_id": store_id,
+    }
+
+
+def _ads(db: Session, start: datetime, end: datetime) -> List[dict]:
+    # ไม่ได้ตั้ง start_at ใช้ created_at เป็นวันเริ่ม
+    rows = db.execute(
+        select(AdFeed.id, AdFeed.title, AdFeed.start_at, AdFeed.end_at, AdFeed.created_at, AdFeed.store_id)
+        .where(
+            AdFeed.is_active == True,
+            or_(
+                AdFeed.start_at < end,
+                and_(AdFeed.start_at.is_(None), AdFeed.created_at < end),
+            ),
+            or_(AdFeed.end_at.is_(None), AdFeed.end_at > start),
+        )
+        .order_by(AdFeed.id)
+    ).all()
+    return [
+        _event("ad-", r.id, r.title or "โฆษณา", "ad", r.start_at or r.created_at, r.end_at, r.store_id)
+        for r in rows
+        if r.start_at or r.created_at
+    ]
+
+
+def _store_promotions(db: Session, start: datetime, end: datetime) -> List[dict]:
+    rows = db.execute(
+        select(StorePromotion.id, StorePromotion.title, StorePromotion.valid_from, StorePromotion.valid_to,
+               StorePromotion.store_id)
+        .where(
+            StorePromotion.is_active == True,
+            _overlaps(StorePromotion.valid_from, StorePromotion.valid_to, start, end),
+        )
+        .order_by(StorePromotion.id)
+    ).all()
+    return [
+        _event("promo-", r.id, r.title or "โปรโมชั่น", "promotion", r.valid_from, r.valid_to, r.store_id)
+        for r in rows
+    ]
+
+
+def _coupon_promos(db: Session, start: datetime, end: datetime) -> List[dict]:
+    rows = db.execute(
+        select(CouponPromo.id, CouponPromo.title, CouponPromo.valid_from, CouponPromo.valid_to)
+        .where(
+            CouponPromo.is_active == True,
+            _overlaps(CouponPromo.valid_from, CouponPromo.valid_to, start, end),
+        )
+        .order_by(CouponPromo.id)
+    ).all()
+    return [
+        _event("coupon-promo-", r.id, r.title or "คูปองโปรโมชั่น", "coupon_promo", r.valid_from, r.valid_to, None)
+        for r in rows
+    ]
+
+
+def _events(db: Session, start: datetime, end: datetime) -> List[dict]:
+    rows = db.execute(
+        select(Event.id, Event.name, Event.start_date, Event.end_date)
+        .where(Event.is_active == True, _overlaps(Event.start_date, Event.end_date, start, end))
+        .order_by(Event.id)
+    ).all()
+    return [_event("event-", r.id, r.name or "Event", "event", r.start_date, r.end_date, None) for r in rows]
+
+
+def load_range(db: Session, start: datetime, end: datetime) -> List[dict]:
+    """เหตุการณ์ทุกแหล่งที่ทับกับ [start, end) จาก DB (ไม่ผ่าน cache)"""
+    start, end = _naive(start), _naive(end)
+    return list(chain(
+        _ads(db, start, end),
+        _store_promotions(db, start, end),
+        _coupon_promos(db, start, end),
+        _events(db, start, end),
+    ))
+
+
+# ---------- cache ต่อ worker ----------
+
+class _RangeCache:
+    def __init__(self, size: int = CACHE_SIZE):
+        self.lock = threading.Lock()
+        self.size = size
+        self.entries: "OrderedDict[Tuple[datetime, datetime], List[dict]]" = OrderedDict()
+
+    def get(self, key) -> Optional[List[dict]]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value: List[dict]) -> None:
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+_cache = _RangeCache()
+settings_cache.register_db_cache(_cache.clear, channel=CACHE_CHANNEL)
+
+
+def events_in_range(db: Session, start: datetime, end: datetime) -> List[dict]:
+    """เหตุการณ์ที่ทับกับ [start, end) - ช่วงขนาดหน้าเดือนอ่านจาก cache - อย่าแก้ list ที่คืนไป"""
+    start, end = _naive(start), _naive(end)
+    if end - start > timedelta(days=MONTH_VIEW_MAX_DAYS):
+        return load_range(db, start, end)
+    settings_cache.ensure_fresh(CACHE_CHANNEL)
+    key = (start, end)
+    value = _cache.get(key)
+    if value is None:
+        value = load_range(db, start, end)
+        _cache.put(key, value)
+    return value
+
+
+# ---------- Session hooks ----------
+
+@event.listens_for(Session, "before_flush")
+def _collect_changes(session: Session, flush_context, instances) -> None:
+    if any(isinstance(obj, _SOURCE_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.info.pop(_CHANGED_KEY, False):
+        settings_cache.invalidate(CACHE_CHANNEL)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_CHANGED_KEY, None)
@@ -2,20 +2,78 @@
 Crypto Service - ระบบจัดการ Crypto Payment (P2P Contract Model)
 """
 from typing import Optional, Dict, Any
+from sqlalchemy import case, literal, update
 from sqlalchemy.orm import Session
 from app.models import (
-    Store, CryptoTransaction, Transaction, CryptoTransactionStatus
+    Store, CryptoTransaction, Transaction, CryptoTransactionStatus, TransactionStatus
 )
 from app.config import (
-    BLOCKCHAIN_EXPLORER_API, TRANSACTION_FEE, CRYPTO_ENABLED
+    BLOCKCHAIN_EXPLORER_API, TRANSACTION_FEE, CRYPTO_ENABLED,
+    CRYPTO_POLL_CONCURRENCY, CRYPTO_POLL_TIMEOUT, CRYPTO_POLL_MIN_INTERVAL, CRYPTO_POLL_MAX_INTERVAL,
 )
+from app.services import metrics
 import aiohttp
+import asyncio
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 
+async def _fetch_status(session: aiohttp.ClientSession, tx_hash: str) -> Dict[str, Any]:
+    """
+    ถามสถานะ tx หนึ่งรายการจาก Blockchain Explorer ผ่าน session ที่ส่งมา
+    retryable = explorer ล่ม / ช้า / จำกัด rate (ไม่ได้แปลว่า tx ล้มเหลว)
+    """
+    try:
+        with metrics.gateway_timer("blockchain"):
+            # ตัวอย่างการเรียก API จาก Blockchain Explorer
+            # ปรับตาม API ที่ใช้จริง
+            url = f"{BLOCKCHAIN_EXPLORER_API}/tx/{tx_hash}"
+
+            async with session.get(url) as response:
+                if response.status == 200:
+                    data = await response.json()
+
+                    # ตรวจสอบสถานะ transaction
+                    confirmations = data.get("confirmations", 0)
+                    status = "confirmed" if confirmations >= 1 else "pending"
+
+                    return {
+                        "status": status,
+                        "confirmations": confirmations,
+                        "tx_hash": tx_hash,
+                        "block_height": data.get("block_height"),
+                        "explorer_url": f"{BLOCKCHAIN_EXPLORER_API}/tx/{tx_hash}"
+                    }
+                else:
+                    return {
+                        "status": "failed",
+                        "error": f"API returned status {response.status}",
+                        "retryable": response.status == 429 or response.status >= 500,
+                    }
+    except Exception as e:
+        logger.error(f"Error checking transaction status: {e}")
+        return {
+            "status": "failed",
+            "error": str(e),
+            "retryable": True,
+        }
+
+
+def _poll_due(created_at: Optional[datetime], last_checked: Optional[datetime], now: datetime) -> bool:
+    """
+    backoff ตาม last_checked: รอเท่ากับอายุของ tx ตอนตรวจครั้งก่อน (ตรวจห่างขึ้นเท่าตัวทุกครั้ง)
+    ไม่น้อยกว่า CRYPTO_POLL_MIN_INTERVAL และไม่เกิน CRYPTO_POLL_MAX_INTERVAL วินาที
+    """
+    if last_checked is None:
+        return True
+    last_checked = last_checked.replace(tzinfo=None)
+    age = (last_checked - created_at.replace(tzinfo=None)).total_seconds() if created_at else 0
+    interval = min(max(age, CRYPTO_POLL_MIN_INTERVAL), CRYPTO_POLL_MAX_INTERVAL)
+    return (now - last_checked).total_seconds() >= interval
+
+
 class CryptoService:
     """Service for handling crypto transactions with P2P model"""
 
@@ -87,38 +145,8 @@ class CryptoService:
         if not CRYPTO_ENABLED:
             return {"error": "Crypto is not enabled"}
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                # ตัวอย่างการเรียก API จาก Blockchain Explorer
-                # ปรับตาม API ที่ใช้จริง
-                url = f"{BLOCKCHAIN_EXPLORER_API}/tx/{tx_hash}"
-                
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        # ตรวจสอบสถานะ transaction
-                        confirmations = data.get("confirmations", 0)
-                        status = "confirmed" if confirmations >= 1 else "pending"
-                        
-                        return {
-                            "status": status,
-                            "confirmations": confirmations,
-                            "tx_hash": tx_hash,
-                            "block_height": data.get("block_height"),
-                            "explorer_url": f"{BLOCKCHAIN_EXPLORER_API}/tx/{tx_hash}"
-                        }
-                    else:
-                        return {
-                            "status": "failed",
-                            "error": f"API returned status {response.status}"
-                        }
-        except Exception as e:
-            logger.error(f"Error checking transaction status: {e}")
-            return {
-                "status": "failed",
-                "error": str(e)
-            }
+        async with aiohttp.ClientSession() as session:
+            return await _fetch_status(session, tx_hash)
 
     async def update_transaction_status(self, crypto_transaction_id: int) -> CryptoTransaction:
         """
@@ -143,7 +171,6 @@ class CryptoService:
                 Transaction.id == crypto_transaction.transaction_id
             ).first()
             if transaction:
-                from app.models import TransactionStatus
                 transaction.status = TransactionStatus.CONFIRMED
         elif status_data.get("status") == "failed":
             crypto_transaction.status = CryptoTransactionStatus.FAILED
@@ -152,7 +179,6 @@ class CryptoService:
                 Transaction.id == crypto_transaction.transaction_id
             ).first()
             if transaction:
-                from app.models import TransactionStatus
                 transaction.status = TransactionStatus.FAILED
 
         crypto_transaction.last_checked = datetime.now()
@@ -161,6 +187,82 @@ class CryptoService:
 
         return crypto_transaction
 
+    async def poll_pending_transactions(
+        self, now: Optional[datetime] = None, concurrency: int = CRYPTO_POLL_CONCURRENCY
+    ) -> Dict[str, int]:
+        """
+        ตรวจ tx ที่ยัง pending ทั้งหมดในรอบเดียว (scheduler ทุก 5 นาที)
+        - query เดียวดึง tx pending (เฉพาะคอลัมน์ที่ใช้) แล้วเลือกตัวที่ถึงรอบตาม backoff (_poll_due)
+        - aiohttp session เดียว (connection pool) ถาม explorer พร้อมกันไม่เกิน concurrency
+        - เขียนผลกลับด้วย UPDATE เดียวต่อตาราง (CASE ตาม id) แล้ว commit ครั้งเดียว
+        explorer ล่ม / timeout / 429 = ยัง pending ตรวจใหม่ตาม backoff (ไม่ตัดสินว่า tx ล้มเหลว)
+        """
+        counts = {"checked": 0, "confirmed": 0, "failed": 0, "pending": 0, "skipped": 0}
+        if not CRYPTO_ENABLED:
+            return counts
+        now = now or datetime.now()
+        rows = self.db.query(
+            CryptoTransaction.id,
+            CryptoTransaction.transaction_id,
+            CryptoTransaction.tx_hash,
+            CryptoTransaction.created_at,
+            CryptoTransaction.last_checked,
+        ).filter(CryptoTransaction.status == CryptoTransactionStatus.PENDING).all()
+        due = [r for r in rows if _poll_due(r.created_at, r.last_checked, now)]
+        counts["skipped"] = len(rows) - len(due)
+        if not due:
+            return counts
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def check(tx_hash: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await _fetch_status(session, tx_hash)
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        timeout = aiohttp.ClientTimeout(total=CRYPTO_POLL_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            results = await asyncio.gather(*(check(r.tx_hash) for r in due))
+
+        changes = {}
+        for row, result in zip(due, results):
+            if result.get("status") == "confirmed":
+                changes[row] = (CryptoTransactionStatus.CONFIRMED, TransactionStatus.CONFIRMED, result.get("explorer_url"))
+            elif result.get("status") == "failed" and not result.get("retryable"):
+                changes[row] = (CryptoTransactionStatus.FAILED, TransactionStatus.FAILED, None)
+        self._write_poll_results([r.id for r in due], changes, now)
+
+        counts["checked"] = len(due)
+        counts["confirmed"] = sum(1 for c in changes.values() if c[0] == CryptoTransactionStatus.CONFIRMED)
+        counts["failed"] = len(changes) - counts["confirmed"]
+        counts["pending"] = len(due) - len(changes)
+        return counts
+
+    def _write_poll_results(self, ids: list, changes: Dict[Any, tuple], now: datetime) -> None:
+        """last_checked ของทุก tx ที่ตรวจ + สถานะที่เปลี่ยน (crypto_transactions / transactions ตารางละหนึ่ง UPDATE)"""
+        values: Dict[str, Any] = {"last_checked": now}
+        if changes:
+            status_type = CryptoTransaction.status.type
+            values["status"] = case(
+                {row.id: literal(new[0], status_type) for row, new in changes.items()},
+                value=CryptoTransaction.id,
+                else_=CryptoTransaction.status,
+            )
+            urls = {row.id: new[2] for row, new in changes.items() if new[2]}
+            if urls:
+                values["explorer_url"] = case(urls, value=CryptoTransaction.id, else_=CryptoTransaction.explorer_url)
+        no_sync = {"synchronize_session": False}
+        self.db.execute(update(CryptoTransaction).where(CryptoTransaction.id.in_(ids)).values(**values), execution_options=no_sync)
+        if changes:
+            tx_status = {row.transaction_id: literal(new[1], Transaction.status.type) for row, new in changes.items()}
+            self.db.execute(
+                update(Transaction)
+                .where(Transaction.id.in_(list(tx_status)))
+                .values(status=case(tx_status, value=Transaction.id)),
+                execution_options=no_sync,
+            )
+        self.db.commit()
+
     def get_store_crypto_transactions(self, store_id: int) -> list:
         """
         ดึงรายการ Crypto Transactions ของร้านค้า
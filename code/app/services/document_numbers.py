@@ -0,0 +1,117 @@
+"""
+Document Numbers - เลขเอกสารที่อ่านง่ายและไม่ซ้ำ โดยไม่ต้อง query เช็คซ้ำ / COUNT(*) ต่อเลข
+รูปแบบ PREFIX-YYYYMMDD-NNNNN (ลำดับเริ่มใหม่ทุกวัน เก็บใน code_sequences ชื่อ "<kind>:YYYYMMDD")
+- ใบกำกับภาษี (INV): จองทีละเลขใน transaction ของผู้เรียก -> เลขต่อเนื่องไม่ขาด (rollback = ไม่ใช้เลข)
+  แถวลำดับถูก lock จนผู้เรียก commit จึงออกใบได้ทีละใบต่อวัน แต่ไม่ต้องนับใบทั้งวันอีก
+- Marketplace ID (FC) / ใบเสร็จ (RCP): แต่ละ worker จองเป็นช่วงละ BLOCK_SIZE ด้วย transaction แยกแล้วแจกจากหน่วยความจำ
+  ไม่ชนกันข้าม worker เลขเพิ่มขึ้นเสมอภายใน worker (ข้าม worker ไม่เรียงตามเวลา และมีช่องว่างเมื่อ worker restart)
+  จองช่วงผ่าน connection เฉพาะ (NullPool) ไม่ยืมจาก pool ของ request - pool เต็มไม่ทำให้ thread อื่นค้างรอ lock ของ allocator
+  SQLite lock ทั้งไฟล์ตอนเขียน transaction แยกจะรอ transaction ของผู้เรียกเอง -> ใช้แบบจองใน transaction แทน
+"""
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.models import CodeSequence
+
+BLOCK_SIZE = 50
+SEQUENCE_DIGITS = 5
+
+
+def reserve_sequence(db: Session, name: str, count: int) -> int:
+    """จองเลขลำดับ count ค่า คืนค่าแรก (แถวถูก lock จนจบ transaction จึงไม่มีใครได้ช่วงซ้ำ)"""
+    result = db.execute(
+        update(CodeSequence)
+        .where(CodeSequence.name == name)
+        .values(next_value=CodeSequence.next_value + count)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        try:
+            with db.begin_nested():
+                db.execute(insert(CodeSequence).values(name=name, next_value=count))
+            return 0
+        except IntegrityError:
+            return reserve_sequence(db, name, count)  # อีก request สร้างแถวไปก่อน
+    end = db.execute(select(CodeSequence.next_value).where(CodeSequence.name == name)).scalar_one()
+    return int(end) - count
+
+
+class _BlockAllocator:
+    """ช่วงเลขที่ worker นี้จองไว้ต่อ sequence: {name: (next, end)}"""
+
+    def __init__(self, block_size: int = BLOCK_SIZE, in_transaction_dialects: Tuple[str, ...] = ("sqlite",)):
+        self.block_size = block_size
+        self.in_transaction_dialects = in_transaction_dialects
+        self._lock = threading.Lock()
+        self._ranges: Dict[str, Tuple[int, int]] = {}
+        self._engines: Dict[str, Engine] = {}
+
+    def _engine(self, bind) -> Engine:
+        """engine ของ DB เดียวกับ bind แต่ไม่มี pool (เหมือน MySQLLeaderLock) - เปิด connection ใหม่เฉพาะตอนจองช่วง"""
+        key = bind.url.render_as_string(hide_password=False)
+        engine = self._engines.get(key)
+        if engine is None:
+            engine = self._engines[key] = create_engine(bind.url, poolclass=NullPool)
+        return engine
+
+    def next(self, db: Session, name: str) -> int:
+        bind = db.get_bind()
+        if bind.dialect.name in self.in_transaction_dialects:
+            return reserve_sequence(db, name, 1)
+        with self._lock:
+            current, end = self._ranges.get(name, (0, 0))
+            if current >= end:
+                with Session(bind=self._engine(bind)) as own:
+                    current = reserve_sequence(own, name, self.block_size)
+                    own.commit()
+                end = current + self.block_size
+                # ช่วงของวันก่อน ๆ ไม่ใช้แล้ว
+                prefix = name.split(":", 1)[0] + ":"
+                for key in [k for k in self._ranges if k.startswith(prefix) and k != name]:
+                    del self._ranges[key]
+            self._ranges[name] = (current + 1, end)
+            return current
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ranges.clear()
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+
+_blocks = _BlockAllocator()
+
+
+def format_number(prefix: str, day: datetime, seq: int) -> str:
+    """ลำดับเริ่มที่ 0 ในตาราง แสดงเริ่มที่ 00001"""
+    return f"{prefix}-{day.strftime('%Y%m%d')}-{str(seq + 1).zfill(SEQUENCE_DIGITS)}"
+
+
+def _sequence_name(kind: str, day: datetime) -> str:
+    return f"{kind}:{day.strftime('%Y%m%d')}"
+
+
+def next_foodcourt_id(db: Session, now: Optional[datetime] = None) -> str:
+    """FC-YYYYMMDD-NNNNN (จองเป็นช่วงต่อ worker)"""
+    now = now or datetime.now()
+    return format_number("FC", now, _blocks.next(db, _sequence_name("foodcourt_id", now)))
+
+
+def next_receipt_number(db: Session, now: Optional[datetime] = None) -> str:
+    """RCP-YYYYMMDD-NNNNN (จองเป็นช่วงต่อ worker)"""
+    now = now or datetime.now()
+    return format_number("RCP", now, _blocks.next(db, _sequence_name("receipt", now)))
+
+
+def next_invoice_number(db: Session, now: Optional[datetime] = None) -> str:
+    """INV-YYYYMMDD-NNNNN ต่อเนื่องไม่ขาด (จองใน transaction ของผู้เรียก - ต้อง commit พร้อมใบกำกับภาษี)"""
+    now = now or datetime.now()
+    return format_number("INV", now, reserve_sequence(db, _sequence_name("invoice", now), 1))
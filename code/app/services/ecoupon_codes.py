@@ -0,0 +1,170 @@
+"""
+E-Coupon Codes - สร้างรหัส e-coupon และออกคูปองจำนวนมากโดยไม่ต้อง query เช็ครหัสซ้ำทีละรหัส
+- random: prefix + 10 ตัว (A-Z0-9) จาก secrets เหมือนเดิม กันซ้ำใน batch ด้วย set และเช็คกับ DB ทีละ chunk (WHERE code IN ...)
+- keyed: เลขลำดับจาก code_sequences (จองทีละช่วงด้วย UPDATE เดียว) -> สลับด้วย Feistel + HMAC(ECOUPON_CODE_KEY)
+  เป็น bijection บน 2^50 จึงไม่ซ้ำแน่นอนและเดาเลขถัดไปไม่ได้ ไม่ต้องเช็ค DB
+  prefix คนละชุดกับ random (EK / EC) จึงไม่ชนกับรหัสสุ่ม
+- issue_bulk: INSERT หลายแถวต่อ statement ทีละ chunk ใน transaction เดียว
+"""
+import hashlib
+import hmac
+import secrets
+import string
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import ECOUPON_CODE_KEY, SECRET_KEY
+from app.models import ECoupon, ECouponStore
+from app.services import member_summary
+from app.services.document_numbers import reserve_sequence
+from app.services.ecoupon_redemption import normalize_allowed_store_ids
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 10
+RANDOM_PREFIX = "EC"
+KEYED_PREFIX = "EK"
+KEYED_SEQUENCE = "ecoupon_code"
+INSERT_CHUNK = 500  # แถวต่อ INSERT (ไม่เกิน limit parameter ของ MySQL/SQLite)
+
+_FEISTEL_HALF_BITS = 25  # 2 x 25 = 50 bits < 36^10
+_FEISTEL_ROUNDS = 4
+_HALF_MASK = (1 << _FEISTEL_HALF_BITS) - 1
+KEYED_MAX_SEQUENCE = 1 << (2 * _FEISTEL_HALF_BITS)
+
+SCHEMES = ("random", "keyed")
+
+
+def random_code(prefix: str = RANDOM_PREFIX, length: int = CODE_LENGTH) -> str:
+    return prefix + "".join(secrets.choice(ALPHABET) for _ in range(length))
+
+
+def _encode_base36(value: int, length: int = CODE_LENGTH) -> str:
+    chars = []
+    for _ in range(length):
+        value, rem = divmod(value, 36)
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars))
+
+
+class KeyedCodeGenerator:
+    """เลขลำดับ -> รหัสที่ไม่ซ้ำและดูสุ่ม (Feistel network ใช้ HMAC-SHA256 เป็น round function)"""
+
+    def __init__(self, key: Optional[str] = None, prefix: str = KEYED_PREFIX):
+        self._key = (key or ECOUPON_CODE_KEY or SECRET_KEY).encode("utf-8")
+        self.prefix = prefix
+
+    def _round(self, rnd: int, half: int) -> int:
+        digest = hmac.new(self._key, bytes([rnd]) + half.to_bytes(4, "big"), hashlib.sha256).digest()
+        return int.from_bytes(digest[:4], "big") & _HALF_MASK
+
+    def permute(self, seq: int) -> int:
+        if not 0 <= seq < KEYED_MAX_SEQUENCE:
+            raise ValueError(f"sequence out of range: {seq}")
+        left, right = seq >> _FEISTEL_HALF_BITS, seq & _HALF_MASK
+        for rnd in range(_FEISTEL_ROUNDS):
+            left, right = right, left ^ self._round(rnd, right)
+        return (left << _FEISTEL_HALF_BITS) | right
+
+    def code(self, seq: int) -> str:
+        return self.prefix + _encode_base36(self.permute(seq))
+
+    def codes(self, start: int, count: int) -> List[str]:
+        return [self.code(seq) for seq in range(start, start + count)]
+
+
+def _chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def generate_random_codes(db: Session, count: int, prefix: str = RANDOM_PREFIX) -> List[str]:
+    """สุ่มรหัส count ตัวที่ไม่ซ้ำกันเองและไม่ซ้ำกับใน DB (เช็คทีละ chunk)"""
+    codes: List[str] = []
+    seen = set()
+    while len(codes) < count:
+        batch = []
+        while len(batch) < count - len(codes):
+            code = random_code(prefix)
+            if code not in seen:
+                seen.add(code)
+                batch.append(code)
+        taken = set()
+        for chunk in _chunks(batch, INSERT_CHUNK):
+            taken.update(db.execute(select(ECoupon.code).where(ECoupon.code.in_(chunk))).scalars())
+        codes.extend(c for c in batch if c not in taken)
+    return codes
+
+
+def generate_codes(db: Session, count: int, scheme: str = "random") -> List[str]:
+    if scheme == "keyed":
+        start = reserve_sequence(db, KEYED_SEQUENCE, count)
+        return KeyedCodeGenerator().codes(start, count)
+    if scheme == "random":
+        return generate_random_codes(db, count)
+    raise ValueError(f"unknown code scheme: {scheme}")
+
+
+def add_with_unique_code(db: Session, ec: ECoupon, prefix: str = RANDOM_PREFIX, attempts: int = 5) -> ECoupon:
+    """
+    เพิ่มคูปองเดียวด้วยรหัสสุ่มโดยไม่ query เช็คก่อน - ชน unique (แทบไม่เกิด) ค่อยสุ่มใหม่ใน savepoint
+    ec.code ที่ตั้งมาแล้วจะถูกใช้ในรอบแรก
+    """
+    for _ in range(attempts):
+        if not ec.code:
+            ec.code = random_code(prefix)
+        try:
+            with db.begin_nested():
+                db.add(ec)
+                db.flush()
+            return ec
+        except IntegrityError:
+            ec.code = None
+    raise RuntimeError("cannot generate unique e-coupon code")
+
+
+def issue_bulk(
+    db: Session,
+    count: int,
+    amount: float,
+    payment_method: str,
+    scheme: str = "random",
+    customer_id: Optional[int] = None,
+    promotion_id: Optional[int] = None,
+    valid_from: Optional[datetime] = None,
+    valid_to: Optional[datetime] = None,
+    allowed_store_ids: Optional[str] = None,
+    store_ids: Sequence[int] = (),
+) -> List[str]:
+    """
+    ออกคูปอง count ใบ ด้วย multi-row INSERT ทีละ chunk (ไม่ commit - ผู้เรียก commit ครั้งเดียว)
+    store_ids: ร้านที่ใช้ได้ (ตรงกับ allowed_store_ids) เขียนลง e_coupon_stores ด้วย INSERT ... SELECT
+    """
+    codes = generate_codes(db, count, scheme)
+    member_summary.touch(db, customer_id, "coupons")
+    now = datetime.utcnow()
+    base = {
+        "amount": amount,
+        "customer_id": customer_id,
+        "status": "assigned" if customer_id else "available",
+        "payment_method": payment_method,
+        "paid_at": now,
+        "promotion_id": promotion_id,
+        "valid_from": valid_from,
+        "valid_to": valid_to,
+        "allowed_store_ids": normalize_allowed_store_ids(allowed_store_ids),
+        "created_at": now,
+    }
+    for chunk in _chunks(codes, INSERT_CHUNK):
+        db.execute(insert(ECoupon).values([dict(base, code=code) for code in chunk]))
+        for store_id in store_ids:
+            db.execute(
+                insert(ECouponStore).from_select(
+                    ["coupon_id", "store_id"],
+                    select(ECoupon.id, literal(store_id)).where(ECoupon.code.in_(chunk)),
+                )
+            )
+    return codes
@@ -0,0 +1,187 @@
+"""
+E-Coupon Redemption Service - หักจ่ายด้วย e-coupon แบบ set-based และกันจ่ายซ้ำเมื่อสแกนพร้อมกัน
+- ร้านที่ใช้ได้เก็บใน e_coupon_stores (normalized จาก allowed_store_ids) ให้ DB กรองด้วย index
+- เลือกคูปองที่ใช้ได้ด้วย query เดียว (ลูกค้า + สถานะ + ช่วงเวลา + ร้าน) พร้อม FOR UPDATE SKIP LOCKED (MySQL/MariaDB)
+- หักยอดด้วย UPDATE เดียวแบบมีเงื่อนไข (amount >= ยอดที่หัก) ถ้าจำนวนแถวที่อัปเดตไม่ครบ = มีการใช้คูปองพร้อมกัน
+- บันทึก ECouponRedemption ทุกคูปองด้วย bulk insert ครั้งเดียว
+ไม่ commit เอง ผู้เรียก commit ครั้งเดียวพร้อมสถานะ order / MemberActivity
+"""
+import json
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import and_, case, delete, exists, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import ECoupon, ECouponRedemption, ECouponStore
+from app.services import member_summary
+
+# ยอดคงเหลือต่ำกว่านี้ถือว่าใช้หมด (amount เป็น Float)
+AMOUNT_EPSILON = 0.005
+
+
+class InsufficientCouponBalance(Exception):
+    """ยอดคูปองที่ใช้ได้ไม่พอ"""
+
+    def __init__(self, available: float, required: float):
+        super().__init__(f"available {available:.2f} < required {required:.2f}")
+        self.available = available
+        self.required = required
+
+
+class ConcurrentRedemption(Exception):
+    """คูปองถูกใช้ไปพร้อมกันจาก request อื่น (ให้ผู้ใช้ลองใหม่)"""
+
+
+class CouponDeduction(NamedTuple):
+    coupon_id: int
+    amount: float
+    balance_after: float
+
+
+class RedemptionResult(NamedTuple):
+    amount: float
+    deductions: List[CouponDeduction]
+
+
+def parse_allowed_store_ids(s: Optional[str]) -> List[int]:
+    """allowed_store_ids (JSON array) -> list ของ store_id (ว่าง = ทุกร้าน)"""
+    if not s or not s.strip():
+        return []
+    try:
+        out = json.loads(s)
+        return [int(x) for x in out] if isinstance(out, list) else []
+    except Exception:
+        return []
+
+
+def normalize_allowed_store_ids(s: Optional[str]) -> Optional[str]:
+    """ค่าที่ parse แล้วไม่มีร้าน (" ", "[ ]", "null", JSON เสีย ฯลฯ = ทุกร้าน) เก็บเป็น NULL"""
+    return s if parse_allowed_store_ids(s) else None
+
+
+def set_coupon_stores(db: Session, coupon_id: int, allowed_store_ids: Optional[str]) -> None:
+    """
+    เขียนแถว e_coupon_stores ของคูปองให้ตรงกับ allowed_store_ids (เรียกหลัง flush ให้มี coupon.id)
+    ค่าที่หมายถึงทุกร้านถูกเขียนกลับเป็น NULL ให้ _unrestricted() กรองได้
+    """
+    db.execute(delete(ECouponStore).where(ECouponStore.coupon_id == coupon_id))
+    store_ids = sorted(set(parse_allowed_store_ids(allowed_store_ids)))
+    if store_ids:
+        db.execute(insert(ECouponStore), [{"coupon_id": coupon_id, "store_id": sid} for sid in store_ids])
+    elif allowed_store_ids is not None:
+        db.execute(update(ECoupon).where(ECoupon.id == coupon_id).values(allowed_store_ids=None))
+
+
+def _unrestricted():
+    """คูปองที่ไม่จำกัดร้าน (allowed_store_ids NULL - "" / "[]" เผื่อแถวที่ยังไม่ผ่าน migration)"""
+    return or_(
+        ECoupon.allowed_store_ids.is_(None),
+        ECoupon.allowed_store_ids.in_(("", "[]")),
+    )
+
+
+def eligible_coupons_stmt(customer_id: int, store_id: int, now: datetime):
+    """
+    SELECT id, amount ของคูปองที่ใช้ได้ที่ร้านนี้ เรียงตาม id (ใช้ใบเก่าก่อน)
+    คูปองที่จำกัดร้านแต่ยังไม่มีแถวใน e_coupon_stores (ยังไม่ backfill) จะไม่ถูกเลือก - ปลอดภัยไว้ก่อน
+    """
+    store_match = exists().where(
+        and_(ECouponStore.coupon_id == ECoupon.id, ECouponStore.store_id == store_id)
+    )
+    return (
+        select(ECoupon.id, ECoupon.amount)
+        .where(
+            ECoupon.customer_id == customer_id,
+            ECoupon.status == "assigned",
+            ECoupon.amount > 0,
+            or_(ECoupon.valid_from.is_(None), ECoupon.valid_from <= now),
+            or_(ECoupon.valid_to.is_(None), ECoupon.valid_to >= now),
+            or_(_unrestricted(), store_match),
+        )
+        .order_by(ECoupon.id.asc())
+    )
+
+
+def _allocate(rows: Iterable, amount: float) -> List[CouponDeduction]:
+    """แบ่งยอดจ่ายลงคูปองตามลำดับ (ใบเก่าก่อน) - ใบที่ใช้หมดมี balance_after = 0"""
+    remaining = amount
+    out = []
+    for row in rows:
+        if remaining <= 0:
+            break
+        coupon_amount = float(row.amount)
+        use = min(remaining, coupon_amount)
+        balance = coupon_amount - use
+        out.append(CouponDeduction(row.id, use, 0.0 if balance <= AMOUNT_EPSILON else balance))
+        remaining -= use
+    return out
+
+
+def redeem(
+    db: Session,
+    customer_id: int,
+    store_id: int,
+    amount: float,
+    order_id: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> RedemptionResult:
+    """
+    หักยอด amount จากคูปองของลูกค้าที่ใช้ได้ที่ร้าน store_id
+    Raises InsufficientCouponBalance ถ้ายอดไม่พอ, ConcurrentRedemption ถ้าคูปองถูกใช้ไปพร้อมกัน
+    """
+    now = now or datetime.utcnow()
+    member_summary.touch(db, customer_id, "coupons")  # ล็อก summary ก่อนแถวคูปอง (ลำดับเดียวกับทุกทาง)
+    stmt = eligible_coupons_stmt(customer_id, store_id, now)
+    if db.get_bind().dialect.name == "mysql":
+        # แถวที่ request อื่นกำลังหักอยู่จะถูกข้าม ไม่ต้องรอ lock
+        stmt = stmt.with_for_update(skip_locked=True)
+    rows = db.execute(stmt).all()
+    total_available = sum(float(r.amount) for r in rows)
+    if total_available < amount:
+        raise InsufficientCouponBalance(total_available, amount)
+
+    deductions = _allocate(rows, amount)
+    if not deductions:
+        return RedemptionResult(amount, [])
+
+    ids = [d.coupon_id for d in deductions]
+    use_by_id = case({d.coupon_id: d.amount for d in deductions}, value=ECoupon.id)
+    balance_by_id = case({d.coupon_id: d.balance_after for d in deductions}, value=ECoupon.id)
+    # status ต้องมาก่อน amount: MySQL ประเมิน SET จากซ้ายไปขวาด้วยค่าที่อัปเดตแล้ว
+    result = db.execute(
+        update(ECoupon)
+        .where(
+            ECoupon.id.in_(ids),
+            ECoupon.status == "assigned",
+            ECoupon.amount >= use_by_id - AMOUNT_EPSILON,
+        )
+        .ordered_values(
+            (ECoupon.status, case((balance_by_id <= 0, "used"), else_=ECoupon.status)),
+            (ECoupon.amount, case((balance_by_id <= 0, 0.0), else_=ECoupon.amount - use_by_id)),
+            (ECoupon.store_id, store_id),
+            (ECoupon.order_id, order_id),
+            (ECoupon.redeemed_at, now),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(ids):
+        db.rollback()
+        raise ConcurrentRedemption()
+
+    db.execute(
+        insert(ECouponRedemption),
+        [
+            {
+                "coupon_id": d.coupon_id,
+                "customer_id": customer_id,
+                "store_id": store_id,
+                "order_id": order_id,
+                "amount": d.amount,
+                "balance_after": d.balance_after,
+                "created_at": now,
+            }
+            for d in deductions
+        ],
+    )
+    return RedemptionResult(amount, deductions)
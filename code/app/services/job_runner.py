@@ -0,0 +1,447 @@
+"""
+Job Runner - งานตามเวลาที่รันครั้งเดียวต่อรอบทั้งระบบ (แทน schedule + sleep 60 ในทุก worker)
+- leader election: worker ที่ได้ล็อก (MySQL GET_LOCK หรือ flock ไฟล์) เป็นผู้รันงาน worker อื่นลองใหม่ทุก tick
+  leader ตาย = ล็อกหลุดเอง (connection / fd ถูกปิด) worker ถัดไปรับช่วงภายในหนึ่ง tick
+- งานรันบน asyncio: งาน async รันใน loop, งาน sync รันใน thread (asyncio.to_thread)
+  จำกัดจำนวนรอบที่รันพร้อมกันต่องาน (max_concurrency - รอบที่ถึงเวลาขณะเต็มถูกข้าม) และ timeout ต่อรอบ
+- ก่อนเริ่มทุกรอบเขียนแถว job_runs (unique job_name + scheduled_for = รอบหนึ่งรันได้ครั้งเดียว แม้ leader เปลี่ยน)
+  จบแล้วบันทึกสถานะและเวลาที่ใช้ งาน sync ที่เกิน timeout (ยกเลิก thread ไม่ได้) อัปเดตแถวอีกครั้งเมื่อจบจริง
+- ระหว่างรัน runner อัปเดต heartbeat_at ทุก tick - แถว running ที่ heartbeat ขาดเกิน STALE_BEATS tick
+  หรือเริ่มนานเกิน timeout ของงาน (runner ตายกลางรอบ) ถูก leader ใหม่ / --run รับไปรันใหม่
+- catch-up: leader ใหม่ (restart / deploy / leader เดิมตาย) รันรอบล่าสุดที่พลาดไปถ้ายังไม่เกิน catch_up ของงาน
+  รอบที่พลาดหลายรอบรวมเป็นครั้งเดียว
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool
+
+from app.config import DATABASE_URL, SCHEDULER_LOCK, SCHEDULER_LOCK_FILE, SCHEDULER_TICK
+from app.models import JobRun
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "marketplace_scheduler"
+LOCK_FILE = Path(SCHEDULER_LOCK_FILE) if SCHEDULER_LOCK_FILE else (
+    Path(__file__).resolve().parent.parent.parent / "data" / "scheduler.lock"
+)
+STOP_GRACE = 30.0  # วินาที - รองานที่กำลังรันตอน shutdown
+STALE_BEATS = 4  # heartbeat ขาดกี่รอบจึงถือว่า runner ของแถวตายแล้ว
+
+
+def runner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+@dataclass(frozen=True)
+class Job:
+    """
+    งานหนึ่งงาน: daily_at="HH:MM" (วันละครั้ง) หรือ every (ทุกช่วงเวลา นับจากเที่ยงคืน)
+    func รับเวลารอบ (scheduled_for) - งานรายวันใช้ตัดสินว่าทำของวันไหน (รันย้อนหลังก็ได้วันที่ถูก)
+    """
+    name: str
+    func: Callable[[datetime], Any]
+    daily_at: Optional[str] = None
+    every: Optional[timedelta] = None
+    timeout: float = 600.0  # วินาที
+    max_concurrency: int = 1
+    catch_up: timedelta = timedelta(0)  # รอบที่พลาดไม่เกินนี้ถูกรันเมื่อได้เป็น leader
+
+    @property
+    def period(self) -> timedelta:
+        return self.every or timedelta(days=1)
+
+    def last_due(self, now: datetime) -> datetime:
+        """รอบล่าสุดที่ไม่เกิน now"""
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.every:
+            return midnight + (now - midnight) // self.every * self.every
+        hour, minute = (int(x) for x in self.daily_at.split(":"))
+        due = midnight.replace(hour=hour, minute=minute)
+        return due if due <= now else due - timedelta(days=1)
+
+
+class FileLeaderLock:
+    """flock บนไฟล์ - ทุก worker ต้องอยู่เครื่องเดียวกัน (gunicorn) process ตายแล้ว kernel ปล่อยล็อกให้เอง"""
+
+    def __init__(self, path: Path = LOCK_FILE):
+        if fcntl is None:
+            raise RuntimeError("FileLeaderLock ต้องใช้ fcntl (Linux/macOS)")
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{runner_id()}\n".encode())
+        self._fd = fd
+        return True
+
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)  # ปิด fd = ปล่อย flock
+            self._fd = None
+
+
+class MySQLLeaderLock:
+    """
+    GET_LOCK บน connection เฉพาะของ leader (ไม่ยืมจาก pool ของ request) - ใช้ได้หลายเครื่อง
+    ล็อกอยู่ตราบที่ connection ยังอยู่ held() ตรวจทุก tick (และกัน connection idle จนโดนตัด)
+    """
+
+    def __init__(self, url: str = DATABASE_URL, name: str = LOCK_NAME):
+        self._engine = create_engine(url, poolclass=NullPool)
+        self.name = name
+        self._conn = None
+
+    def _scalar(self, sql: str):
+        value = self._conn.execute(text(sql), {"name": self.name}).scalar()
+        self._conn.commit()  # ไม่ถือ transaction (read view) ค้างไว้บน connection ที่เปิดตลอด
+        return value
+
+    def acquire(self) -> bool:
+        if self._conn is not None:
+            return self.held()
+        self._conn = self._engine.connect()
+        try:
+            if self._scalar("SELECT GET_LOCK(:name, 0)") == 1:
+                return True
+        except Exception:
+            self._close()
+            raise
+        self._close()
+        return False
+
+    def held(self) -> bool:
+        if self._conn is None:
+            return False
+        try:
+            return bool(self._scalar("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()"))
+        except Exception as e:
+            logger.warning("Scheduler lock connection lost: %s", e)
+            self._close()
+            return False
+
+    def release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._scalar("SELECT RELEASE_LOCK(:name)")
+        except Exception:
+            pass
+        self._close()
+
+    def _close(self) -> None:
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+
+def make_leader_lock(kind: str = SCHEDULER_LOCK):
+    """auto = GET_LOCK เมื่อ DB เป็น MySQL/MariaDB ไม่เช่นนั้นใช้ไฟล์"""
+    if kind == "auto":
+        kind = "db" if make_url(DATABASE_URL).get_backend_name() == "mysql" else "file"
+    if kind == "db":
+        return MySQLLeaderLock()
+    if kind == "file":
+        return FileLeaderLock()
+    raise ValueError(f"SCHEDULER_LOCK ไม่รู้จัก: {kind}")
+
+
+class JobRunner:
+    """loop ของ scheduler: เลือก leader ทุก tick แล้วเริ่มงานที่ถึงรอบ (รันใน thread + event loop ของตัวเอง)"""
+
+    def __init__(
+        self,
+        jobs: Iterable[Job],
+        lock,
+        session_factory=None,
+        tick: float = SCHEDULER_TICK,
+        clock: Callable[[], datetime] = datetime.now,
+        heartbeat: Optional[float] = None,
+    ):
+        self.jobs: Dict[str, Job] = {job.name: job for job in jobs}
+        self.lock = lock
+        self.tick_seconds = tick
+        self.heartbeat = heartbeat or tick
+        self.clock = clock
+        self._session_factory = session_factory
+        self.leader = False
+        self._next: Dict[str, datetime] = {}
+        self._running: Dict[str, int] = defaultdict(int)
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopped = threading.Event()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _session(self):
+        if self._session_factory is None:
+            from app.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    # ---------- leader ----------
+
+    def _elect(self, now: datetime) -> None:
+        if self.leader:
+            if not self.lock.held():
+                logger.warning("Scheduler: lost leadership (%s)", runner_id())
+                self.leader = False
+                self._next.clear()
+            return
+        try:
+            acquired = self.lock.acquire()
+        except Exception as e:
+            logger.error("Scheduler leader election failed: %s", e)
+            return
+        if acquired:
+            self.leader = True
+            self._next = {name: self._first_due(job, now) for name, job in self.jobs.items()}
+            logger.info("Scheduler: %s is leader", runner_id())
+
+    @staticmethod
+    def _first_due(job: Job, now: datetime) -> datetime:
+        last = job.last_due(now)
+        return last if now - last <= job.catch_up else last + job.period
+
+    # ---------- run ----------
+
+    def tick(self, now: Optional[datetime] = None) -> List[asyncio.Task]:
+        """หนึ่งรอบของ loop (เรียกใน event loop): เลือก leader แล้วเริ่มงานที่ถึงเวลา คืน task ที่เริ่ม"""
+        now = now or self.clock()
+        self._elect(now)
+        if not self.leader:
+            return []
+        started = []
+        for name, job in self.jobs.items():
+            if self._next[name] > now:
+                continue
+            scheduled_for = job.last_due(now)  # พลาดหลายรอบ (loop ค้าง) = รันรอบล่าสุดครั้งเดียว
+            self._next[name] = scheduled_for + job.period
+            if self._running[name] >= job.max_concurrency:
+                logger.warning("Job %s still running, skipped run for %s", name, scheduled_for)
+                continue
+            started.append(self._launch(job, scheduled_for))
+        return started
+
+    def _launch(self, job: Job, scheduled_for: datetime, retry: bool = False) -> asyncio.Task:
+        self._running[job.name] += 1
+        task = asyncio.get_running_loop().create_task(self._run(job, scheduled_for, retry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, job: Job, scheduled_for: datetime, retry: bool = False) -> Optional[str]:
+        """รันหนึ่งรอบ คืนสถานะ (None = รอบนี้มีคนรันแล้ว)"""
+        try:
+            run_id = await asyncio.to_thread(self._claim, job, scheduled_for, retry)
+            if run_id is None:
+                logger.info("Job %s for %s already ran", job.name, scheduled_for)
+                return None
+            beat = asyncio.ensure_future(self._beat(run_id))
+            try:
+                return await self._execute(job, scheduled_for, run_id)
+            finally:
+                beat.cancel()
+        finally:
+            self._running[job.name] -= 1
+
+    async def _execute(self, job: Job, scheduled_for: datetime, run_id: int) -> str:
+        is_async = asyncio.iscoroutinefunction(job.func)
+        work = asyncio.ensure_future(
+            job.func(scheduled_for) if is_async else asyncio.to_thread(job.func, scheduled_for)
+        )
+        started = time.monotonic()
+        status, error = "success", None
+        try:
+            await asyncio.wait_for(asyncio.shield(work), job.timeout)
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"เกิน {job.timeout:g} วินาที"
+            logger.error("Job %s for %s timed out after %ss", job.name, scheduled_for, job.timeout)
+            if is_async:
+                work.cancel()
+        except Exception as e:
+            status, error = "failed", repr(e)[:2000]
+            logger.exception("Job %s for %s failed", job.name, scheduled_for)
+        duration_ms = int((time.monotonic() - started) * 1000)
+        await asyncio.to_thread(self._finish, run_id, status, duration_ms, error, is_async or work.done())
+        if not work.done():
+            # thread ยกเลิกไม่ได้ - ถือ slot (และ heartbeat) ไว้จนงานจบจริง กันรอบถัดไปซ้อน แล้วบันทึกผลจริง
+            await asyncio.wait({work})
+            late_error = None if work.cancelled() else work.exception()
+            elapsed = time.monotonic() - started
+            logger.warning("Job %s for %s ended %.0fs after start (%r)", job.name, scheduled_for, elapsed, late_error)
+            if not is_async:
+                note = f"{error} - จบจริงหลัง {elapsed:.0f} วินาที"
+                await asyncio.to_thread(
+                    self._finish, run_id, "failed" if late_error else "success", int(elapsed * 1000),
+                    f"{note}: {late_error!r}"[:2000] if late_error else note, True,
+                )
+        logger.info("Job %s for %s: %s in %d ms", job.name, scheduled_for, status, duration_ms)
+        return status
+
+    async def _beat(self, run_id: int) -> None:
+        """อัปเดต heartbeat_at ของแถวที่กำลังรันทุก tick จนงานจบจริง (ถูก cancel)"""
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            try:
+                await asyncio.to_thread(self._touch, run_id)
+            except Exception as e:
+                logger.warning("Job run %s heartbeat failed: %s", run_id, e)
+
+    def _touch(self, run_id: int) -> None:
+        db = self._session()
+        try:
+            # heartbeat_at เป็น NULL แล้ว = _finish บันทึกว่าจบจริง ไม่เขียนทับ
+            db.execute(update(JobRun).where(JobRun.id == run_id, JobRun.heartbeat_at.isnot(None)).values(
+                heartbeat_at=datetime.now(),
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def _claim(self, job: Job, scheduled_for: datetime, retry: bool = False) -> Optional[int]:
+        """
+        เขียนแถว running ของรอบ - รอบที่มีแถวแล้วคืน None ยกเว้น
+        แถว running ที่ runner ตายแล้ว (heartbeat ขาด / เริ่มนานเกิน timeout) และ retry: แถว failed / timeout
+        ที่งานจบจริงแล้ว - รับมารันใหม่
+        """
+        db = self._session()
+        try:
+            now = datetime.now()
+            run = JobRun(
+                job_name=job.name, scheduled_for=scheduled_for, status="running",
+                runner=runner_id(), started_at=now, heartbeat_at=now,
+            )
+            db.add(run)
+            try:
+                db.flush()
+                run_id = run.id
+                db.commit()
+                return run_id
+            except IntegrityError:
+                db.rollback()
+            row = db.query(JobRun).filter(
+                JobRun.job_name == job.name, JobRun.scheduled_for == scheduled_for,
+            ).first()
+            if row is None or not self._takeover(job, row, retry, now):
+                return None
+            if row.status == "running":
+                logger.warning(
+                    "Job %s for %s: taking over run of %s (last heartbeat %s)",
+                    job.name, scheduled_for, row.runner, row.heartbeat_at,
+                )
+            # compare-and-set: leader / --run สองตัวรับแถวเดียวกันพร้อมกัน ได้ตัวเดียว
+            beat = JobRun.heartbeat_at.is_(None) if row.heartbeat_at is None else JobRun.heartbeat_at == row.heartbeat_at
+            claimed = db.execute(
+                update(JobRun).where(
+                    JobRun.id == row.id, JobRun.status == row.status, JobRun.started_at == row.started_at, beat,
+                ).values(
+                    status="running", runner=runner_id(), started_at=now, heartbeat_at=now,
+                    finished_at=None, duration_ms=None, error=None,
+                )
+            ).rowcount
+            db.commit()
+            return row.id if claimed else None
+        finally:
+            db.close()
+
+    def _takeover(self, job: Job, row: JobRun, retry: bool, now: datetime) -> bool:
+        grace = timedelta(seconds=STALE_BEATS * self.heartbeat)
+        gone = row.heartbeat_at is None or row.heartbeat_at < now - grace
+        if row.status == "running":
+            return gone or row.started_at < now - timedelta(seconds=job.timeout) - grace
+        return retry and row.status in ("failed", "timeout") and gone
+
+    def _finish(self, run_id: int, status: str, duration_ms: int, error: Optional[str], done: bool = True) -> None:
+        """บันทึกผลรอบ - done=False (thread ยังรันหลัง timeout) เก็บ heartbeat ไว้ กันรันซ้ำจนกว่าจะจบจริง"""
+        values = dict(status=status, finished_at=datetime.now(), duration_ms=duration_ms, error=error)
+        if done:
+            values["heartbeat_at"] = None
+        db = self._session()
+        try:
+            db.execute(update(JobRun).where(JobRun.id == run_id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    def run_once(self, name: str, scheduled_for: Optional[datetime] = None) -> Optional[str]:
+        """รันงานเดียวทันทีนอก loop (script / ซ่อมรอบที่ failed) - ไม่ต้องเป็น leader แต่ยังกันรอบซ้ำด้วย job_runs"""
+        job = self.jobs[name]
+        scheduled_for = scheduled_for or job.last_due(self.clock())
+
+        async def main():
+            return await self._launch(job, scheduled_for, retry=True)
+
+        return asyncio.run(main())
+
+    # ---------- loop / thread ----------
+
+    async def run(self) -> None:
+        """loop หลักจนกว่าจะ stop() - tick ทุก tick_seconds"""
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        try:
+            while not self._stopped.is_set():
+                self.tick()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.tick_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            if self._tasks:
+                await asyncio.wait(self._tasks, timeout=STOP_GRACE)
+        finally:
+            self.lock.release()
+            self.leader = False
+
+    def start(self) -> None:
+        """รันใน daemon thread ของตัวเอง (event loop แยกจาก request)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), name="job-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = STOP_GRACE + 5) -> None:
+        """หยุด loop รองานที่ค้าง (ไม่เกิน STOP_GRACE) แล้วปล่อยล็อกให้ worker อื่น"""
+        self._stopped.set()
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # loop ปิดไปแล้ว
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -19,6 +19,7 @@ from app.config import (
     KBANK_CONSUMER_SECRET,
     KBANK_OAUTH_TOKEN_URL,
 )
+from app.services import metrics
 
 # Cache ในหน่วย process (token, expiry timestamp)
 _cached_token: Optional[str] = None
@@ -67,7 +68,7 @@ def get_access_token(
     data = {"grant_type": "client_credentials"}
 
     logger.info("K Bank API call: oauth/token POST %s", url)
-    with httpx.Client(timeout=15.0) as client:
+    with metrics.gateway_timer("kbank"), httpx.Client(timeout=15.0) as client:
         resp = client.post(url, headers=headers, data=data)
     logger.info("K Bank API response: oauth/token status=%s", resp.status_code)
 
@@ -0,0 +1,138 @@
+"""
+Locale Context Service - resolve ภาษา/หน่วยเงินต่อร้าน + labels bundle ต่อภาษา แล้ว cache ไว้
+- LocaleContext ต่อ store_id: StoreLocaleSetting ของร้าน ถ้าไม่มีใช้ AppSetting (ค่าทั่วไป)
+- LabelsBundle ต่อ locale: labels จาก program_settings ทำเป็น JSON + gzip ไว้ล่วงหน้า พร้อม ETag
+  หน้าเว็บโหลดคำแปลครั้งเดียวจาก URL ที่มี version (browser cache ได้)
+cache ผูกกับ settings_cache: invalidate_db_settings() (เรียกจาก update_locale_settings / program_settings)
+ล้างทุก worker
+"""
+import gzip
+import hashlib
+import json
+import threading
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from app.services import settings_cache
+from app.utils.i18n import project_labels
+
+DEFAULT_LOCALE = "th"
+
+
+class LocaleContext(NamedTuple):
+    locale: str
+    currency_code: str
+    currency_symbol: str
+    currency_name: str
+
+
+class LabelsBundle(NamedTuple):
+    """labels ของ locale หนึ่ง พร้อม body JSON / gzip ที่สร้างไว้แล้ว"""
+    locale: str
+    labels: Dict[str, str]
+    version: str
+    body: bytes
+    body_gzip: bytes
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+
+class _LocaleCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.contexts: Dict[Optional[int], LocaleContext] = {}
+        self.bundles: Optional[Dict[str, LabelsBundle]] = None
+
+    def clear(self) -> None:
+        with self.lock:
+            self.contexts = {}
+            self.bundles = None
+
+
+_cache = _LocaleCache()
+settings_cache.register_db_cache(_cache.clear)
+
+
+def _global_context(db: Session) -> LocaleContext:
+    return LocaleContext(
+        settings_cache.get_app_setting(db, "locale") or DEFAULT_LOCALE,
+        settings_cache.get_app_setting(db, "currency_code") or "THB",
+        settings_cache.get_app_setting(db, "currency_symbol") or "฿",
+        settings_cache.get_app_setting(db, "currency_name") or "Baht",
+    )
+
+
+def get_locale_context(db: Session, store_id: Optional[int] = None) -> LocaleContext:
+    """ภาษา/หน่วยเงินของร้าน (store_id=None = ค่าทั่วไป)"""
+    settings_cache.ensure_db_settings_fresh()
+    ctx = _cache.contexts.get(store_id)
+    if ctx is not None:
+        return ctx
+    values = settings_cache.get_store_locale_values(db, store_id) if store_id else None
+    ctx = LocaleContext(*values) if values else _global_context(db)
+    _cache.contexts[store_id] = ctx
+    return ctx
+
+
+def get_store_locale(db: Session, store_id: Optional[int], default: str = DEFAULT_LOCALE) -> str:
+    """ภาษาที่ร้านตั้งไว้ (ไม่ดูค่าทั่วไป) - ใช้กับเมนู/ชื่อร้าน"""
+    if not store_id:
+        return default
+    values = settings_cache.get_store_locale_values(db, store_id)
+    return values.locale if values else default
+
+
+def _build_bundle(locale: str, labels: Dict[str, str]) -> LabelsBundle:
+    labels_json = json.dumps(labels, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    version = hashlib.sha1(f"{locale}:{labels_json}".encode("utf-8")).hexdigest()[:16]
+    body = json.dumps(
+        {"locale": locale, "version": version, "translations": labels},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return LabelsBundle(locale, labels, version, body, gzip.compress(body, compresslevel=9, mtime=0))
+
+
+def _load_bundles(db: Session) -> Optional[Dict[str, LabelsBundle]]:
+    """bundle ทุก locale จาก program_settings (None = อ่านตารางไม่ได้ เช่นยังไม่มีตาราง)"""
+    from app.models import ProgramSetting
+
+    try:
+        rows = db.query(ProgramSetting).all()
+    except (OperationalError, ProgrammingError):
+        return None
+    projections = project_labels(rows)
+    return {loc: _build_bundle(loc, labels) for loc, labels in projections.items()}
+
+
+def _fallback_bundles() -> Dict[str, LabelsBundle]:
+    return {loc: _build_bundle(loc, labels) for loc, labels in project_labels([]).items()}
+
+
+def get_labels_bundle(db: Session, locale: str) -> LabelsBundle:
+    """labels bundle ของ locale (locale ที่ไม่รองรับใช้ fallback เดียวกับ en)"""
+    settings_cache.ensure_db_settings_fresh()
+    bundles = _cache.bundles
+    if bundles is None:
+        with _cache.lock:
+            bundles = _cache.bundles
+            if bundles is None:
+                bundles = _load_bundles(db)
+                if bundles is not None:
+                    _cache.bundles = bundles
+    if bundles is None:
+        # อ่าน DB ไม่ได้: ตอบ fallback เฉพาะ request นี้ ไม่ cache (ครั้งหน้าลองอ่านใหม่)
+        bundles = _fallback_bundles()
+    bundle = bundles.get(locale)
+    if bundle is None:
+        bundle = bundles["en"]
+    return bundle
+
+
+def invalidate_locale_cache() -> None:
+    """เรียกหลังแก้ AppSetting / StoreLocaleSetting / ProgramSetting (กระจายไปทุก worker)"""
+    settings_cache.invalidate_db_settings()
@@ -0,0 +1,307 @@
+"""
+Member Summary - ข้อมูลหน้า dashboard สมาชิกเก็บไว้ในแถวเดียว (member_summaries) อ่านด้วย primary key
+- คำนวณใหม่ตอน commit ของ transaction ที่แก้ยอดเงิน / e-coupon / กิจกรรม / voucher ของลูกค้าคนนั้น
+  เฉพาะส่วนที่ถูกแก้ (balance / coupons / vouchers / activities) - transaction ที่ไม่แตะข้อมูลเหล่านี้ไม่ query เพิ่ม
+  * ORM (db.add MemberActivity, ECoupon, CustomerBalance, MemberVoucher ฯลฯ) ตรวจเจอเองจาก before_flush
+    (แถวที่แก้แต่คอลัมน์ที่ไม่อยู่ใน summary เช่น CustomerBalance.last_reset_date ไม่นับ)
+  * UPDATE/INSERT ระดับ Core (wallet_ledger, ecoupon_redemption, ecoupon_codes) เรียก touch() ก่อนแก้
+  * wallet_ledger ส่งยอดหลังแก้มาด้วย set_balance() - commit แค่ UPDATE balance ไม่ต้องอ่านใหม่
+- กันเขียนยอดเก่าทับเมื่อแก้ลูกค้าคนเดียวกันพร้อมกัน: touch ล็อกแถว summary (INSERT ก่อนแล้ว SELECT ... FOR UPDATE) ก่อนแก้ข้อมูล
+  (ลำดับล็อก summary -> ข้อมูล เหมือนกันทุกทาง จึงไม่ deadlock) และตอน commit อ่านด้วย locking read
+  ซึ่งเห็นข้อมูลล่าสุดที่ commit แล้ว (ไม่ใช่ snapshot ของ REPEATABLE READ)
+  ทำใน transaction เดียวกับการแก้ไข จึงไม่มีช่วงที่ summary ไม่ตรงกับข้อมูลจริง
+- โปรโมชั่นร้าน (เหมือนกันทุกคน) cache ต่อ worker ใน channel "promotions" ของ settings_cache
+  (แก้ StorePromotion แล้วล้างทุก worker โดยไม่ล้าง cache ค่าตั้งค่า)
+เวลาโหลด dashboard จึงไม่ขึ้นกับจำนวนคูปอง/ประวัติของสมาชิก
+"""
+import json
+import threading
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.models import (
+    CustomerBalance,
+    ECoupon,
+    MemberActivity,
+    MemberSummary,
+    MemberVoucher,
+    StorePromotion,
+    VoucherDefinition,
+)
+from app.services import settings_cache
+
+RECENT_ACTIVITY_LIMIT = 20
+PROMOTION_LIMIT = 20
+
+PARTS = ("balance", "coupons", "vouchers", "activities")
+
+_DIRTY_KEY = "member_summary_dirty"  # customer_id -> ส่วนที่ต้องคำนวณใหม่
+_BALANCE_KEY = "member_summary_balance"  # customer_id -> ยอดกระเป๋าหลังแก้ (จาก wallet_ledger)
+_LOCKED_KEY = "member_summary_locked"
+_PROMOTIONS_KEY = "member_summary_promotions_changed"
+# model -> (ส่วนของ summary, คอลัมน์ที่มีผล - None = ทุกคอลัมน์)
+_CUSTOMER_MODELS = {
+    CustomerBalance: ("balance", ("balance",)),
+    ECoupon: ("coupons", ("amount", "status", "customer_id")),
+    MemberVoucher: ("vouchers", ("used_at", "voucher_definition_id", "customer_id")),
+    MemberActivity: ("activities", None),
+}
+
+
+def _lock(db: Session, customer_id: int) -> None:
+    """ล็อกแถว summary ของลูกค้า (ครั้งแรกใน transaction) - ยังไม่มีแถวสร้างก่อนแล้วคำนวณทุกส่วนตอน commit"""
+    locked: Set[int] = db.info.setdefault(_LOCKED_KEY, set())
+    if customer_id in locked:
+        return
+    locked.add(customer_id)
+    # INSERT ก่อน SELECT ... FOR UPDATE: ถ้า SELECT แถวที่ยังไม่มีก่อน สอง transaction จะถือ gap lock
+    # ที่ key เดียวกันแล้วต่างรอ INSERT ของอีกฝั่ง (deadlock 1213)
+    # MySQL ใช้ ON DUPLICATE KEY UPDATE ให้ได้ X lock ทันที (INSERT IGNORE ได้แค่ S lock แล้วต้องอัปเกรด = deadlock อีกแบบ)
+    table = MemberSummary.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(table).values(customer_id=customer_id)
+        db.execute(stmt.on_duplicate_key_update(customer_id=table.c.customer_id))
+    else:
+        db.execute(
+            insert(table).values(customer_id=customer_id)
+            .prefix_with("OR IGNORE", dialect="sqlite")
+        )
+    # rowcount ของ ON DUPLICATE KEY UPDATE แยกแถวใหม่ไม่ได้ (SQLAlchemy เปิด CLIENT_FOUND_ROWS: ได้ 1 ทั้งสองกรณี)
+    # แถวใหม่ดูจากคอลัมน์ที่ refresh ทุกส่วนต้องเขียนเสมอ
+    created = db.execute(
+        select(MemberSummary.recent_activities_json.is_(None))
+        .where(MemberSummary.customer_id == customer_id)
+        .with_for_update()
+    ).scalar()
+    if created:
+        db.info.setdefault(_DIRTY_KEY, {}).setdefault(customer_id, set()).update(PARTS)
+
+
+def touch(db: Session, customer_id: Optional[int], *parts: str) -> None:
+    """
+    เรียกก่อนแก้ข้อมูลของลูกค้าด้วย Core UPDATE/INSERT: ล็อกแถว summary แล้วให้คำนวณ parts ใหม่ตอน commit
+    (ไม่ใส่ parts = ล็อกอย่างเดียว เช่น wallet_ledger ที่ส่งยอดมาทาง set_balance)
+    """
+    if not customer_id:
+        return
+    _lock(db, customer_id)
+    if parts:
+        db.info.setdefault(_DIRTY_KEY, {}).setdefault(customer_id, set()).update(parts)
+
+
+def set_balance(db: Session, customer_id: int, balance: float) -> None:
+    """ยอดกระเป๋าหลังแก้ใน transaction นี้ (ต้อง touch ก่อน) - เขียนลง summary ตอน commit โดยไม่อ่านใหม่"""
+    db.info.setdefault(_BALANCE_KEY, {})[customer_id] = balance
+
+
+def _vouchers(db: Session, customer_id: int) -> List[dict]:
+    rows = db.execute(
+        select(MemberVoucher.id, VoucherDefinition.name, VoucherDefinition.value, VoucherDefinition.valid_to)
+        .join(VoucherDefinition, MemberVoucher.voucher_definition_id == VoucherDefinition.id)
+        .where(
+            MemberVoucher.customer_id == customer_id,
+            MemberVoucher.used_at.is_(None),
+            VoucherDefinition.is_active == True,
+        )
+        .with_for_update(read=True)
+    ).all()
+    return [
+        {"id": r.id, "name": r.name, "value": r.value, "valid_to": r.valid_to.isoformat() if r.valid_to else None}
+        for r in rows
+    ]
+
+
+def _recent_activities(db: Session, customer_id: int) -> List[dict]:
+    rows = db.execute(
+        select(
+            MemberActivity.id,
+            MemberActivity.activity_type,
+            MemberActivity.amount,
+            MemberActivity.description,
+            MemberActivity.created_at,
+        )
+        .where(MemberActivity.customer_id == customer_id)
+        .order_by(MemberActivity.id.desc())
+        .limit(RECENT_ACTIVITY_LIMIT)
+        .with_for_update(read=True)
+    ).all()
+    return [
+        {
+            "id": a.id,
+            "type": a.activity_type,
+            "amount": a.amount,
+            "description": a.description,
+            "created_at": a.created_at.isoformat() if a.created_at else None,
+        }
+        for a in rows
+    ]
+
+
+def refresh(
+    db: Session, customer_id: int, parts: Iterable[str] = PARTS, balance: Optional[float] = None,
+) -> None:
+    """
+    คำนวณส่วนที่ระบุของ summary จากข้อมูลจริงแล้วเขียนลงแถว (ไม่ commit) - ต้อง touch ล็อกแถวไว้ก่อน
+    balance: ยอดที่รู้แล้ว (ใช้เมื่อไม่ได้ขอคำนวณ "balance")
+    """
+    parts = set(parts)
+    values = {}
+    if "balance" in parts:
+        balance = db.execute(
+            select(CustomerBalance.balance)
+            .where(CustomerBalance.customer_id == customer_id)
+            .order_by(CustomerBalance.id.asc())
+            .limit(1)
+            .with_for_update(read=True)
+        ).scalar() or 0
+    if balance is not None:
+        values["balance"] = float(balance)
+    if "coupons" in parts:
+        e_coupon_balance = db.execute(
+            select(func.coalesce(func.sum(ECoupon.amount), 0)).where(
+                ECoupon.customer_id == customer_id,
+                ECoupon.status == "assigned",
+            ).with_for_update(read=True)
+        ).scalar()
+        values["e_coupon_balance"] = float(e_coupon_balance or 0)
+    if "vouchers" in parts:
+        vouchers = _vouchers(db, customer_id)
+        values["voucher_count"] = len(vouchers)
+        values["vouchers_json"] = json.dumps(vouchers, ensure_ascii=False)
+    if "activities" in parts:
+        values["recent_activities_json"] = json.dumps(_recent_activities(db, customer_id), ensure_ascii=False)
+    if values:
+        db.execute(update(MemberSummary).where(MemberSummary.customer_id == customer_id).values(**values))
+
+
+def get_summary(db: Session, customer_id: int) -> MemberSummary:
+    """summary ของลูกค้า (ยังไม่มีแถว = สร้างครั้งแรก)"""
+    summary = db.get(MemberSummary, customer_id)
+    if summary is None:
+        touch(db, customer_id)
+        db.commit()
+        summary = db.get(MemberSummary, customer_id)
+    return summary
+
+
+def summary_vouchers(summary: MemberSummary) -> List[dict]:
+    return json.loads(summary.vouchers_json) if summary.vouchers_json else []
+
+
+def summary_activities(summary: MemberSummary) -> List[dict]:
+    return json.loads(summary.recent_activities_json) if summary.recent_activities_json else []
+
+
+# ---------- โปรโมชั่นร้าน (ใช้ร่วมกันทุกสมาชิก) ----------
+
+class _PromotionsCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value: Optional[List[dict]] = None
+
+    def clear(self) -> None:
+        with self.lock:
+            self.value = None
+
+
+PROMOTIONS_CHANNEL = "promotions"
+
+_promotions = _PromotionsCache()
+settings_cache.register_db_cache(_promotions.clear, channel=PROMOTIONS_CHANNEL)
+
+
+def get_active_promotions(db: Session) -> List[dict]:
+    """โปรโมชั่นร้านที่เปิดอยู่ (cache ต่อ worker) - อย่าแก้ list ที่คืนไป"""
+    settings_cache.ensure_fresh(PROMOTIONS_CHANNEL)
+    value = _promotions.value
+    if value is None:
+        rows = db.execute(
+            select(
+                StorePromotion.id,
+                StorePromotion.store_id,
+                StorePromotion.title,
+                StorePromotion.description,
+                StorePromotion.valid_to,
+            )
+            .where(StorePromotion.is_active == True)
+            .limit(PROMOTION_LIMIT)
+        ).all()
+        value = [
+            {
+                "id": p.id,
+                "store_id": p.store_id,
+                "title": p.title,
+                "description": p.description,
+                "valid_to": p.valid_to.isoformat() if p.valid_to else None,
+            }
+            for p in rows
+        ]
+        _promotions.value = value
+    return value
+
+
+# ---------- Session hooks ----------
+
+def _voucher_holders(session: Session, definition_id: int) -> List[int]:
+    return list(session.execute(
+        select(MemberVoucher.customer_id).where(MemberVoucher.voucher_definition_id == definition_id).distinct()
+    ).scalars())
+
+
+def _changed(session: Session, obj, columns: Optional[Iterable[str]]) -> bool:
+    if obj in session.new or obj in session.deleted:
+        return True
+    if columns is None:
+        return session.is_modified(obj)
+    state = inspect(obj)
+    return any(state.attrs[c].history.has_changes() for c in columns)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changes(session: Session, flush_context, instances) -> None:
+    changes: Dict[int, Set[str]] = {}
+    for obj in chain(session.new, session.dirty, session.deleted):
+        watched = _CUSTOMER_MODELS.get(type(obj))
+        if watched is not None:
+            part, columns = watched
+            if obj.customer_id and _changed(session, obj, columns):
+                changes.setdefault(obj.customer_id, set()).add(part)
+        elif isinstance(obj, VoucherDefinition):
+            if obj.id is not None and _changed(session, obj, None):
+                for customer_id in _voucher_holders(session, obj.id):
+                    changes.setdefault(customer_id, set()).add("vouchers")
+        elif isinstance(obj, StorePromotion):
+            session.info[_PROMOTIONS_KEY] = True
+    for customer_id in sorted(changes):  # ล็อกก่อน flush เขียนแถว เรียงตาม id กัน deadlock
+        touch(session, customer_id, *changes[customer_id])
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_dirty(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # savepoint: รอ commit ของ transaction หลัก
+    session.flush()
+    dirty: Dict[int, Set[str]] = session.info.pop(_DIRTY_KEY, None) or {}
+    balances: Dict[int, float] = session.info.pop(_BALANCE_KEY, None) or {}
+    session.info.pop(_LOCKED_KEY, None)
+    for customer_id in sorted(set(dirty) | set(balances)):
+        refresh(session, customer_id, dirty.get(customer_id, ()), balances.get(customer_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.info.pop(_PROMOTIONS_KEY, False):
+        settings_cache.invalidate(PROMOTIONS_CHANNEL)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        for key in (_DIRTY_KEY, _BALANCE_KEY, _LOCKED_KEY, _PROMOTIONS_KEY):
+            session.info.pop(key, None)
@@ -0,0 +1,163 @@
+"""
+Metrics - ตัวชี้วัดรูปแบบ Prometheus ที่ /metrics (prometheus_client)
+- HTTP: latency histogram ต่อ route (path template), จำนวน request ต่อ status, request ที่กำลังทำ (in-flight)
+- DB: เวลารอ checkout connection จาก pool, connection ที่ถูกยืมอยู่ / ความจุ pool (utilization = checked_out / capacity)
+  query / เวลา DB / request ที่สงสัย N+1 ต่อ route (จาก query_stats)
+- Gateway: latency ต่อ provider (stripe, omise, scb, kbank, blockchain) แยก ok / error
+- Webhook: ingestion lag = เวลารับ - paid_at ที่ธนาคาร/gateway แจ้ง
+- Subscribers: จอ signage / store-pos ที่ poll ภายใน SUBSCRIBER_WINDOW วินาที
+หลาย worker (gunicorn): ตั้ง PROMETHEUS_MULTIPROC_DIR ก่อน import (gunicorn_config ตั้งให้) ค่าของทุก worker
+เขียนลงไฟล์ mmap ในโฟลเดอร์นั้น แล้ว /metrics รวมทุก worker ด้วย MultiProcessCollector
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+SUBSCRIBER_WINDOW = 60  # วินาที - poll ล่าสุดภายในช่วงนี้นับเป็นผู้ติดตามที่ยังอยู่
+UNMATCHED_ROUTE = "<other>"  # path ที่ไม่ตรง route (404 / static) รวมเป็นป้ายเดียว ไม่ให้ label บาน
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+LAG_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "เวลาตอบ request ต่อ route", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS = Counter("http_requests", "จำนวน request ต่อ route และ status", ["method", "route", "status"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "request ที่กำลังทำ", multiprocess_mode="livesum")
+
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "เวลารอ connection จาก pool", ["engine"], buckets=WAIT_BUCKETS
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "connection ที่ถูกยืมอยู่", ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity", "pool_size + max_overflow", ["engine"], multiprocess_mode="livesum"
+)
+DB_QUERIES = Counter("db_queries", "จำนวน query ต่อ route", ["method", "route"])
+DB_QUERY_SECONDS = Counter("db_query_seconds", "เวลา DB รวมต่อ route", ["method", "route"])
+DB_N_PLUS_ONE = Counter("db_n_plus_one_requests", "request ที่มี statement ซ้ำจนสงสัย N+1", ["method", "route"])
+
+GATEWAY_LATENCY = Histogram(
+    "gateway_request_duration_seconds", "เวลาเรียก payment gateway", ["provider", "outcome"], buckets=LATENCY_BUCKETS
+)
+WEBHOOK_LAG = Histogram(
+    "webhook_ingestion_lag_seconds", "เวลารับ webhook - paid_at", ["gateway"], buckets=LAG_BUCKETS
+)
+SUBSCRIBER_POLLS = Counter("subscriber_polls", "จำนวน poll ของจอ signage / store-pos", ["kind"])
+SUBSCRIBERS = Gauge(
+    "subscribers_active", "ร้านที่จอ poll ภายใน SUBSCRIBER_WINDOW วินาที (ค่าสูงสุดของ worker)",
+    ["kind"], multiprocess_mode="livemax",
+)
+
+
+def render() -> bytes:
+    """ข้อความ Prometheus ของทุก worker (multiprocess) หรือ process นี้"""
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+# ---------- HTTP / DB ----------
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    HTTP_LATENCY.labels(method, route).observe(seconds)
+    HTTP_REQUESTS.labels(method, route, str(status)).inc()
+
+
+def observe_queries(method: str, route: str, stats) -> None:
+    """สถิติ query ของ request หนึ่ง (query_stats.QueryStats)"""
+    if stats.count:
+        DB_QUERIES.labels(method, route).inc(stats.count)
+        DB_QUERY_SECONDS.labels(method, route).inc(stats.total_ms / 1000)
+    if stats.repeated():
+        DB_N_PLUS_ONE.labels(method, route).inc()
+
+
+class _TimedCheckout:
+    """วัดเวลารอใน pool._do_get (รวมเวลาเปิด connection ใหม่เมื่อ pool ยังไม่เต็ม)"""
+    metrics_engine = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self.metrics_engine).observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics_engine = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_engine = "async"
+
+
+def instrument_pool(engine, name: str, capacity: int) -> None:
+    """นับ connection ที่ถูกยืม (checkout / checkin) ของ engine - async ส่ง engine.sync_engine"""
+    DB_POOL_CAPACITY.labels(name).set(capacity)
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+    event.listen(engine, "checkout", lambda *args: checked_out.inc())
+    event.listen(engine, "checkin", lambda *args: checked_out.dec())
+
+
+# ---------- gateway / webhook ----------
+
+@contextmanager
+def gateway_timer(provider: str) -> Iterator[None]:
+    """with gateway_timer("stripe"): ... - exception (timeout / ต่อไม่ได้) = outcome error, HTTP status ใดก็ตาม = ok"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        GATEWAY_LATENCY.labels(provider, outcome).observe(time.perf_counter() - start)
+
+
+def observe_webhook_lag(gateway: Optional[str], paid_at: datetime) -> None:
+    """paid_at ไม่มี timezone ถือเป็น UTC (เหมือนค่าเริ่มต้นของ back transaction)"""
+    if paid_at.tzinfo is None:
+        paid_at = paid_at.replace(tzinfo=timezone.utc)
+    lag = (datetime.now(timezone.utc) - paid_at).total_seconds()
+    WEBHOOK_LAG.labels(gateway or "unknown").observe(max(lag, 0.0))
+
+
+# ---------- subscribers ----------
+
+_subscribers_lock = threading.Lock()
+_subscribers: Dict[str, Dict[int, float]] = {}
+
+
+def touch_subscriber(kind: str, key: int, now: Optional[float] = None) -> None:
+    """จอ (signage / pos) ของร้าน key เพิ่ง poll - นับร้านที่ poll ภายใน SUBSCRIBER_WINDOW วินาที"""
+    now = time.monotonic() if now is None else now
+    with _subscribers_lock:
+        seen = _subscribers.setdefault(kind, {})
+        seen[key] = now
+        cutoff = now - SUBSCRIBER_WINDOW
+        for stale in [k for k, t in seen.items() if t < cutoff]:
+            del seen[stale]
+        active = len(seen)
+    SUBSCRIBER_POLLS.labels(kind).inc()
+    SUBSCRIBERS.labels(kind).set(active)
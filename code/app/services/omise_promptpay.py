@@ -12,6 +12,8 @@ from typing import Any, Dict, Optional
 
 import httpx
 
+from app.services import metrics
+
 logger = logging.getLogger(__name__)
 OMISE_API = "https://api.omise.co"
 
@@ -40,7 +42,7 @@ def create_charge_promptpay(
             data[f"metadata[{k}]"] = str(v)
 
     logger.info("Omise API: POST /charges amount=%s satang", amount_satang)
-    with httpx.Client(timeout=15.0) as client:
+    with metrics.gateway_timer("omise"), httpx.Client(timeout=15.0) as client:
         resp = client.post(url, headers=headers, data=data)
     logger.info("Omise API response: charges status=%s", resp.status_code)
 
@@ -66,7 +68,7 @@ def get_charge(secret_key: str, charge_id: str) -> Dict[str, Any]:
     url = f"{OMISE_API}/charges/{charge_id}"
     auth = base64.b64encode(f"{secret_key}:".encode()).decode()
     headers = {"Authorization": f"Basic {auth}"}
-    with httpx.Client(timeout=10.0) as client:
+    with metrics.gateway_timer("omise"), httpx.Client(timeout=10.0) as client:
         resp = client.get(url, headers=headers)
     if resp.status_code != 200:
         raise ValueError(f"Omise get charge failed: {resp.status_code}")
@@ -102,7 +104,7 @@ def create_charge_card(
         data["return_uri"] = return_uri
 
     logger.info("Omise API: POST /charges (card) amount=%s satang", amount_satang)
-    with httpx.Client(timeout=15.0) as client:
+    with metrics.gateway_timer("omise"), httpx.Client(timeout=15.0) as client:
         resp = client.post(url, headers=headers, data=data)
     logger.info("Omise API response: charges status=%s", resp.status_code)
 
@@ -2,19 +2,27 @@
 Payment Hub Service - ระบบจัดการการชำระเงินหลายรูปแบบ
 """
 from typing import Dict, Any, Optional, List
+from sqlalchemy import case, select, update
 from sqlalchemy.orm import Session
 from app.models import (
     PaymentMethod, FoodCourtID, CounterTransaction, StoreTransaction,
     Customer, CustomerBalance, Transaction, TransactionStatus
 )
+from app.services import document_numbers
 from datetime import datetime
-import uuid
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# ยอดคงเหลือต่ำกว่านี้ถือว่าใช้หมด (current_balance เป็น Float)
+BALANCE_EPSILON = 0.005
+
+
+class FoodCourtIDNotFound(ValueError):
+    """ไม่พบ Food Court ID (หรือไม่อยู่ในสถานะที่ใช้ได้)"""
+
 
 class PaymentHub:
     """Payment Hub สำหรับจัดการการชำระเงินหลายรูปแบบ"""
@@ -25,15 +33,9 @@ class PaymentHub:
     def generate_foodcourt_id(self) -> str:
         """
         สร้าง Food Court ID
-        รูปแบบ: FC-YYYYMMDD-XXXXX
+        รูปแบบ: FC-YYYYMMDD-XXXXX (ลำดับรายวันจาก document_numbers ไม่ต้องเช็คซ้ำ)
         """
-        now = datetime.now()
-        date_str = now.strftime("%Y%m%d")
-        
-        # สุ่มตัวเลข 5 หลัก
-        random_part = str(uuid.uuid4().int)[:5].zfill(5)
-        
-        return f"FC-{date_str}-{random_part}"
+        return document_numbers.next_foodcourt_id(self.db)
 
     def exchange_to_foodcourt_id(
         self,
@@ -47,49 +49,51 @@ class PaymentHub:
         """
         แลก Food Court ID ที่ Counter
         รองรับทั้งรูปแบบที่ 1 (เงินสดเท่านั้น) และรูปแบบที่ 2 (หลายรูปแบบ)
+        Food Court ID และ CounterTransaction commit พร้อมกันครั้งเดียว
         """
         # สร้าง Food Court ID
         foodcourt_id_str = self.generate_foodcourt_id()
-        
-        # ตรวจสอบว่า ID ไม่ซ้ำ
-        while self.db.query(FoodCourtID).filter(
-            FoodCourtID.foodcourt_id == foodcourt_id_str
-        ).first():
-            foodcourt_id_str = self.generate_foodcourt_id()
-
-        # สร้าง Food Court ID record
+
+        details_json = json.dumps(payment_details) if payment_details else None
         foodcourt_id = FoodCourtID(
             foodcourt_id=foodcourt_id_str,
             customer_id=customer_id,
             initial_amount=amount,
             current_balance=amount,
             payment_method=payment_method,
-            payment_details=json.dumps(payment_details) if payment_details else None,
+            payment_details=details_json,
             counter_id=counter_id,
             counter_user_id=counter_user_id,
             status="active"
         )
-        self.db.add(foodcourt_id)
-        self.db.commit()
-        self.db.refresh(foodcourt_id)
-
-        # บันทึก Counter Transaction
         counter_transaction = CounterTransaction(
             foodcourt_id=foodcourt_id_str,
             counter_id=counter_id or 0,
             counter_user_id=counter_user_id or 0,
             amount=amount,
             payment_method=payment_method,
-            payment_details=json.dumps(payment_details) if payment_details else None,
+            payment_details=details_json,
             status="completed"
         )
-        self.db.add(counter_transaction)
+        self.db.add_all([foodcourt_id, counter_transaction])
         self.db.commit()
+        self.db.refresh(foodcourt_id)
 
         logger.info(f"Marketplace ID created: {foodcourt_id_str}, Amount: {amount}, Method: {payment_method.value}")
 
         return foodcourt_id
 
+    def _raise_unavailable(self, foodcourt_id_str: str, amount: float) -> None:
+        """UPDATE แบบมีเงื่อนไขไม่โดนแถวไหน: แยกว่าไม่พบ / ไม่ active / ยอดไม่พอ"""
+        row = self.db.execute(
+            select(FoodCourtID.status, FoodCourtID.current_balance)
+            .where(FoodCourtID.foodcourt_id == foodcourt_id_str)
+        ).first()
+        self.db.rollback()
+        if row is None or row.status != "active":
+            raise FoodCourtIDNotFound("Food Court ID not found or inactive")
+        raise ValueError(f"Insufficient balance. Current balance: {row.current_balance}")
+
     def use_foodcourt_id(
         self,
         foodcourt_id_str: str,
@@ -98,63 +102,132 @@ class PaymentHub:
     ) -> Dict[str, Any]:
         """
         ใช้ Food Court ID ที่ร้านค้า (หักยอดเงิน)
+        หักด้วย UPDATE เดียว WHERE current_balance >= amount ให้ DB ตัดสิน (สองร้านหักบัตรเดียวกันพร้อมกันไม่ติดลบ)
+        ยอด + StoreTransaction + Transaction commit พร้อมกันครั้งเดียว
         """
-        foodcourt_id = self.db.query(FoodCourtID).filter(
-            FoodCourtID.foodcourt_id == foodcourt_id_str,
-            FoodCourtID.status == "active"
-        ).first()
+        if amount <= 0:
+            raise ValueError("Amount must be greater than 0")
 
-        if not foodcourt_id:
-            raise ValueError("Food Court ID not found or inactive")
-
-        if foodcourt_id.current_balance < amount:
-            raise ValueError(f"Insufficient balance. Current balance: {foodcourt_id.current_balance}")
-
-        # หักยอดเงิน
-        foodcourt_id.current_balance -= amount
-        foodcourt_id.updated_at = datetime.now()
-        
-        # ถ้ายอดเงินเหลือ 0 ให้เปลี่ยน status
-        if foodcourt_id.current_balance <= 0:
-            foodcourt_id.status = "used"
+        now = datetime.now()
+        # status ต้องมาก่อน current_balance: MySQL ประเมิน SET จากซ้ายไปขวาด้วยค่าที่อัปเดตแล้ว
+        result = self.db.execute(
+            update(FoodCourtID)
+            .where(
+                FoodCourtID.foodcourt_id == foodcourt_id_str,
+                FoodCourtID.status == "active",
+                FoodCourtID.current_balance >= amount,
+            )
+            .ordered_values(
+                (FoodCourtID.status, case(
+                    (FoodCourtID.current_balance - amount <= BALANCE_EPSILON, "used"),
+                    else_=FoodCourtID.status,
+                )),
+                (FoodCourtID.current_balance, FoodCourtID.current_balance - amount),
+                (FoodCourtID.updated_at, now),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            self._raise_unavailable(foodcourt_id_str, amount)
 
-        self.db.commit()
-        self.db.refresh(foodcourt_id)
+        # แถวถูก lock โดย UPDATE ข้างบนจนจบ transaction - ค่าที่อ่านตรงนี้คือค่าหลังหักของเรา
+        card = self.db.execute(
+            select(FoodCourtID.current_balance, FoodCourtID.customer_id, FoodCourtID.payment_method)
+            .where(FoodCourtID.foodcourt_id == foodcourt_id_str)
+        ).one()
 
-        # บันทึก Store Transaction
-        store_transaction = StoreTransaction(
+        self.db.add(StoreTransaction(
             foodcourt_id=foodcourt_id_str,
             store_id=store_id,
             amount=amount,
             status="completed"
-        )
-        self.db.add(store_transaction)
-        self.db.commit()
+        ))
 
         # สร้าง Transaction record (ถ้ามี customer_id)
         transaction = None
-        if foodcourt_id.customer_id:
+        if card.customer_id:
             transaction = Transaction(
-                customer_id=foodcourt_id.customer_id,
+                customer_id=card.customer_id,
                 store_id=store_id,
                 amount=amount,
-                payment_method=foodcourt_id.payment_method,
+                payment_method=card.payment_method,
                 status=TransactionStatus.CONFIRMED,
                 receipt_number=self._generate_receipt_number(),
                 foodcourt_id=foodcourt_id_str
             )
             self.db.add(transaction)
-            self.db.commit()
-            self.db.refresh(transaction)
+        self.db.commit()
 
         logger.info(f"Marketplace ID used: {foodcourt_id_str}, Store: {store_id}, Amount: {amount}")
 
         return {
             "foodcourt_id": foodcourt_id_str,
-            "remaining_balance": foodcourt_id.current_balance,
+            "remaining_balance": card.current_balance,
             "transaction_id": transaction.id if transaction else None
         }
 
+    def topup_foodcourt_id(
+        self,
+        foodcourt_id_str: str,
+        amount: float,
+        payment_method: PaymentMethod,
+        payment_details: Optional[Dict[str, Any]] = None,
+        counter_id: Optional[int] = None,
+        counter_user_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        เติมเงินให้ Food Court ID ที่ active ด้วย UPDATE current_balance = current_balance + amount
+        ยอด + CounterTransaction commit พร้อมกันครั้งเดียว
+        """
+        if amount <= 0:
+            raise ValueError("Amount must be greater than 0")
+
+        result = self.db.execute(
+            update(FoodCourtID)
+            .where(FoodCourtID.foodcourt_id == foodcourt_id_str, FoodCourtID.status == "active")
+            .values(
+                current_balance=FoodCourtID.current_balance + amount,
+                initial_amount=FoodCourtID.initial_amount + amount,
+                updated_at=datetime.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            status = self.db.execute(
+                select(FoodCourtID.status).where(FoodCourtID.foodcourt_id == foodcourt_id_str)
+            ).scalar()
+            self.db.rollback()
+            if status is None:
+                raise FoodCourtIDNotFound(f"Marketplace ID not found: {foodcourt_id_str}")
+            raise ValueError(f"Marketplace ID is not active (status: {status})")
+
+        new_balance = self.db.execute(
+            select(FoodCourtID.current_balance).where(FoodCourtID.foodcourt_id == foodcourt_id_str)
+        ).scalar_one()
+        counter_transaction = CounterTransaction(
+            foodcourt_id=foodcourt_id_str,
+            counter_id=counter_id or 0,
+            counter_user_id=counter_user_id or 0,
+            amount=amount,
+            payment_method=payment_method,
+            payment_details=json.dumps(payment_details) if payment_details else None,
+            status="completed"
+        )
+        self.db.add(counter_transaction)
+        self.db.commit()
+
+        logger.info(f"Marketplace ID topped up: {foodcourt_id_str}, Amount: {amount}, Method: {payment_method.value}")
+
+        return {
+            "foodcourt_id": foodcourt_id_str,
+            "topup_amount": amount,
+            "old_balance": new_balance - amount,
+            "new_balance": new_balance,
+            "payment_method": payment_method.value,
+            "transaction_id": counter_transaction.id,
+            "created_at": counter_transaction.created_at.isoformat() if counter_transaction.created_at else None
+        }
+
     def refund_remaining_balance(
         self,
         foodcourt_id_str: str,
@@ -163,26 +236,38 @@ class PaymentHub:
     ) -> Dict[str, Any]:
         """
         คืนเงินที่เหลือที่ Counter
+        ล็อกแถว (FOR UPDATE) แล้วปิดยอดด้วย UPDATE ที่เช็คยอดเดิม - ร้านหักพร้อมกันจะไม่ถูกคืนเงินซ้ำ
         """
-        foodcourt_id = self.db.query(FoodCourtID).filter(
-            FoodCourtID.foodcourt_id == foodcourt_id_str
+        card = self.db.execute(
+            select(FoodCourtID.status, FoodCourtID.current_balance, FoodCourtID.payment_method)
+            .where(FoodCourtID.foodcourt_id == foodcourt_id_str)
+            .with_for_update()
         ).first()
 
-        if not foodcourt_id:
-            raise ValueError("Food Court ID not found")
+        if not card:
+            raise FoodCourtIDNotFound("Food Court ID not found")
 
-        if foodcourt_id.status == "refunded":
+        if card.status == "refunded":
             raise ValueError("Food Court ID already refunded")
 
-        if foodcourt_id.current_balance <= 0:
+        if card.current_balance <= 0:
             raise ValueError("No balance to refund")
 
-        refund_amount = foodcourt_id.current_balance
+        refund_amount = card.current_balance
 
-        # อัพเดท status
-        foodcourt_id.status = "refunded"
-        foodcourt_id.current_balance = 0
-        foodcourt_id.updated_at = datetime.now()
+        result = self.db.execute(
+            update(FoodCourtID)
+            .where(
+                FoodCourtID.foodcourt_id == foodcourt_id_str,
+                FoodCourtID.status != "refunded",
+                FoodCourtID.current_balance == refund_amount,
+            )
+            .values(status="refunded", current_balance=0, updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            self.db.rollback()
+            raise ValueError("Food Court ID balance changed, please retry")
 
         self.db.commit()
 
@@ -191,7 +276,7 @@ class PaymentHub:
         return {
             "foodcourt_id": foodcourt_id_str,
             "refund_amount": refund_amount,
-            "original_payment_method": foodcourt_id.payment_method.value
+            "original_payment_method": card.payment_method.value
         }
 
     def get_foodcourt_id_balance(self, foodcourt_id_str: str) -> Optional[Dict[str, Any]]:
@@ -226,18 +311,9 @@ class PaymentHub:
     def _generate_receipt_number(self) -> str:
         """
         สร้างเลขที่ใบเสร็จ
+        รูปแบบ: RCP-YYYYMMDD-XXXXX
         """
-        now = datetime.now()
-        date_str = now.strftime("%Y%m%d")
-        
-        # นับจำนวน transactions ในวันนี้
-        today_start = datetime.combine(now.date(), datetime.min.time())
-        count = self.db.query(Transaction).filter(
-            Transaction.created_at >= today_start
-        ).count()
-        
-        sequence = str(count + 1).zfill(5)
-        return f"RCP-{date_str}-{sequence}"
+        return document_numbers.next_receipt_number(self.db)
 
     def get_payment_method_info(self, payment_method: PaymentMethod) -> Dict[str, Any]:
         """
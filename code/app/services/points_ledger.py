@@ -0,0 +1,208 @@
+"""
+Points Ledger Service - แต้มสะสมสมาชิก: สมุด member_points_ledger + ยอดรวม Customer.total_points + snapshot รายวัน
+- post: เพิ่ม/หักแต้มรายการเดียวด้วย UPDATE total_points = total_points +/- :x แล้วบันทึก ledger (balance_after = ยอดใหม่)
+- accrue_day: ให้แต้มจากยอดซื้อทั้งวันด้วย INSERT ... SELECT เดียว (transactions ที่ CONFIRMED ของสมาชิก)
+  balance_after คิดด้วย window SUM ต่อสมาชิก แล้วบวก total_points ด้วย UPDATE เดียว
+  unique (customer_id, reason, ref_id) กันให้แต้มซ้ำเมื่อรันวันเดิมซ้ำ
+- write_snapshots: ยอดสิ้นวันของสมาชิกที่มีความเคลื่อนไหววันนั้น - balance_at อ่าน snapshot ล่าสุด + ledger หลังจากนั้น
+- reconcile_total_points: ตั้ง total_points = SUM(points_delta) จาก ledger ทีเดียวทั้งตาราง (แก้ยอดที่เพี้ยน)
+- post_opening_balances: ยอดที่มีก่อนเริ่มใช้ ledger (ไม่มีแถวใน ledger) บันทึกเป็นแถว opening_balance ก่อน reconcile
+ไม่ commit เอง ผู้เรียก commit ครั้งเดียว
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, exists, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.config import POINTS_PER_BAHT
+from app.models import (
+    Customer,
+    MemberPointsLedger,
+    MemberPointsSnapshot,
+    Transaction,
+    TransactionStatus,
+)
+
+PURCHASE = "purchase"
+OPENING_BALANCE = "opening_balance"
+
+
+class InsufficientPoints(Exception):
+    """แต้มไม่พอหัก"""
+
+
+def _day_range(day: date):
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def post(
+    db: Session,
+    customer_id: int,
+    delta: float,
+    reason: str,
+    ref_id: Optional[int] = None,
+) -> float:
+    """เพิ่ม (delta > 0) หรือหัก (delta < 0) แต้ม คืนยอดใหม่ - Raises InsufficientPoints ถ้าหักเกินยอด"""
+    stmt = update(Customer).where(Customer.id == customer_id)
+    if delta < 0:
+        stmt = stmt.where(Customer.total_points >= -delta)
+    result = db.execute(
+        stmt.values(total_points=Customer.total_points + delta).execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise InsufficientPoints()
+    balance = db.execute(select(Customer.total_points).where(Customer.id == customer_id)).scalar_one()
+    db.execute(insert(MemberPointsLedger).values(
+        customer_id=customer_id,
+        points_delta=delta,
+        balance_after=balance,
+        reason=reason,
+        ref_id=ref_id,
+        created_at=datetime.now(),
+    ))
+    return float(balance)
+
+
+def accrue_day(db: Session, day: date, points_per_baht: float = POINTS_PER_BAHT) -> int:
+    """ให้แต้มจากยอดซื้อ (Transaction CONFIRMED) ของสมาชิกในวัน day คืนจำนวนรายการที่ให้แต้ม"""
+    start, end = _day_range(day)
+    points = func.floor(Transaction.amount * points_per_baht)
+    running = Customer.total_points + func.sum(points).over(
+        partition_by=Transaction.customer_id, order_by=Transaction.id
+    )
+    already = exists().where(
+        MemberPointsLedger.customer_id == Transaction.customer_id,
+        MemberPointsLedger.reason == PURCHASE,
+        MemberPointsLedger.ref_id == Transaction.id,
+    )
+    now = datetime.now()
+    source = (
+        select(Transaction.customer_id, points, running, literal(PURCHASE), Transaction.id, literal(now))
+        .join(Customer, Customer.id == Transaction.customer_id)
+        .where(
+            Transaction.status == TransactionStatus.CONFIRMED,
+            Transaction.created_at >= start,
+            Transaction.created_at < end,
+            Customer.username.isnot(None),  # สมาชิก (ไม่รวมลูกค้า guest ของ PromptPay / POS)
+            points > 0,
+            ~already,
+        )
+        .order_by(Transaction.id)
+    )
+    last_id = db.execute(select(func.coalesce(func.max(MemberPointsLedger.id), 0))).scalar()
+    result = db.execute(
+        insert(MemberPointsLedger).from_select(
+            ["customer_id", "points_delta", "balance_after", "reason", "ref_id", "created_at"], source
+        )
+    )
+    if result.rowcount:
+        new_rows = select(MemberPointsLedger.customer_id).where(
+            MemberPointsLedger.id > last_id, MemberPointsLedger.reason == PURCHASE
+        )
+        accrued = (
+            select(func.sum(MemberPointsLedger.points_delta))
+            .where(
+                MemberPointsLedger.customer_id == Customer.id,
+                MemberPointsLedger.id > last_id,
+                MemberPointsLedger.reason == PURCHASE,
+            )
+            .scalar_subquery()
+        )
+        db.execute(
+            update(Customer)
+            .where(Customer.id.in_(new_rows))
+            .values(total_points=Customer.total_points + accrued)
+            .execution_options(synchronize_session=False)
+        )
+    return result.rowcount
+
+
+def write_snapshots(db: Session, day: date) -> int:
+    """ยอดแต้มสิ้นวัน day ของสมาชิกที่มีรายการใน ledger วันนั้น (รันซ้ำได้ - เขียนทับ) คืนจำนวนแถว"""
+    start, end = _day_range(day)
+    last_ids = (
+        select(func.max(MemberPointsLedger.id))
+        .where(MemberPointsLedger.created_at >= start, MemberPointsLedger.created_at < end)
+        .group_by(MemberPointsLedger.customer_id)
+    )
+    db.execute(delete(MemberPointsSnapshot).where(MemberPointsSnapshot.snapshot_date == day))
+    result = db.execute(
+        insert(MemberPointsSnapshot).from_select(
+            ["snapshot_date", "customer_id", "balance", "ledger_id"],
+            select(
+                literal(day, MemberPointsSnapshot.snapshot_date.type),
+                MemberPointsLedger.customer_id,
+                MemberPointsLedger.balance_after,
+                MemberPointsLedger.id,
+            ).where(MemberPointsLedger.id.in_(last_ids)),
+        )
+    )
+    return result.rowcount
+
+
+def balance_at(db: Session, customer_id: int, at: datetime) -> float:
+    """ยอดแต้ม ณ เวลา at: snapshot ล่าสุดก่อนวันของ at + ledger หลัง snapshot นั้น (ไม่ไล่ ledger ทั้งหมด)"""
+    snap = db.execute(
+        select(MemberPointsSnapshot.balance, MemberPointsSnapshot.ledger_id)
+        .where(MemberPointsSnapshot.customer_id == customer_id, MemberPointsSnapshot.snapshot_date < at.date())
+        .order_by(MemberPointsSnapshot.snapshot_date.desc())
+        .limit(1)
+    ).first()
+    latest = db.execute(
+        select(MemberPointsLedger.balance_after)
+        .where(
+            MemberPointsLedger.customer_id == customer_id,
+            MemberPointsLedger.id > (snap.ledger_id if snap else 0),
+            MemberPointsLedger.created_at <= at,
+        )
+        .order_by(MemberPointsLedger.id.desc())
+        .limit(1)
+    ).scalar()
+    if latest is not None:
+        return float(latest)
+    return float(snap.balance) if snap else 0.0
+
+
+def _ledger_total():
+    return func.coalesce(
+        select(func.sum(MemberPointsLedger.points_delta))
+        .where(MemberPointsLedger.customer_id == Customer.id)
+        .scalar_subquery(),
+        0,
+    )
+
+
+def post_opening_balances(db: Session) -> int:
+    """
+    INSERT ... SELECT แถว opening_balance ให้ลูกค้าที่ total_points ไม่ตรงกับผลรวม ledger (ส่วนต่าง)
+    ใช้ตอนเริ่มใช้ ledger กับข้อมูลเดิม ไม่ให้ reconcile_total_points ล้างแต้มที่สะสมมาก่อน (รันซ้ำได้) คืนจำนวนลูกค้า
+    """
+    ledger_total = _ledger_total()
+    result = db.execute(
+        insert(MemberPointsLedger).from_select(
+            ["customer_id", "points_delta", "balance_after", "reason", "ref_id", "created_at"],
+            select(
+                Customer.id,
+                Customer.total_points - ledger_total,
+                Customer.total_points,
+                literal(OPENING_BALANCE),
+                literal(None),
+                literal(datetime.now()),
+            ).where(Customer.total_points != ledger_total),
+        )
+    )
+    return result.rowcount
+
+
+def reconcile_total_points(db: Session, customer_ids: Optional[Iterable[int]] = None) -> int:
+    """ตั้ง Customer.total_points = SUM(points_delta) จาก ledger (เฉพาะแถวที่ไม่ตรง) คืนจำนวนลูกค้าที่แก้"""
+    ledger_total = _ledger_total()
+    stmt = update(Customer).where(Customer.total_points != ledger_total)
+    if customer_ids is not None:
+        stmt = stmt.where(Customer.id.in_(list(customer_ids)))
+    result = db.execute(
+        stmt.values(total_points=ledger_total).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
@@ -0,0 +1,184 @@
+"""
+POS Journal - รับรายการที่ Store POS เก็บไว้ในเครื่องตอนออฟไลน์ แล้วส่งมาทีเดียวเมื่อเน็ตกลับมา
+- กันซ้ำด้วย (store_id, client_id) ที่เครื่อง POS สร้าง: เช็คทั้งชุดด้วย query เดียว รายการที่เคยรับแล้วตอบ duplicate พร้อม id เดิม
+- sale -> Order (paid) + Transaction (ลูกค้า guest ของ POS) + EmergencyBackupEntry
+  exchange / topup / other -> EmergencyBackupEntry อย่างเดียว (เหมือนกรอกที่หน้ารายการสำรอง)
+- ทุกแถวของชุดเพิ่มใน flush เดียวและ commit ครั้งเดียว ผลลัพธ์คืนทีละรายการตามลำดับที่ส่งมา
+"""
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Customer,
+    EmergencyBackupEntry,
+    Order,
+    PaymentMethod,
+    PosJournalEntry,
+    Transaction,
+    TransactionStatus,
+)
+from app.services import document_numbers
+
+ENTRY_TYPES = ("sale", "exchange", "topup", "other")
+MAX_ITEMS = 1000  # รายการต่อชุด
+LOOKUP_CHUNK = 500  # client_id ต่อ WHERE ... IN
+POS_GUEST_PHONE = "POS-GUEST"
+
+
+class JournalConflict(Exception):
+    """ชุดเดียวกันถูกส่งพร้อมกันจากอีก request (ให้ส่งใหม่ จะได้ผล duplicate)"""
+
+
+def validate_item(item) -> Optional[str]:
+    """ข้อความ error ของรายการ (None = ใช้ได้)"""
+    if not item.client_id or len(item.client_id) > 64:
+        return "client_id ต้องมี 1-64 ตัวอักษร"
+    if item.entry_type not in ENTRY_TYPES:
+        return "entry_type ต้องเป็น sale, exchange, topup หรือ other"
+    if item.amount < 0:
+        return "amount ต้องไม่ต่ำกว่า 0"
+    if item.entry_type == "sale":
+        if item.amount <= 0:
+            return "ยอดขายต้องมากกว่า 0"
+        try:
+            PaymentMethod(item.payment_method or PaymentMethod.CASH.value)
+        except ValueError:
+            return f"payment_method ไม่ถูกต้อง: {item.payment_method}"
+    return None
+
+
+def _pos_guest_customer_id(db: Session) -> int:
+    """ลูกค้า placeholder สำหรับ Transaction ที่ขายหน้าร้าน (ไม่มีลูกค้าจริง)"""
+    guest_id = db.execute(select(Customer.id).where(Customer.phone == POS_GUEST_PHONE)).scalar()
+    if guest_id is None:
+        guest = Customer(phone=POS_GUEST_PHONE, name="ลูกค้าหน้าร้าน (POS)")
+        db.add(guest)
+        db.flush()
+        guest_id = guest.id
+    return guest_id
+
+
+def _existing(db: Session, store_id: int, client_ids: List[str]) -> Dict[str, PosJournalEntry]:
+    out = {}
+    for i in range(0, len(client_ids), LOOKUP_CHUNK):
+        rows = db.execute(
+            select(PosJournalEntry).where(
+                PosJournalEntry.store_id == store_id,
+                PosJournalEntry.client_id.in_(client_ids[i:i + LOOKUP_CHUNK]),
+            )
+        ).scalars()
+        out.update((r.client_id, r) for r in rows)
+    return out
+
+
+def _result(client_id: str, status: str, order_id=None, transaction_id=None, backup_entry_id=None) -> dict:
+    return {
+        "client_id": client_id,
+        "status": status,
+        "order_id": order_id,
+        "transaction_id": transaction_id,
+        "backup_entry_id": backup_entry_id,
+    }
+
+
+def _insert(db: Session, store_id: int, fresh: List[tuple], user_id: int, results: List[Optional[dict]]) -> None:
+    """เพิ่ม backup / order / transaction ของรายการใหม่ใน flush เดียว แล้ว bulk insert journal (ไม่ commit)"""
+    now = datetime.now()
+    guest_id = None
+    created = []
+    for i, item in fresh:
+        at = item.occurred_at or now
+        backup = EmergencyBackupEntry(
+            source="store_pos",
+            store_id=store_id,
+            entry_type=item.entry_type,
+            amount=item.amount,
+            description=item.description or "",
+            entered_by_user_id=user_id,
+            created_at=at,
+        )
+        order = txn = None
+        if item.entry_type == "sale":
+            if guest_id is None:
+                guest_id = _pos_guest_customer_id(db)
+            order = Order(
+                store_id=store_id,
+                total_amount=item.amount,
+                status="paid",
+                items=json.dumps(item.order_lines or [], ensure_ascii=False),
+                created_at=at,
+                paid_at=at,
+            )
+            txn = Transaction(
+                customer_id=guest_id,
+                store_id=store_id,
+                amount=item.amount,
+                payment_method=PaymentMethod(item.payment_method or PaymentMethod.CASH.value),
+                status=TransactionStatus.CONFIRMED,
+                receipt_number=document_numbers.next_receipt_number(db, at),
+                created_at=at,
+            )
+        created.append((i, item, at, backup, order, txn))
+        db.add_all([obj for obj in (backup, order, txn) if obj is not None])
+    db.flush()
+
+    rows = []
+    for i, item, at, backup, order, txn in created:
+        results[i] = _result(
+            item.client_id, "created", order.id if order else None, txn.id if txn else None, backup.id
+        )
+        rows.append({
+            "store_id": store_id,
+            "client_id": item.client_id,
+            "entry_type": item.entry_type,
+            "amount": item.amount,
+            "occurred_at": at,
+            "order_id": results[i]["order_id"],
+            "transaction_id": results[i]["transaction_id"],
+            "backup_entry_id": backup.id,
+            "entered_by_user_id": user_id,
+        })
+    db.execute(insert(PosJournalEntry), rows)
+
+
+def sync(db: Session, store_id: int, items: Sequence, user_id: int) -> List[dict]:
+    """
+    บันทึกรายการ journal ของร้าน (item มี client_id, entry_type, amount, payment_method,
+    order_lines, description, occurred_at) คืนผลต่อรายการ: created / duplicate / rejected
+    Raises JournalConflict ถ้าชนกับ request อื่นที่ส่งชุดเดียวกันพร้อมกัน (ทั้งชุด rollback)
+    """
+    results: List[Optional[dict]] = [None] * len(items)
+    first_index: Dict[str, int] = {}
+    for i, item in enumerate(items):
+        error = validate_item(item)
+        if error:
+            results[i] = dict(_result(item.client_id, "rejected"), error=error)
+        elif item.client_id not in first_index:
+            first_index[item.client_id] = i
+
+    existing = _existing(db, store_id, list(first_index))
+    for client_id, entry in existing.items():
+        results[first_index[client_id]] = _result(
+            client_id, "duplicate", entry.order_id, entry.transaction_id, entry.backup_entry_id
+        )
+
+    fresh = [(i, items[i]) for cid, i in first_index.items() if cid not in existing]
+    if fresh:
+        try:
+            _insert(db, store_id, fresh, user_id, results)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise JournalConflict()
+
+    # client_id ซ้ำภายในชุดเดียวกัน: ตอบ duplicate ของรายการแรก
+    for i, item in enumerate(items):
+        if results[i] is None:
+            first = results[first_index[item.client_id]]
+            results[i] = dict(first, status="duplicate")
+    return results
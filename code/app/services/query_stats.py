@@ -0,0 +1,171 @@
+"""
+Query Stats - นับ query / เวลา DB / statement ที่ซ้ำ ต่อ request จาก engine event ของ SQLAlchemy
+- ทุก Engine (sync และ sync_engine ของ async) ส่ง before/after_cursor_execute มาที่นี่
+- สถิติของ request ปัจจุบันเก็บใน contextvar (ตามไปถึง thread pool และ AsyncSession.run_sync)
+- fingerprint = SQL ที่ยุบช่องว่างและรายการ placeholder ของ IN (...) แล้ว - statement เดิมรัน >= REPEAT_THRESHOLD
+  ครั้งใน request เดียว = สงสัย N+1 (log warning)
+- รวมต่อ route ไว้ใน worker (route_totals) - middleware ส่งต่อเข้า /metrics ด้วย
+- QueryBudget: ตรวจจำนวน query ของโค้ดช่วงหนึ่ง (ใช้ใน tests ผ่าน fixture query_budget)
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+REPEAT_THRESHOLD = 5  # statement เดียวกันกี่ครั้งต่อ request ถึงนับเป็น N+1
+FINGERPRINT_LENGTH = 300
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(\?|%s|%\(\w+\)s|:\w+)(\s*,\s*(\?|%s|%\(\w+\)s|:\w+))+\s*\)")
+
+
+def fingerprint(statement: str) -> str:
+    """SQL ที่ต่างกันแค่ค่าพารามิเตอร์หรือความยาวของ IN (...) ได้ fingerprint เดียวกัน"""
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    return _PLACEHOLDER_LIST.sub("(?)", sql)[:FINGERPRINT_LENGTH]
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[fingerprint(statement)] += 1
+
+    def merge(self, other: "QueryStats") -> None:
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.statements.update(other.statements)
+
+    @property
+    def max_repeat(self) -> int:
+        return max(self.statements.values(), default=0)
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        """statement ที่รันซ้ำ >= threshold ครั้ง (มากไปน้อย)"""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_stats_start")
+    if starts:
+        stats.record(statement, (time.perf_counter() - starts.pop()) * 1000)
+
+
+@contextmanager
+def collect() -> Iterator[QueryStats]:
+    """เก็บสถิติ query ของโค้ดในบล็อก (ซ้อนกันได้ - บล็อกในสุดเป็นผู้เก็บ)"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+# ---------- รวมต่อ route ----------
+
+@dataclass
+class RouteTotals:
+    requests: int = 0
+    queries: int = 0
+    db_ms: float = 0.0
+    n_plus_one: int = 0  # จำนวน request ที่มี statement ซ้ำ >= REPEAT_THRESHOLD
+
+
+_totals_lock = threading.Lock()
+route_totals: Dict[Tuple[str, str], RouteTotals] = {}
+_request_listeners: List[Callable[[QueryStats], None]] = []
+
+
+def record_request(method: str, route: str, stats: QueryStats) -> None:
+    """บันทึกสถิติของ request ที่จบแล้ว + log statement ที่สงสัย N+1"""
+    repeated = stats.repeated()
+    with _totals_lock:
+        totals = route_totals.get((method, route))
+        if totals is None:
+            totals = route_totals[(method, route)] = RouteTotals()
+        totals.requests += 1
+        totals.queries += stats.count
+        totals.db_ms += stats.total_ms
+        if repeated:
+            totals.n_plus_one += 1
+        listeners = list(_request_listeners)
+    for listener in listeners:
+        listener(stats)
+    if repeated:
+        sql, n = repeated[0]
+        logger.warning("N+1 suspected: %s %s ran %d queries, %d x %s", method, route, stats.count, n, sql[:200])
+
+
+def snapshot() -> Dict[Tuple[str, str], RouteTotals]:
+    with _totals_lock:
+        return {key: RouteTotals(**vars(t)) for key, t in route_totals.items()}
+
+
+def reset_totals() -> None:
+    with _totals_lock:
+        route_totals.clear()
+
+
+# ---------- query budget (tests) ----------
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeat: Optional[int] = None) -> Iterator[QueryStats]:
+    """
+    AssertionError ถ้าโค้ดในบล็อกรัน query เกิน max_queries หรือ statement เดียวซ้ำเกิน max_repeat ครั้ง
+    นับทั้ง query ที่รันในบล็อกตรง ๆ และ request ที่จบในบล็อก (TestClient รัน app ใน thread อื่น)
+    """
+    with collect() as stats:
+        requests = QueryStats()
+        with _totals_lock:
+            _request_listeners.append(requests.merge)
+        try:
+            yield stats
+        finally:
+            with _totals_lock:
+                _request_listeners.remove(requests.merge)
+    stats.merge(requests)
+    problems = []
+    if stats.count > max_queries:
+        problems.append(f"{stats.count} queries > budget {max_queries}")
+    if max_repeat is not None and stats.max_repeat > max_repeat:
+        sql, n = stats.statements.most_common(1)[0]
+        problems.append(f"statement repeated {n} times > {max_repeat}: {sql[:200]}")
+    if problems:
+        raise QueryBudgetExceeded("; ".join(problems))
@@ -3,6 +3,7 @@ Refund Service - ระบบจัดการการคืนเงิน (E
 """
 from datetime import datetime, time
 from typing import Optional, List
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.models import (
     Customer, CustomerBalance, RefundRequest, RefundNotification,
@@ -12,6 +13,7 @@ from app.config import (
     HAS_E_MONEY_LICENSE, AUTO_REFUND_ENABLED, REFUND_NOTIFICATION_TIME,
     DAILY_BALANCE_RESET
 )
+from app.services import wallet_ledger
 import logging
 
 logger = logging.getLogger(__name__)
@@ -151,39 +153,54 @@ class RefundService:
         if refund_request.status != "pending":
             raise ValueError(f"Refund request already {refund_request.status}")
 
-        customer = self.db.query(Customer).filter(
-            Customer.id == refund_request.customer_id
-        ).first()
-
-        balance = self.db.query(CustomerBalance).filter(
-            CustomerBalance.customer_id == refund_request.customer_id
-        ).first()
-
-        if not balance or balance.balance < refund_request.amount:
+        # จองเงิน: หักกระเป๋า + เปลี่ยนสถานะเป็น processing ใน transaction เดียวกันก่อนจ่ายออก
+        # (UPDATE มีเงื่อนไข status = pending กันกดประมวลผลซ้ำพร้อมกัน)
+        claimed = self.db.execute(
+            update(RefundRequest)
+            .where(RefundRequest.id == refund_request.id, RefundRequest.status == "pending")
+            .values(status="processing")
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        if not claimed:
+            self.db.rollback()
+            raise ValueError("Refund request already processing")
+        try:
+            wallet_ledger.debit(
+                self.db, refund_request.customer_id, refund_request.amount,
+                reason="refund", ref=str(refund_request.id),
+            )
+        except wallet_ledger.InsufficientBalance:
+            self.db.rollback()
             refund_request.status = "failed"
             self.db.commit()
             raise ValueError("Insufficient balance")
+        self.db.commit()
+        self.db.refresh(refund_request)
 
-        # ประมวลผลการคืนเงินตามวิธีที่เลือก
-        if refund_request.refund_method == RefundMethod.PROMPTPAY:
-            # TODO: Integrate with PromptPay API
-            success = self._process_promptpay_refund(
-                refund_request.promptpay_number,
-                refund_request.amount
-            )
-        else:
-            # Cash refund - ต้องไปรับที่เคาน์เตอร์
-            success = True
+        # ประมวลผลการคืนเงินตามวิธีที่เลือก (เงินถูกหักแล้ว - จ่ายไม่สำเร็จคืนเข้ากระเป๋า)
+        try:
+            if refund_request.refund_method == RefundMethod.PROMPTPAY:
+                success = self._process_promptpay_refund(
+                    refund_request.promptpay_number,
+                    refund_request.amount
+                )
+            else:
+                # Cash refund - ต้องไปรับที่เคาน์เตอร์
+                success = True
+        except Exception as e:
+            logger.error(f"Refund {refund_request.id} payout failed: {e}")
+            success = False
 
         if success:
-            # ลดยอดเงินในบัญชี
-            balance.balance -= refund_request.amount
             refund_request.status = "completed"
             refund_request.processed_at = datetime.now()
-            self.db.commit()
         else:
+            wallet_ledger.credit(
+                self.db, refund_request.customer_id, refund_request.amount,
+                reason="refund_reversal", ref=str(refund_request.id),
+            )
             refund_request.status = "failed"
-            self.db.commit()
+        self.db.commit()
 
         return refund_request
 
@@ -211,22 +228,29 @@ class RefundService:
             return
 
         # หาลูกค้าทั้งหมดที่มียอดเงินคงเหลือ
-        balances = self.db.query(CustomerBalance).filter(
+        balances = self.db.query(CustomerBalance.customer_id, CustomerBalance.balance).filter(
             CustomerBalance.balance > 0
         ).all()
 
         reset_count = 0
-        for balance in balances:
+        for customer_id, amount in balances:
             # ส่งการแจ้งเตือนก่อนรีเซ็ต
-            if balance.balance > 0:
-                self.check_and_send_refund_notification(balance.customer_id)
-            
-            # รีเซ็ตยอดเป็น 0
-            balance.balance = 0
-            balance.last_reset_date = datetime.now()
+            self.check_and_send_refund_notification(customer_id)
+
+            # หักยอดที่อ่านได้ผ่าน ledger (atomic - เงินที่เติมเข้ามาระหว่างนี้ไม่ถูกทับ)
+            try:
+                wallet_ledger.debit(self.db, customer_id, float(amount), reason="daily_reset")
+            except wallet_ledger.InsufficientBalance:
+                continue  # ยอดถูกใช้ไประหว่างนี้ - รอบถัดไปรีเซ็ตยอดที่เหลือ
+            self.db.execute(
+                update(CustomerBalance)
+                .where(CustomerBalance.customer_id == customer_id)
+                .values(last_reset_date=datetime.now())
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
             reset_count += 1
 
-        self.db.commit()
         logger.info(f"Daily balance reset completed. Reset {reset_count} customer balances.")
 
     def get_customer_balance(self, customer_id: int) -> Optional[CustomerBalance]:
@@ -13,6 +13,7 @@ from typing import Any, Dict, Optional
 import httpx
 
 from app.config import SCB_BASE_URL
+from app.services import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -44,7 +45,7 @@ def get_oauth_token(
         "applicationSecret": api_secret,
     }
     logger.info("SCB API call: oauth/token POST %s", url)
-    with httpx.Client(timeout=15.0) as client:
+    with metrics.gateway_timer("scb"), httpx.Client(timeout=15.0) as client:
         resp = client.post(url, json=body, headers=headers)
     logger.info("SCB API response: oauth/token status=%s", resp.status_code)
     if resp.status_code != 200:
@@ -129,7 +130,7 @@ def create_deeplink_transaction(
         },
     }
     logger.info("SCB API call: deeplink/transactions POST %s amount=%.2f ref1=%s", url, payment_amount, ref1[:20] + "..." if len(ref1) > 20 else ref1)
-    with httpx.Client(timeout=15.0) as client:
+    with metrics.gateway_timer("scb"), httpx.Client(timeout=15.0) as client:
         resp = client.post(url, json=body, headers=headers)
     logger.info("SCB API response: deeplink/transactions status=%s", resp.status_code)
     if resp.status_code not in (200, 201):
@@ -156,7 +157,7 @@ def get_transaction(
         "accept-language": "EN",
     }
     logger.info("SCB API call: transactions GET %s", url)
-    with httpx.Client(timeout=15.0) as client:
+    with metrics.gateway_timer("scb"), httpx.Client(timeout=15.0) as client:
         resp = client.get(url, headers=headers)
     logger.info("SCB API response: transactions/%s status=%s", transaction_id, resp.status_code)
     if resp.status_code != 200:
@@ -0,0 +1,332 @@
+"""
+Settings Cache - โหลดไฟล์ตั้งค่า JSON ใน app/data/ และค่าตั้งค่าจาก DB ครั้งเดียว แล้วเก็บไว้ในหน่วยความจำ
+- ไฟล์ (pos_settings.json, signage_media.json): ตรวจ mtime ทุก CHECK_INTERVAL วินาที ถ้าเปลี่ยนจึงโหลดใหม่
+  ทุก gunicorn worker อ่านไฟล์เดียวกัน การบันทึกจาก worker ใดก็ได้จึงกระจายไปทุก worker ภายใน CHECK_INTERVAL
+- เขียนไฟล์แบบ atomic (เขียน temp file ในโฟลเดอร์เดียวกัน แล้ว os.replace) ไม่มี worker ไหนอ่านเจอไฟล์ครึ่งๆ
+- ค่าจาก DB (AppSetting, StoreLocaleSetting): cache ต่อ worker, เมื่อมีการแก้ไขให้เรียก invalidate_db_settings()
+  ซึ่งจะ touch ไฟล์ .settings_version ให้ worker อื่นล้าง cache ตามไปด้วย (มี TTL กันกรณีแก้ DB ตรง)
+- cache อื่นที่สร้างจากข้อมูลใน DB (โปรโมชั่น, ปฏิทิน) ใช้ channel ของตัวเอง: register_db_cache(clear, channel=...)
+  + invalidate(channel) - ไฟล์ version แยกต่อ channel แก้โฆษณา / โปรโมชั่นจึงไม่ล้าง cache ค่าตั้งค่า
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+POS_SETTINGS_FILE = DATA_DIR / "pos_settings.json"
+SIGNAGE_MEDIA_FILE = DATA_DIR / "signage_media.json"
+_VERSION_FILE = DATA_DIR / ".settings_version"
+
+CHECK_INTERVAL = 1.0  # วินาที - ระยะห่างขั้นต่ำระหว่างการ stat ไฟล์
+DB_SETTINGS_TTL = 60.0  # วินาที - อายุ cache ค่าจาก DB (กันกรณีแก้ DB ตรงโดยไม่ผ่าน API)
+
+DEFAULT_MENU_IMAGE_PRIORITY = "local,server,base64"
+
+DEFAULT_SIGNAGE_MEDIA = [
+    {"type": "image", "url": "https://picsum.photos/1200/800?random=1", "duration": 2},
+    {"type": "image", "url": "https://picsum.photos/1200/800?random=2", "duration": 2},
+    {"type": "image", "url": "https://picsum.photos/1200/800?random=3", "duration": 2},
+]
+
+
+def _file_signature(path: Path) -> Optional[tuple]:
+    """คืน (mtime_ns, size) ของไฟล์ หรือ None ถ้าไม่มีไฟล์"""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def atomic_write_json(path: Path, data: Any) -> None:
+    """เขียน JSON แบบ atomic: temp file ในโฟลเดอร์เดียวกัน -> fsync -> os.replace"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class WatchedJsonFile:
+    """
+    ไฟล์ JSON ที่ cache ไว้ในหน่วยความจำ reload เมื่อ (mtime, size) เปลี่ยน
+    parse: แปลงข้อมูลที่อ่านได้ (คืน default ถ้าข้อมูลไม่ถูกรูปแบบ)
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        default_factory: Callable[[], Any],
+        parse: Optional[Callable[[Any], Any]] = None,
+        check_interval: float = CHECK_INTERVAL,
+    ):
+        self.path = path
+        self._default_factory = default_factory
+        self._parse = parse
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._value: Any = None
+        self._signature: Optional[tuple] = None
+        self._loaded = False
+        self._last_check = 0.0
+
+    def _load(self) -> Any:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self._default_factory()
+        except Exception as e:
+            logger.warning("Settings file %s unreadable: %s", self.path, e)
+            return self._default_factory()
+        if self._parse is not None:
+            return self._parse(data)
+        return data
+
+    def get(self) -> Any:
+        """คืนค่าที่ cache ไว้ (ตรวจ mtime ไม่บ่อยกว่า check_interval)"""
+        now = time.monotonic()
+        if self._loaded and now - self._last_check < self._check_interval:
+            return self._value
+        with self._lock:
+            if self._loaded and now - self._last_check < self._check_interval:
+                return self._value
+            signature = _file_signature(self.path)
+            if not self._loaded or signature != self._signature:
+                self._value = self._load()
+                self._signature = signature
+                self._loaded = True
+            self._last_check = now
+            return self._value
+
+    def write(self, data: Any) -> None:
+        """บันทึกแบบ atomic แล้วอัปเดต cache ของ worker นี้ทันที"""
+        with self._lock:
+            atomic_write_json(self.path, data)
+            self._value = self._parse(data) if self._parse is not None else data
+            self._signature = _file_signature(self.path)
+            self._loaded = True
+            self._last_check = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
+            self._signature = None
+
+
+def _parse_dict(data: Any) -> dict:
+    return data if isinstance(data, dict) else {}
+
+
+def _parse_signage_media(data: Any) -> List[dict]:
+    if isinstance(data, list) and len(data) > 0:
+        return data
+    return DEFAULT_SIGNAGE_MEDIA
+
+
+pos_settings_file = WatchedJsonFile(POS_SETTINGS_FILE, dict, parse=_parse_dict)
+signage_media_file = WatchedJsonFile(SIGNAGE_MEDIA_FILE, lambda: DEFAULT_SIGNAGE_MEDIA, parse=_parse_signage_media)
+
+
+# ---------- Typed access: ไฟล์ ----------
+
+def get_pos_overrides() -> Dict[str, Any]:
+    """ค่า override ของ POS จาก pos_settings.json (อย่าแก้ dict ที่คืนไป ให้ copy ก่อน)"""
+    return pos_settings_file.get()
+
+
+def save_pos_overrides(data: Dict[str, Any]) -> None:
+    pos_settings_file.write(dict(data))
+
+
+def get_menu_image_priority() -> str:
+    """ลำดับแหล่งรูปเมนู เช่น 'local,server,base64'"""
+    value = get_pos_overrides().get("menu_image_priority")
+    return value if isinstance(value, str) and value.strip() else DEFAULT_MENU_IMAGE_PRIORITY
+
+
+def get_signage_media() -> List[dict]:
+    """รายการ video/โฆษณาสำหรับ signage idle mode"""
+    return signage_media_file.get()
+
+
+# ---------- Typed access: ค่าจาก DB ----------
+
+class StoreLocaleValues(NamedTuple):
+    """ค่าจาก StoreLocaleSetting (ไม่ผูกกับ Session จึง cache ข้าม request ได้)"""
+    locale: str
+    currency_code: str
+    currency_symbol: str
+    currency_name: str
+
+
+SETTINGS_CHANNEL = "settings"
+
+
+def _version_file(channel: str) -> Path:
+    """channel หลักใช้ .settings_version เดิม channel อื่น .<channel>_version ในโฟลเดอร์เดียวกัน"""
+    if channel == SETTINGS_CHANNEL:
+        return _VERSION_FILE
+    return _VERSION_FILE.with_name(f".{channel}_version")
+
+
+class _CacheChannel:
+    """กลุ่ม cache ต่อ worker ที่ล้างพร้อมกัน: หมด TTL หรือ worker อื่น bump ไฟล์ version ของ channel"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loaded_at = time.monotonic()
+        self._version: Optional[tuple] = _file_signature(_version_file(name))
+        self._last_check = 0.0
+        self.listeners: List[Callable[[], None]] = []
+
+    def _reset(self) -> None:
+        """ล้างค่าที่ channel เก็บเอง (เรียกขณะถือ _lock)"""
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+            self._loaded_at = time.monotonic()
+        for listener in self.listeners:
+            listener()
+
+    def ensure_fresh(self) -> None:
+        """ล้าง cache ถ้าหมด TTL หรือ worker อื่น bump ไฟล์ version"""
+        now = time.monotonic()
+        if now - self._loaded_at >= DB_SETTINGS_TTL:
+            self.clear()
+            return
+        if now - self._last_check < CHECK_INTERVAL:
+            return
+        self._last_check = now
+        version = _file_signature(_version_file(self.name))
+        if version != self._version:
+            self._version = version
+            self.clear()
+
+    def bump(self) -> None:
+        """แจ้งทุก worker ว่าข้อมูลของ channel นี้เปลี่ยน (เขียนไฟล์ version แบบ atomic)"""
+        path = _version_file(self.name)
+        try:
+            atomic_write_json(path, {"pid": os.getpid(), "ts": time.time()})
+            self._version = _file_signature(path)
+        except OSError as e:
+            logger.warning("Cannot bump %s cache version: %s", self.name, e)
+        self.clear()
+
+
+class _DbSettingsCache(_CacheChannel):
+    def __init__(self):
+        self.app_settings: Optional[Dict[str, Optional[str]]] = None
+        self.store_locales: Dict[int, Optional[StoreLocaleValues]] = {}
+        super().__init__(SETTINGS_CHANNEL)
+
+    def _reset(self) -> None:
+        self.app_settings = None
+        self.store_locales = {}
+
+
+_db_cache = _DbSettingsCache()
+_channels: Dict[str, _CacheChannel] = {SETTINGS_CHANNEL: _db_cache}
+
+
+def _channel(name: str) -> _CacheChannel:
+    channel = _channels.get(name)
+    if channel is None:
+        channel = _channels.setdefault(name, _CacheChannel(name))
+    return channel
+
+
+def get_app_settings(db: Session) -> Dict[str, Optional[str]]:
+    """AppSetting ทั้งหมดเป็น dict key -> value (query ครั้งเดียวต่อ TTL)"""
+    from app.models import AppSetting
+
+    _db_cache.ensure_fresh()
+    settings = _db_cache.app_settings
+    if settings is None:
+        settings = {row.key: row.value for row in db.query(AppSetting.key, AppSetting.value).all()}
+        _db_cache.app_settings = settings
+    return settings
+
+
+def get_app_setting(db: Session, key: str, default: Optional[str] = None) -> Optional[str]:
+    value = get_app_settings(db).get(key)
+    return value if value else default
+
+
+def get_store_locale_values(db: Session, store_id: int) -> Optional[StoreLocaleValues]:
+    """StoreLocaleSetting ของร้าน (None ถ้าร้านไม่มีตั้งค่า) - cache ทั้งกรณีมีและไม่มี"""
+    from app.models import StoreLocaleSetting
+
+    _db_cache.ensure_fresh()
+    if store_id in _db_cache.store_locales:
+        return _db_cache.store_locales[store_id]
+    row = (
+        db.query(
+            StoreLocaleSetting.locale,
+            StoreLocaleSetting.currency_code,
+            StoreLocaleSetting.currency_symbol,
+            StoreLocaleSetting.currency_name,
+        )
+        .filter(StoreLocaleSetting.store_id == store_id)
+        .first()
+    )
+    values = None
+    if row:
+        values = StoreLocaleValues(row.locale, row.currency_code, row.currency_symbol, row.currency_name or "Baht")
+    _db_cache.store_locales[store_id] = values
+    return values
+
+
+def register_db_cache(clear: Callable[[], None], channel: str = SETTINGS_CHANNEL) -> None:
+    """
+    ให้ cache ที่สร้างจากค่าใน DB ถูกล้างพร้อม channel
+    (ค่าเริ่มต้น = ค่าตั้งค่า เช่น locale_context, ข้อมูลอื่นใช้ channel ของตัวเอง เช่น "promotions")
+    """
+    _channel(channel).listeners.append(clear)
+
+
+def ensure_fresh(channel: str) -> None:
+    """เรียกก่อนอ่าน cache ของ channel"""
+    _channel(channel).ensure_fresh()
+
+
+def invalidate(channel: str) -> None:
+    """เรียกหลัง commit ที่แก้ข้อมูลของ channel - ล้าง cache ของ channel นี้ทุก worker"""
+    _channel(channel).bump()
+
+
+def ensure_db_settings_fresh() -> None:
+    _db_cache.ensure_fresh()
+
+
+def invalidate_db_settings() -> None:
+    """เรียกหลัง commit การแก้ AppSetting / StoreLocaleSetting / ProgramSetting"""
+    _db_cache.bump()
+
+
+def reset_caches() -> None:
+    """ล้าง cache ทั้งหมดของ worker นี้ (ใช้ใน tests)"""
+    pos_settings_file.invalidate()
+    signage_media_file.invalidate()
+    for channel in list(_channels.values()):
+        channel.clear()
@@ -5,8 +5,8 @@ Settlement Service - รับ Back Transaction, รายงาน, ราย
 """
 from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict, Any, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, func
 
 from app.models import (
     Store,
@@ -19,6 +19,13 @@ from app.models import (
     TransactionStatus,
 )
 from app.config import SETTLEMENT_GP_PERCENT
+from app.services import archive
+
+
+def _on_day(column, day: date):
+    """column อยู่ในวัน day - เทียบเป็นช่วง [00:00, วันถัดไป) ใช้ index ได้ (func.date(column) == day ต้องสแกนทั้งตาราง)"""
+    start = datetime.combine(day, datetime.min.time())
+    return and_(column >= start, column < start + timedelta(days=1))
 
 
 def _get_or_create_promptpay_guest_customer(db: Session) -> Customer:
@@ -158,31 +165,27 @@ def get_back_transactions_report(
     end_date: Optional[datetime] = None,
     limit: int = 500,
 ) -> List[dict]:
-    """รายงาน Back Transactions สำหรับทำ Report"""
-    q = db.query(PromptPayBackTransaction).order_by(
-        PromptPayBackTransaction.paid_at.desc()
+    """รายงาน Back Transactions สำหรับทำ Report (รวมแถวที่ย้ายไป archive แล้ว - services/archive)"""
+    where = {"store_id": store_id} if store_id is not None else None
+    rows = archive.query(
+        db, "promptpay_back_transactions", start=start_date, end=end_date, where=where, limit=limit
     )
-    if store_id is not None:
-        q = q.filter(PromptPayBackTransaction.store_id == store_id)
-    if start_date is not None:
-        q = q.filter(PromptPayBackTransaction.paid_at >= start_date)
-    if end_date is not None:
-        q = q.filter(PromptPayBackTransaction.paid_at <= end_date)
-    rows = q.limit(limit).all()
+    store_ids = {r["store_id"] for r in rows if r["store_id"] is not None}
+    names = dict(db.query(Store.id, Store.name).filter(Store.id.in_(store_ids)).all()) if store_ids else {}
     return [
         {
-            "id": r.id,
-            "ref1": r.ref1,
-            "ref2": r.ref2,
-            "ref3": r.ref3,
-            "amount": r.amount,
-            "paid_at": r.paid_at.isoformat() if r.paid_at else None,
-            "slip_reference": r.slip_reference,
-            "store_id": r.store_id,
-            "store_name": r.store.name if r.store else None,
-            "status": r.status,
-            "payment_gateway": getattr(r, "payment_gateway", None),
-            "created_at": r.created_at.isoformat() if r.created_at else None,
+            "id": r["id"],
+            "ref1": r["ref1"],
+            "ref2": r["ref2"],
+            "ref3": r["ref3"],
+            "amount": r["amount"],
+            "paid_at": r["paid_at"].isoformat() if r["paid_at"] else None,
+            "slip_reference": r["slip_reference"],
+            "store_id": r["store_id"],
+            "store_name": names.get(r["store_id"]),
+            "status": r["status"],
+            "payment_gateway": r["payment_gateway"],
+            "created_at": r["created_at"].isoformat() if r["created_at"] else None,
         }
         for r in rows
     ]
@@ -198,7 +201,9 @@ def get_back_transactions_live(
     รายการ Back Transactions ล่าสุด (เรียงตาม created_at) สำหรับ realtime
     ใช้ since_created เพื่อ poll เฉพาะรายการที่เพิ่มหลังเวลานี้
     """
-    q = db.query(PromptPayBackTransaction).order_by(
+    q = db.query(PromptPayBackTransaction).options(
+        joinedload(PromptPayBackTransaction.store)
+    ).order_by(
         PromptPayBackTransaction.created_at.desc()
     )
     if store_id is not None:
@@ -250,19 +255,16 @@ def create_daily_settlements(db: Session, settlement_date: Optional[date] = None
         .group_by(PromptPayBackTransaction.store_id)
     )
     result = subq.all()
+    # ร้านที่มีรายการของวันนั้นแล้ว (query เดียว แทนการถามทีละร้าน)
+    settled = {
+        store_id
+        for (store_id,) in db.query(StoreSettlement.store_id).filter(
+            _on_day(StoreSettlement.settlement_date, settlement_date)
+        )
+    }
     created = []
     for store_id, total in result:
-        if store_id is None or total <= 0:
-            continue
-        existing = (
-            db.query(StoreSettlement)
-            .filter(
-                StoreSettlement.store_id == store_id,
-                func.date(StoreSettlement.settlement_date) == settlement_date,
-            )
-            .first()
-        )
-        if existing:
+        if store_id is None or total <= 0 or store_id in settled:
             continue
         st = StoreSettlement(
             store_id=store_id,
@@ -273,8 +275,6 @@ def create_daily_settlements(db: Session, settlement_date: Optional[date] = None
         db.add(st)
         created.append(st)
     db.commit()
-    for st in created:
-        db.refresh(st)
     return created
 
 
@@ -284,9 +284,9 @@ def get_settlement_list(
     status: Optional[str] = None,
 ) -> List[dict]:
     """รายการเตรียมโอนเงินสิ้นวัน (Schedule list)"""
-    q = db.query(StoreSettlement).order_by(StoreSettlement.store_id)
+    q = db.query(StoreSettlement).options(joinedload(StoreSettlement.store)).order_by(StoreSettlement.store_id)
     if settlement_date is not None:
-        q = q.filter(func.date(StoreSettlement.settlement_date) == settlement_date)
+        q = q.filter(_on_day(StoreSettlement.settlement_date, settlement_date))
     if status is not None:
         q = q.filter(StoreSettlement.status == status)
     rows = q.all()
@@ -441,7 +441,7 @@ def get_settlement_summary_by_period(
         settlement_date = start_date.date()
         settlements = (
             db.query(StoreSettlement)
-            .filter(func.date(StoreSettlement.settlement_date) == settlement_date)
+            .filter(_on_day(StoreSettlement.settlement_date, settlement_date))
             .all()
         )
         store_to_settlement = {s.store_id: {"id": s.id, "status": s.status or "pending"} for s in settlements}
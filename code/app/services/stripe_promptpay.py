@@ -11,6 +11,8 @@ from typing import Any, Dict, Optional
 
 import httpx
 
+from app.services import metrics
+
 logger = logging.getLogger(__name__)
 STRIPE_API = "https://api.stripe.com/v1"
 
@@ -65,7 +67,7 @@ def create_payment_intent(
     # มิฉะนั้น Stripe จะ error: return_url cannot be passed unless confirm is true
 
     logger.info("Stripe API: POST payment_intents amount=%s methods=%s", amount_satang, payment_method_types)
-    with httpx.Client(timeout=15.0) as client:
+    with metrics.gateway_timer("stripe"), httpx.Client(timeout=15.0) as client:
         resp = client.post(url, headers=headers, data=data)
     logger.info("Stripe API response: payment_intents status=%s", resp.status_code)
 
@@ -98,7 +100,7 @@ def retrieve_payment_intent(secret_key: str, payment_intent_id: str) -> Dict[str
     """ดึง PaymentIntent จาก Stripe"""
     url = f"{STRIPE_API}/payment_intents/{payment_intent_id}"
     headers = {"Authorization": f"Bearer {secret_key}"}
-    with httpx.Client(timeout=10.0) as client:
+    with metrics.gateway_timer("stripe"), httpx.Client(timeout=10.0) as client:
         resp = client.get(url, headers=headers)
     if resp.status_code != 200:
         raise ValueError(f"Stripe get PaymentIntent failed: {resp.status_code}")
@@ -121,7 +123,7 @@ def confirm_payment_intent_promptpay(
         "payment_method_data[billing_details][email]": email or "noreply@store.local",
     }
     logger.info("Stripe API: POST payment_intents/%s/confirm (promptpay)", payment_intent_id)
-    with httpx.Client(timeout=15.0) as client:
+    with metrics.gateway_timer("stripe"), httpx.Client(timeout=15.0) as client:
         resp = client.post(url, headers=headers, data=data)
     logger.info("Stripe API response: confirm status=%s", resp.status_code)
     if resp.status_code != 200:
@@ -167,7 +169,7 @@ def list_webhook_endpoints(secret_key: str) -> list:
     """ดึงรายการ webhook endpoints จาก Stripe"""
     url = f"{STRIPE_API}/webhook_endpoints"
     headers = {"Authorization": f"Bearer {secret_key}"}
-    with httpx.Client(timeout=10.0) as client:
+    with metrics.gateway_timer("stripe"), httpx.Client(timeout=10.0) as client:
         resp = client.get(url, params={"limit": "100"})
     if resp.status_code != 200:
         raise ValueError(f"Stripe list webhooks failed: {resp.status_code} {resp.text}")
@@ -180,7 +182,7 @@ def update_webhook_endpoint_url(secret_key: str, endpoint_id: str, new_url: str)
     url = f"{STRIPE_API}/webhook_endpoints/{endpoint_id}"
     headers = {"Authorization": f"Bearer {secret_key}", "Content-Type": "application/x-www-form-urlencoded"}
     data = {"url": new_url}
-    with httpx.Client(timeout=10.0) as client:
+    with metrics.gateway_timer("stripe"), httpx.Client(timeout=10.0) as client:
         resp = client.post(url, headers=headers, data=data)
     if resp.status_code != 200:
         raise ValueError(f"Stripe update webhook failed: {resp.status_code} {resp.text}")
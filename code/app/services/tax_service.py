@@ -5,6 +5,7 @@ from typing import Optional, List, Dict, Any
 from sqlalchemy.orm import Session
 from app.models import Transaction, TaxInvoice, PaymentMethod
 from app.config import VAT_RATE, WHT_RATE, TAX_ID, COMPANY_NAME
+from app.services import document_numbers
 from datetime import datetime
 import logging
 
@@ -108,19 +109,9 @@ class TaxService:
     def _generate_invoice_number(self) -> str:
         """
         สร้างเลขที่ใบกำกับภาษี
-        รูปแบบ: INV-YYYYMMDD-XXXXX
+        รูปแบบ: INV-YYYYMMDD-XXXXX (ลำดับรายวันต่อเนื่อง จองใน transaction เดียวกับใบกำกับภาษี)
         """
-        now = datetime.now()
-        date_str = now.strftime("%Y%m%d")
-        
-        # นับจำนวนใบกำกับภาษีในวันนี้
-        today_start = datetime.combine(now.date(), datetime.min.time())
-        count = self.db.query(TaxInvoice).filter(
-            TaxInvoice.issued_at >= today_start
-        ).count()
-        
-        sequence = str(count + 1).zfill(5)
-        return f"INV-{date_str}-{sequence}"
+        return document_numbers.next_invoice_number(self.db)
 
     def generate_sales_tax_report(
         self,
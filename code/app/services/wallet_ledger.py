@@ -0,0 +1,123 @@
+"""
+Wallet Ledger Service - เพิ่ม/ลดยอด CustomerBalance แบบ atomic พร้อมบันทึก WalletLedger
+- credit/debit ใช้ UPDATE ... SET balance = balance +/- :x ใน DB (ไม่อ่านค่าแล้วบวกใน Python) จึงไม่ทับกันเมื่อเติมพร้อมกัน
+- debit มีเงื่อนไข balance >= :x ยอดไม่พอ = ไม่มีแถวถูกอัปเดต
+- claim_payment: กัน webhook ซ้ำด้วย processed_payment_events (unique (provider, payment_id))
+  retry ของ gateway เจอแถวเดิมด้วย index lookup เดียวแล้วตอบกลับทันที
+ไม่ commit เอง ผู้เรียก commit ครั้งเดียว (รวมการออกคูปอง/MemberActivity ใน transaction เดียวกัน)
+"""
+from typing import Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Customer, CustomerBalance, ProcessedPaymentEvent, WalletLedger
+from app.services import member_summary
+
+
+class InsufficientBalance(Exception):
+    """ยอดในกระเป๋าไม่พอหัก"""
+
+
+def is_payment_processed(db: Session, provider: str, payment_id: str) -> bool:
+    return db.execute(
+        select(ProcessedPaymentEvent.id).where(
+            ProcessedPaymentEvent.provider == provider,
+            ProcessedPaymentEvent.payment_id == payment_id,
+        )
+    ).first() is not None
+
+
+def claim_payment(
+    db: Session,
+    provider: str,
+    payment_id: str,
+    event_id: Optional[str] = None,
+    event_type: Optional[str] = None,
+    customer_id: Optional[int] = None,
+    amount: Optional[float] = None,
+) -> bool:
+    """
+    จองการประมวลผล payment นี้ใน transaction ปัจจุบัน - False ถ้าเคยประมวลผลแล้ว
+    (webhook ซ้ำที่มาพร้อมกันจะรอ unique key ของอีกอันจน commit แล้วได้ False)
+    """
+    if is_payment_processed(db, provider, payment_id):
+        return False
+    try:
+        with db.begin_nested():
+            db.execute(
+                insert(ProcessedPaymentEvent).values(
+                    provider=provider,
+                    payment_id=payment_id,
+                    event_id=event_id,
+                    event_type=event_type,
+                    customer_id=customer_id,
+                    amount=amount,
+                )
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def _balance_id(db: Session, customer_id: int) -> Optional[int]:
+    """id ของ CustomerBalance ของลูกค้า (แถวแรก เหมือน .first() ที่หน้าอื่นใช้อ่านยอด)"""
+    return db.execute(
+        select(CustomerBalance.id)
+        .where(CustomerBalance.customer_id == customer_id)
+        .order_by(CustomerBalance.id.asc())
+        .limit(1)
+    ).scalar()
+
+
+def _apply(db: Session, balance_id: int, delta: float, require_funds: bool) -> bool:
+    stmt = update(CustomerBalance).where(CustomerBalance.id == balance_id)
+    if require_funds:
+        stmt = stmt.where(CustomerBalance.balance >= -delta)
+    result = db.execute(
+        stmt.values(balance=CustomerBalance.balance + delta).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _record(db: Session, customer_id: int, balance_id: int, delta: float, reason: str, ref: Optional[str]) -> float:
+    balance_after = float(
+        db.execute(select(CustomerBalance.balance).where(CustomerBalance.id == balance_id)).scalar() or 0
+    )
+    db.execute(
+        insert(WalletLedger).values(
+            customer_id=customer_id,
+            delta=delta,
+            balance_after=balance_after,
+            reason=reason,
+            ref=ref,
+        )
+    )
+    member_summary.set_balance(db, customer_id, balance_after)
+    return balance_after
+
+
+def credit(db: Session, customer_id: int, amount: float, reason: str, ref: Optional[str] = None) -> float:
+    """เพิ่มยอด คืนยอดคงเหลือหลังเพิ่ม (ยังไม่มี CustomerBalance จะสร้างให้)"""
+    member_summary.touch(db, customer_id)  # ล็อก summary ก่อนแถวยอดเงิน (ลำดับเดียวกับทุกทาง)
+    balance_id = _balance_id(db, customer_id)
+    if balance_id is None:
+        # lock แถวลูกค้าก่อนสร้าง CustomerBalance กันสองรายการสร้างซ้อนกัน
+        db.execute(select(Customer.id).where(Customer.id == customer_id).with_for_update())
+        balance_id = _balance_id(db, customer_id)
+    if balance_id is None:
+        result = db.execute(insert(CustomerBalance).values(customer_id=customer_id, balance=amount))
+        balance_id = result.inserted_primary_key[0]
+    else:
+        _apply(db, balance_id, amount, require_funds=False)
+    return _record(db, customer_id, balance_id, amount, reason, ref)
+
+
+def debit(db: Session, customer_id: int, amount: float, reason: str, ref: Optional[str] = None) -> float:
+    """หักยอด คืนยอดคงเหลือหลังหัก - Raises InsufficientBalance ถ้ายอดไม่พอ"""
+    member_summary.touch(db, customer_id)
+    balance_id = _balance_id(db, customer_id)
+    if balance_id is None or not _apply(db, balance_id, -amount, require_funds=True):
+        raise InsufficientBalance(f"customer {customer_id} balance < {amount:.2f}")
+    return _record(db, customer_id, balance_id, -amount, reason, ref)
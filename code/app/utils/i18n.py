@@ -1,8 +1,52 @@
 """
 Helper สำหรับ resolve ข้อความหลายภาษา (name_i18n, description_i18n)
+JSON ของแต่ละ field parse ครั้งเดียวแล้ว cache ตามข้อความ JSON (ข้อความเดิม = revision เดิม)
+ผลลัพธ์ต่อ locale ของ Menu / Store / ProgramSetting cache ไว้ตามค่าของแถว ไม่ต้อง parse ซ้ำทุก request
 """
 import json
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+SUPPORTED_LOCALES = ("th", "en", "lo", "my", "kh", "ms", "shn", "zh", "ru")
+
+# ProgramSetting: แต่ละ column = ภาษา
+LABEL_COLUMNS = {loc: f"label_{loc}" for loc in SUPPORTED_LOCALES}
+
+_I18N_CACHE_SIZE = 16384
+
+
+class I18nText:
+    """ข้อความหลายภาษาที่ parse แล้ว: values = {lang: ข้อความ (strip แล้ว)} เฉพาะค่าที่ไม่ว่าง"""
+
+    __slots__ = ("values", "first")
+
+    def __init__(self, data: dict):
+        self.values = {lang: str(val).strip() for lang, val in data.items() if val}
+        # ค่าแรกใน JSON (ไม่ strip) ใช้เป็น fallback สุดท้ายเหมือนเดิม
+        self.first = next(iter(data.values())) if data else ""
+
+    def pick(self, default: Optional[str], locale: str) -> str:
+        """Fallback: locale -> th -> en -> default -> ค่าแรก"""
+        values = self.values
+        for lang in (locale, "th", "en"):
+            val = values.get(lang)
+            if val is not None:
+                return val
+        return default or self.first
+
+
+@lru_cache(maxsize=_I18N_CACHE_SIZE)
+def parse_i18n(i18n_json: Optional[str]) -> Optional[I18nText]:
+    """parse JSON {"th":"...","en":"..."} ครั้งเดียว (None ถ้าว่างหรือไม่ใช่ object) - อย่าแก้ค่าที่คืนไป"""
+    if not i18n_json or not i18n_json.strip():
+        return None
+    try:
+        data = json.loads(i18n_json)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    return I18nText(data)
 
 
 def resolve_i18n(i18n_json: Optional[str], default: Optional[str], locale: str) -> str:
@@ -10,18 +54,42 @@ def resolve_i18n(i18n_json: Optional[str], default: Optional[str], locale: str)
     คืนค่าตาม locale จาก JSON {"th":"...","en":"..."}
     Fallback: locale -> th -> en -> default
     """
-    if not i18n_json or not i18n_json.strip():
+    parsed = parse_i18n(i18n_json)
+    if parsed is None:
         return default or ""
+    return parsed.pick(default, locale)
+
+
+@lru_cache(maxsize=_I18N_CACHE_SIZE)
+def _parse_addon_options(addon_options_json: str) -> Optional[Tuple[Any, ...]]:
+    """parse addon_options ครั้งเดียว: tuple ของ (item, I18nText|None) - None ถ้าไม่ใช่ JSON array"""
     try:
-        data = json.loads(i18n_json)
-        if not isinstance(data, dict):
-            return default or ""
-        for lang in (locale, "th", "en"):
-            if lang in data and data[lang]:
-                return str(data[lang]).strip()
-        return default or (list(data.values())[0] if data else "")
+        arr = json.loads(addon_options_json)
     except (json.JSONDecodeError, TypeError):
-        return default or ""
+        return None
+    if not isinstance(arr, list):
+        return None
+    parsed = []
+    for item in arr:
+        name_i18n = item.get("name_i18n") if isinstance(item, dict) else None
+        parsed.append((item, I18nText(name_i18n) if name_i18n and isinstance(name_i18n, dict) else None))
+    return tuple(parsed)
+
+
+@lru_cache(maxsize=_I18N_CACHE_SIZE)
+def _resolve_addon_options_cached(addon_options_json: str, locale: str) -> str:
+    parsed = _parse_addon_options(addon_options_json)
+    if parsed is None:
+        return addon_options_json
+    out = []
+    for item, name_i18n in parsed:
+        if name_i18n is None:
+            out.append(item)
+            continue
+        copy = dict(item)
+        copy["name"] = name_i18n.pick(copy.get("name", ""), locale)
+        out.append(copy)
+    return json.dumps(out, ensure_ascii=False)
 
 
 def resolve_addon_options(addon_options_json: Optional[str], locale: str) -> Optional[str]:
@@ -31,22 +99,73 @@ def resolve_addon_options(addon_options_json: Optional[str], locale: str) -> Opt
     """
     if not addon_options_json or not addon_options_json.strip():
         return addon_options_json
-    try:
-        arr = json.loads(addon_options_json)
-        if not isinstance(arr, list):
-            return addon_options_json
-        out = []
-        for item in arr:
-            if not isinstance(item, dict):
-                out.append(item)
-                continue
-            copy = dict(item)
-            name_i18n = copy.get("name_i18n")
-            default_name = copy.get("name", "")
-            if name_i18n and isinstance(name_i18n, dict):
-                resolved = resolve_i18n(json.dumps(name_i18n), default_name, locale)
-                copy["name"] = resolved
-            out.append(copy)
-        return json.dumps(out, ensure_ascii=False)
-    except (json.JSONDecodeError, TypeError):
-        return addon_options_json
+    return _resolve_addon_options_cached(addon_options_json, locale)
+
+
+# ---------- Projection ต่อ locale ----------
+
+@lru_cache(maxsize=_I18N_CACHE_SIZE)
+def _project_menu_text(
+    name: Optional[str],
+    name_i18n: Optional[str],
+    description: Optional[str],
+    description_i18n: Optional[str],
+    addon_options: Optional[str],
+    locale: str,
+) -> Tuple[str, Optional[str], Optional[str]]:
+    resolved_name = resolve_i18n(name_i18n, name, locale) or name
+    resolved_desc = resolve_i18n(description_i18n, description, locale) or description
+    resolved_addon = resolve_addon_options(addon_options, locale) if addon_options else None
+    return resolved_name, resolved_desc, resolved_addon or addon_options
+
+
+def project_menu_text(menu: Any, locale: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    คืน (name, description, addon_options) ของ Menu ตาม locale
+    cache ตามค่าของคอลัมน์ในแถว - แก้ไขแถวแล้ว key เปลี่ยนเอง ไม่ต้อง invalidate
+    """
+    return _project_menu_text(
+        menu.name,
+        getattr(menu, "name_i18n", None),
+        menu.description,
+        getattr(menu, "description_i18n", None),
+        getattr(menu, "addon_options", None),
+        locale,
+    )
+
+
+def project_store_name(store: Any, locale: str) -> str:
+    """ชื่อร้านตาม locale (Store.name_i18n)"""
+    return resolve_i18n(getattr(store, "name_i18n", None), store.name, locale) or store.name
+
+
+def _label_fallback_order(locale: str) -> Tuple[str, ...]:
+    return (locale, "en", "th") if locale != "th" else (locale, "en")
+
+
+def project_labels(rows: Iterable[Any]) -> Dict[str, Dict[str, str]]:
+    """
+    สร้าง labels ของ ProgramSetting ครบทุก locale ในรอบเดียว: {locale: {label_key: ข้อความ}}
+    Fallback ต่อ label: locale -> en -> th
+    """
+    columns = [(r.label_key, {loc: getattr(r, col, None) for loc, col in LABEL_COLUMNS.items()}) for r in rows]
+    projections: Dict[str, Dict[str, str]] = {}
+    for locale in SUPPORTED_LOCALES:
+        order = _label_fallback_order(locale)
+        labels = {}
+        for label_key, values in columns:
+            for loc in order:
+                val = values.get(loc)
+                if val:
+                    labels[label_key] = val
+                    break
+        projections[locale] = labels
+    return projections
+
+
+def clear_i18n_caches() -> None:
+    """ล้าง cache ทั้งหมด (ใช้ใน tests / benchmark)"""
+    parse_i18n.cache_clear()
+    _parse_addon_options.cache_clear()
+    _resolve_addon_options_cached.cache_clear()
+    _project_menu_text.cache_clear()
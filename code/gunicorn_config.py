@@ -32,6 +32,14 @@ backlog = 2048
 cpu_count = multiprocessing.cpu_count()
 workers = min(cpu_count * 2, 8)  # สูงสุด 8 workers
 worker_class = "uvicorn.workers.UvicornWorker"
+
+# Rate limit นับรวมทุก worker (token bucket ในไฟล์ mmap ร่วมกัน - middleware/rate_limit.py)
+os.environ.setdefault("RATE_LIMIT_STORE", "shared")
+# /metrics รวมค่าทุก worker (prometheus_client multiprocess - ไฟล์ต่อ worker ในโฟลเดอร์นี้ ล้างทุกครั้งที่ start)
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "prometheus_multiproc"),
+)
 worker_connections = 1000
 timeout = 60  # เพิ่ม timeout สำหรับ public internet
 keepalive = 5  # เพิ่ม keepalive
@@ -57,3 +65,16 @@ tmp_upload_dir = None
 # keyfile = "/path/to/keyfile"
 # certfile = "/path/to/certfile"
 
+
+def on_starting(server):
+    """ล้างไฟล์ metrics ของรอบก่อน (ค่าจาก worker เก่าจะถูกนับซ้ำ)"""
+    import shutil
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """worker ตาย/ถูก restart - ลบค่า gauge แบบ live ของ worker นั้น"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -3,12 +3,20 @@
 Marketplace Management System - Main Application
 """
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.sessions import SessionMiddleware
-from app.database import engine, Base
-from app.api import customer, crypto, reports, tax, refund, stores, counter, payment_hub, reports_payment, admin, admin_config, profiles, geo, store_quick_amounts, menus, payment_callback, signage, pos_settings, locale_settings, program_settings, auth, member, member_scan, admin_ecoupon, admin_coupon_promo, admin_ads, admin_backup_audit
-from app.config import BACKEND_URL, SECRET_KEY
+from middleware.metrics import MetricsMiddleware
+from middleware.query_stats import QueryStatsMiddleware
+from middleware.session import PathSessionMiddleware
+from app.database import engine, Base, dispose_async_engine
+from app.api import customer, crypto, reports, tax, refund, stores, counter, payment_hub, reports_payment, admin, admin_config, profiles, geo, store_quick_amounts, menus, payment_callback, signage, pos_settings, locale_settings, program_settings, auth, member, member_scan, admin_ecoupon, admin_coupon_promo, admin_ads, admin_backup_audit, pos_journal
+from app.config import BACKEND_URL, DB_THREADPOOL_SIZE, DEBUG, METRICS_TOKEN, SECRET_KEY
+from app import scheduler
+from app.services import ad_impressions, audit_log, metrics
+import hmac
+import anyio.to_thread
 import os
 
 # Paths relative to main.py (code/) so server works from project root or code/
@@ -38,8 +46,14 @@ except ImportError:
     # ถ้าไม่มี middleware ก็ข้ามไป
     pass
 
-# Session middleware - สำหรับ Store POS Login
-app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
+# Metrics - latency / in-flight ต่อ route (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Query stats - จำนวน query / เวลา DB ต่อ request (header X-DB-* เฉพาะ DEBUG)
+app.add_middleware(QueryStatsMiddleware, headers=DEBUG)
+
+# Session middleware - สำหรับ Store POS Login (ข้าม static / webhook / signage)
+app.add_middleware(PathSessionMiddleware, secret_key=SECRET_KEY)
 
 # CORS middleware - ระบุ allowed origins ใน production
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "*").split(",")
@@ -80,6 +94,37 @@ app.include_router(admin_ecoupon.router)
 app.include_router(admin_coupon_promo.router)
 app.include_router(admin_ads.router)
 app.include_router(admin_backup_audit.router)
+app.include_router(pos_journal.router)
+
+
+@app.on_event("startup")
+async def limit_sync_threadpool():
+    """handler / dependency แบบ sync (Session ของ get_db) รันใน thread pool ไม่เกิน DB_THREADPOOL_SIZE
+    ให้เท่ากับ connection ของ engine - thread เกินจากนี้มีแต่รอ connection"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = DB_THREADPOOL_SIZE
+
+
+@app.on_event("startup")
+def start_job_runner():
+    """งานตามเวลา: ทุก worker เริ่ม runner แต่รันงานเฉพาะ worker ที่เป็น leader (app/scheduler)"""
+    scheduler.start_scheduler()
+
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    scheduler.stop_scheduler()
+
+
+@app.on_event("shutdown")
+def flush_write_behind_buffers():
+    """เขียน event ที่ยังค้างใน buffer ของ worker นี้ก่อนปิด"""
+    ad_impressions.collector.close()
+    audit_log.writer.close()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
 
 # Mount static files (must be before specific routes to avoid conflicts)
 if os.path.exists(_STATIC_DIR):
@@ -448,7 +493,7 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
+def health_check():
     """Health check - รวมการตรวจสอบ DB"""
     from app.database import check_db_connection
     db_ok, db_msg = check_db_connection()
@@ -458,3 +503,27 @@ async def health_check():
         "database": "ok" if db_ok else db_msg,
     }
 
+
+_LOOPBACK_HOSTS = frozenset({"127.0.0.1", "::1"})
+
+
+def _metrics_allowed(request: Request) -> bool:
+    """
+    ตั้ง METRICS_TOKEN = ต้องส่ง Authorization: Bearer <token> (ใช้เมื่อ Prometheus อยู่คนละเครื่อง)
+    ไม่ตั้ง (ค่าเริ่มต้น) = เฉพาะ request จากเครื่องนี้ที่ไม่ได้ผ่าน reverse proxy (ไม่มี X-Forwarded-For / Forwarded)
+    """
+    if METRICS_TOKEN:
+        given = request.headers.get("authorization", "")
+        return hmac.compare_digest(given.encode(), f"Bearer {METRICS_TOKEN}".encode())
+    if "x-forwarded-for" in request.headers or "forwarded" in request.headers:
+        return False
+    return request.client is not None and request.client.host in _LOOPBACK_HOSTS
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint(request: Request):
+    """ตัวชี้วัดรูปแบบ Prometheus รวมทุก worker (สิทธิ์เข้าถึงดู _metrics_allowed)"""
+    if not _metrics_allowed(request):
+        raise HTTPException(status_code=401 if METRICS_TOKEN else 403, detail="Unauthorized")
+    return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
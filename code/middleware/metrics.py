@@ -0,0 +1,35 @@
+"""
+Metrics middleware - latency / status ต่อ route และจำนวน request ที่กำลังทำ (app.services.metrics)
+route = path template ของ FastAPI (/api/menus/store/{store_id}) - path ที่ไม่ตรง route รวมเป็น "<other>"
+"""
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services import metrics
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        metrics.HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or metrics.UNMATCHED_ROUTE
+            metrics.observe_request(scope["method"], route, status, time.perf_counter() - start)
@@ -0,0 +1,35 @@
+"""
+Query stats middleware - เก็บจำนวน query / เวลา DB ของแต่ละ request (app.services.query_stats)
+- รวมต่อ route (path template) ส่งเข้า /metrics (app.services.metrics) และ log เมื่อ statement เดียวซ้ำจนสงสัย N+1
+- headers=True (DEBUG): ใส่ X-DB-Query-Count, X-DB-Time-Ms, X-DB-Max-Repeat ใน response
+"""
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services import metrics, query_stats
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp, headers: bool = False):
+        self.app = app
+        self.headers = headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with query_stats.collect() as stats:
+            async def send_with_stats(message: Message) -> None:
+                if self.headers and message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers") or ()) + [
+                        (b"x-db-query-count", str(stats.count).encode()),
+                        (b"x-db-time-ms", f"{stats.total_ms:.1f}".encode()),
+                        (b"x-db-max-repeat", str(stats.max_repeat).encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                route = getattr(scope.get("route"), "path", None) or metrics.UNMATCHED_ROUTE
+                query_stats.record_request(scope["method"], route, stats)
+                metrics.observe_queries(scope["method"], route, stats)
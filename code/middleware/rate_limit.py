@@ -0,0 +1,153 @@
+"""
+Rate limiting - token bucket ต่อ (policy, IP) ใช้หน่วยความจำคงที่ และ O(1) ต่อ request
+- LocalBucketStore: เก็บใน process (OrderedDict) เกิน max_keys ทิ้ง IP ที่ไม่ได้ใช้นานที่สุด (LRU)
+- SharedBucketStore: ตาราง slot ขนาดคงที่ในไฟล์ที่ mmap ร่วมกันทุก worker (gunicorn)
+  ล็อกทีละ slot ด้วย fcntl จึงนับรวมทุก worker - slot ชนกันเมื่อ IP ใหม่มาแทน (เหมือน evict)
+- RateLimitPolicy: จำนวนต่อนาทีตาม prefix ของ path (per_minute=None = ไม่จำกัด)
+เลือก store ด้วย env RATE_LIMIT_STORE=local|shared (gunicorn_config ตั้ง shared) - Windows ใช้ local เสมอ
+"""
+import hashlib
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_MAX_KEYS = 10000
+DEFAULT_SHARED_SLOTS = 16384
+SHARED_FILE = Path(__file__).resolve().parent.parent / "data" / "rate_limit.bin"
+
+_SLOT = struct.Struct("<Qdd")  # key hash, tokens, last refill (epoch วินาที)
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """จำนวน request ต่อนาทีของ path ที่ขึ้นต้นด้วย prefix (burst = ใช้ต่อเนื่องได้สูงสุด ค่าเริ่มต้นเท่ากับ per_minute)"""
+    prefix: str
+    per_minute: Optional[int]
+    burst: Optional[int] = None
+
+    @property
+    def capacity(self) -> float:
+        return float(self.burst or self.per_minute or 0)
+
+    @property
+    def rate(self) -> float:
+        return (self.per_minute or 0) / 60.0
+
+
+def _refill(tokens: float, last: float, now: float, rate: float, capacity: float) -> float:
+    elapsed = now - last
+    if elapsed < 0:  # นาฬิกาถอยหลัง (เช่น ไฟล์ shared ค้างจากก่อน reboot)
+        return capacity
+    return min(capacity, tokens + elapsed * rate)
+
+
+class LocalBucketStore:
+    """token bucket ใน process - ไม่ thread-safe (ใช้จาก event loop เดียว)"""
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: str, rate: float, capacity: float, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [capacity, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = _refill(bucket[0], bucket[1], now, rate, capacity)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+
+class SharedBucketStore:
+    """token bucket ในไฟล์ mmap ร่วมกันหลาย process - slot = hash(key) % slots"""
+
+    def __init__(self, path: Path = SHARED_FILE, slots: int = DEFAULT_SHARED_SLOTS):
+        if fcntl is None:
+            raise RuntimeError("SharedBucketStore ต้องใช้ fcntl (Linux/macOS)")
+        self.slots = slots
+        size = slots * _SLOT.size
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # hash() ของ Python สุ่มต่อ process จึงใช้ blake2b ให้ทุก worker ได้ slot เดียวกัน
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big") or 1
+
+    def allow(self, key: str, rate: float, capacity: float, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        key_hash = self._hash(key)
+        offset = (key_hash % self.slots) * _SLOT.size
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _SLOT.size, offset)
+        try:
+            stored, tokens, last = _SLOT.unpack_from(self._map, offset)
+            if stored != key_hash:
+                tokens = capacity
+            else:
+                tokens = _refill(tokens, last, now, rate, capacity)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            _SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _SLOT.size, offset)
+        return allowed
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+def create_store(kind: Optional[str] = None):
+    """store ตาม RATE_LIMIT_STORE (local / shared) - shared ใช้ไม่ได้ก็กลับไปใช้ local"""
+    kind = (kind or os.getenv("RATE_LIMIT_STORE", "local")).lower()
+    if kind == "shared" and fcntl is not None:
+        try:
+            return SharedBucketStore()
+        except OSError:
+            pass
+    return LocalBucketStore()
+
+
+class RateLimiter:
+    """เลือก policy จาก path (prefix แรกที่ตรง) แล้วตัด token จาก bucket ของ (policy, IP)"""
+
+    def __init__(self, policies: Sequence[RateLimitPolicy], default: RateLimitPolicy, store=None):
+        self.policies = list(policies)
+        self.default = default
+        self.store = store if store is not None else create_store()
+
+    def policy_for(self, path: str) -> RateLimitPolicy:
+        for policy in self.policies:
+            if path.startswith(policy.prefix):
+                return policy
+        return self.default
+
+    def allow(self, path: str, client_ip: str, now: Optional[float] = None) -> bool:
+        policy = self.policy_for(path)
+        if not policy.per_minute:
+            return True
+        return self.store.allow(policy.prefix + "|" + client_ip, policy.rate, policy.capacity, now)
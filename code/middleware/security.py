@@ -1,117 +1,96 @@
 """
 Security Middleware for Public Internet Access
 เพิ่มความปลอดภัยสำหรับ public web
+เป็น ASGI middleware ตรง (ไม่ใช้ BaseHTTPMiddleware ที่ห่อ response ทุกตัวด้วย task แยก)
+header คงที่เตรียมไว้ครั้งเดียว - CORS ให้ CORSMiddleware ใน main.py จัดการ
 """
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse, HTMLResponse
-import time
-import os
-from collections import defaultdict
-from typing import Dict, List
+from typing import List
 
-# Rate limiting storage (ใน production ควรใช้ Redis)
-rate_limit_store: Dict[str, list] = defaultdict(list)
+from starlette.responses import HTMLResponse, JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-# Paths ที่ไม่นับ rate limit (polling / หน้าเว็บที่โหลดบ่อย / login / webhook)
-RATE_LIMIT_SKIP_PREFIXES: List[str] = [
-    "/admin",
-    "/api/signage",
-    "/api/auth",
-    "/api/payment-callback/stores/",
-    "/api/payment-callback/webhook",
-    "/store-pos",
-    "/store-pos-login",
-    "/signage",
-    "/customer",
-    "/launch",
-    "/static",
-    "/favicon",
+from middleware.rate_limit import RateLimiter, RateLimitPolicy
+
+# Policy ตาม prefix ของ path (ตัวแรกที่ตรงถูกใช้) - per_minute=None = ไม่นับ (polling / หน้าเว็บที่โหลดบ่อย / login / webhook)
+# path อื่นใช้ rate_limit_per_minute ของ middleware
+RATE_LIMIT_POLICIES: List[RateLimitPolicy] = [
+    RateLimitPolicy("/admin", None),
+    RateLimitPolicy("/api/signage", None),
+    RateLimitPolicy("/api/auth", None),
+    RateLimitPolicy("/api/payment-callback/stores/", None),
+    RateLimitPolicy("/api/payment-callback/webhook", None),
+    RateLimitPolicy("/store-pos", None),
+    RateLimitPolicy("/store-pos-login", None),
+    RateLimitPolicy("/signage", None),
+    RateLimitPolicy("/customer", None),
+    RateLimitPolicy("/launch", None),
+    RateLimitPolicy("/static", None),
+    RateLimitPolicy("/favicon", None),
+    RateLimitPolicy("/metrics", 30),  # Prometheus scrape ทุก 15 วินาที = 4 ครั้งต่อนาที
+]
+
+
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=(self)"),
 ]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
 
+_TOO_MANY_HTML = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>Too Many Requests</title></head><body>
+<h1>429 Too Many Requests</h1>
+<p>คำขอมากเกินไป กรุณารอสักครู่แล้วลองใหม่</p>
+<p><a href="/admin">กลับหน้า Admin</a></p>
+</body></html>"""
 
-def _should_skip_rate_limit(path: str) -> bool:
-    for prefix in RATE_LIMIT_SKIP_PREFIXES:
-        if path.startswith(prefix):
-            return True
-    return False
 
+def _header(scope: Scope, name: bytes) -> str:
+    for key, value in scope.get("headers") or ():
+        if key == name:
+            return value.decode("latin-1")
+    return ""
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+
+class SecurityMiddleware:
     """
     Security middleware สำหรับ public internet
-    - Rate limiting (ยกเว้น path ที่ poll บ่อย เช่น signage, admin)
-    - CORS headers
+    - Rate limiting แบบ token bucket ตาม policy ของ path (path ที่ poll บ่อย เช่น signage, admin ไม่จำกัด)
     - Security headers
     """
-    
-    def __init__(self, app, rate_limit_per_minute: int = 300):
-        super().__init__(app)
+
+    def __init__(self, app: ASGIApp, rate_limit_per_minute: int = 300, policies: List[RateLimitPolicy] = None, store=None):
+        self.app = app
         self.rate_limit_per_minute = rate_limit_per_minute
-    
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host if request.client else "unknown"
-        path = request.url.path or ""
+        self.limiter = RateLimiter(
+            RATE_LIMIT_POLICIES if policies is None else policies,
+            RateLimitPolicy("/", rate_limit_per_minute),
+            store,
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope.get("path") or ""
+        client = scope.get("client")
+        if not self.limiter.allow(path, client[0] if client else "unknown"):
+            await self._too_many_requests(scope, path)(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [h for h in message.get("headers") or () if h[0] not in _SECURITY_HEADER_NAMES]
+                headers.extend(SECURITY_HEADERS)
+                message["headers"] = headers
+            await send(message)
 
-        # ไม่นับ rate limit สำหรับ path ที่โหลด/ poll บ่อย
-        if not _should_skip_rate_limit(path):
-            if not self._check_rate_limit(client_ip):
-                accept = (request.headers.get("accept") or "").lower()
-                if "text/html" in accept or path in ("/admin", "/"):
-                    return HTMLResponse(
-                        status_code=429,
-                        content="""<!DOCTYPE html><html><head><meta charset="utf-8"><title>Too Many Requests</title></head><body>
-                        <h1>429 Too Many Requests</h1>
-                        <p>คำขอมากเกินไป กรุณารอสักครู่แล้วลองใหม่</p>
-                        <p><a href="/admin">กลับหน้า Admin</a></p>
-                        </body></html>""",
-                        media_type="text/html; charset=utf-8",
-                    )
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Too many requests. Please try again later."},
-                )
-        
-        # Security headers
-        response = await call_next(request)
-        
-        # เพิ่ม security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=(self)"
-        
-        # CORS headers (ถ้ายังไม่มี)
-        if "Access-Control-Allow-Origin" not in response.headers:
-            # ควรระบุ domain ที่อนุญาตแทน "*"
-            allowed_origins = os.getenv("ALLOWED_ORIGINS", "*").split(",")
-            origin = request.headers.get("origin")
-            if origin in allowed_origins or "*" in allowed_origins:
-                response.headers["Access-Control-Allow-Origin"] = origin or "*"
-                response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-                response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-                response.headers["Access-Control-Allow-Credentials"] = "true"
-        
-        return response
-    
-    def _check_rate_limit(self, client_ip: str) -> bool:
-        """ตรวจสอบ rate limit"""
-        now = time.time()
-        minute_ago = now - 60
-        
-        # ลบ requests เก่า
-        rate_limit_store[client_ip] = [
-            req_time for req_time in rate_limit_store[client_ip]
-            if req_time > minute_ago
-        ]
-        
-        # ตรวจสอบจำนวน requests
-        if len(rate_limit_store[client_ip]) >= self.rate_limit_per_minute:
-            return False
-        
-        # เพิ่ม request ใหม่
-        rate_limit_store[client_ip].append(now)
-        return True
+        await self.app(scope, receive, send_with_headers)
 
+    @staticmethod
+    def _too_many_requests(scope: Scope, path: str):
+        if "text/html" in _header(scope, b"accept").lower() or path in ("/admin", "/"):
+            return HTMLResponse(status_code=429, content=_TOO_MANY_HTML, media_type="text/html; charset=utf-8")
+        return JSONResponse(status_code=429, content={"detail": "Too many requests. Please try again later."})
@@ -0,0 +1,39 @@
+"""
+Session middleware ที่ข้าม path ซึ่งไม่ใช้ session (ไฟล์ static / webhook / signage)
+ไม่ต้องถอดรหัสและตรวจลายเซ็น cookie ในทุก request - path ที่ข้ามได้ request.session เป็น dict ว่าง
+"""
+from typing import Sequence
+
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# ใช้ session เฉพาะ Store POS login (app/api/auth + หน้า /store-pos) - path เหล่านี้ไม่ต้องใช้
+SESSION_BYPASS_PREFIXES = (
+    "/static",
+    "/contracts",
+    "/menu-images",
+    "/videos",
+    "/ad-media",
+    "/favicon",
+    "/health",
+    "/metrics",
+    # เฉพาะ webhook / POS สาธารณะ - /api/payment-callback/settlements/* ใช้ require_admin ต้องมี session
+    "/api/payment-callback/webhook",
+    "/api/payment-callback/back-transaction",
+    "/api/payment-callback/stores/",
+    "/api/signage",
+)
+
+
+class PathSessionMiddleware:
+    def __init__(self, app: ASGIApp, secret_key: str, bypass_prefixes: Sequence[str] = SESSION_BYPASS_PREFIXES, **kwargs):
+        self.app = app
+        self.session = SessionMiddleware(app, secret_key=secret_key, **kwargs)
+        self.bypass_prefixes = tuple(bypass_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.bypass_prefixes):
+            scope["session"] = {}
+            await self.app(scope, receive, send)
+            return
+        await self.session(scope, receive, send)
@@ -0,0 +1,35 @@
+"""
+ให้แต้มสะสมย้อนหลังทีละวัน (รันซ้ำได้ - รายการที่ให้แต้มแล้วจะไม่ได้ซ้ำ) พร้อมเขียน snapshot ยอดแต้มสิ้นวัน
+ใช้: python scripts/accrue_points.py 2026-10-01 [2026-10-18] [--reconcile]
+"""
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import SessionLocal
+from app.services import points_ledger
+
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+if not args:
+    print(__doc__)
+    sys.exit(1)
+start = date.fromisoformat(args[0])
+end = date.fromisoformat(args[1]) if len(args) > 1 else start
+
+db = SessionLocal()
+try:
+    day = start
+    while day <= end:
+        accrued = points_ledger.accrue_day(db, day)
+        snapshots = points_ledger.write_snapshots(db, day)
+        db.commit()
+        print(f"{day}: {accrued} transactions, {snapshots} snapshots")
+        day += timedelta(days=1)
+    if "--reconcile" in sys.argv:
+        fixed = points_ledger.reconcile_total_points(db)
+        db.commit()
+        print(f"total_points fixed for {fixed} customers")
+finally:
+    db.close()
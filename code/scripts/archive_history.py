@@ -0,0 +1,47 @@
+"""
+ย้ายประวัติที่เก่ากว่า retention ออกจากตารางหลักเป็นไฟล์ gzip JSONL แยกวัน แล้วตรวจไฟล์ (services/archive)
+ใช้: python scripts/archive_history.py [ชื่อตาราง ...] [--verify-only] [--max-days N]
+ย้ายแล้วตรวจเฉพาะไฟล์ที่เพิ่งเขียน --verify-only ตรวจทุกไฟล์ (sha256 + แถวค้างใน hot)
+ไม่ระบุตาราง = ทุกตาราง (promptpay_back_transactions, audit_logs, ad_impressions)
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import SessionLocal  # noqa: E402
+from app.services import archive  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ย้ายประวัติเก่าไป archive แล้วตรวจไฟล์")
+    parser.add_argument("tables", nargs="*", help=f"ค่าเริ่มต้น: ทุกตาราง ({', '.join(archive.ARCHIVES)})")
+    parser.add_argument("--verify-only", action="store_true", help="ตรวจทุกไฟล์อย่างเดียว ไม่ย้าย")
+    parser.add_argument("--max-days", type=int, default=None, help="ย้ายไม่เกิน N วันต่อตาราง")
+    args = parser.parse_args()
+    unknown = [name for name in args.tables if name not in archive.ARCHIVES]
+    if unknown:
+        parser.error(f"ไม่รู้จักตาราง: {', '.join(unknown)}")
+
+    failed = False
+    db = SessionLocal()
+    try:
+        for name in args.tables or list(archive.ARCHIVES):
+            files = None
+            if not args.verify_only:
+                result = archive.archive_table(db, name, max_days=args.max_days)
+                print(f"{name}: ย้าย {result.rows} แถว ({result.days} วัน)")
+                files = result.files
+            check = archive.verify(name, db, files=files)
+            print(f"{name}: ตรวจ {check.files} ไฟล์ {check.rows} แถว - {'OK' if check.ok else 'ผิดพลาด'}")
+            for error in check.errors:
+                print(f"  {error}")
+            failed = failed or not check.ok
+    finally:
+        db.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: แปลงรายการเมนูตาม locale (500 รายการ x 9 ภาษา)
+เทียบวิธีเดิม (json.loads ทุกครั้ง + dumps/loads name_i18n ของ addon) กับ app.utils.i18n ที่ parse ครั้งเดียว
+ไม่ต้องต่อ DB
+ใช้: python scripts/bench_i18n.py [--items 500] [--rounds 20]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.utils.i18n import SUPPORTED_LOCALES, clear_i18n_caches, project_menu_text  # noqa: E402
+
+
+# ---------- วิธีเดิม (ก่อนมี cache) สำหรับเปรียบเทียบ ----------
+
+def _legacy_resolve_i18n(i18n_json, default, locale):
+    if not i18n_json or not i18n_json.strip():
+        return default or ""
+    try:
+        data = json.loads(i18n_json)
+        if not isinstance(data, dict):
+            return default or ""
+        for lang in (locale, "th", "en"):
+            if lang in data and data[lang]:
+                return str(data[lang]).strip()
+        return default or (list(data.values())[0] if data else "")
+    except (json.JSONDecodeError, TypeError):
+        return default or ""
+
+
+def _legacy_resolve_addon_options(addon_options_json, locale):
+    if not addon_options_json or not addon_options_json.strip():
+        return addon_options_json
+    try:
+        arr = json.loads(addon_options_json)
+        if not isinstance(arr, list):
+            return addon_options_json
+        out = []
+        for item in arr:
+            if not isinstance(item, dict):
+                out.append(item)
+                continue
+            copy = dict(item)
+            name_i18n = copy.get("name_i18n")
+            if name_i18n and isinstance(name_i18n, dict):
+                copy["name"] = _legacy_resolve_i18n(json.dumps(name_i18n), copy.get("name", ""), locale)
+            out.append(copy)
+        return json.dumps(out, ensure_ascii=False)
+    except (json.JSONDecodeError, TypeError):
+        return addon_options_json
+
+
+def _legacy_project(menu, locale):
+    name = _legacy_resolve_i18n(menu.name_i18n, menu.name, locale)
+    description = _legacy_resolve_i18n(menu.description_i18n, menu.description, locale)
+    addon = _legacy_resolve_addon_options(menu.addon_options, locale) if menu.addon_options else None
+    return name or menu.name, description or menu.description, addon or menu.addon_options
+
+
+# ---------- ข้อมูลทดสอบ ----------
+
+def make_menus(n: int):
+    menus = []
+    for i in range(n):
+        names = {loc: f"เมนู {i} ({loc})" for loc in SUPPORTED_LOCALES}
+        descs = {loc: f"คำอธิบายเมนู {i} ภาษา {loc}" for loc in SUPPORTED_LOCALES}
+        addons = [
+            {"name": f"ท็อปปิ้ง {j}", "price": 10 + j, "name_i18n": {loc: f"Topping {j} {loc}" for loc in SUPPORTED_LOCALES}}
+            for j in range(4)
+        ]
+        menus.append(SimpleNamespace(
+            id=i + 1,
+            name=f"เมนู {i}",
+            name_i18n=json.dumps(names, ensure_ascii=False),
+            description=f"คำอธิบาย {i}",
+            description_i18n=json.dumps(descs, ensure_ascii=False),
+            addon_options=json.dumps(addons, ensure_ascii=False),
+        ))
+    return menus
+
+
+def bench(label: str, fn, menus, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for locale in SUPPORTED_LOCALES:
+            for menu in menus:
+                fn(menu, locale)
+    elapsed = time.perf_counter() - start
+    per_list = elapsed / (rounds * len(SUPPORTED_LOCALES)) * 1000
+    print(f"{label:<28} total {elapsed:8.3f}s  per menu list {per_list:8.3f} ms")
+    return per_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description="i18n menu projection micro-benchmark")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    menus = make_menus(args.items)
+    print(f"menus={args.items} locales={len(SUPPORTED_LOCALES)} rounds={args.rounds}")
+
+    # ตรวจว่าผลลัพธ์ตรงกับวิธีเดิม
+    for locale in SUPPORTED_LOCALES:
+        for menu in menus[:50]:
+            assert project_menu_text(menu, locale) == _legacy_project(menu, locale), (menu.id, locale)
+
+    legacy = bench("legacy (json per call)", _legacy_project, menus, args.rounds)
+    clear_i18n_caches()
+    cold = bench("cached (cold, 1 round)", project_menu_text, menus, 1)
+    warm = bench("cached (warm)", project_menu_text, menus, args.rounds)
+    print(f"speedup warm vs legacy: {legacy / warm:.1f}x (cold round {cold:.3f} ms per list)")
+
+
+if __name__ == "__main__":
+    main()
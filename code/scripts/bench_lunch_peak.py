@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Load test ช่วงพีคเที่ยง - ยิง mix ของ request แบบ food court จริงแล้วสรุป p50 / p95 / p99 + throughput
+- ข้อมูล: scripts/seed_load_sample.py (seed ให้อัตโนมัติถ้า DB ยังว่าง) - SQLite ใน data/bench หรือ MariaDB ว่าง
+- ค่าเริ่มต้นยิงเข้า app ใน process (httpx ASGITransport ไม่มี network) ตัวแปรน้อย เทียบข้าม commit ได้
+  แต่ละ request มาจาก IP ของอุปกรณ์ที่สุ่มจาก DEVICES เครื่อง (rate limit ต่อ IP ทำงานเหมือนหน้างานจริง)
+  --base-url ยิงเข้า server ที่รันอยู่ (เช่น gunicorn -c gunicorn_config.py main:app) ต้อง seed DB เดียวกันก่อน
+  (ทุก request มาจาก IP เดียว - 429 จาก rate limit จะนับใน 4xx)
+- mix (น้ำหนักต่อ request): โหลดเมนู, จอ signage poll, store-pos poll เงินเข้า, สร้าง PromptPay QR,
+  webhook ธนาคาร, สมาชิก scan-pay, รายงาน admin
+- ผลเขียน JSON ต่อ commit ใน data/bench/ (--output) และ --compare ไฟล์ผลของ commit อื่นเพื่อดูส่วนต่าง
+
+ใช้: python scripts/bench_lunch_peak.py [--scale lunch|smoke] [--requests 5000] [--concurrency 32]
+                                     [--database-url URL] [--base-url URL] [--compare data/bench/<commit>.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+RESULTS_DIR = ROOT / "data" / "bench"
+DEVICES = 2000  # มือถือลูกค้า / จอ / POS ในศูนย์อาหารช่วงเที่ยง
+CLIENT_HEADER = "x-bench-client"
+DEFAULT_DATABASE_URL = f"sqlite:///{RESULTS_DIR / 'lunch_peak.db'}"
+
+# app สร้าง engine จาก DATABASE_URL ตอน import ครั้งแรก (seed_load_sample import models) จึงต้องตั้งก่อน import
+_pre = argparse.ArgumentParser(add_help=False)
+_pre.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+os.environ["DATABASE_URL"] = _pre.parse_known_args()[0].database_url
+
+import httpx  # noqa: E402
+
+from seed_load_sample import SCALES, FoodCourt, food_court_for, seed_food_court  # noqa: E402
+
+
+class Call(NamedTuple):
+    method: str
+    path: str
+    params: Optional[dict] = None
+    json: Optional[dict] = None
+    headers: Optional[dict] = None
+
+
+class Scenario(NamedTuple):
+    name: str
+    weight: int
+    build: Callable[[random.Random, "Context"], Call]
+
+
+class Context(NamedTuple):
+    court: FoodCourt
+    member_tokens: Dict[int, str]
+
+
+# ---------- mix ช่วงเที่ยง ----------
+
+def _menus(rng, ctx):
+    return Call("GET", f"/api/menus/store/{rng.choice(ctx.court.store_ids)}")
+
+
+def _signage(rng, ctx):
+    return Call("GET", "/api/signage/display", params={"store_id": rng.choice(ctx.court.store_ids)})
+
+
+def _pos_recent_paid(rng, ctx):
+    since = (datetime.now() - timedelta(seconds=30)).isoformat()
+    return Call("GET", f"/api/payment-callback/stores/{rng.choice(ctx.court.store_ids)}/recent-paid",
+                params={"since": since})
+
+
+def _promptpay_qr(rng, ctx):
+    price = rng.choice((45, 50, 55, 60))
+    qty = rng.randint(1, 3)
+    return Call("POST", f"/api/stores/{rng.choice(ctx.court.store_ids)}/generate-promptpay-qr", json={
+        "amount": price * qty,
+        "order_lines": [{"menu_id": 1, "name": "ข้าวผัด", "qty": qty, "unit_price": price}],
+    })
+
+
+def _bank_webhook(rng, ctx):
+    store_id = rng.choice(ctx.court.store_ids)
+    return Call("POST", "/api/payment-callback/webhook", json={
+        "ref1": ctx.court.tokens[store_id],
+        "ref2": str(rng.randrange(10 ** 11)).zfill(12),
+        "amount": float(rng.choice((45, 50, 90, 120))),
+        "paid_at": (datetime.utcnow() - timedelta(seconds=rng.randint(1, 5))).isoformat() + "Z",
+        "payment_gateway": rng.choice(("scb", "kbank")),
+    })
+
+
+def _scan_pay(rng, ctx):
+    member_id = rng.choice(list(ctx.member_tokens))
+    return Call("POST", "/api/member/scan-pay",
+                json={"store_id": rng.choice(ctx.court.store_ids), "amount": float(rng.choice((35, 45, 50)))},
+                headers={"Authorization": f"Bearer {ctx.member_tokens[member_id]}"})
+
+
+def _admin_report(rng, ctx):
+    day = ctx.court.last_day - timedelta(days=rng.randrange(1, 8))
+    return rng.choice((
+        Call("GET", "/api/reports/payment/daily", params={"date": day.date().isoformat()}),
+        Call("GET", "/api/payment-callback/back-transactions/report",
+             params={"start_date": day.date().isoformat(), "end_date": day.date().isoformat(), "limit": 200}),
+        Call("GET", f"/api/reports/payment/store/{rng.choice(ctx.court.store_ids)}",
+             params={"start_date": (day - timedelta(days=30)).date().isoformat(), "end_date": day.date().isoformat()}),
+    ))
+
+
+LUNCH_MIX = [
+    Scenario("menus", 30, _menus),
+    Scenario("signage_poll", 25, _signage),
+    Scenario("pos_recent_paid", 15, _pos_recent_paid),
+    Scenario("promptpay_qr", 10, _promptpay_qr),
+    Scenario("bank_webhook", 10, _bank_webhook),
+    Scenario("scan_pay", 7, _scan_pay),
+    Scenario("admin_report", 3, _admin_report),
+]
+
+
+# ---------- ยิง + สรุป ----------
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """nearest-rank percentile ของ list ที่เรียงแล้ว"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _summary(latencies: List[float], errors: int, rejected: int, seconds: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rejected": rejected,
+        "throughput_rps": round(len(values) / seconds, 1) if seconds else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+    }
+
+
+async def run_mix(client: httpx.AsyncClient, ctx: Context, requests: int, concurrency: int, seed: int) -> dict:
+    """ยิง requests ครั้งด้วย concurrency งานพร้อมกัน คืนผลรวมและแยกตาม scenario"""
+    rng = random.Random(seed)
+    weights = [s.weight for s in LUNCH_MIX]
+    plan = [rng.choices(LUNCH_MIX, weights)[0] for _ in range(requests)]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)  # 5xx / ต่อไม่ได้
+    rejected: Dict[str, int] = defaultdict(int)  # 4xx (เช่น คูปองไม่พอ) - เพิ่มขึ้นข้าม commit = mix ไม่ได้วัดสิ่งเดิม
+    next_index = 0
+
+    async def worker(worker_id: int):
+        nonlocal next_index
+        worker_rng = random.Random(seed * 1000 + worker_id)
+        while next_index < len(plan):
+            scenario = plan[next_index]
+            next_index += 1
+            call = scenario.build(worker_rng, ctx)
+            headers = {CLIENT_HEADER: str(worker_rng.randrange(DEVICES)), **(call.headers or {})}
+            start = time.perf_counter()
+            try:
+                response = await client.request(call.method, call.path, params=call.params, json=call.json,
+                                                headers=headers)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            latencies[scenario.name].append((time.perf_counter() - start) * 1000)
+            if status is None or status >= 500:
+                errors[scenario.name] += 1
+            elif status >= 400:
+                rejected[scenario.name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    seconds = time.perf_counter() - start
+    every = [ms for values in latencies.values() for ms in values]
+    return {
+        "total": _summary(every, sum(errors.values()), sum(rejected.values()), seconds),
+        "scenarios": {
+            s.name: _summary(latencies[s.name], errors[s.name], rejected[s.name], seconds) for s in LUNCH_MIX
+        },
+    }
+
+
+def _with_device_ip(app):
+    """ASGI ใน process: ตั้ง client IP ตาม header x-bench-client (เลขอุปกรณ์) แทน IP เดียวของ ASGITransport"""
+    header = CLIENT_HEADER.encode()
+
+    async def wrapped(scope, receive, send):
+        if scope["type"] == "http":
+            device = next((int(v) for k, v in scope["headers"] if k == header), 0)
+            scope["client"] = (f"10.{device // 65536}.{device // 256 % 256}.{device % 256}", 50000)
+        await app(scope, receive, send)
+    return wrapped
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _print_results(results: dict, baseline: Optional[dict]) -> None:
+    header = f"{'scenario':<16}{'req':>7}{'err':>5}{'4xx':>5}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    if baseline:
+        header += f"  vs {baseline['commit']} (p95 / rps)"
+    print(header)
+    rows = [("TOTAL", results["total"])] + list(results["scenarios"].items())
+    for name, r in rows:
+        line = (f"{name:<16}{r['requests']:>7}{r['errors']:>5}{r['rejected']:>5}{r['throughput_rps']:>9}"
+                f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+        if baseline:
+            b = baseline["total"] if name == "TOTAL" else baseline["scenarios"].get(name)
+            if b and b["p95_ms"] and b["throughput_rps"]:
+                line += (f"  {(r['p95_ms'] / b['p95_ms'] - 1) * 100:+6.1f}%"
+                         f" / {(r['throughput_rps'] / b['throughput_rps'] - 1) * 100:+6.1f}%")
+        print(line)
+
+
+def _prepare_database(database_url: str, scale_name: str, seed: int) -> FoodCourt:
+    from sqlalchemy import create_engine, func, select
+    from app.models import Store
+
+    if database_url.startswith("sqlite:///"):
+        Path(database_url[len("sqlite:///"):]).parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(database_url)
+    try:
+        from app.database import Base
+        Base.metadata.create_all(bind=engine)
+        with engine.connect() as conn:
+            existing = conn.execute(select(func.count()).select_from(Store)).scalar()
+        scale = SCALES[scale_name]
+        if existing:
+            if existing != scale.stores:
+                raise SystemExit(f"DB มี {existing} ร้าน ไม่ตรงกับ --scale {scale_name} ({scale.stores}) - seed ใหม่ด้วย --reseed")
+            return food_court_for(scale, datetime.now())
+        print(f"seeding {scale_name} -> {database_url} ...")
+        return seed_food_court(engine, scale, seed)
+    finally:
+        engine.dispose()
+
+
+async def _main_async(args) -> dict:
+    from app.api.member import create_token
+
+    if args.reseed:
+        from sqlalchemy import create_engine
+        from app.database import Base
+        engine = create_engine(args.database_url)
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+    court = _prepare_database(args.database_url, args.scale, args.seed)
+    rng = random.Random(args.seed)
+    members = rng.sample(court.member_ids, min(200, len(court.member_ids)))
+    ctx = Context(court=court, member_tokens={m: create_token(m) for m in members})
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30.0,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+        lifespan = None
+    else:
+        from main import app
+        logging.disable(logging.INFO)  # log ต่อ request ของ app / httpx ทำให้ตัวเลขเพี้ยน
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=_with_device_ip(app)),
+                                   base_url="http://bench", timeout=30.0)
+        lifespan = app.router.lifespan_context(app)
+    async with client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            await run_mix(client, ctx, min(args.requests, 200), args.concurrency, args.seed + 1)  # warm-up
+            return await run_mix(client, ctx, args.requests, args.concurrency, args.seed)
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load test ช่วงพีคเที่ยงของ food court")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="lunch")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--base-url", default=None, help="ยิง server ที่รันอยู่แทน app ใน process")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reseed", action="store_true", help="ล้าง DB แล้ว seed ใหม่")
+    parser.add_argument("--output", default=None, help="ไฟล์ผล JSON (ค่าเริ่มต้น data/bench/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="ไฟล์ผล JSON ของ commit อื่น")
+    args = parser.parse_args()
+
+    results = asyncio.run(_main_async(args))
+    commit = _git_commit()
+    results.update({
+        "commit": commit,
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "target": args.base_url or "in-process",
+        "database": args.database_url.split("://")[0],
+        "scale": args.scale,
+        "concurrency": args.concurrency,
+    })
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    _print_results(results, baseline)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresults -> {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: overhead ต่อ request ของ middleware stack (security + session)
+เทียบแบบเดิม (SecurityMiddleware บน BaseHTTPMiddleware + SessionMiddleware ทุก path)
+กับ ASGI middleware ตรง (middleware.security + middleware.session) - เรียก ASGI app ตรงไม่ผ่าน network ไม่ต้องต่อ DB
+ใช้: python scripts/bench_middleware.py [--requests 5000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.middleware.sessions import SessionMiddleware  # noqa: E402
+from starlette.responses import JSONResponse, PlainTextResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from middleware.rate_limit import LocalBucketStore  # noqa: E402
+from middleware.security import SecurityMiddleware  # noqa: E402
+from middleware.session import PathSessionMiddleware  # noqa: E402
+
+SECRET = "bench-secret"
+LIMIT = 10 ** 9  # ไม่ให้ชน 429 ระหว่างวัด
+
+
+# ---------- แบบเดิม (ก่อนเป็น ASGI ตรง) สำหรับเปรียบเทียบ ----------
+
+_legacy_store = defaultdict(list)
+
+
+class _LegacySecurityMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        client_ip = request.client.host if request.client else "unknown"
+        now = time.time()
+        _legacy_store[client_ip] = [t for t in _legacy_store[client_ip] if t > now - 60]
+        if len(_legacy_store[client_ip]) >= LIMIT:
+            return JSONResponse(status_code=429, content={"detail": "Too many requests"})
+        _legacy_store[client_ip].append(now)
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=(self)"
+        if "Access-Control-Allow-Origin" not in response.headers:
+            allowed_origins = os.getenv("ALLOWED_ORIGINS", "*").split(",")
+            origin = request.headers.get("origin")
+            if origin in allowed_origins or "*" in allowed_origins:
+                response.headers["Access-Control-Allow-Origin"] = origin or "*"
+                response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+                response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+                response.headers["Access-Control-Allow-Credentials"] = "true"
+        return response
+
+
+# ---------- app ทดสอบ ----------
+
+async def _ok(request):
+    return PlainTextResponse("ok")
+
+
+def make_app(stack: str):
+    app = Starlette(routes=[Route("/api/menus", _ok), Route("/api/payment-callback/webhook", _ok, methods=["POST"])])
+    if stack == "legacy":
+        app.add_middleware(SessionMiddleware, secret_key=SECRET)
+        app.add_middleware(_LegacySecurityMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(PathSessionMiddleware, secret_key=SECRET)
+        app.add_middleware(SecurityMiddleware, rate_limit_per_minute=LIMIT, store=LocalBucketStore())
+    return app
+
+
+def _scope(path: str, method: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"accept", b"application/json"), (b"origin", b"http://pos.local")],
+        "client": ("10.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def _run(app, path: str, method: str, n: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(_scope(path, method), receive, send)  # warm-up (สร้าง middleware stack)
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(_scope(path, method), receive, send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="middleware stack overhead micro-benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"requests={args.requests} per case (µs/request, overhead = เทียบกับไม่มี middleware)")
+    for path, method in (("/api/menus", "GET"), ("/api/payment-callback/webhook", "POST")):
+        results = {stack: asyncio.run(_run(make_app(stack), path, method, args.requests))
+                   for stack in ("none", "legacy", "asgi")}
+        base = results["none"]
+        legacy, asgi = results["legacy"] - base, results["asgi"] - base
+        print(f"{method} {path}")
+        print(f"  none   {base:8.1f}")
+        print(f"  legacy {results['legacy']:8.1f}  overhead {legacy:8.1f}")
+        print(f"  asgi   {results['asgi']:8.1f}  overhead {asgi:8.1f}  ({legacy / max(asgi, 0.1):.1f}x less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Migration: composite / covering index ตาม access path ของ query ที่ถูกเรียกถี่ (index ประกาศใน app/models.py)
+- ก่อนสร้าง: EXPLAIN query ตัวแทนของแต่ละ access path (เหมือนที่ service เรียกจริง) บอกว่าใช้ index ที่ควรใช้หรือยัง
+- สร้างเฉพาะ index ที่ยังไม่มี (checkfirst) - InnoDB สร้าง secondary index แบบ online ไม่ล็อกการเขียน
+  แล้ว ANALYZE TABLE ให้ planner เห็นสถิติใหม่ และ EXPLAIN ซ้ำให้เห็นแผนหลังสร้าง
+- DATE(settlement_date) = วัน ถูกเขียนใหม่เป็นช่วงใน services/settlement_service (_on_day) แล้วจึงใช้ index ได้
+รันครั้งเดียว: python scripts/migrate_access_path_indexes.py [--dry-run]
+"""
+import argparse
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func, inspect, select, text  # noqa: E402
+from sqlalchemy.sql import Select  # noqa: E402
+
+from app.database import Base, engine  # noqa: E402
+from app.models import (  # noqa: E402
+    AdImpression,
+    AuditLog,
+    Order,
+    PromptPayBackTransaction as Back,
+    StoreSettlement,
+    StoreTransaction,
+    Transaction,
+    TransactionStatus,
+)
+
+STORE_ID = 1  # ค่าตัวอย่างใน query ตัวแทน (แผนไม่ขึ้นกับค่า)
+
+
+@dataclass(frozen=True)
+class AccessPath:
+    name: str
+    index: str
+    statement: Callable[[datetime], Select]
+
+
+def _day(now: datetime) -> datetime:
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+ACCESS_PATHS: List[AccessPath] = [
+    AccessPath(
+        "store-pos เงินเข้าล่าสุด (get_recent_paid_for_store)", "ix_promptpay_back_transactions_store_status_paid",
+        lambda now: select(Back.id).where(
+            Back.store_id == STORE_ID, Back.status == "received", Back.paid_at >= now - timedelta(hours=1),
+        ).order_by(Back.paid_at.desc()).limit(50),
+    ),
+    AccessPath(
+        "live feed รายร้าน (get_back_transactions_live)", "ix_promptpay_back_transactions_store_created",
+        lambda now: select(Back.id).where(
+            Back.store_id == STORE_ID, Back.created_at > now - timedelta(minutes=1),
+        ).order_by(Back.created_at.desc()).limit(100),
+    ),
+    AccessPath(
+        "live feed ทุกร้าน (get_back_transactions_live)", "ix_promptpay_back_transactions_created",
+        lambda now: select(Back.id).where(Back.created_at > now - timedelta(minutes=1)).order_by(
+            Back.created_at.desc()
+        ).limit(100),
+    ),
+    AccessPath(
+        "settlement สิ้นวัน (create_daily_settlements)", "ix_promptpay_back_transactions_paid_store",
+        lambda now: select(Back.store_id, func.sum(Back.amount)).where(
+            Back.paid_at >= _day(now), Back.paid_at < _day(now) + timedelta(days=1), Back.store_id.isnot(None),
+        ).group_by(Back.store_id),
+    ),
+    AccessPath(
+        "รายการโอนของวัน (get_settlement_list)", "ix_store_settlements_date_store",
+        lambda now: select(StoreSettlement.id).where(
+            StoreSettlement.settlement_date >= _day(now),
+            StoreSettlement.settlement_date < _day(now) + timedelta(days=1),
+        ).order_by(StoreSettlement.store_id),
+    ),
+    AccessPath(
+        "ใบเสร็จ settlement ของร้าน", "ix_store_settlements_store_date",
+        lambda now: select(StoreSettlement.id).where(StoreSettlement.store_id == STORE_ID).order_by(
+            StoreSettlement.settlement_date.desc()
+        ).limit(30),
+    ),
+    AccessPath(
+        "ReportService รายร้าน", "ix_store_transactions_store_status_created",
+        lambda now: select(StoreTransaction.id).where(
+            StoreTransaction.store_id == STORE_ID, StoreTransaction.status == "completed",
+            StoreTransaction.created_at >= now - timedelta(days=30), StoreTransaction.created_at <= now,
+        ),
+    ),
+    AccessPath(
+        "ReportService รายวัน / admin สถิติ", "ix_store_transactions_created_status",
+        lambda now: select(func.sum(StoreTransaction.amount)).where(
+            StoreTransaction.created_at >= _day(now), StoreTransaction.status == "completed",
+        ),
+    ),
+    AccessPath(
+        "แต้มสะสม / รายงานภาษี", "ix_transactions_status_created",
+        lambda now: select(Transaction.id).where(
+            Transaction.status == TransactionStatus.CONFIRMED,
+            Transaction.created_at >= _day(now) - timedelta(days=1), Transaction.created_at < _day(now),
+        ),
+    ),
+    AccessPath(
+        "admin ธุรกรรมของร้าน", "ix_transactions_store_created",
+        lambda now: select(Transaction.id).where(Transaction.store_id == STORE_ID).order_by(
+            Transaction.created_at.desc()
+        ).limit(100),
+    ),
+    AccessPath(
+        "admin ธุรกรรมล่าสุด", "ix_transactions_created",
+        lambda now: select(Transaction.id).order_by(Transaction.created_at.desc()).limit(100),
+    ),
+    AccessPath(
+        "store-pos ประวัติ order", "ix_orders_store_status_created",
+        lambda now: select(Order.id).where(Order.store_id == STORE_ID, Order.status == "paid").order_by(
+            Order.created_at.desc()
+        ).limit(50),
+    ),
+    AccessPath(
+        "archive audit_logs", "ix_audit_logs_created",
+        lambda now: select(func.min(AuditLog.created_at)).where(AuditLog.created_at < _day(now)),
+    ),
+    AccessPath(
+        "archive ad_impressions", "ix_ad_impressions_created",
+        lambda now: select(func.min(AdImpression.created_at)).where(AdImpression.created_at < _day(now)),
+    ),
+]
+
+
+def explain(conn, statement: Select) -> List[str]:
+    """แผนของ statement หนึ่งบรรทัดต่อตาราง / ขั้น (MySQL: EXPLAIN, SQLite: EXPLAIN QUERY PLAN)"""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+    return [
+        f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}".rstrip()
+        for row in conn.exec_driver_sql("EXPLAIN " + sql).mappings()
+    ]
+
+
+def _indexes() -> Dict[str, object]:
+    wanted = {path.index for path in ACCESS_PATHS}
+    return {
+        index.name: index
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+        if index.name in wanted
+    }
+
+
+def report(now: datetime) -> List[str]:
+    """index ที่ยังไม่มี (ตามลำดับ ACCESS_PATHS) - พิมพ์แผนปัจจุบันของทุก access path"""
+    indexes = _indexes()
+    inspector = inspect(engine)
+    existing = {
+        table: {ix["name"] for ix in inspector.get_indexes(table)}
+        for table in {index.table.name for index in indexes.values()}
+    }
+    missing = []
+    with engine.connect() as conn:
+        for path in ACCESS_PATHS:
+            plan = explain(conn, path.statement(now))
+            table = indexes[path.index].table.name
+            if path.index not in existing[table]:
+                status = "ยังไม่มี index"
+                if path.index not in missing:
+                    missing.append(path.index)
+            elif any(path.index in line for line in plan):
+                status = "ใช้ index แล้ว"
+            else:
+                status = "มี index แต่ planner ยังไม่เลือก (ข้อมูลน้อย / สถิติเก่า)"
+            print(f"- {path.name}: {path.index} -> {status}")
+            for line in plan:
+                print(f"    {line}")
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="สร้าง composite / covering index ตาม access path")
+    parser.add_argument("--dry-run", action="store_true", help="แสดงแผนและ index ที่ขาด ไม่สร้าง")
+    args = parser.parse_args()
+
+    now = datetime.now()
+    missing = report(now)
+    if args.dry_run or not missing:
+        print(f"Migration: ขาด {len(missing)} index" + (" (dry run)" if args.dry_run else ""))
+        return 0
+    indexes = _indexes()
+    for name in missing:
+        print(f"CREATE INDEX {name} ...")
+        indexes[name].create(bind=engine, checkfirst=True)
+    if engine.dialect.name == "mysql":
+        with engine.begin() as conn:
+            for table in sorted({indexes[name].table.name for name in missing}):
+                conn.execute(text(f"ANALYZE TABLE {table}"))
+    print("หลังสร้าง index:")
+    report(now)
+    print(f"Migration: access path indexes done ({len(missing)} created)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+"""
+Migration: สร้างตาราง ad_impression_counters แล้วเติมยอดต่อนาทีจาก ad_impressions ที่มีอยู่
+(สรุปโฆษณาอ่านจากตารางนี้แทน COUNT(*) บน ad_impressions)
+รันครั้งเดียว: python scripts/migrate_ad_impression_counters.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.models import Base, AdImpressionCounter
+
+Base.metadata.create_all(bind=engine, tables=[AdImpressionCounter.__table__])
+with engine.begin() as conn:
+    conn.execute(text("DELETE FROM ad_impression_counters"))
+    conn.execute(text("""
+        INSERT INTO ad_impression_counters (ad_feed_id, minute, views, clicks)
+        SELECT ad_feed_id,
+               DATE_FORMAT(created_at, '%Y-%m-%d %H:%i:00') AS minute,
+               SUM(event_type = 'view'),
+               SUM(event_type = 'click')
+        FROM ad_impressions
+        WHERE created_at IS NOT NULL
+        GROUP BY ad_feed_id, minute
+    """))
+print("Migration: ad_impression_counters done")
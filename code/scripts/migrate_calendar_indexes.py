@@ -0,0 +1,18 @@
+"""
+Migration: index (is_active, เริ่ม, สิ้นสุด) ของ ad_feeds / store_promotions / coupon_promos / events
+ให้ query ช่วงวันที่ของปฏิทิน (services/calendar_events) ไม่ต้องสแกนทั้งตาราง
+รันครั้งเดียว: python scripts/migrate_calendar_indexes.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import engine
+from app.models import AdFeed, CouponPromo, Event, StorePromotion
+
+for model in (AdFeed, StorePromotion, CouponPromo, Event):
+    for index in model.__table__.indexes:
+        if index.name and index.name.endswith("_active_range"):
+            index.create(bind=engine, checkfirst=True)
+print("Migration: calendar range indexes done")
@@ -0,0 +1,46 @@
+"""
+Migration: ตารางสำหรับ e-coupon redemption engine
+- e_coupon_stores: ร้านที่ใช้คูปองได้ (backfill จาก e_coupons.allowed_store_ids)
+  ค่าที่หมายถึงทุกร้าน (" ", "[ ]", "null", JSON เสีย) ถูกเขียนเป็น NULL
+- e_coupon_redemptions: สมุดการหักคูปอง
+- index ix_e_coupons_customer_status (customer_id, status, id) บน e_coupons
+รัน (ซ้ำได้): python scripts/migrate_ecoupon_redemption.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models import Base, ECoupon, ECouponRedemption, ECouponStore
+from app.services.ecoupon_redemption import parse_allowed_store_ids, set_coupon_stores
+
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=[ECouponStore.__table__, ECouponRedemption.__table__])
+    index = next(ix for ix in ECoupon.__table__.indexes if ix.name == "ix_e_coupons_customer_status")
+    try:
+        index.create(bind=engine)
+    except Exception:
+        pass  # มีอยู่แล้ว
+
+    with Session(engine) as db:
+        rows = db.execute(
+            select(ECoupon.id, ECoupon.allowed_store_ids).where(ECoupon.allowed_store_ids.is_not(None))
+        ).all()
+        restricted = 0
+        for row in rows:
+            set_coupon_stores(db, row.id, row.allowed_store_ids)
+            restricted += bool(parse_allowed_store_ids(row.allowed_store_ids))
+        db.commit()
+    print(
+        f"Migration: e_coupon_stores backfilled {restricted} coupons, "
+        f"{len(rows) - restricted} set to all stores (NULL), e_coupon_redemptions done"
+    )
+
+
+if __name__ == "__main__":
+    main()
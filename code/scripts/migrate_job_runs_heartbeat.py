@@ -0,0 +1,30 @@
+"""
+Migration: เพิ่มคอลัมน์ heartbeat_at ใน job_runs (leader ใหม่รับรอบ running ของ runner ที่ตายไปแล้วมารันต่อ)
+รันครั้งเดียว: จากโฟลเดอร์ code: python scripts/migrate_job_runs_heartbeat.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text
+from app.database import engine
+from app.models import Base, JobRun
+
+
+def run():
+    Base.metadata.create_all(bind=engine, tables=[JobRun.__table__])
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE job_runs ADD COLUMN heartbeat_at DATETIME NULL AFTER started_at"))
+            conn.commit()
+            print("Migration: job_runs.heartbeat_at added.")
+        except Exception as e:
+            if "Duplicate column" in str(e) or "1060" in str(e):
+                print("Migration: job_runs.heartbeat_at already exists, skip.")
+            else:
+                raise
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,15 @@
+"""
+Migration: สร้างตาราง member_summaries (สรุปหน้า dashboard สมาชิก)
+ไม่ต้องเติมข้อมูล - แถวของแต่ละคนถูกสร้างตอนเปิด dashboard ครั้งแรก
+รันครั้งเดียว: python scripts/migrate_member_summaries.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import engine
+from app.models import Base, MemberSummary
+
+Base.metadata.create_all(bind=engine, tables=[MemberSummary.__table__])
+print("Migration: member_summaries done")
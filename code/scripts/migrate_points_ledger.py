@@ -0,0 +1,31 @@
+"""
+Migration: สร้างตาราง member_points_snapshots + index ของ member_points_ledger
+(unique (customer_id, reason, ref_id) กันให้แต้มซ้ำ, created_at สำหรับ snapshot รายวัน)
+แล้วบันทึกแต้มที่มีอยู่ก่อนใช้ ledger เป็นแถว opening_balance (ส่วนต่าง total_points - ผลรวม ledger ต่อคน)
+ก่อนปรับ customers.total_points ให้ตรงกับผลรวมใน ledger - ไม่มีลูกค้าคนไหนเสียแต้มเดิม
+รันครั้งเดียว: python scripts/migrate_points_ledger.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import SessionLocal, engine
+from app.models import Base, MemberPointsLedger, MemberPointsSnapshot
+from app.services import points_ledger
+
+Base.metadata.create_all(bind=engine, tables=[MemberPointsLedger.__table__, MemberPointsSnapshot.__table__])
+for index in MemberPointsLedger.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
+
+db = SessionLocal()
+try:
+    opened = points_ledger.post_opening_balances(db)
+    fixed = points_ledger.reconcile_total_points(db)
+    db.commit()
+finally:
+    db.close()
+print(
+    f"Migration: member points ledger done "
+    f"(opening balance for {opened} customers, total_points fixed for {fixed} customers)"
+)
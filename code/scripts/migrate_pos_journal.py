@@ -0,0 +1,14 @@
+"""
+Migration: สร้างตาราง pos_journal_entries (รายการจาก journal ออฟไลน์ของ Store POS + unique (store_id, client_id))
+รันครั้งเดียว: python scripts/migrate_pos_journal.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import engine
+from app.models import Base, PosJournalEntry
+
+Base.metadata.create_all(bind=engine, tables=[PosJournalEntry.__table__])
+print("Migration: pos_journal_entries done")
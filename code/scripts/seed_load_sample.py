@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Seed food court ขนาดจริงสำหรับ load test (scripts/bench_lunch_peak.py) - ต่อยอดจาก seed_full_sample.py
+- ร้านหลายร้อย + เมนูหลายพัน (มี name_i18n) + สมาชิกพร้อม e-coupon (scan-pay)
+- ธุรกรรมย้อนหลังหลายเดือน (กระจุกช่วงเที่ยง) + back transaction ของ PromptPay ให้รายงานมีข้อมูลจริง
+- ค่าเดิมทุกครั้งด้วย --seed (random ตายตัว) เทียบผล benchmark ข้าม commit ได้
+- insert เป็นชุดผ่าน Core ไม่ผ่าน ORM (ล้านแถวใช้เวลาเป็นนาที ไม่ใช่ชั่วโมง)
+DB ปลายทาง: --database-url (ค่าเริ่มต้น SQLite ใน data/bench) หรือ MariaDB ที่ว่าง เช่น mysql+pymysql://u:p@localhost/bench
+
+ใช้: python scripts/seed_load_sample.py [--scale lunch|smoke] [--database-url URL] [--reset]
+"""
+import argparse
+import json
+import random
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import create_engine, func, insert, select, text  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.models import (  # noqa: E402
+    Customer,
+    ECoupon,
+    Event,
+    Menu,
+    PaymentMethod,
+    Profile,
+    PromptPayBackTransaction,
+    Store,
+    Transaction,
+    TransactionStatus,
+)
+from app.utils.store_token import generate_store_token  # noqa: E402
+
+DEFAULT_DATABASE_URL = f"sqlite:///{ROOT / 'data' / 'bench' / 'lunch_peak.db'}"
+CHUNK = 5000
+GROUP_ID = 1
+SITE_ID = 1
+
+
+@dataclass(frozen=True)
+class Scale:
+    stores: int
+    menus_per_store: int
+    days: int
+    tx_per_store_day: int
+    members: int
+
+
+SCALES: Dict[str, Scale] = {
+    # food court จริง: ~300 ร้าน / 4,500 เมนู / 3 เดือน ~800k ธุรกรรม
+    "lunch": Scale(stores=300, menus_per_store=15, days=90, tx_per_store_day=30, members=3000),
+    # รันเร็ว (ตรวจว่าสคริปต์ยังใช้ได้)
+    "smoke": Scale(stores=20, menus_per_store=10, days=7, tx_per_store_day=10, members=100),
+}
+
+DISHES = [
+    ("ข้าวผัด", "Fried rice", 45), ("ก๋วยเตี๋ยว", "Noodle soup", 50), ("ข้าวมันไก่", "Chicken rice", 50),
+    ("ผัดกะเพรา", "Basil stir-fry", 55), ("ต้มยำกุ้ง", "Tom yum", 90), ("ส้มตำ", "Papaya salad", 45),
+    ("ข้าวขาหมู", "Pork leg rice", 55), ("ราดหน้า", "Rad na", 50), ("ผัดไทย", "Pad thai", 60),
+    ("กาแฟเย็น", "Iced coffee", 35), ("ชาไทย", "Thai tea", 30), ("น้ำเปล่า", "Water", 10),
+]
+ADDONS = json.dumps([{"name": "ไข่ดาว", "price": 10}, {"name": "พิเศษ", "price": 20}], ensure_ascii=False)
+
+# สัดส่วนธุรกรรมตามชั่วโมง (เที่ยงหนาแน่นสุด)
+HOUR_WEIGHTS = {8: 4, 9: 4, 10: 6, 11: 16, 12: 22, 13: 14, 14: 6, 15: 5, 16: 5, 17: 8, 18: 10}
+
+
+@dataclass
+class FoodCourt:
+    """สิ่งที่ load test ต้องรู้ของข้อมูลที่ seed (ไม่ต้อง query กลับ)"""
+    store_ids: List[int]
+    tokens: Dict[int, str]
+    member_ids: List[int]
+    first_day: datetime
+    last_day: datetime
+
+
+def store_token(store_id: int) -> str:
+    return generate_store_token(group_id=GROUP_ID, site_id=SITE_ID, store_id=store_id, menu_id=0)
+
+
+def food_court_for(scale: Scale, now: datetime) -> FoodCourt:
+    store_ids = list(range(1, scale.stores + 1))
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return FoodCourt(
+        store_ids=store_ids,
+        tokens={sid: store_token(sid) for sid in store_ids},
+        member_ids=list(range(1, scale.members + 1)),
+        first_day=today - timedelta(days=scale.days),
+        last_day=today,
+    )
+
+
+def _insert_chunks(conn, model, rows) -> int:
+    batch, total = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            conn.execute(insert(model), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert(model), batch)
+        total += len(batch)
+    return total
+
+
+def _stores(scale: Scale, profile_id: int, event_id: int):
+    for sid in range(1, scale.stores + 1):
+        yield {
+            "id": sid,
+            "name": f"ร้าน {sid:03d}",
+            "tax_id": f"{sid:013d}",
+            "biller_id": f"{sid:013d}99",
+            "contract_accepted": True,
+            "crypto_enabled": False,
+            "group_id": GROUP_ID,
+            "site_id": SITE_ID,
+            "token": store_token(sid),
+            "profile_id": profile_id,
+            "event_id": event_id,
+            "location_name": f"ล็อก {sid:03d}",
+        }
+
+
+def _menus(scale: Scale, rng: random.Random):
+    for sid in range(1, scale.stores + 1):
+        for n in range(scale.menus_per_store):
+            th, en, price = DISHES[(sid + n) % len(DISHES)]
+            yield {
+                "store_id": sid,
+                "name": f"{th} {n + 1}",
+                "name_i18n": json.dumps({"th": f"{th} {n + 1}", "en": f"{en} {n + 1}"}, ensure_ascii=False),
+                "unit_price": float(price + rng.choice((0, 5, 10))),
+                "barcode": f"885{sid:04d}{n:05d}",
+                "addon_options": ADDONS if n % 3 == 0 else None,
+                "is_active": True,
+            }
+
+
+def _members(scale: Scale):
+    for mid in range(1, scale.members + 1):
+        yield {
+            "id": mid,
+            "phone": f"08{mid:08d}",
+            "username": f"member{mid:05d}",
+            "name": f"สมาชิก {mid}",
+            "total_points": 0.0,
+            "auto_apply_coupon": True,
+        }
+
+
+def _coupons(scale: Scale, now: datetime):
+    # คูปองละ 5,000 บาท 2 ใบต่อสมาชิก - scan-pay ช่วง load test ไม่หมด
+    for mid in range(1, scale.members + 1):
+        for n in range(2):
+            yield {
+                "code": f"LOAD{mid:06d}{n}",
+                "amount": 5000.0,
+                "customer_id": mid,
+                "status": "assigned",
+                "payment_method": "cash",
+                "paid_at": now,
+            }
+
+
+def _sales(scale: Scale, court: FoodCourt, rng: random.Random):
+    """(transaction, back transaction หรือ None) ทีละรายการ - ครึ่งหนึ่งจ่าย PromptPay"""
+    hours, weights = zip(*HOUR_WEIGHTS.items())
+    methods = (PaymentMethod.PROMPTPAY, PaymentMethod.CASH, PaymentMethod.PROMPTPAY, PaymentMethod.COUPON)
+    receipt = 0
+    for day in range(scale.days):
+        date = court.first_day + timedelta(days=day)
+        for sid in court.store_ids:
+            for _ in range(scale.tx_per_store_day):
+                receipt += 1
+                at = date + timedelta(hours=rng.choices(hours, weights)[0], seconds=rng.randrange(3600))
+                amount = float(rng.choice((35, 45, 50, 55, 60, 90, 120)))
+                method = methods[receipt % len(methods)]
+                tx = {
+                    "customer_id": rng.choice(court.member_ids),
+                    "store_id": sid,
+                    "amount": amount,
+                    "payment_method": method,
+                    "status": TransactionStatus.CONFIRMED,
+                    "receipt_number": f"LD{receipt:010d}",
+                    "ref1": court.tokens[sid] if method == PaymentMethod.PROMPTPAY else None,
+                    "created_at": at,
+                }
+                back = None
+                if method == PaymentMethod.PROMPTPAY:
+                    back = {
+                        "ref1": court.tokens[sid],
+                        "ref2": f"{receipt:012d}",
+                        "amount": amount,
+                        "paid_at": at,
+                        "store_id": sid,
+                        "status": "matched",
+                        "payment_gateway": rng.choice(("scb", "kbank", "stripe", "omise")),
+                        "created_at": at + timedelta(seconds=rng.randrange(1, 5)),
+                    }
+                yield tx, back
+
+
+def seed_food_court(engine, scale: Scale, seed: int = 42, now: datetime = None) -> FoodCourt:
+    """seed ลง DB ที่ว่าง (มีร้านอยู่แล้ว = ValueError) คืน FoodCourt ของข้อมูลที่ใส่"""
+    now = now or datetime.now()
+    rng = random.Random(seed)
+    if engine.dialect.name == "sqlite":
+        # WAL: ผู้อ่านไม่บล็อกผู้เขียนระหว่าง load test (ค่าติดอยู่กับไฟล์ DB)
+        with engine.connect() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+    Base.metadata.create_all(bind=engine)
+    court = food_court_for(scale, now)
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(Store)).scalar():
+            raise ValueError("DB มีร้านอยู่แล้ว - ใช้ --reset เพื่อล้างก่อน seed")
+        profile_id = conn.execute(insert(Profile).values(
+            name="Food court load test", profile_type="store_rental", is_active=True,
+        )).inserted_primary_key[0]
+        event_id = conn.execute(insert(Event).values(
+            profile_id=profile_id, name="Lunch peak", is_active=True,
+            start_date=court.first_day, end_date=court.last_day + timedelta(days=30),
+        )).inserted_primary_key[0]
+        _insert_chunks(conn, Store, _stores(scale, profile_id, event_id))
+        _insert_chunks(conn, Menu, _menus(scale, rng))
+        _insert_chunks(conn, Customer, _members(scale))
+        _insert_chunks(conn, ECoupon, _coupons(scale, now))
+    sales = _sales(scale, court, rng)
+    while True:
+        txs, backs = [], []
+        for tx, back in sales:
+            txs.append(tx)
+            if back:
+                backs.append(back)
+            if len(txs) >= CHUNK:
+                break
+        if not txs:
+            break
+        with engine.begin() as conn:
+            conn.execute(insert(Transaction), txs)
+            if backs:
+                conn.execute(insert(PromptPayBackTransaction), backs)
+    return court
+
+
+def main():
+    parser = argparse.ArgumentParser(description="seed food court สำหรับ load test")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="lunch")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="drop ทุกตารางก่อน seed")
+    args = parser.parse_args()
+
+    if args.database_url.startswith("sqlite:///"):
+        Path(args.database_url[len("sqlite:///"):]).parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(args.database_url)
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    scale = SCALES[args.scale]
+    started = datetime.now()
+    seed_food_court(engine, scale, args.seed)
+    engine.dispose()
+    print(
+        f"seeded {args.scale}: {scale.stores} ร้าน, {scale.stores * scale.menus_per_store} เมนู, "
+        f"{scale.members} สมาชิก, {scale.days * scale.stores * scale.tx_per_store_day} ธุรกรรม "
+        f"ใน {(datetime.now() - started).total_seconds():.0f}s -> {args.database_url}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,54 @@
 """
 Pytest configuration and fixtures
 """
+import os
+
+# ไม่เริ่ม job runner (app/scheduler) ตอน TestClient เรียก startup - ต้องตั้งก่อน import app.config
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-from app.database import Base, get_db
+from sqlalchemy.pool import NullPool, StaticPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.database import Base, async_url, get_async_db, get_db, get_reporting_db
 from app.config import DATABASE_URL
+from app.services import audit_log, query_stats, settings_cache
 from fastapi.testclient import TestClient
 from main import app
 
-# Create test database (in-memory SQLite for testing)
-TEST_DATABASE_URL = "sqlite:///:memory:"
+# Test database: ไฟล์ SQLite ต่อ test (endpoint async ใช้ aiosqlite ต่อไฟล์เดียวกัน)
+TEST_DATABASE_FILE = "test.db"
+
+
+@pytest.fixture(autouse=True)
+def reset_settings_cache(tmp_path, monkeypatch):
+    """ล้าง cache ค่าตั้งค่าระหว่าง test (แต่ละ test ใช้ DB ใหม่) - ไฟล์ version อยู่ใน tmp_path ไม่เขียนลง source tree"""
+    monkeypatch.setattr(settings_cache, "_VERSION_FILE", tmp_path / ".settings_version")
+    settings_cache.reset_caches()
+    yield
+    settings_cache.reset_caches()
+
+
+@pytest.fixture(autouse=True)
+def audit_writer(tmp_path, monkeypatch):
+    """audit writer ต่อ test: spool ใน tmp_path และไม่ flush เอง (test เรียก flush ด้วย db_session)"""
+    writer = audit_log.AuditWriter(spool_dir=tmp_path / "audit_spool", flush_size=10 ** 6, flush_interval=3600)
+    monkeypatch.setattr(audit_log, "writer", writer)
+    yield writer
+    writer.close(flush=False)
+
+
+@pytest.fixture(scope="function")
+def test_database_url(tmp_path):
+    return f"sqlite:///{tmp_path / TEST_DATABASE_FILE}"
+
 
 @pytest.fixture(scope="function")
-def db_session():
+def db_session(test_database_url):
     """Create a test database session"""
     engine = create_engine(
-        TEST_DATABASE_URL,
+        test_database_url,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
@@ -30,18 +61,39 @@ def db_session():
     finally:
         session.close()
         Base.metadata.drop_all(bind=engine)
+        engine.dispose()
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def client(db_session, test_database_url):
     """Create a test client"""
     def override_get_db():
         try:
             yield db_session
         finally:
             pass
-    
+
+    async_engine = create_async_engine(async_url(test_database_url), poolclass=NullPool)
+    AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as session:
+            yield session
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_reporting_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
+
+
+@pytest.fixture
+def query_budget():
+    """
+    งบจำนวน query ต่อ endpoint:
+        with query_budget(5, max_repeat=2):
+            client.get(...)
+    เกินงบ (หรือ statement เดียวซ้ำเกิน max_repeat) = test fail พร้อม SQL ที่ซ้ำ
+    """
+    return query_stats.query_budget
@@ -0,0 +1,105 @@
+"""
+Tests that hot per-store / time-range queries are served by composite indexes (EXPLAIN QUERY PLAN)
+"""
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models import PromptPayBackTransaction, Store, StoreSettlement, StoreTransaction
+from app.services.report_service import ReportService
+from app.services.settlement_service import (
+    get_back_transactions_live,
+    get_recent_paid_for_store,
+    get_settlement_list,
+)
+
+
+@contextmanager
+def captured_selects(db_session):
+    """SELECT ที่ service ส่งจริง (statement + parameter หลังแปลงแล้ว)"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    bind = db_session.get_bind()
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+
+def query_plan(db_session, statement, parameters) -> str:
+    rows = db_session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+    return " | ".join(row[-1] for row in rows)
+
+
+def plans_of(db_session, call, table):
+    with captured_selects(db_session) as statements:
+        call()
+    return [query_plan(db_session, sql, params) for sql, params in statements if f"FROM {table}" in sql]
+
+
+def _store(db_session):
+    store = Store(name="ร้านก๋วยเตี๋ยว")
+    db_session.add(store)
+    db_session.commit()
+    return store
+
+
+def test_back_transaction_feeds_use_store_time_indexes(db_session):
+    """Test store-pos paid alerts and the live feed search composite indexes without sorting"""
+    store = _store(db_session)
+    now = datetime.now()
+    db_session.add(PromptPayBackTransaction(ref1="1" * 20, amount=40, paid_at=now, store_id=store.id))
+    db_session.commit()
+
+    table = "promptpay_back_transactions"
+    since = now - timedelta(minutes=1)
+    recent = plans_of(db_session, lambda: get_recent_paid_for_store(db_session, store.id, since=since), table)
+    live_store = plans_of(db_session, lambda: get_back_transactions_live(db_session, store.id, since), table)
+    live_all = plans_of(db_session, lambda: get_back_transactions_live(db_session, since_created=since), table)
+
+    assert "ix_promptpay_back_transactions_store_status_paid (store_id=? AND status=? AND paid_at>?)" in recent[0]
+    assert "ix_promptpay_back_transactions_store_created (store_id=? AND created_at>?)" in live_store[0]
+    assert "ix_promptpay_back_transactions_created (created_at>?)" in live_all[0]
+    for plan in recent + live_store + live_all:
+        assert "TEMP B-TREE FOR ORDER BY" not in plan
+
+
+def test_settlement_day_filter_is_a_sargable_range(db_session):
+    """Test the settlement list filters one day as a settlement_date range served by an index"""
+    store = _store(db_session)
+    day = date(2026, 10, 18)
+    for d in (day - timedelta(days=1), day, day + timedelta(days=1)):
+        end_of_day = datetime.combine(d, datetime.max.time())
+        db_session.add(StoreSettlement(store_id=store.id, settlement_date=end_of_day, amount=100))
+    db_session.commit()
+
+    with captured_selects(db_session) as statements:
+        items = get_settlement_list(db_session, settlement_date=day)
+    assert [i["settlement_date"][:10] for i in items] == [day.isoformat()]
+    sql, params = statements[0]
+    assert "date(" not in sql.lower()
+    plan = query_plan(db_session, sql, params)
+    assert "ix_store_settlements_date_store (settlement_date>? AND settlement_date<?)" in plan
+
+
+def test_report_service_uses_store_transaction_indexes(db_session):
+    """Test per-store and daily summaries search the store_transactions composite indexes"""
+    store = _store(db_session)
+    db_session.add(StoreTransaction(foodcourt_id="FC1", store_id=store.id, amount=50, created_at=datetime.now()))
+    db_session.commit()
+    reports = ReportService(db_session)
+
+    per_store = plans_of(db_session, lambda: reports.get_store_summary(store.id), "store_transactions")
+    daily = plans_of(db_session, lambda: reports.get_daily_summary(), "store_transactions")
+
+    assert (
+        "ix_store_transactions_store_status_created (store_id=? AND status=? AND created_at>? AND created_at<?)"
+        in per_store[0]
+    )
+    assert "ix_store_transactions_created_status (created_at>? AND created_at<?)" in daily[0]
@@ -0,0 +1,59 @@
+"""
+Tests for write-behind Ad Impressions
+"""
+from datetime import datetime
+
+import pytest
+from app.models import AdFeed, AdImpression, AdImpressionCounter
+from app.services import ad_impressions
+from app.services.ad_impressions import ImpressionCollector, ImpressionEvent
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    """collector ที่ไม่ flush เอง (test เรียก flush ด้วย db_session)"""
+    c = ImpressionCollector(flush_size=10 ** 6, flush_interval=3600)
+    monkeypatch.setattr(ad_impressions, "collector", c)
+    yield c
+    c.close()
+
+
+def _ad(db_session, title="Ad"):
+    ad = AdFeed(title=title)
+    db_session.add(ad)
+    db_session.commit()
+    return ad
+
+
+def test_flush_writes_raw_rows_and_minute_counters(db_session, collector):
+    """Test buffered events are written in one flush and counters accumulate across flushes"""
+    ad = _ad(db_session)
+    minute = datetime(2026, 1, 1, 12, 0)
+    collector.add([ImpressionEvent(ad.id, "view", None, minute.replace(second=s)) for s in range(5)])
+    collector.add([ImpressionEvent(ad.id, "click", None, minute.replace(second=30))])
+    assert collector.flush(db_session) == 6
+    collector.add([ImpressionEvent(ad.id, "view", None, minute.replace(second=59))])
+    assert collector.flush(db_session) == 1
+
+    assert db_session.query(AdImpression).count() == 7
+    counter = db_session.query(AdImpressionCounter).one()
+    assert (counter.minute, counter.views, counter.clicks) == (minute, 6, 1)
+
+
+def test_track_api_buffers_batches_and_summary_reads_counters(client, db_session, collector):
+    """Test track API accepts arrays, skips unknown ads, and summary reflects flushed counters"""
+    ad1, ad2 = _ad(db_session, "A"), _ad(db_session, "B")
+    r = client.post("/api/member/ads/track", json=[
+        {"ad_feed_id": ad1.id, "event_type": "view"},
+        {"ad_feed_id": ad2.id, "event_type": "view"},
+        {"ad_feed_id": 9999, "event_type": "view"},
+    ])
+    assert r.json() == {"ok": True, "accepted": 2}
+    assert client.post("/api/member/ads/track", json={"ad_feed_id": ad1.id, "event_type": "click"}).status_code == 200
+    assert client.post("/api/member/ads/track", json={"ad_feed_id": 9999}).status_code == 404
+    assert db_session.query(AdImpression).count() == 0  # ยังอยู่ใน buffer
+
+    collector.flush(db_session)
+    items = {i["ad_id"]: i for i in client.get("/api/admin/ads/summary").json()["items"]}
+    assert (items[ad1.id]["views"], items[ad1.id]["clicks"]) == (1, 1)
+    assert (items[ad2.id]["views"], items[ad2.id]["clicks"]) == (1, 0)
@@ -0,0 +1,128 @@
+"""
+Tests for hot/cold archival of back transactions, audit logs and ad impressions
+"""
+import gzip
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from app.models import AuditLog, PromptPayBackTransaction, Store
+from app.services import archive
+
+NOW = datetime(2026, 10, 19, 3, 0)
+
+
+def _back(store_id, paid_at, amount=50.0):
+    return PromptPayBackTransaction(
+        ref1="0" * 20, amount=amount, paid_at=paid_at, store_id=store_id,
+        raw_payload=json.dumps({"amount": amount}), created_at=paid_at,
+    )
+
+
+def test_archive_moves_old_days_to_verified_gzip_partitions(db_session, tmp_path):
+    """Test rows older than retention leave the hot table as one gzip JSONL file per day"""
+    retention = archive.ARCHIVES["audit_logs"].retention_days
+    old_day = NOW - timedelta(days=retention + 2)
+    db_session.add_all([
+        AuditLog(action="login", table_name="users", created_at=old_day),
+        AuditLog(action="login", table_name="users", created_at=old_day + timedelta(hours=5)),
+        AuditLog(action="update", table_name="stores", old_values='{"name": "เก่า"}', created_at=old_day + timedelta(days=1)),
+        AuditLog(action="update", table_name="stores", created_at=NOW - timedelta(days=1)),
+    ])
+    db_session.commit()
+
+    result = archive.archive_table(db_session, "audit_logs", now=NOW, root=tmp_path)
+    assert (result.days, result.rows) == (2, 3)
+    assert db_session.query(AuditLog).count() == 1
+    first = tmp_path / "audit_logs" / result.files[0]
+    assert first.name.startswith(old_day.date().isoformat())
+    with gzip.open(first, "rt", encoding="utf-8") as f:
+        assert [json.loads(line)["action"] for line in f] == ["login", "login"]
+
+    check = archive.verify("audit_logs", db_session, root=tmp_path)
+    assert check.ok and (check.files, check.rows) == (2, 3)
+    assert archive.archive_table(db_session, "audit_logs", now=NOW, root=tmp_path).rows == 0
+
+
+def test_report_merges_hot_and_archived_rows(client, db_session, tmp_path, monkeypatch):
+    """Test the back-transaction report still returns rows after they moved to the archive"""
+    monkeypatch.setattr(archive, "ARCHIVE_ROOT", tmp_path)
+    store = Store(name="ร้านส้มตำ")
+    db_session.add(store)
+    db_session.commit()
+    retention = archive.ARCHIVES["promptpay_back_transactions"].retention_days
+    old = datetime.now() - timedelta(days=retention + 10)
+    db_session.add_all([_back(store.id, old, 45), _back(store.id, old + timedelta(days=1), 55), _back(store.id, datetime.now(), 60)])
+    db_session.commit()
+    assert archive.archive_table(db_session, "promptpay_back_transactions", root=tmp_path).rows == 2
+
+    items = client.get("/api/payment-callback/back-transactions/report", params={"store_id": store.id}).json()["items"]
+    assert [i["amount"] for i in items] == [60, 55, 45]
+    assert {i["store_name"] for i in items} == {"ร้านส้มตำ"}
+    ranged = client.get("/api/payment-callback/back-transactions/report", params={
+        "start_date": old.date().isoformat(), "end_date": old.date().isoformat(),
+    }).json()["items"]
+    assert [i["amount"] for i in ranged] == [45]
+    assert [i["amount"] for i in client.get(
+        "/api/payment-callback/back-transactions/report", params={"limit": 1}
+    ).json()["items"]] == [60]
+
+
+def test_verify_reports_tampered_files_and_rows_left_in_hot(db_session, tmp_path, monkeypatch):
+    """Test verification catches a modified partition and rows a crashed run did not delete"""
+    retention = archive.ARCHIVES["promptpay_back_transactions"].retention_days
+    old = NOW - timedelta(days=retention + 3)
+    db_session.add_all([_back(None, old), _back(None, old + timedelta(days=1))])
+    db_session.commit()
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("worker killed")
+
+    with monkeypatch.context() as m:
+        m.setattr(db_session, "commit", crash)
+        with pytest.raises(RuntimeError):
+            archive.archive_table(db_session, "promptpay_back_transactions", now=NOW, root=tmp_path)
+    db_session.rollback()
+    check = archive.verify("promptpay_back_transactions", db_session, root=tmp_path)
+    assert not check.ok and "ยังอยู่ในตารางหลัก" in check.errors[0]
+    assert len(archive.query(db_session, "promptpay_back_transactions", root=tmp_path)) == 2  # ไม่ซ้ำ
+
+    result = archive.archive_table(db_session, "promptpay_back_transactions", now=NOW, root=tmp_path)
+    assert result.rows == 2 and archive.verify("promptpay_back_transactions", db_session, root=tmp_path).ok
+
+    partition = tmp_path / "promptpay_back_transactions" / result.files[0]
+    partition.write_bytes(gzip.compress(b'{"id": 999}\n'))
+    assert "sha256" in archive.verify("promptpay_back_transactions", root=tmp_path).errors[0]
+
+
+def test_nightly_verify_and_limited_query_touch_only_needed_partitions(db_session, tmp_path, monkeypatch):
+    """Test verify(files=) reads only this run's files and query(limit=) stops before older partitions"""
+    retention = archive.ARCHIVES["audit_logs"].retention_days
+    first_day = NOW - timedelta(days=retention + 5)
+    db_session.add_all([
+        AuditLog(action=f"day{i}", table_name="users", created_at=first_day + timedelta(days=i, hours=h))
+        for i in range(4) for h in (1, 2)
+    ])
+    db_session.commit()
+    old = archive.archive_table(db_session, "audit_logs", now=NOW - timedelta(days=3), root=tmp_path)
+    db_session.add(AuditLog(action="day3", table_name="users", created_at=first_day + timedelta(days=3, hours=3)))
+    db_session.commit()
+    new = archive.archive_table(db_session, "audit_logs", now=NOW, root=tmp_path)
+    assert (old.days, new.days) == (2, 2)
+
+    opened = []
+    read_file = archive._read_file
+    monkeypatch.setattr(archive, "_read_file", lambda path: opened.append(path.name) or read_file(path))
+    check = archive.verify("audit_logs", db_session, root=tmp_path, files=new.files)
+    assert check.ok and (check.files, check.rows) == (2, 5)
+    assert sorted(opened) == sorted(Path(f).name for f in new.files)
+
+    opened.clear()
+    rows = archive.query(db_session, "audit_logs", limit=3, root=tmp_path)
+    assert [r["action"] for r in rows] == ["day3", "day3", "day3"]
+    assert len(opened) == 1  # วันที่ 3 ให้ครบ 3 แถวที่ใหม่กว่าวันที่ 2 แล้ว
+    opened.clear()
+    assert [r["action"] for r in archive.query(db_session, "audit_logs", limit=5, root=tmp_path)][-2:] == ["day2", "day2"]
+    assert len(opened) == 2
@@ -0,0 +1,36 @@
+"""
+Tests for the async database path used by hot endpoints
+"""
+from app.database import async_url
+from app.models import Menu, Store, StoreLocaleSetting
+
+
+def test_async_url_maps_drivers():
+    """Test the async engine URL keeps the database and swaps in the async driver"""
+    assert str(async_url("mysql+pymysql://u:p@db:3306/mp?charset=utf8mb4")) == "mysql+aiomysql://u:***@db:3306/mp?charset=utf8mb4"
+    assert str(async_url("sqlite:////tmp/t.db")) == "sqlite+aiosqlite:////tmp/t.db"
+
+
+def test_signage_display_reads_store_name_async(client, db_session):
+    """Test the signage poll endpoint reads committed data through the async session"""
+    store = Store(name="ร้านก๋วยเตี๋ยว")
+    db_session.add(store)
+    db_session.commit()
+    response = client.get("/api/signage/display", params={"store_id": store.id})
+    assert response.json()["store_name"] == "ร้านก๋วยเตี๋ยว"
+
+
+def test_menus_by_store_async(client, db_session):
+    """Test menu listing and barcode lookup on the async session, including the store locale"""
+    store = Store(name="ร้านข้าว")
+    db_session.add(store)
+    db_session.flush()
+    db_session.add_all([
+        Menu(store_id=store.id, name="ข้าวผัด", name_i18n='{"en": "Fried rice"}', unit_price=50, barcode="885001"),
+        StoreLocaleSetting(store_id=store.id, locale="en"),
+    ])
+    db_session.commit()
+    menus = client.get(f"/api/menus/store/{store.id}").json()
+    assert [m["name"] for m in menus] == ["Fried rice"]
+    assert client.get(f"/api/menus/store/{store.id}/by-barcode/885001").json()["unit_price"] == 50
+    assert client.get("/api/menus/store/9999").status_code == 404
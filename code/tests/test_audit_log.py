@@ -0,0 +1,94 @@
+"""
+Tests for the batched audit log writer and its crash-safe spool
+"""
+import json
+
+import pytest
+from sqlalchemy import event
+
+from app.api.auth import get_current_session_user
+from app.models import AuditLog
+from app.services import audit_log
+from main import app
+
+
+def test_log_action_enqueues_and_flushes_in_one_insert(db_session, audit_writer):
+    """Test entries wait in the spool (not the DB) and flush as one multi-row INSERT"""
+    for i in range(30):
+        audit_log.log_action("menu_update", "menus", record_id=i, new_values={"unit_price": 40 + i}, source="store_pos")
+    audit_writer.spool()
+    assert db_session.query(AuditLog).count() == 0
+    assert audit_writer.pending() == 30
+
+    inserts = []
+    bind = db_session.get_bind()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO audit_logs"):
+            inserts.append(statement)
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        assert audit_writer.flush(db_session) == 30
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+    assert len(inserts) == 1
+    rows = db_session.query(AuditLog).order_by(AuditLog.record_id).all()
+    assert [r.record_id for r in rows] == list(range(30))
+    assert json.loads(rows[5].new_values) == {"unit_price": 45}
+    assert rows[0].created_at is not None and rows[0].source == "store_pos"
+    assert audit_writer.pending() == 0 and not list(audit_writer.spool_dir.glob("*.jsonl"))
+
+
+def test_spool_of_dead_worker_is_replayed_by_another(db_session, audit_writer):
+    """Test spool files are claimed only once their owner's flock is gone, not by pid"""
+    audit_log.log_action("login", "users", user_id=7)
+    audit_log.log_action("logout", "users", user_id=7)
+    audit_writer.spool()
+
+    sibling = audit_log.AuditWriter(spool_dir=audit_writer.spool_dir)  # pid เดียวกัน แต่เจ้าของยังถือล็อก
+    assert sibling.flush(db_session) == 0 and audit_writer.pending() == 2
+    audit_writer.close(flush=False)  # worker ตายก่อน flush = ล็อกหลุด
+
+    restarted = audit_log.AuditWriter(spool_dir=audit_writer.spool_dir)
+    assert restarted.flush(db_session) == 2
+    assert [r.action for r in db_session.query(AuditLog).order_by(AuditLog.id)] == ["login", "logout"]
+    assert restarted.flush(db_session) == 0  # ไม่เขียนซ้ำ
+    restarted.close()
+    sibling.close()
+    assert not list(audit_writer.spool_dir.glob("*.lock"))
+
+
+def test_batch_failing_repeatedly_quarantines_bad_entries(db_session, audit_writer):
+    """Test one bad row stops blocking the spool: after repeated failures good rows land and the bad one is set aside"""
+    audit_log.log_action("login", "users", user_id=1)
+    audit_log.log_action(None, "users", user_id=2)  # action NOT NULL
+    audit_log.log_action("logout", "users", user_id=1)
+    audit_writer.spool()
+
+    for _ in range(audit_log.MAX_FLUSH_FAILURES - 1):
+        with pytest.raises(Exception):
+            audit_writer.flush(db_session)
+    assert db_session.query(AuditLog).count() == 0
+
+    assert audit_writer.flush(db_session) == 2
+    assert [r.action for r in db_session.query(AuditLog).order_by(AuditLog.id)] == ["login", "logout"]
+    quarantined = list((audit_writer.spool_dir / "quarantine").iterdir())
+    assert len(quarantined) == 1 and json.loads(quarantined[0].read_text())["user_id"] == 2
+    assert audit_writer.pending() == 0 and not list(audit_writer.spool_dir.glob("*.jsonl"))
+
+
+def test_endpoint_logs_without_writing_in_request(client, db_session, audit_writer):
+    """Test an API call only enqueues its audit entry; the writer inserts it afterwards"""
+    app.dependency_overrides[get_current_session_user] = lambda: {"user_id": 1}
+    try:
+        response = client.post("/api/emergency-backup", json={"source": "admin", "entry_type": "sale", "amount": 120})
+    finally:
+        app.dependency_overrides.pop(get_current_session_user, None)
+    assert response.status_code == 200
+    assert db_session.query(AuditLog).count() == 0
+
+    assert audit_writer.flush(db_session) == 1
+    row = db_session.query(AuditLog).one()
+    assert (row.action, row.record_id, row.user_id) == ("emergency_backup_create", response.json()["id"], 1)
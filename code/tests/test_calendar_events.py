@@ -0,0 +1,60 @@
+"""
+Tests for calendar range queries (ads, promotions, coupon promos, events)
+"""
+from datetime import datetime
+
+from app.models import AdFeed, CouponPromo, Event, StorePromotion
+from app.services import calendar_events, settings_cache
+
+JUNE = (datetime(2026, 6, 1), datetime(2026, 7, 1))
+
+
+def _seed(db_session):
+    db_session.add_all([
+        AdFeed(title="ในเดือน", start_at=datetime(2026, 6, 10), end_at=datetime(2026, 6, 20)),
+        AdFeed(title="จบก่อน", start_at=datetime(2026, 5, 1), end_at=datetime(2026, 6, 1)),
+        AdFeed(title="ปิด", start_at=datetime(2026, 6, 10), is_active=False),
+        StorePromotion(store_id=1, title="ไม่มีวันจบ", valid_from=datetime(2026, 1, 1)),
+        StorePromotion(store_id=1, title="ไม่มีวันเริ่ม", valid_to=datetime(2026, 6, 15)),
+        CouponPromo(title="เติม 200", min_topup_amount=200, discount_amount=20,
+                    valid_from=datetime(2026, 6, 30), valid_to=datetime(2026, 8, 1)),
+        Event(name="งานวัด", start_date=datetime(2026, 7, 1), end_date=datetime(2026, 7, 3)),
+        Event(name="ตลาดนัด", start_date=datetime(2026, 5, 25), end_date=datetime(2026, 6, 2)),
+    ])
+    db_session.commit()
+
+
+def test_range_returns_only_overlapping_active_rows(db_session):
+    """Test only active rows overlapping [start, end) come back, across all four sources"""
+    _seed(db_session)
+    events = calendar_events.load_range(db_session, *JUNE)
+    assert [(e["type"], e["title"]) for e in events] == [
+        ("ad", "ในเดือน"),
+        ("promotion", "ไม่มีวันจบ"),
+        ("coupon_promo", "เติม 200"),
+        ("event", "ตลาดนัด"),
+    ]
+    assert events[1]["end"] == events[1]["start"]
+
+
+def test_month_view_cached_until_source_changes(db_session):
+    """Test a month view is served from cache and reloaded after a commit touching a source table"""
+    calendar_events._cache.clear()
+    _seed(db_session)
+    first = calendar_events.events_in_range(db_session, *JUNE)
+    assert calendar_events.events_in_range(db_session, *JUNE) is first
+
+    db_session.add(Event(name="เทศกาลอาหาร", start_date=datetime(2026, 6, 5), end_date=datetime(2026, 6, 6)))
+    db_session.commit()
+    titles = [e["title"] for e in calendar_events.events_in_range(db_session, *JUNE)]
+    assert "เทศกาลอาหาร" in titles
+    # แก้เหตุการณ์ไม่ล้าง cache ค่าตั้งค่า (channel แยก)
+    assert not settings_cache._VERSION_FILE.exists()
+
+
+def test_calendar_endpoint(client, db_session):
+    """Test the admin calendar endpoint parses dates and returns range results"""
+    _seed(db_session)
+    response = client.get("/api/admin/ads/calendar/events", params={"start": "2026-06-01", "end": "2026-06-30"})
+    assert response.status_code == 200
+    assert {e["type"] for e in response.json()["events"]} == {"ad", "promotion", "coupon_promo", "event"}
@@ -0,0 +1,150 @@
+"""
+Tests for batched crypto confirmation polling (one HTTP session, bounded concurrency, bulk UPDATE)
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from aiohttp import web
+from sqlalchemy import event
+
+from app.models import (
+    Customer,
+    CryptoTransaction,
+    CryptoTransactionStatus,
+    PaymentMethod,
+    Store,
+    Transaction,
+    TransactionStatus,
+)
+from app.services import crypto_service
+from app.services.crypto_service import CryptoService
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+class Explorer:
+    """Blockchain explorer จำลองบน localhost: hash ขึ้นต้นด้วย c=confirmed, p=pending, gone=404, down=503"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self.requests = 0
+        self.peers = set()
+
+    async def tx(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        self.peers.add(request.transport.get_extra_info("peername"))
+        try:
+            await asyncio.sleep(self.delay)
+            tx_hash = request.match_info["tx_hash"]
+            if tx_hash.startswith("gone"):
+                return web.json_response({"error": "not found"}, status=404)
+            if tx_hash.startswith("down"):
+                return web.json_response({"error": "maintenance"}, status=503)
+            return web.json_response({"confirmations": 3 if tx_hash.startswith("c") else 0, "block_height": 900000})
+        finally:
+            self.in_flight -= 1
+
+
+def poll(db_session, monkeypatch, explorer, **kwargs):
+    async def main():
+        app = web.Application()
+        app.router.add_get("/tx/{tx_hash}", explorer.tx)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(crypto_service, "BLOCKCHAIN_EXPLORER_API", f"http://127.0.0.1:{port}")
+        try:
+            return await CryptoService(db_session).poll_pending_transactions(**kwargs)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def _pending(db_session, hashes, created_at=NOW - timedelta(minutes=3), last_checked=None):
+    store = db_session.query(Store).first()
+    if store is None:
+        store = Store(name="ร้านคริปโต", crypto_enabled=True, contract_accepted=True)
+        customer = Customer(phone="0800000000")
+        db_session.add_all([store, customer])
+        db_session.flush()
+    customer = db_session.query(Customer).first()
+    items = []
+    for h in hashes:
+        tx = Transaction(
+            customer_id=customer.id, store_id=store.id, amount=100, payment_method=PaymentMethod.CRYPTO_BTC,
+            receipt_number=f"R-{h}",
+        )
+        db_session.add(tx)
+        db_session.flush()
+        items.append(CryptoTransaction(
+            transaction_id=tx.id, store_id=store.id, tx_hash=h, blockchain_address="bc1q", amount_crypto=0.001,
+            created_at=created_at, last_checked=last_checked,
+        ))
+    db_session.add_all(items)
+    db_session.commit()
+    return items
+
+
+def test_pending_transactions_are_checked_concurrently_and_written_in_bulk(db_session, monkeypatch):
+    """Test 60 pending txs clear through one session at bounded concurrency with one UPDATE per table"""
+    hashes = [f"c{i}" for i in range(30)] + [f"p{i}" for i in range(20)] + [f"gone{i}" for i in range(10)]
+    _pending(db_session, hashes)
+    explorer = Explorer()
+    statements = []
+    bind = db_session.get_bind()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        counts = poll(db_session, monkeypatch, explorer, now=NOW, concurrency=8)
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+    assert counts == {"checked": 60, "confirmed": 30, "failed": 10, "pending": 20, "skipped": 0}
+    assert explorer.requests == 60 and 1 < explorer.peak <= 8
+    assert len(explorer.peers) <= 8  # connection ถูกใช้ซ้ำจาก pool ของ session เดียว
+    assert statements.count("SELECT") == 1 and statements.count("UPDATE") == 2
+
+    db_session.expire_all()
+    by_hash = {c.tx_hash: c for c in db_session.query(CryptoTransaction)}
+    assert by_hash["c0"].status == CryptoTransactionStatus.CONFIRMED and by_hash["c0"].explorer_url.endswith("/tx/c0")
+    assert by_hash["gone3"].status == CryptoTransactionStatus.FAILED
+    assert by_hash["p5"].status == CryptoTransactionStatus.PENDING and by_hash["p5"].last_checked == NOW
+    assert db_session.get(Transaction, by_hash["c7"].transaction_id).status == TransactionStatus.CONFIRMED
+    assert db_session.get(Transaction, by_hash["gone1"].transaction_id).status == TransactionStatus.FAILED
+    assert db_session.get(Transaction, by_hash["p1"].transaction_id).status == TransactionStatus.PENDING
+
+
+def test_backoff_skips_transactions_checked_recently(db_session, monkeypatch):
+    """Test the wait before a re-check grows with the tx age at its last check"""
+    _pending(db_session, ["p-old"], created_at=NOW - timedelta(hours=5), last_checked=NOW - timedelta(minutes=30))
+    _pending(db_session, ["p-young"], created_at=NOW - timedelta(minutes=10), last_checked=NOW - timedelta(minutes=4))
+    _pending(db_session, ["c-due"], created_at=NOW - timedelta(minutes=10), last_checked=NOW - timedelta(minutes=8))
+    _pending(db_session, ["c-new"], created_at=NOW - timedelta(minutes=1))
+    explorer = Explorer(delay=0)
+
+    counts = poll(db_session, monkeypatch, explorer, now=NOW)
+
+    # p-old: อายุ 4.5 ชม. ตอนตรวจ -> รอ 1 ชม. (เพดาน); p-young: อายุ 6 นาที -> รอ 6 นาที
+    assert counts["skipped"] == 2 and counts["confirmed"] == 2 and explorer.requests == 2
+
+
+def test_explorer_outage_keeps_transactions_pending(db_session, monkeypatch):
+    """Test 5xx responses are retried later instead of failing the payment"""
+    _pending(db_session, ["down-1", "down-2", "c-ok"])
+
+    counts = poll(db_session, monkeypatch, Explorer(delay=0), now=NOW)
+
+    assert (counts["pending"], counts["confirmed"], counts["failed"]) == (2, 1, 0)
+    db_session.expire_all()
+    down = db_session.query(CryptoTransaction).filter(CryptoTransaction.tx_hash == "down-1").one()
+    assert down.status == CryptoTransactionStatus.PENDING and down.last_checked == NOW
@@ -0,0 +1,57 @@
+"""
+Tests for Document Numbers (FoodCourtID / receipt / invoice)
+"""
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import CodeSequence
+from app.services import document_numbers
+from app.services.document_numbers import _BlockAllocator
+
+
+def test_invoice_numbers_are_daily_and_sequential(db_session):
+    """Test invoice numbers continue within a day and restart the next day"""
+    day1, day2 = datetime(2026, 1, 31, 23, 59), datetime(2026, 2, 1, 0, 1)
+    assert document_numbers.next_invoice_number(db_session, day1) == "INV-20260131-00001"
+    assert document_numbers.next_invoice_number(db_session, day1) == "INV-20260131-00002"
+    assert document_numbers.next_invoice_number(db_session, day2) == "INV-20260201-00001"
+    db_session.rollback()
+    # rollback คืนเลข: ใบกำกับภาษีไม่มีเลขขาดช่วง
+    assert document_numbers.next_invoice_number(db_session, day1) == "INV-20260131-00001"
+
+
+def test_worker_blocks_never_overlap(tmp_path):
+    """Test two workers allocating blocks from the same sequence hand out disjoint, increasing numbers"""
+    # pool ของ request มี connection เดียวและผู้เรียกถืออยู่: การจองช่วงต้องไม่รอ pool นี้
+    engine = create_engine(f"sqlite:///{tmp_path / 'seq.db'}", pool_size=1, max_overflow=0, pool_timeout=1)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    workers = [_BlockAllocator(block_size=3, in_transaction_dialects=()) for _ in range(2)]
+
+    issued = [[], []]
+    with SessionLocal() as db:
+        db.connection()
+        for i in range(10):
+            for w, allocator in enumerate(workers):
+                issued[w].append(allocator.next(db, "receipt:20260101"))
+        reserved = db.get(CodeSequence, "receipt:20260101").next_value
+    for allocator in workers:
+        allocator.clear()
+    engine.dispose()
+
+    assert all(seq == sorted(seq) for seq in issued)
+    assert len(set(issued[0]) | set(issued[1])) == 20
+    assert reserved == 24  # 2 worker x 4 ช่วง x 3 เลข
+
+
+def test_payment_hub_ids_use_sequences(client):
+    """Test Marketplace IDs issued at the counter are unique daily sequence numbers"""
+    ids = [
+        client.post("/api/counter/exchange", json={"amount": 10, "payment_method": "cash"}).json()["foodcourt_id"]
+        for _ in range(3)
+    ]
+    today = datetime.now().strftime("%Y%m%d")
+    assert ids == [f"FC-{today}-0000{n}" for n in (1, 2, 3)]
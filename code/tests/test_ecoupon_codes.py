@@ -0,0 +1,68 @@
+"""
+Tests for E-Coupon code generation and bulk issuance
+"""
+import csv
+import io
+
+from app.api.auth import require_admin
+from app.models import ECoupon, ECouponStore
+from app.services import ecoupon_codes
+from app.services.ecoupon_codes import KeyedCodeGenerator
+from main import app
+
+
+def test_keyed_codes_unique_and_stable():
+    """Test keyed scheme is a bijection: distinct sequences give distinct, repeatable codes"""
+    gen = KeyedCodeGenerator(key="test-key")
+    codes = gen.codes(0, 20000)
+    assert len(set(codes)) == 20000
+    assert all(c.startswith("EK") and len(c) == 12 for c in codes)
+    assert KeyedCodeGenerator(key="test-key").code(123) == codes[123]
+    assert KeyedCodeGenerator(key="other-key").code(123) != codes[123]
+
+
+def test_reserve_sequence_blocks_do_not_overlap(db_session):
+    """Test sequence reservation hands out consecutive, non-overlapping blocks"""
+    assert ecoupon_codes.reserve_sequence(db_session, "t", 100) == 0
+    assert ecoupon_codes.reserve_sequence(db_session, "t", 50) == 100
+    assert ecoupon_codes.reserve_sequence(db_session, "t", 1) == 150
+
+
+def test_issue_bulk_inserts_coupons_and_store_rows(db_session):
+    """Test bulk issuance inserts every code in chunks and writes store eligibility"""
+    db_session.add(ECoupon(code="ECEXISTING1", amount=5, status="available"))
+    db_session.commit()
+    codes = ecoupon_codes.issue_bulk(
+        db_session, count=1200, amount=50, payment_method="cash", scheme="keyed",
+        allowed_store_ids="[1,2]", store_ids=[1, 2],
+    )
+    db_session.commit()
+    assert len(set(codes)) == 1200
+    assert db_session.query(ECoupon).filter(ECoupon.code.in_(codes)).count() == 1200
+    assert db_session.query(ECouponStore).count() == 2400
+
+
+def test_add_with_unique_code_retries_on_collision(db_session):
+    """Test single issuance regenerates the code when the unique constraint is hit"""
+    db_session.add(ECoupon(code="ECTAKEN00001", amount=5, status="available"))
+    db_session.commit()
+    ec = ECoupon(code="ECTAKEN00001", amount=10, status="available")
+    ecoupon_codes.add_with_unique_code(db_session, ec)
+    db_session.commit()
+    assert ec.id and ec.code != "ECTAKEN00001"
+    assert db_session.query(ECoupon).count() == 2
+
+
+def test_bulk_issue_api_streams_csv(client):
+    """Test bulk issuance API returns a CSV of the issued codes"""
+    app.dependency_overrides[require_admin] = lambda: {"is_admin": True}
+    response = client.post(
+        "/api/admin/ecoupon/bulk-issue",
+        json={"count": 25, "amount": 20, "payment_method": "cash"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["code", "amount", "status"]
+    assert len(rows) == 26
+    assert all(r[0].startswith("EC") and r[1] == "20.00" and r[2] == "available" for r in rows[1:])
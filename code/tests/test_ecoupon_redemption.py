@@ -0,0 +1,94 @@
+"""
+Tests for E-Coupon Redemption Service
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from app.models import Customer, ECoupon, ECouponRedemption
+from app.services import ecoupon_redemption
+from app.services.ecoupon_redemption import set_coupon_stores
+
+
+def _customer(db_session):
+    customer = Customer(phone="0812345678")
+    db_session.add(customer)
+    db_session.commit()
+    return customer
+
+
+def _coupon(db_session, customer, code, amount, allowed_store_ids=None, **kwargs):
+    ec = ECoupon(code=code, amount=amount, customer_id=customer.id, status="assigned", allowed_store_ids=allowed_store_ids, **kwargs)
+    db_session.add(ec)
+    db_session.flush()
+    set_coupon_stores(db_session, ec.id, allowed_store_ids)
+    db_session.commit()
+    return ec
+
+
+def test_redeem_filters_store_and_validity(db_session):
+    """Test only coupons valid for the store and time window are deducted, oldest first"""
+    customer = _customer(db_session)
+    now = datetime.utcnow()
+    other_store = _coupon(db_session, customer, "EC1", 100, "[2]")
+    expired = _coupon(db_session, customer, "EC2", 100, valid_to=now - timedelta(days=1))
+    first = _coupon(db_session, customer, "EC3", 30, "[1,2]")
+    second = _coupon(db_session, customer, "EC4", 50)
+
+    result = ecoupon_redemption.redeem(db_session, customer.id, 1, 40, order_id=7, now=now)
+    db_session.commit()
+
+    assert [(d.coupon_id, d.amount, d.balance_after) for d in result.deductions] == [
+        (first.id, 30, 0.0),
+        (second.id, 10, 40),
+    ]
+    for ec in (other_store, expired, first, second):
+        db_session.refresh(ec)
+    assert (first.status, first.amount, first.store_id, first.order_id) == ("used", 0, 1, 7)
+    assert (second.status, second.amount) == ("assigned", 40)
+    assert other_store.amount == 100 and expired.amount == 100
+    assert db_session.query(ECouponRedemption).count() == 2
+
+
+def test_blank_or_null_store_list_means_all_stores(db_session):
+    """Test whitespace, "[ ]" and "null" store lists are stored as NULL and redeem at any store"""
+    customer = _customer(db_session)
+    coupons = [_coupon(db_session, customer, f"ECN{i}", 10, raw) for i, raw in enumerate((" ", "[ ]", "null", "{bad"))]
+
+    result = ecoupon_redemption.redeem(db_session, customer.id, 9, 40)
+    db_session.commit()
+
+    assert [d.coupon_id for d in result.deductions] == [ec.id for ec in coupons]
+    for ec in coupons:
+        db_session.refresh(ec)
+        assert ec.allowed_store_ids is None
+
+
+def test_redeem_insufficient_balance(db_session):
+    """Test insufficient eligible balance raises and leaves coupons untouched"""
+    customer = _customer(db_session)
+    ec = _coupon(db_session, customer, "EC1", 20)
+    _coupon(db_session, customer, "EC2", 500, "[3]")
+
+    with pytest.raises(ecoupon_redemption.InsufficientCouponBalance) as exc:
+        ecoupon_redemption.redeem(db_session, customer.id, 1, 50)
+    assert exc.value.available == 20
+    db_session.refresh(ec)
+    assert ec.amount == 20
+
+
+def test_redeem_conditional_update_detects_concurrent_use(db_session, monkeypatch):
+    """Test a coupon spent between SELECT and UPDATE is not deducted twice"""
+    customer = _customer(db_session)
+    ec = _coupon(db_session, customer, "EC1", 50)
+    original_allocate = ecoupon_redemption._allocate
+
+    def allocate_then_spend(rows, amount):
+        out = original_allocate(rows, amount)
+        # จำลองอีก request หักคูปองไปก่อน
+        db_session.query(ECoupon).filter(ECoupon.id == ec.id).update({"amount": 10})
+        return out
+
+    monkeypatch.setattr(ecoupon_redemption, "_allocate", allocate_then_spend)
+    with pytest.raises(ecoupon_redemption.ConcurrentRedemption):
+        ecoupon_redemption.redeem(db_session, customer.id, 1, 40)
+    assert db_session.query(ECouponRedemption).count() == 0
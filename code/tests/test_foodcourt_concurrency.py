@@ -0,0 +1,67 @@
+"""
+Concurrency stress test: many stores charging the same Food Court ID at once
+(ใช้ SQLite แบบไฟล์ให้แต่ละ thread มี connection / transaction ของตัวเอง)
+"""
+import threading
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import FoodCourtID, PaymentMethod, StoreTransaction
+from app.services.payment_hub import PaymentHub
+
+THREADS = 16
+ATTEMPTS_PER_THREAD = 10
+INITIAL = 1000.0
+CHARGE = 30.0
+
+
+def test_concurrent_charges_conserve_money(tmp_path):
+    """Test parallel deductions never overdraw and every baht is accounted for"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'foodcourt.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as db:
+        card = PaymentHub(db).exchange_to_foodcourt_id(amount=INITIAL, payment_method=PaymentMethod.CASH)
+        card_id = card.foodcourt_id
+
+    successes, rejections, errors = [], [], []
+    start = threading.Barrier(THREADS)
+
+    def worker(store_id):
+        start.wait()
+        with SessionLocal() as db:
+            hub = PaymentHub(db)
+            for _ in range(ATTEMPTS_PER_THREAD):
+                try:
+                    hub.use_foodcourt_id(card_id, store_id=store_id, amount=CHARGE)
+                    successes.append(CHARGE)
+                except ValueError:
+                    rejections.append(store_id)
+                except Exception as e:  # pragma: no cover - ให้ assert ด้านล่างแสดง error
+                    db.rollback()
+                    errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i + 1,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with SessionLocal() as db:
+        card = db.query(FoodCourtID).filter_by(foodcourt_id=card_id).one()
+        charged = db.query(func.coalesce(func.sum(StoreTransaction.amount), 0)).scalar()
+        store_tx = db.query(StoreTransaction).count()
+
+    engine.dispose()
+    assert errors == []
+    assert len(successes) == int(INITIAL // CHARGE)
+    assert len(successes) + len(rejections) == THREADS * ATTEMPTS_PER_THREAD
+    assert store_tx == len(successes)
+    assert card.current_balance >= 0
+    assert card.current_balance + charged == INITIAL
@@ -0,0 +1,51 @@
+"""
+Tests for i18n helpers
+"""
+import json
+import pytest
+from types import SimpleNamespace
+from app.utils.i18n import resolve_i18n, resolve_addon_options, project_menu_text, project_labels
+
+
+def test_resolve_i18n_fallback():
+    """Test locale -> th -> en -> default fallback"""
+    data = json.dumps({"th": " ต้มยำ ", "en": "Tom Yum"})
+    assert resolve_i18n(data, "default", "en") == "Tom Yum"
+    assert resolve_i18n(data, "default", "zh") == "ต้มยำ"
+    assert resolve_i18n(json.dumps({"zh": "冬阴功"}), "default", "ru") == "default"
+    assert resolve_i18n(None, "default", "en") == "default"
+    assert resolve_i18n("not json", None, "en") == ""
+
+
+def test_resolve_addon_options_locale():
+    """Test addon names resolved by locale without touching other fields"""
+    addons = json.dumps([
+        {"name": "ไข่ดาว", "name_i18n": {"en": "Fried Egg"}, "price": 10},
+        {"name": "พิเศษ", "price": 20},
+    ], ensure_ascii=False)
+    out = json.loads(resolve_addon_options(addons, "en"))
+    assert out[0]["name"] == "Fried Egg"
+    assert out[0]["price"] == 10
+    assert out[1] == {"name": "พิเศษ", "price": 20}
+    assert out[0]["name_i18n"] == {"en": "Fried Egg"}
+
+
+def test_project_menu_text_follows_row_changes():
+    """Test cached projection changes when the row content changes"""
+    menu = SimpleNamespace(
+        name="ข้าวผัด", name_i18n=json.dumps({"en": "Fried Rice"}),
+        description=None, description_i18n=None, addon_options=None,
+    )
+    assert project_menu_text(menu, "en") == ("Fried Rice", None, None)
+    menu.name_i18n = json.dumps({"en": "Fried Rice with Egg"})
+    assert project_menu_text(menu, "en")[0] == "Fried Rice with Egg"
+
+
+def test_project_labels_all_locales():
+    """Test ProgramSetting labels projected for every locale in one pass"""
+    rows = [SimpleNamespace(label_key="store_pos", label_th="หน้าร้าน", label_en="Store POS", label_lo=None,
+                            label_my=None, label_kh=None, label_ms=None, label_shn=None, label_zh="收银", label_ru=None)]
+    labels = project_labels(rows)
+    assert labels["th"]["store_pos"] == "หน้าร้าน"
+    assert labels["zh"]["store_pos"] == "收银"
+    assert labels["lo"]["store_pos"] == "Store POS"
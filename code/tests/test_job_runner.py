@@ -0,0 +1,170 @@
+"""
+Tests for the single-leader job runner (leader election, run history, timeouts, catch-up)
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.models import JobRun
+from app.services.job_runner import FileLeaderLock, Job, JobRunner, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="file leader lock needs fcntl")
+
+NIGHT = datetime(2026, 10, 18, 23, 0, 5)
+
+
+@pytest.fixture
+def sessions(db_session, test_database_url):
+    """session ของ runner ใช้ได้ข้าม thread (DB ไฟล์เดียวกับ db_session)"""
+    engine = create_engine(test_database_url, connect_args={"check_same_thread": False}, poolclass=NullPool)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def drive(runner, *moments):
+    """tick ตามเวลาที่กำหนดแล้วรองานที่เริ่มจนจบ คืนสถานะต่อรอบ"""
+    async def main():
+        statuses = []
+        for now in moments:
+            statuses += await asyncio.gather(*runner.tick(now))
+        return statuses
+
+    return asyncio.run(main())
+
+
+def test_only_the_leader_runs_and_a_new_leader_does_not_repeat(db_session, sessions, tmp_path):
+    """Test two workers share one lock: the job runs once, and the takeover skips the finished run"""
+    calls = []
+    jobs = [Job("settle", calls.append, daily_at="23:00", catch_up=timedelta(hours=12))]
+    lock_file = tmp_path / "scheduler.lock"
+    first = JobRunner(jobs, FileLeaderLock(lock_file), session_factory=sessions)
+    second = JobRunner(jobs, FileLeaderLock(lock_file), session_factory=sessions)
+
+    assert drive(first, NIGHT) == ["success"]
+    assert drive(second, NIGHT) == [] and not second.leader
+
+    first.lock.release()  # leader ตาย
+    assert drive(second, NIGHT + timedelta(minutes=1)) == [None]  # รับช่วงแล้ว แต่รอบนี้รันไปแล้ว
+    assert second.leader and calls == [datetime(2026, 10, 18, 23, 0)]
+    run = db_session.query(JobRun).one()
+    assert (run.job_name, run.status) == ("settle", "success") and run.duration_ms is not None
+    second.lock.release()
+
+
+def test_timeouts_failures_and_concurrency_limit_are_recorded(db_session, sessions, tmp_path):
+    """Test each run is written to job_runs with its outcome and overlapping runs are skipped"""
+    release = threading.Event()
+
+    async def hang(run_at):
+        await asyncio.sleep(60)
+
+    def broken(run_at):
+        raise ValueError("no bank file")
+
+    def slow(run_at):
+        release.wait(5)
+
+    soon = timedelta(minutes=1)
+    jobs = [
+        Job("hang", hang, every=timedelta(minutes=5), timeout=0.05, catch_up=soon),
+        Job("broken", broken, daily_at="23:00", catch_up=soon),
+        Job("slow", slow, every=timedelta(minutes=5), max_concurrency=1, catch_up=soon),
+    ]
+    runner = JobRunner(jobs, FileLeaderLock(tmp_path / "scheduler.lock"), session_factory=sessions)
+
+    async def main():
+        tasks = runner.tick(NIGHT)
+        await tasks[0]  # รอ hang หมดเวลาและบันทึกผลเสร็จ (ไม่เดาด้วย sleep) ก่อนรอบถัดไป
+        skipped = runner.tick(NIGHT + timedelta(minutes=5))  # slow ยังไม่จบ - รอบนี้ข้าม, hang เริ่มรอบใหม่
+        release.set()
+        return await asyncio.gather(*tasks), await asyncio.gather(*skipped)
+
+    started = time.monotonic()
+    first, second = asyncio.run(main())
+    assert time.monotonic() - started < 5
+    assert first == ["timeout", "failed", "success"] and second == ["timeout"]
+    runs = {(r.job_name, r.scheduled_for.minute): r for r in db_session.query(JobRun)}
+    assert set(runs) == {("hang", 0), ("hang", 5), ("broken", 0), ("slow", 0)}
+    assert "no bank file" in runs[("broken", 0)].error
+    assert all(r.finished_at is not None and r.duration_ms >= 0 for r in runs.values())
+    runner.lock.release()
+
+
+def test_missed_runs_are_caught_up_once_within_window(db_session, sessions, tmp_path):
+    """Test a leader starting after a missed slot runs it with the original time, once"""
+    calls = []
+    jobs = [
+        Job("settle", lambda run_at: calls.append(("settle", run_at)), daily_at="23:00", catch_up=timedelta(hours=12)),
+        Job("notify", lambda run_at: calls.append(("notify", run_at)), daily_at="22:00", catch_up=timedelta(hours=1)),
+    ]
+    restart = datetime(2026, 10, 19, 1, 30)  # deploy กลางคืน: ไม่มี leader ตอน 22:00 และ 23:00
+    runner = JobRunner(jobs, FileLeaderLock(tmp_path / "scheduler.lock"), session_factory=sessions)
+
+    assert drive(runner, restart, restart + timedelta(minutes=1)) == ["success"]
+    assert calls == [("settle", datetime(2026, 10, 18, 23, 0))]  # notify เลยช่วง catch_up แล้ว ไม่ส่งกลางดึก
+    runner.lock.release()
+
+    restarted = JobRunner(jobs, FileLeaderLock(tmp_path / "scheduler.lock"), session_factory=sessions)
+    assert drive(restarted, restart + timedelta(minutes=10)) == [None]
+    assert drive(restarted, datetime(2026, 10, 19, 22, 0, 10), datetime(2026, 10, 19, 23, 0, 10)) == ["success", "success"]
+    assert db_session.query(JobRun).count() == 3
+    restarted.lock.release()
+
+
+def test_run_left_running_by_a_dead_leader_is_taken_over(db_session, sessions, tmp_path):
+    """Test a running row whose heartbeat stopped is rerun by the next leader and by --run, a live one is not"""
+    calls = []
+    jobs = [
+        Job("settle", calls.append, daily_at="23:00", catch_up=timedelta(hours=12)),
+        Job("notify", calls.append, daily_at="22:00", catch_up=timedelta(hours=12)),
+    ]
+    now = datetime.now()
+    db_session.add_all([
+        JobRun(job_name="settle", scheduled_for=datetime(2026, 10, 18, 23, 0), status="running",
+               runner="old-host:41", started_at=now - timedelta(minutes=3), heartbeat_at=now - timedelta(minutes=2)),
+        JobRun(job_name="notify", scheduled_for=datetime(2026, 10, 18, 22, 0), status="running",
+               runner="live-host:7", started_at=now - timedelta(minutes=3), heartbeat_at=now),
+    ])
+    db_session.commit()
+    runner = JobRunner(jobs, FileLeaderLock(tmp_path / "scheduler.lock"), session_factory=sessions, heartbeat=5)
+
+    assert sorted(drive(runner, NIGHT), key=str) == [None, "success"]  # notify ยังมี heartbeat - ไม่แย่ง
+    assert calls == [datetime(2026, 10, 18, 23, 0)]
+    db_session.expire_all()
+    settle = db_session.query(JobRun).filter_by(job_name="settle").one()
+    assert settle.status == "success" and settle.runner != "old-host:41" and settle.heartbeat_at is None
+
+    db_session.query(JobRun).filter_by(job_name="notify").update({"heartbeat_at": now - timedelta(minutes=5)})
+    db_session.commit()
+    assert runner.run_once("notify", datetime(2026, 10, 18, 22, 0)) == "success"
+    runner.lock.release()
+
+
+def test_sync_job_finishing_after_timeout_records_the_real_outcome(db_session, sessions, tmp_path):
+    """Test a thread that outlives its timeout updates its row when it actually ends, and blocks --run meanwhile"""
+    release = threading.Event()
+    jobs = [Job("slow", lambda run_at: release.wait(5), daily_at="23:00", timeout=0.05, catch_up=timedelta(hours=1))]
+    runner = JobRunner(jobs, FileLeaderLock(tmp_path / "scheduler.lock"), session_factory=sessions)
+    other = JobRunner(jobs, FileLeaderLock(tmp_path / "other.lock"), session_factory=sessions)
+
+    async def main():
+        task, = runner.tick(NIGHT)
+        await asyncio.sleep(0.2)
+        row = db_session.query(JobRun).one()
+        recorded = (row.status, row.heartbeat_at is not None)
+        retried = await asyncio.to_thread(other._claim, jobs[0], datetime(2026, 10, 18, 23, 0), True)
+        release.set()
+        return await task, recorded, retried
+
+    status, recorded, retried = asyncio.run(main())
+    assert status == "timeout" and recorded == ("timeout", True) and retried is None
+    db_session.expire_all()
+    row = db_session.query(JobRun).one()
+    assert row.status == "success" and row.heartbeat_at is None and "จบจริง" in row.error
+    runner.lock.release()
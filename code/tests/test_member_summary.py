@@ -0,0 +1,80 @@
+"""
+Tests for precomputed member dashboard summary
+"""
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.models import Customer, CustomerBalance, ECoupon, MemberActivity, MemberSummary, StorePromotion
+from app.services import member_summary, wallet_ledger
+
+
+def _customer(db_session):
+    customer = Customer(phone="0877777777")
+    db_session.add(customer)
+    db_session.commit()
+    return customer
+
+
+def test_summary_follows_orm_and_ledger_changes(db_session):
+    """Test the summary row is rebuilt in the same commit as coupon, activity and wallet changes"""
+    customer = _customer(db_session)
+    summary = member_summary.get_summary(db_session, customer.id)
+    assert (summary.balance, summary.e_coupon_balance) == (0, 0)
+
+    db_session.add(ECoupon(code="ECSUM1", amount=40, customer_id=customer.id, status="assigned"))
+    db_session.add(MemberActivity(customer_id=customer.id, activity_type="topup", amount=100, description="เติมเงิน"))
+    wallet_ledger.credit(db_session, customer.id, 100, reason="topup")
+    db_session.commit()
+
+    summary = db_session.get(MemberSummary, customer.id)
+    db_session.refresh(summary)
+    assert summary.balance == 100
+    assert summary.e_coupon_balance == 40
+    assert [a["type"] for a in member_summary.summary_activities(summary)] == ["topup"]
+
+
+def test_only_touched_parts_are_recomputed(db_session):
+    """Test a wallet change writes the known balance without re-reading, and unrelated columns trigger nothing"""
+    customer = _customer(db_session)
+    wallet_ledger.credit(db_session, customer.id, 70, reason="topup")
+    db_session.commit()
+    statements = []
+    bind = db_session.get_bind()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()))
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        wallet_ledger.debit(db_session, customer.id, 70, reason="daily_reset")
+        db_session.commit()
+        wallet_sql, statements[:] = list(statements), []
+        db_session.query(CustomerBalance).filter_by(customer_id=customer.id).one().last_reset_date = datetime.now()
+        db_session.commit()
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+    assert not [q for q in wallet_sql if "e_coupons" in q or "member_activities" in q or "member_vouchers" in q]
+    assert len([q for q in wallet_sql if q.startswith("UPDATE member_summaries")]) == 1
+    assert not [q for q in statements if "member_summaries" in q]
+    assert db_session.get(MemberSummary, customer.id).balance == 0
+
+
+def test_rollback_discards_pending_refresh(db_session):
+    """Test a rolled back change does not leave the customer marked for refresh"""
+    customer = _customer(db_session)
+    member_summary.touch(db_session, customer.id)
+    db_session.rollback()
+    assert not db_session.info.get("member_summary_dirty")
+
+
+def test_promotions_cache_cleared_on_change(db_session):
+    """Test active promotions are cached and reloaded after a StorePromotion commit"""
+    member_summary._promotions.clear()
+    assert member_summary.get_active_promotions(db_session) == []
+
+    db_session.add(StorePromotion(store_id=1, title="ลด 10%", is_active=True))
+    db_session.commit()
+
+    assert [p["title"] for p in member_summary.get_active_promotions(db_session)] == ["ลด 10%"]
@@ -0,0 +1,73 @@
+"""
+Tests for the Prometheus metrics endpoint and multi-worker aggregation
+"""
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import main
+from app.models import Store
+from app.services import metrics
+
+
+def test_metrics_endpoint_reports_routes_and_subscribers(client, db_session, monkeypatch):
+    """Test /metrics exposes latency per route template, DB queries and signage subscribers"""
+    store = Store(name="ร้านกาแฟ")
+    db_session.add(store)
+    db_session.commit()
+    client.get("/api/signage/display", params={"store_id": store.id})
+    local = TestClient(main.app, client=("127.0.0.1", 50000))
+    body = local.get("/metrics").text
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/signage/display"}' in body
+    assert 'subscribers_active{kind="signage"} 1.0' in body
+    assert 'http_requests_total{method="GET",route="/metrics",status="200"}' not in body  # นับหลังตอบเสร็จ
+
+    # ไม่ตั้ง token: เฉพาะเครื่องนี้ที่ไม่ผ่าน reverse proxy
+    assert client.get("/metrics").status_code == 403
+    assert local.get("/metrics", headers={"X-Forwarded-For": "203.0.113.7"}).status_code == 403
+
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert local.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+
+
+def test_gateway_timer_and_webhook_lag():
+    """Test gateway latency is split by outcome and webhook lag is measured from paid_at"""
+    def count(name, labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    before_ok = count("gateway_request_duration_seconds_count", {"provider": "omise", "outcome": "ok"})
+    before_error = count("gateway_request_duration_seconds_count", {"provider": "omise", "outcome": "error"})
+    with metrics.gateway_timer("omise"):
+        pass
+    with pytest.raises(TimeoutError):
+        with metrics.gateway_timer("omise"):
+            raise TimeoutError()
+    assert count("gateway_request_duration_seconds_count", {"provider": "omise", "outcome": "ok"}) == before_ok + 1
+    assert count("gateway_request_duration_seconds_count", {"provider": "omise", "outcome": "error"}) == before_error + 1
+
+    before = count("webhook_ingestion_lag_seconds_bucket", {"gateway": "kbank", "le": "30.0"})
+    metrics.observe_webhook_lag("kbank", datetime.now(timezone.utc) - timedelta(seconds=20))
+    metrics.observe_webhook_lag("kbank", datetime.utcnow() - timedelta(seconds=120))
+    assert count("webhook_ingestion_lag_seconds_bucket", {"gateway": "kbank", "le": "30.0"}) == before + 1
+
+
+def test_multiprocess_metrics_aggregate_across_workers(tmp_path, monkeypatch):
+    """Test counters written by separate worker processes are summed by the /metrics renderer"""
+    root = Path(metrics.__file__).resolve().parents[2]
+    worker = (
+        "from app.services import metrics\n"
+        "metrics.observe_request('GET', '/api/menus/store/{store_id}', 200, 0.02)\n"
+    )
+    env = {"PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PATH": "", "PYTHONPATH": str(root)}
+    for _ in range(3):
+        subprocess.run([sys.executable, "-c", worker], cwd=root, env=env, check=True)
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    body = metrics.render().decode()
+    assert 'http_requests_total{method="GET",route="/api/menus/store/{store_id}",status="200"} 3.0' in body
@@ -0,0 +1,65 @@
+"""
+Tests for the pure ASGI security and session middleware
+"""
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.api.auth import _hash_password
+from app.models import Store, StoreSettlement, User
+from middleware.rate_limit import LocalBucketStore
+from middleware.security import SecurityMiddleware
+from middleware.session import PathSessionMiddleware
+
+
+async def _count(request):
+    request.session["n"] = request.session.get("n", 0) + 1
+    return JSONResponse({"n": request.session["n"]}, headers={"X-Frame-Options": "SAMEORIGIN"})
+
+
+def _app():
+    app = Starlette(routes=[Route("/api/count", _count), Route("/api/signage/count", _count)])
+    app.add_middleware(PathSessionMiddleware, secret_key="test")
+    app.add_middleware(SecurityMiddleware, rate_limit_per_minute=2, store=LocalBucketStore())
+    return app
+
+
+def test_security_headers_and_rate_limit():
+    """Test security headers replace the app's own and the limit returns 429 JSON / HTML"""
+    client = TestClient(_app())
+    response = client.get("/api/count")
+    assert response.headers["x-frame-options"] == "DENY"
+    assert response.headers["x-content-type-options"] == "nosniff"
+    client.get("/api/count")
+    assert client.get("/api/count").status_code == 429
+    blocked = client.get("/api/count", headers={"Accept": "text/html"})
+    assert blocked.status_code == 429 and "Too Many Requests" in blocked.text
+    assert client.get("/api/signage/count").status_code == 200  # policy ไม่จำกัด
+
+
+def test_session_bypassed_for_listed_paths():
+    """Test the session cookie round-trips normally but is ignored on bypass prefixes"""
+    client = TestClient(Starlette(routes=[Route("/api/count", _count), Route("/api/signage/count", _count)]))
+    client.app.add_middleware(PathSessionMiddleware, secret_key="test")
+    assert client.get("/api/count").json() == {"n": 1}
+    assert client.get("/api/count").json() == {"n": 2}
+    assert client.get("/api/signage/count").json() == {"n": 1}
+    assert "set-cookie" not in client.get("/api/signage/count").headers
+
+
+def test_admin_session_reaches_settlement_routes(client, db_session):
+    """Test webhooks skip the session but admin settlement actions under payment-callback still see it"""
+    store = Store(name="ร้านข้าวมันไก่")
+    db_session.add_all([store, User(username="account", password_hash=_hash_password("pw-1234"), is_admin=True)])
+    db_session.flush()
+    settlement = StoreSettlement(store_id=store.id, settlement_date=datetime.now(), amount=500, status="pending")
+    db_session.add(settlement)
+    db_session.commit()
+
+    assert client.post(f"/api/payment-callback/settlements/{settlement.id}/mark-transferred").status_code == 401
+    assert client.post("/api/auth/login", json={"username": "account", "password": "pw-1234"}).status_code == 200
+    response = client.post(f"/api/payment-callback/settlements/{settlement.id}/mark-transferred")
+    assert response.status_code == 200 and response.json()["status"] == "transferred"
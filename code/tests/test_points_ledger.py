@@ -0,0 +1,106 @@
+"""
+Tests for Points Ledger (batch accrual, snapshots, reconcile)
+"""
+from datetime import date, datetime
+
+import pytest
+from app.models import Customer, MemberPointsLedger, MemberPointsSnapshot, PaymentMethod, Transaction, TransactionStatus
+from app.services import points_ledger
+
+DAY = date(2026, 3, 1)
+
+
+def _txn(db_session, customer, amount, hour, status=TransactionStatus.CONFIRMED, day=DAY):
+    txn = Transaction(
+        customer_id=customer.id, store_id=1, amount=amount, payment_method=PaymentMethod.CASH,
+        status=status, receipt_number=f"T-{customer.id}-{amount}-{hour}-{day}",
+        created_at=datetime(day.year, day.month, day.day, hour),
+    )
+    db_session.add(txn)
+    return txn
+
+
+@pytest.fixture
+def members(db_session):
+    member = Customer(phone="0811111111", username="member1", total_points=5)
+    guest = Customer(phone="POS-GUEST")
+    db_session.add_all([member, guest])
+    db_session.flush()
+    db_session.add(MemberPointsLedger(customer_id=member.id, points_delta=5, balance_after=5, reason="promo"))
+    db_session.commit()
+    return member, guest
+
+
+def test_accrue_day_is_set_based_and_idempotent(db_session, members):
+    """Test a day's purchases accrue once per transaction with running balances, members only"""
+    member, guest = members
+    _txn(db_session, member, 250, 11)
+    _txn(db_session, member, 130, 12)
+    _txn(db_session, member, 999, 13, status=TransactionStatus.PENDING)
+    _txn(db_session, member, 500, 9, day=date(2026, 3, 2))
+    _txn(db_session, guest, 1000, 12)
+    db_session.commit()
+
+    assert points_ledger.accrue_day(db_session, DAY, points_per_baht=0.04) == 2
+    db_session.commit()
+    assert points_ledger.accrue_day(db_session, DAY, points_per_baht=0.04) == 0
+    db_session.commit()
+
+    rows = db_session.query(MemberPointsLedger).filter_by(reason="purchase").order_by(MemberPointsLedger.id).all()
+    assert [(r.points_delta, r.balance_after) for r in rows] == [(10, 15), (5, 20)]
+    db_session.refresh(member)
+    db_session.refresh(guest)
+    assert (member.total_points, guest.total_points) == (20, 0)
+
+
+def test_snapshots_and_balance_at(db_session, members):
+    """Test balance-at-time reads the day's snapshot plus later ledger rows"""
+    member, _ = members
+    points_ledger.post(db_session, member.id, 10, reason="promo", ref_id=1)
+    db_session.commit()
+    today = date.today()
+    assert points_ledger.write_snapshots(db_session, today) == 1
+    db_session.commit()
+    snap = db_session.query(MemberPointsSnapshot).one()
+    assert (snap.snapshot_date, snap.balance) == (today, 15)
+
+    assert points_ledger.post(db_session, member.id, -12, reason="redeem", ref_id=2) == 3
+    with pytest.raises(points_ledger.InsufficientPoints):
+        points_ledger.post(db_session, member.id, -4, reason="redeem", ref_id=3)
+    db_session.commit()
+    assert points_ledger.balance_at(db_session, member.id, datetime.now()) == 3
+    assert points_ledger.balance_at(db_session, member.id, datetime(2000, 1, 1)) == 0
+
+
+def test_reconcile_total_points(db_session, members):
+    """Test total_points drifted from the ledger is reset to the ledger sum in one update"""
+    member, guest = members
+    member.total_points = 99
+    guest.total_points = 1
+    db_session.commit()
+
+    assert points_ledger.reconcile_total_points(db_session) == 2
+    db_session.commit()
+    db_session.refresh(member)
+    db_session.refresh(guest)
+    assert (member.total_points, guest.total_points) == (5, 0)
+
+
+def test_opening_balances_keep_points_earned_before_the_ledger(db_session, members):
+    """Test pre-ledger points are posted as opening_balance rows so reconcile keeps them"""
+    member, guest = members
+    member.total_points = 120  # 5 อยู่ใน ledger แล้ว + 115 ก่อนใช้ ledger
+    guest.total_points = 40
+    db_session.commit()
+
+    assert points_ledger.post_opening_balances(db_session) == 2
+    assert points_ledger.post_opening_balances(db_session) == 0  # รันซ้ำไม่เพิ่ม
+    assert points_ledger.reconcile_total_points(db_session) == 0
+    db_session.commit()
+
+    opening = {r.customer_id: (r.points_delta, r.balance_after) for r in db_session.query(MemberPointsLedger).filter_by(
+        reason=points_ledger.OPENING_BALANCE
+    )}
+    assert opening == {member.id: (115, 120), guest.id: (40, 40)}
+    db_session.refresh(member)
+    assert member.total_points == 120
@@ -0,0 +1,71 @@
+"""
+Tests for offline POS journal bulk sync
+"""
+import pytest
+from app.api.auth import get_current_session_user
+from app.models import EmergencyBackupEntry, Order, PosJournalEntry, Store, Transaction
+from main import app
+
+
+@pytest.fixture
+def pos_client(client, db_session):
+    store = Store(name="ร้านทดสอบ")
+    db_session.add(store)
+    db_session.commit()
+    app.dependency_overrides[get_current_session_user] = lambda: {"user_id": 1, "store_ids": [store.id]}
+    yield client, store
+    app.dependency_overrides.pop(get_current_session_user, None)
+
+
+def _sale(client_id, amount=50.0):
+    return {
+        "client_id": client_id,
+        "entry_type": "sale",
+        "amount": amount,
+        "payment_method": "cash",
+        "order_lines": [{"menu_id": 1, "name": "ข้าวผัด", "qty": 1, "unit_price": amount}],
+        "occurred_at": "2026-03-01T12:05:00",
+    }
+
+
+def test_sync_creates_and_reports_per_item(pos_client, db_session):
+    """Test a batch creates orders, transactions and backup entries and reports each item"""
+    client, store = pos_client
+    items = [
+        _sale("a1"),
+        {"client_id": "b1", "entry_type": "topup", "amount": 100.0},
+        {"client_id": "c1", "entry_type": "refund", "amount": 10.0},
+        _sale("a1"),
+    ]
+    response = client.post("/api/pos-journal/sync", json={"store_id": store.id, "items": items})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["duplicate"], data["rejected"]) == (2, 1, 1)
+    assert [r["status"] for r in data["results"]] == ["created", "created", "rejected", "duplicate"]
+    assert data["results"][3]["order_id"] == data["results"][0]["order_id"]
+    order = db_session.get(Order, data["results"][0]["order_id"])
+    assert order.status == "paid" and order.total_amount == 50.0
+    assert db_session.query(Transaction).count() == 1
+    assert db_session.query(EmergencyBackupEntry).count() == 2
+
+
+def test_resync_is_idempotent(pos_client, db_session):
+    """Test replaying the same journal returns the original ids without inserting again"""
+    client, store = pos_client
+    items = [_sale(f"s{i}", 10.0 + i) for i in range(20)]
+    first = client.post("/api/pos-journal/sync", json={"store_id": store.id, "items": items}).json()
+    again = client.post("/api/pos-journal/sync", json={"store_id": store.id, "items": items}).json()
+
+    assert first["created"] == 20
+    assert again["duplicate"] == 20 and again["created"] == 0
+    assert [r["transaction_id"] for r in again["results"]] == [r["transaction_id"] for r in first["results"]]
+    assert db_session.query(Order).count() == 20
+    assert db_session.query(PosJournalEntry).count() == 20
+
+
+def test_sync_rejects_other_store(pos_client):
+    """Test a POS user cannot sync into a store they are not assigned to"""
+    client, store = pos_client
+    response = client.post("/api/pos-journal/sync", json={"store_id": store.id + 1, "items": [_sale("x")]})
+    assert response.status_code == 403
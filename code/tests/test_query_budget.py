@@ -0,0 +1,69 @@
+"""
+Tests for per-request query stats, the N+1 detector and endpoint query budgets
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.models import Event, Profile, PromptPayBackTransaction, Store, StoreSettlement
+from app.services import query_stats
+from middleware.query_stats import QueryStatsMiddleware
+
+STORES = 12
+
+
+def test_fingerprint_collapses_parameters_and_in_lists():
+    """Test statements differing only in IN-list length and whitespace share a fingerprint"""
+    a = query_stats.fingerprint("SELECT * FROM stores\n  WHERE id IN (?, ?, ?)")
+    b = query_stats.fingerprint("SELECT * FROM stores WHERE id IN (?, ?)")
+    assert a == b == "SELECT * FROM stores WHERE id IN (?)"
+
+
+def test_middleware_headers_and_route_totals(db_session):
+    """Test the middleware reports query count and repeats per request and aggregates them per route"""
+    def repeat(request):
+        for _ in range(query_stats.REPEAT_THRESHOLD):
+            db_session.execute(text("SELECT 1"))
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/items/{item_id}", repeat)])
+    app.add_middleware(QueryStatsMiddleware, headers=True)
+    query_stats.reset_totals()
+    response = TestClient(app).get("/items/7")
+    assert response.headers["x-db-query-count"] == str(query_stats.REPEAT_THRESHOLD)
+    assert response.headers["x-db-max-repeat"] == str(query_stats.REPEAT_THRESHOLD)
+    totals = query_stats.snapshot()[("GET", "/items/{item_id}")]
+    assert (totals.requests, totals.queries, totals.n_plus_one) == (1, query_stats.REPEAT_THRESHOLD, 1)
+
+
+@pytest.mark.parametrize("path", [
+    "/api/geo/stores",
+    "/api/payment-callback/back-transactions/report",
+    "/api/payment-callback/back-transactions/live",
+    "/api/payment-callback/settlements",
+])
+def test_endpoint_query_budget(client, db_session, query_budget, path):
+    """Test list endpoints load related rows in bulk instead of one query per store"""
+    profile = Profile(name="ตลาดนัด", profile_type="event")
+    db_session.add(profile)
+    db_session.flush()
+    event = Event(profile_id=profile.id, name="งานวัด", start_date=datetime(2026, 1, 1), end_date=datetime(2026, 1, 3))
+    db_session.add(event)
+    db_session.flush()
+    for i in range(STORES):
+        store = Store(name=f"ร้าน {i}", profile_id=profile.id, event_id=event.id)
+        db_session.add(store)
+        db_session.flush()
+        db_session.add_all([
+            PromptPayBackTransaction(ref1=f"{i:020d}", amount=10, paid_at=datetime(2026, 1, 2), store_id=store.id),
+            StoreSettlement(store_id=store.id, settlement_date=datetime(2026, 1, 2, 23, 59), amount=10),
+        ])
+    db_session.commit()
+    with query_budget(6, max_repeat=2):
+        response = client.get(path)
+    assert response.status_code == 200
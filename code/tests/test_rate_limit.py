@@ -0,0 +1,49 @@
+"""
+Tests for the token-bucket rate limiter used by SecurityMiddleware
+"""
+import pytest
+
+from middleware.rate_limit import LocalBucketStore, RateLimiter, RateLimitPolicy, SharedBucketStore, fcntl
+
+
+def test_bucket_refills_and_evicts_least_recent():
+    """Test tokens refill at per_minute / 60 per second and the store stays within max_keys"""
+    store = LocalBucketStore(max_keys=2)
+    limiter = RateLimiter([], RateLimitPolicy("/", 2), store)
+    assert limiter.allow("/api/x", "1.1.1.1", now=0)
+    assert limiter.allow("/api/x", "1.1.1.1", now=0)
+    assert not limiter.allow("/api/x", "1.1.1.1", now=1)
+    assert limiter.allow("/api/x", "1.1.1.1", now=30)  # 30 วินาที = 1 token
+
+    limiter.allow("/api/x", "2.2.2.2", now=30)
+    limiter.allow("/api/x", "3.3.3.3", now=30)
+    assert len(store) == 2
+
+
+def test_route_policies():
+    """Test the first matching prefix wins and per_minute=None is unlimited"""
+    limiter = RateLimiter(
+        [RateLimitPolicy("/api/signage", None), RateLimitPolicy("/api/auth", 1)],
+        RateLimitPolicy("/", 100),
+        LocalBucketStore(),
+    )
+    assert all(limiter.allow("/api/signage/feed", "1.1.1.1", now=0) for _ in range(500))
+    assert limiter.allow("/api/auth/login", "1.1.1.1", now=0)
+    assert not limiter.allow("/api/auth/login", "1.1.1.1", now=0)
+    assert limiter.allow("/api/menus", "1.1.1.1", now=0)
+
+
+@pytest.mark.skipif(fcntl is None, reason="shared store needs fcntl")
+def test_shared_store_counts_across_workers(tmp_path):
+    """Test two stores mapping the same file (two workers) share one bucket per IP"""
+    path = tmp_path / "rate_limit.bin"
+    worker_a, worker_b = SharedBucketStore(path, slots=64), SharedBucketStore(path, slots=64)
+    try:
+        assert worker_a.allow("/|1.1.1.1", rate=0, capacity=3, now=0)
+        assert worker_b.allow("/|1.1.1.1", rate=0, capacity=3, now=0)
+        assert worker_a.allow("/|1.1.1.1", rate=0, capacity=3, now=0)
+        assert not worker_b.allow("/|1.1.1.1", rate=0, capacity=3, now=0)
+        assert worker_b.allow("/|2.2.2.2", rate=0, capacity=3, now=0)
+    finally:
+        worker_a.close()
+        worker_b.close()
@@ -0,0 +1,92 @@
+"""
+Tests for routing report endpoints to the separately pooled reporting engine
+"""
+from fastapi.routing import APIRoute
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app import database
+from app.api import admin, payment_callback, reports, reports_payment
+from app.database import get_db, get_reporting_db
+from app.models import Store
+from main import app
+
+REPORT_PATHS = {
+    "/api/reports/sales-tax",
+    "/api/reports/payment/daily",
+    "/api/reports/payment/overall-summary",
+    "/api/admin/statistics",
+    "/api/payment-callback/back-transactions/report",
+}
+
+
+def _dependencies(route):
+    return {dep.call for dep in route.dependant.dependencies}
+
+
+def test_report_endpoints_declare_reporting_class():
+    """Test report endpoints take a reporting session while checkout / webhook keep the primary one"""
+    routes = {
+        route.path: route
+        for router in (admin.router, payment_callback.router, reports.router, reports_payment.router)
+        for route in router.routes
+        if isinstance(route, APIRoute)
+    }
+    for path in REPORT_PATHS:
+        assert get_reporting_db in _dependencies(routes[path]), path
+        assert get_db not in _dependencies(routes[path]), path
+    assert get_db in _dependencies(routes["/api/payment-callback/settlements"])
+    assert get_reporting_db not in _dependencies(routes["/api/payment-callback/back-transactions/live"])
+
+
+def test_exhausted_reporting_pool_returns_503_without_touching_primary(client, db_session, tmp_path, monkeypatch):
+    """Test a full reporting pool answers 503 quickly while OLTP endpoints keep working"""
+    store = Store(name="ร้านข้าวมันไก่")
+    db_session.add(store)
+    db_session.commit()
+    reporting = create_engine(
+        f"sqlite:///{tmp_path / 'reporting.db'}", poolclass=QueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=0.1, connect_args={"check_same_thread": False},
+    )
+    monkeypatch.setattr(database, "ReportingSessionLocal", sessionmaker(bind=reporting))
+    app.dependency_overrides.pop(get_reporting_db)
+    held = reporting.connect()  # รายงานสิ้นเดือนถือ connection เดียวของ pool ไว้
+    try:
+        response = client.get("/api/reports/payment/daily")
+        assert response.status_code == 503
+        assert response.headers["retry-after"]
+        assert client.get(f"/api/payment-callback/stores/{store.id}/gateway-info").status_code == 200
+    finally:
+        held.close()
+        reporting.dispose()
+
+
+def test_reporting_connections_are_time_limited_and_read_only(monkeypatch):
+    """Test MySQL / MariaDB reporting connections get a statement timeout and a read-only session"""
+    class Cursor:
+        def __init__(self, log):
+            self.log = log
+
+        def execute(self, sql):
+            self.log.append(sql)
+
+        def close(self):
+            pass
+
+    class Connection:
+        def __init__(self, server):
+            self.server, self.log = server, []
+
+        def get_server_info(self):
+            return self.server
+
+        def cursor(self):
+            return Cursor(self.log)
+
+    monkeypatch.setattr(database, "REPORTING_STATEMENT_TIMEOUT", 30)
+    mysql, mariadb = Connection("8.0.36"), Connection("10.11.6-MariaDB")
+    database._limit_reporting_session(mysql, None)
+    database._limit_reporting_session(mariadb, None)
+    assert mysql.log == ["SET SESSION max_execution_time = 30000", "SET SESSION TRANSACTION READ ONLY"]
+    assert mariadb.log == ["SET SESSION max_statement_time = 30", "SET SESSION TRANSACTION READ ONLY"]
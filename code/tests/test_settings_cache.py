@@ -0,0 +1,127 @@
+"""
+Tests for Settings Cache
+"""
+import json
+import pytest
+from app.services import settings_cache
+from app.services.settings_cache import WatchedJsonFile
+from app.models import AppSetting, Store, StoreLocaleSetting
+
+
+def test_watched_file_reloads_on_change(tmp_path):
+    """Test file is cached and reloaded when mtime/size changes"""
+    path = tmp_path / "settings.json"
+    watched = WatchedJsonFile(path, dict, check_interval=0)
+    assert watched.get() == {}
+
+    path.write_text(json.dumps({"menu_columns": 4}), encoding="utf-8")
+    assert watched.get() == {"menu_columns": 4}
+
+    path.write_text(json.dumps({"menu_columns": 6, "x": 1}), encoding="utf-8")
+    assert watched.get() == {"menu_columns": 6, "x": 1}
+
+
+def test_watched_file_atomic_write(tmp_path):
+    """Test write replaces file atomically and leaves no temp files"""
+    path = tmp_path / "settings.json"
+    watched = WatchedJsonFile(path, dict, check_interval=0)
+    watched.write({"menu_image_priority": "server,local"})
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"menu_image_priority": "server,local"}
+    assert [p.name for p in tmp_path.iterdir()] == ["settings.json"]
+    assert watched.get()["menu_image_priority"] == "server,local"
+
+
+def test_watched_file_invalid_json_uses_default(tmp_path):
+    """Test unreadable file falls back to default"""
+    path = tmp_path / "media.json"
+    path.write_text("{not json", encoding="utf-8")
+    watched = WatchedJsonFile(path, lambda: ["default"], check_interval=0)
+    assert watched.get() == ["default"]
+
+
+def test_db_settings_cached_until_invalidated(db_session):
+    """Test AppSetting / StoreLocaleSetting are cached and invalidated"""
+    db_session.add(Store(id=1, name="Test Store"))
+    db_session.add(AppSetting(key="locale", value="en"))
+    db_session.add(StoreLocaleSetting(store_id=1, locale="lo", currency_code="LAK", currency_symbol="₭"))
+    db_session.commit()
+
+    assert settings_cache.get_app_setting(db_session, "locale") == "en"
+    values = settings_cache.get_store_locale_values(db_session, 1)
+    assert values.locale == "lo"
+    assert settings_cache.get_store_locale_values(db_session, 2) is None
+
+    db_session.query(StoreLocaleSetting).filter(StoreLocaleSetting.store_id == 1).update({"locale": "zh"})
+    db_session.commit()
+    assert settings_cache.get_store_locale_values(db_session, 1).locale == "lo"
+
+    settings_cache.invalidate_db_settings()
+    assert settings_cache.get_store_locale_values(db_session, 1).locale == "zh"
+
+
+def test_cache_channels_invalidate_independently(db_session):
+    """Test invalidating another channel (e.g. promotions) keeps the settings cache"""
+    db_session.add(AppSetting(key="locale", value="en"))
+    db_session.commit()
+    cleared = []
+    settings_cache.register_db_cache(lambda: cleared.append(1), channel="test_channel")
+
+    assert settings_cache.get_app_setting(db_session, "locale") == "en"
+    db_session.query(AppSetting).filter(AppSetting.key == "locale").update({"value": "th"})
+    db_session.commit()
+
+    settings_cache.invalidate("test_channel")
+    assert cleared == [1]
+    assert settings_cache.get_app_setting(db_session, "locale") == "en"
+    assert not settings_cache._VERSION_FILE.exists()
+
+    settings_cache.invalidate_db_settings()
+    assert settings_cache.get_app_setting(db_session, "locale") == "th"
+    assert cleared == [1]
+
+
+def test_locale_context_and_labels_bundle(db_session):
+    """Test locale context cached per store and labels bundle rebuilt after invalidation"""
+    import gzip
+    import json
+    from app.models import ProgramSetting
+    from app.services.locale_context import get_locale_context, get_labels_bundle, invalidate_locale_cache
+
+    db_session.add(Store(id=1, name="Test Store"))
+    db_session.add(StoreLocaleSetting(store_id=1, locale="en", currency_code="USD", currency_symbol="$", currency_name="Dollar"))
+    db_session.add(ProgramSetting(label_key="store_pos", label_th="หน้าร้าน", label_en="Store POS"))
+    db_session.commit()
+
+    assert get_locale_context(db_session, 1).currency_code == "USD"
+    assert get_locale_context(db_session, None).locale == "th"
+
+    bundle = get_labels_bundle(db_session, "en")
+    assert bundle.labels == {"store_pos": "Store POS"}
+    assert json.loads(gzip.decompress(bundle.body_gzip))["translations"] == bundle.labels
+
+    row = db_session.query(ProgramSetting).filter(ProgramSetting.label_key == "store_pos").first()
+    row.label_en = "Cashier"
+    db_session.commit()
+    assert get_labels_bundle(db_session, "en").version == bundle.version
+
+    invalidate_locale_cache()
+    assert get_labels_bundle(db_session, "en").labels == {"store_pos": "Cashier"}
+
+
+def test_labels_bundle_not_cached_when_table_unreadable():
+    """Test a failed program_settings read serves fallback labels without caching them"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app.models import ProgramSetting
+    from app.services.locale_context import get_labels_bundle
+
+    engine = create_engine("sqlite://")
+    with Session(engine) as db:
+        assert get_labels_bundle(db, "en").labels == {}  # ยังไม่มีตาราง
+
+        ProgramSetting.__table__.create(bind=engine)
+        db.add(ProgramSetting(label_key="store_pos", label_th="หน้าร้าน", label_en="Store POS"))
+        db.commit()
+        assert get_labels_bundle(db, "en").labels == {"store_pos": "Store POS"}
+    engine.dispose()
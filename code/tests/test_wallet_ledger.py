@@ -0,0 +1,107 @@
+"""
+Tests for Wallet Ledger and idempotent Stripe member top-up
+"""
+import pytest
+from app.models import Customer, CustomerBalance, ProcessedPaymentEvent, RefundMethod, RefundRequest, WalletLedger
+from app.services import refund_service, wallet_ledger
+from app.services.refund_service import RefundService
+
+
+def _customer(db_session):
+    customer = Customer(phone="0899999999")
+    db_session.add(customer)
+    db_session.commit()
+    return customer
+
+
+def _topup_event(customer_id, payment_intent_id="pi_test_1", event_id="evt_1", amount_satang=10000):
+    return {
+        "id": event_id,
+        "type": "payment_intent.succeeded",
+        "data": {"object": {
+            "id": payment_intent_id,
+            "object": "payment_intent",
+            "amount": amount_satang,
+            "status": "succeeded",
+            "metadata": {"customer_id": str(customer_id), "type": "member_topup"},
+        }},
+    }
+
+
+def test_credit_and_debit_are_atomic_updates(db_session):
+    """Test credit creates the balance row, debit refuses to overdraw, ledger records each change"""
+    customer = _customer(db_session)
+    assert wallet_ledger.credit(db_session, customer.id, 100, reason="topup") == 100
+    assert wallet_ledger.credit(db_session, customer.id, 50, reason="topup") == 150
+    assert wallet_ledger.debit(db_session, customer.id, 120, reason="refund") == 30
+    with pytest.raises(wallet_ledger.InsufficientBalance):
+        wallet_ledger.debit(db_session, customer.id, 31, reason="refund")
+    db_session.commit()
+
+    assert db_session.query(CustomerBalance).filter_by(customer_id=customer.id).one().balance == 30
+    ledger = db_session.query(WalletLedger).order_by(WalletLedger.id).all()
+    assert [(r.delta, r.balance_after) for r in ledger] == [(100, 100), (50, 150), (-120, 30)]
+
+
+def test_refund_reserves_balance_before_payout_and_returns_it_on_failure(db_session, monkeypatch):
+    """Test the wallet is debited before PromptPay pays out and credited back when the payout fails"""
+    customer = _customer(db_session)
+    wallet_ledger.credit(db_session, customer.id, 100, reason="topup")
+    request = RefundRequest(customer_id=customer.id, amount=80, refund_method=RefundMethod.PROMPTPAY, status="pending")
+    db_session.add(request)
+    db_session.commit()
+    seen = []
+
+    def payout(number, amount):
+        seen.append(db_session.query(CustomerBalance.balance).filter_by(customer_id=customer.id).scalar())
+        return False
+
+    service = RefundService(db_session)
+    monkeypatch.setattr(service, "_process_promptpay_refund", payout)
+    assert service.process_refund(request.id).status == "failed"
+
+    assert seen == [20]  # หักแล้วก่อนจ่าย
+    assert db_session.query(CustomerBalance).filter_by(customer_id=customer.id).one().balance == 100
+    ledger = db_session.query(WalletLedger).order_by(WalletLedger.id).all()
+    assert [(r.delta, r.reason) for r in ledger] == [(100, "topup"), (-80, "refund"), (80, "refund_reversal")]
+    with pytest.raises(ValueError):
+        service.process_refund(request.id)
+
+
+def test_daily_balance_reset_goes_through_the_ledger(db_session, monkeypatch):
+    """Test the nightly reset debits each wallet with a ledger row instead of zeroing it in place"""
+    monkeypatch.setattr(refund_service, "HAS_E_MONEY_LICENSE", False)
+    monkeypatch.setattr(refund_service, "DAILY_BALANCE_RESET", True)
+    customer = _customer(db_session)
+    wallet_ledger.credit(db_session, customer.id, 70, reason="topup")
+    db_session.commit()
+
+    RefundService(db_session).daily_balance_reset()
+
+    balance = db_session.query(CustomerBalance).filter_by(customer_id=customer.id).one()
+    assert balance.balance == 0 and balance.last_reset_date is not None
+    last = db_session.query(WalletLedger).order_by(WalletLedger.id.desc()).first()
+    assert (last.delta, last.balance_after, last.reason) == (-70, 0, "daily_reset")
+
+
+def test_claim_payment_once(db_session):
+    """Test a payment id can only be claimed once"""
+    assert wallet_ledger.claim_payment(db_session, "stripe", "pi_1") is True
+    db_session.commit()
+    assert wallet_ledger.claim_payment(db_session, "stripe", "pi_1") is False
+    assert wallet_ledger.claim_payment(db_session, "omise", "pi_1") is True
+
+
+def test_stripe_topup_webhook_retry_credits_once(client, db_session):
+    """Test a retried payment_intent.succeeded webhook credits the member wallet only once"""
+    customer = _customer(db_session)
+    event = _topup_event(customer.id)
+
+    first = client.post("/api/payment-callback/webhook/stripe", json=event)
+    retry = client.post("/api/payment-callback/webhook/stripe", json=event)
+
+    assert first.status_code == 200 and retry.status_code == 200
+    assert retry.json().get("duplicate") is True
+    assert db_session.query(CustomerBalance).filter_by(customer_id=customer.id).one().balance == 100
+    assert db_session.query(ProcessedPaymentEvent).count() == 1
+    assert db_session.query(WalletLedger).count() == 1